@@ -2,12 +2,15 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q, Count
 from datetime import date
 from django.http import HttpResponse
 from django import forms
 from django.core.exceptions import ValidationError
 import csv
+from finance import rollups
+from hotels.occupancy import SOLD_STATUSES, booking_stays, record_stays
 from .models import (
     Booking, HotelBooking, BusBooking, BusBookingSeat,
     PackageBooking, PackageBookingTraveler, Review, BookingAuditLog
@@ -372,7 +375,18 @@ class BookingAdmin(admin.ModelAdmin):
     
     def cancel_booking(self, request, queryset):
         """Action to cancel bookings"""
-        count = queryset.exclude(status__in=['completed', 'cancelled']).update(status='cancelled')
+        to_cancel = queryset.exclude(status__in=['completed', 'cancelled'])
+        with transaction.atomic():
+            # Queryset update skips signals: take sold hotel nights out of the occupancy facts
+            # and fold the cancellations into the finance rollups here
+            rows = list(to_cancel.select_for_update().values_list('pk', 'booking_type', *rollups.STATE_FIELDS))
+            previous = {row[0]: rollups.FinanceState(*row[2:]) for row in rows}
+            sold_stays = booking_stays([
+                pk for pk, booking_type, status, *_ in rows if booking_type == 'hotel' and status in SOLD_STATUSES
+            ])
+            count = to_cancel.filter(pk__in=previous).update(status='cancelled', cancelled_at=timezone.now())
+            record_stays(sold_stays, -1)
+            rollups.bookings_updated(previous)
         self.message_user(request, f"{count} booking(s) cancelled.")
     cancel_booking.short_description = "Cancel selected bookings"
     
@@ -1,74 +1,147 @@
 """Inventory helpers for hotel bookings (Phase-2).
 
 These helpers work on RoomAvailability rows to ensure inventory is reduced on
-reservation and restored on cancellation. Callers should wrap operations in an
-atomic transaction to avoid race conditions.
+reservation and restored on cancellation.
+
+Every stay is handled with set-based statements instead of per-night
+get_or_create/select_for_update/save round trips:
+- missing nights are inserted in one bulk INSERT that ignores existing rows
+- all nights are decremented with one conditional UPDATE
+  (available_rooms = available_rooms - n WHERE available_rooms >= n);
+  if fewer rows than nights were updated the whole reservation is rolled back
 """
+from collections import defaultdict
 from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+
 from hotels.models import RoomAvailability, RoomType
 
 
+class InsufficientInventoryError(ValueError):
+    """Raised when at least one night of a stay cannot cover the requested rooms."""
+
+    def __init__(self, target_date, available, requested):
+        self.date = target_date
+        self.available = available
+        self.requested = requested
+        super().__init__(f"Only {available} rooms available on {target_date}")
+
+
 def _date_range(check_in, check_out):
     """Return list of dates from check_in (inclusive) to check_out (exclusive)."""
     days = (check_out - check_in).days
     return [check_in + timedelta(days=i) for i in range(max(days, 0))]
 
 
-def _get_available_rooms(room_type, target_date):
-    """Fetch available rooms for a date, defaulting to total_rooms when missing."""
-    availability = (
-        RoomAvailability.objects.select_for_update()
-        .filter(room_type=room_type, date=target_date)
+def ensure_availability_rows(room_type: RoomType, check_in, check_out):
+    """Create RoomAvailability rows for missing nights in a single INSERT.
+
+    New rows start at full capacity and base price; existing rows are left untouched.
+    """
+    dates = _date_range(check_in, check_out)
+    if not dates:
+        return
+    RoomAvailability.objects.bulk_create(
+        [
+            RoomAvailability(
+                room_type=room_type,
+                date=current_date,
+                available_rooms=room_type.total_rooms or 0,
+                price=room_type.base_price,
+            )
+            for current_date in dates
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _first_short_night(room_type, check_in, check_out, num_rooms):
+    return (
+        RoomAvailability.objects.filter(
+            room_type=room_type,
+            date__gte=check_in,
+            date__lt=check_out,
+            available_rooms__lt=num_rooms,
+        )
+        .order_by('date')
+        .values_list('date', 'available_rooms')
         .first()
     )
-    if availability:
-        return availability.available_rooms
-    return room_type.total_rooms or 0
 
 
 def reserve_inventory(room_type: RoomType, check_in, check_out, num_rooms: int):
     """Reduce availability for each night in the stay.
 
-    Raises ValueError if any date has insufficient availability.
+    Raises InsufficientInventoryError (a ValueError) if any date has insufficient
+    availability; no night is changed in that case.
     """
     if num_rooms <= 0:
         return
 
-    dates = _date_range(check_in, check_out)
-    # First pass: validate availability
-    for current_date in dates:
-        available = _get_available_rooms(room_type, current_date)
-        if available < num_rooms:
-            raise ValueError(f"Only {available} rooms available on {current_date}")
-
-    # Second pass: apply reductions
-    for current_date in dates:
-        availability, _ = RoomAvailability.objects.select_for_update().get_or_create(
+    nights = len(_date_range(check_in, check_out))
+    if not nights:
+        return
+
+    with transaction.atomic():
+        ensure_availability_rows(room_type, check_in, check_out)
+        updated = RoomAvailability.objects.filter(
             room_type=room_type,
-            date=current_date,
-            defaults={
-                'available_rooms': room_type.total_rooms or 0,
-                'price': room_type.base_price,
-            },
-        )
-        availability.available_rooms = max(availability.available_rooms - num_rooms, 0)
-        availability.save(update_fields=['available_rooms'])
+            date__gte=check_in,
+            date__lt=check_out,
+            available_rooms__gte=num_rooms,
+        ).update(available_rooms=F('available_rooms') - num_rooms)
+
+        if updated < nights:
+            # Raising inside atomic() undoes the partial decrement
+            short = _first_short_night(room_type, check_in, check_out, num_rooms)
+            short_date, available = short if short else (check_in, 0)
+            raise InsufficientInventoryError(short_date, available, num_rooms)
 
 
 def restore_inventory(room_type: RoomType, check_in, check_out, num_rooms: int):
-    """Restore availability after cancellation."""
+    """Restore availability after cancellation, release or expiry.
+
+    ``room_type`` may be a RoomType or its id.
+
+    Only stored nights are incremented: a night without a row was never
+    decremented and already reads as full capacity.
+    """
     if num_rooms <= 0:
-        return
+        return 0
 
-    dates = _date_range(check_in, check_out)
-    for current_date in dates:
-        availability, _ = RoomAvailability.objects.select_for_update().get_or_create(
-            room_type=room_type,
-            date=current_date,
-            defaults={
-                'available_rooms': room_type.total_rooms or 0,
-                'price': room_type.base_price,
-            },
-        )
-        availability.available_rooms += num_rooms
-        availability.save(update_fields=['available_rooms'])
+    return RoomAvailability.objects.filter(
+        room_type=room_type,
+        date__gte=check_in,
+        date__lt=check_out,
+    ).update(available_rooms=F('available_rooms') + num_rooms)
+
+
+def restore_inventory_bulk(stays):
+    """Restore availability for many stays with aggregated UPDATEs.
+
+    ``stays`` is an iterable of ``(room_type_id, check_in, check_out, num_rooms)``.
+    Rooms are summed per (room_type, night) and applied with one
+    ``F('available_rooms') + n`` UPDATE per (room_type, n) group, so the
+    statement count depends on how varied the stays are, not how many there are.
+    Returns the number of RoomAvailability rows updated.
+    """
+    per_night = defaultdict(int)
+    for room_type_id, check_in, check_out, num_rooms in stays:
+        if not num_rooms or num_rooms <= 0:
+            continue
+        for current_date in _date_range(check_in, check_out):
+            per_night[(room_type_id, current_date)] += num_rooms
+
+    groups = defaultdict(list)
+    for (room_type_id, current_date), rooms in per_night.items():
+        groups[(room_type_id, rooms)].append(current_date)
+
+    updated = 0
+    for (room_type_id, rooms), dates in groups.items():
+        updated += RoomAvailability.objects.filter(
+            room_type_id=room_type_id,
+            date__in=dates,
+        ).update(available_rooms=F('available_rooms') + rooms)
+    return updated
@@ -0,0 +1,37 @@
+"""
+Management command to queue reminders for upcoming hotel check-ins, bus journeys and package departures.
+Safe to re-run (bookings already reminded are skipped); run hourly via cron:
+0 * * * * cd /path/to/project && python manage.py send_booking_reminders
+python manage.py send_booking_reminders [--lead-days 1] [--type hotel] [--chunk-size 500] [--dry-run]
+"""
+from django.core.management.base import BaseCommand
+
+from bookings.reminders import REMINDER_CHUNK_SIZE, SOURCES, send_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue booking reminders for the upcoming reminder window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-days', type=int, default=None, help='Days ahead to remind (default REMINDER_LEAD_DAYS)')
+        parser.add_argument('--type', choices=list(SOURCES), action='append', dest='types', help='Booking type (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=REMINDER_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Count due reminders without queueing them')
+
+    def handle(self, *args, **options):
+        metrics = send_reminders(
+            lead=options['lead_days'], chunk_size=options['chunk_size'],
+            booking_types=options['types'], dry_run=options['dry_run'],
+        )
+        for booking_type, count in metrics['by_type'].items():
+            self.stdout.write(f"  {booking_type}: {count} reminders")
+        self.stdout.write(
+            f"  Window {metrics['window']}: scanned {metrics['scanned']} bookings in {metrics['chunks']} chunks, "
+            f"{metrics['skipped_duplicate']} already reminded"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would queue' if metrics['dry_run'] else 'Queued'} {metrics['queued']} reminders "
+            f"({metrics['notifications']} notifications) in {metrics['duration_seconds']}s "
+            f"({metrics['bookings_per_second']} bookings/s); lag max {metrics['max_lag_seconds']}s, "
+            f"avg {metrics['avg_lag_seconds']}s"
+        ))
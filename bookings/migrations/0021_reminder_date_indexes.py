@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0020_promocode_promocodeusage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hotelbooking',
+            index=models.Index(fields=['check_in'], name='hotelbooking_check_in_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='busbooking',
+            index=models.Index(fields=['journey_date'], name='busbooking_journey_date_idx'),
+        ),
+    ]
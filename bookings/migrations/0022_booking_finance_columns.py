@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0021_reminder_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='wallet_used_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Paid from wallet/cashback, stamped at finalization', max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created_at'], name='booking_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['confirmed_at'], name='booking_confirmed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['cancelled_at'], name='booking_cancelled_at_idx'),
+        ),
+    ]
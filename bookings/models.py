@@ -79,6 +79,7 @@ class Booking(TimeStampedModel):
     # Wallet traceability (for admin visibility)
     wallet_balance_before = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Wallet balance before payment")
     wallet_balance_after = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Wallet balance after payment")
+    wallet_used_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="Paid from wallet/cashback, stamped at finalization")
     
     # Contact details
     customer_name = models.CharField(max_length=200)
@@ -124,6 +125,12 @@ class Booking(TimeStampedModel):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Finance dashboards and rollup rebuilds filter on these as datetime ranges
+            models.Index(fields=['created_at'], name='booking_created_at_idx'),
+            models.Index(fields=['confirmed_at'], name='booking_confirmed_at_idx'),
+            models.Index(fields=['cancelled_at'], name='booking_cancelled_at_idx'),
+        ]
     
     def __str__(self):
         username = self.user.username if self.user else "guest"
@@ -232,7 +239,9 @@ class Booking(TimeStampedModel):
             elif lock.source == 'external_cm':
                 from hotels.channel_manager_service import ExternalChannelManagerClient, InventoryLockError
                 try:
-                    ExternalChannelManagerClient(provider=lock.provider).release_lock(lock.lock_id or lock.reference_id)
+                    ExternalChannelManagerClient(provider=lock.provider).release_lock(
+                        lock.lock_id or lock.reference_id, room_type_id=lock.room_type_id
+                    )
                 except InventoryLockError:
                     # Ignore failures; status will still be marked expired
                     pass
@@ -284,6 +293,11 @@ class HotelBooking(TimeStampedModel):
     
     total_nights = models.IntegerField()
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['check_in'], name='hotelbooking_check_in_idx'),
+        ]
+    
     def lock_cancellation_policy(self, policy: RoomCancellationPolicy):
         """Freeze cancellation policy snapshot on the booking if not already locked."""
         if self.policy_locked_at or not policy:
@@ -337,6 +351,11 @@ class BusBooking(TimeStampedModel):
     contact_phone = models.CharField(max_length=20, blank=True, help_text="Contact phone at booking time")
     departure_time_snapshot = models.CharField(max_length=20, blank=True, help_text="Departure time at booking time")
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['journey_date'], name='busbooking_journey_date_idx'),
+        ]
+    
     def __str__(self):
         return f"Bus Booking - {self.booking.booking_id}"
     
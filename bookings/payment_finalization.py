@@ -238,6 +238,10 @@ def finalize_booking_payment(
             booking.total_amount = pricing['total_payable']  # Store final amount
             booking.paid_amount = total_paid
             booking.payment_reference = gateway_transaction_id or f"wallet_{booking.booking_id}"
+            # Finance columns (finance.rollups reads these instead of the price snapshot)
+            booking.service_fee_amount = pricing['service_fee']
+            booking.gst_amount = pricing['gst_amount']
+            booking.wallet_used_amount = wallet_applied
             
             booking.save(update_fields=[
                 'status',
@@ -247,6 +251,9 @@ def finalize_booking_payment(
                 'payment_reference',
                 'wallet_balance_before',
                 'wallet_balance_after',
+                'service_fee_amount',
+                'gst_amount',
+                'wallet_used_amount',
                 'updated_at'
             ])
             
@@ -275,9 +282,8 @@ def finalize_booking_payment(
                 'wallet': float(wallet_applied),
                 'gateway': float(gateway_amount),
             }
-            logger.info("[NOTIFICATION_EMAIL] payload=%s", payload)
-            logger.info("[NOTIFICATION_SMS] payload=%s", payload)
-            logger.info("[NOTIFICATION_WHATSAPP] payload=%s", payload)
+            logger.info("[NOTIFICATION_QUEUED] payload=%s", payload)
+            _queue_confirmation(booking, user, total_paid)
             
             logger.info(
                 "[PAYMENT_FINALIZE_SUCCESS] booking=%s mode=%s user=%s status=confirmed amount=%.2f wallet=%.2f gateway=%.2f",
@@ -309,10 +315,9 @@ def finalize_booking_payment(
     # ============================================================
     # STEP 5: SUCCESS - SEND NOTIFICATIONS (ASYNC)
     # ============================================================
-    # TODO: Trigger async tasks
-    # send_booking_confirmation_sms.delay(booking.booking_id)
-    # send_booking_confirmation_email.delay(booking.booking_id)
-    # send_invoice.delay(booking.booking_id)
+    # Email/SMS/WhatsApp rows were queued in the notification outbox inside
+    # the transaction above; the outbox worker sends them after commit.
+    # TODO: send_invoice.delay(booking.booking_id)
     
     return {
         'status': 'success',
@@ -323,3 +328,27 @@ def finalize_booking_payment(
         'wallet_deducted': float(wallet_applied),
         'gateway_charged': float(gateway_amount)
     }
+
+
+def _queue_confirmation(booking, user, total_paid):
+    """Queue the booking confirmation in the notification outbox (savepoint: never fails the payment)."""
+    from notifications.services import NotificationManager
+
+    property_name = ''
+    for relation, attr in (('hotel_details', 'room_type'), ('bus_details', 'bus_name'), ('package_details', 'package')):
+        details = getattr(booking, relation, None)
+        if details is not None:
+            property_name = str(getattr(details, attr, '') or '')
+            break
+    try:
+        with transaction.atomic():
+            NotificationManager.send_booking_confirmation(user, {
+                'booking_id': str(booking.booking_id),
+                'booking_type': booking.get_booking_type_display(),
+                'property_name': property_name,
+                'booking_date': timezone.localdate().isoformat(),
+                'price': f"{total_paid:.2f}",
+                'status': 'Confirmed',
+            })
+    except Exception as exc:  # noqa: BLE001
+        logger.error("[NOTIFICATION_QUEUE_ERROR] booking=%s error=%s", booking.booking_id, exc, exc_info=True)
@@ -0,0 +1,144 @@
+"""
+Scheduled booking reminders
+
+Queues "your trip is coming up" reminders for confirmed bookings whose
+hotel check-in, bus journey date or package departure falls inside the
+reminder window (today .. today + REMINDER_LEAD_DAYS, so a missed run
+catches up on the next one):
+- each booking type is scanned in keyset chunks over its indexed date
+  column (HotelBooking.check_in, BusBooking.journey_date,
+  PackageDeparture.departure_date), one joined query per chunk
+- bookings that already have a live ``reminder`` Notification (anything
+  but failed/dead) are skipped with one lookup per chunk, so re-running is
+  safe
+- each chunk is rendered and written to the notification outbox in one
+  batch (NotificationManager.send_bulk); the outbox worker sends them
+  under NOTIFICATION_OUTBOX_RATE_LIMITS
+- send_reminders() returns throughput and lag metrics: lag is how long
+  after its window opened (midnight, lead days before the event) a
+  reminder was queued
+"""
+import logging
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from bookings.models import BusBooking, HotelBooking, PackageBooking
+from notifications.models import Notification
+
+logger = logging.getLogger(__name__)
+
+REMINDER_CHUNK_SIZE = 500
+
+
+def lead_days():
+    return getattr(settings, 'REMINDER_LEAD_DAYS', 1)
+
+
+def _hotel_reminder(details):
+    hotel = details.room_type.hotel
+    return details.check_in, {
+        'property_name': hotel.name,
+        'check_in_time': f"Check-in from {hotel.checkin_time:%H:%M}" if hotel.checkin_time else 'As per confirmation',
+    }
+
+
+def _bus_reminder(details):
+    return details.journey_date, {
+        'property_name': details.route_name or details.operator_name or details.bus_name,
+        'check_in_time': f"Departs {details.departure_time_snapshot}" if details.departure_time_snapshot else 'As per confirmation',
+    }
+
+
+def _package_reminder(details):
+    departure = details.package_departure
+    return departure.departure_date, {'property_name': departure.package.name}
+
+
+# booking type -> (details model, date lookup, select_related, reminder data)
+SOURCES = {
+    'hotel': (HotelBooking, 'check_in', ['booking__user', 'room_type__hotel'], _hotel_reminder),
+    'bus': (BusBooking, 'journey_date', ['booking__user'], _bus_reminder),
+    'package': (PackageBooking, 'package_departure__departure_date', ['booking__user', 'package_departure__package'], _package_reminder),
+}
+
+
+def due_chunks(booking_type, start, end, chunk_size=REMINDER_CHUNK_SIZE):
+    """Yield lists of confirmed ``booking_type`` details rows with their event date in [start, end]."""
+    model, date_field, related, _ = SOURCES[booking_type]
+    queryset = model.objects.filter(
+        **{f'{date_field}__gte': start, f'{date_field}__lte': end},
+        booking__status='confirmed', booking__is_deleted=False,
+    ).select_related(*related).order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def already_reminded(booking_ids):
+    """The subset of ``booking_ids`` (strings) with a reminder queued or sent."""
+    return set(
+        Notification.objects.filter(kind='reminder', booking_id__in=booking_ids)
+        .exclude(status__in=['failed', 'dead']).values_list('booking_id', flat=True)
+    )
+
+
+def send_reminders(lead=None, chunk_size=REMINDER_CHUNK_SIZE, booking_types=None, dry_run=False, now=None):
+    """Queue every due reminder; returns per-run metrics."""
+    from notifications.services import NotificationManager
+
+    started = time.monotonic()
+    now = now or timezone.now()
+    lead = lead_days() if lead is None else lead
+    today = timezone.localdate(now)
+    end = today + timedelta(days=lead)
+
+    metrics = {'scanned': 0, 'queued': 0, 'skipped_duplicate': 0, 'notifications': 0, 'chunks': 0, 'by_type': {}}
+    lags = []
+    for booking_type in booking_types or SOURCES:
+        reminder_data = SOURCES[booking_type][3]
+        queued = 0
+        for chunk in due_chunks(booking_type, today, end, chunk_size):
+            metrics['chunks'] += 1
+            metrics['scanned'] += len(chunk)
+            sent = already_reminded([str(details.booking.booking_id) for details in chunk])
+            recipients = []
+            for details in chunk:
+                booking = details.booking
+                if str(booking.booking_id) in sent:
+                    metrics['skipped_duplicate'] += 1
+                    continue
+                event_date, extra = reminder_data(details)
+                recipients.append((booking.user, {
+                    'booking_id': str(booking.booking_id),
+                    'booking_type': booking.get_booking_type_display(),
+                    'booking_date': event_date.isoformat(),
+                    'email': booking.customer_email,
+                    **({'user_name': booking.customer_name} if booking.customer_name else {}),
+                    **extra,
+                }))
+                window_opens = timezone.make_aware(datetime.combine(event_date - timedelta(days=lead), dt_time.min))
+                lags.append(max((now - window_opens).total_seconds(), 0.0))
+            if recipients and not dry_run:
+                metrics['notifications'] += len(NotificationManager.send_bulk('reminder', recipients))
+            queued += len(recipients)
+        metrics['by_type'][booking_type] = queued
+        metrics['queued'] += queued
+
+    duration = time.monotonic() - started
+    metrics.update({
+        'duration_seconds': round(duration, 3),
+        'bookings_per_second': round(metrics['scanned'] / duration, 1) if duration > 0 else float(metrics['scanned']),
+        'max_lag_seconds': round(max(lags), 1) if lags else 0.0,
+        'avg_lag_seconds': round(sum(lags) / len(lags), 1) if lags else 0.0,
+        'window': f'{today.isoformat()}..{end.isoformat()}',
+        'dry_run': dry_run,
+    })
+    logger.info("[BOOKING_REMINDERS_RUN] %s", metrics)
+    return metrics
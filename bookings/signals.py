@@ -1,10 +1,14 @@
 """
-Signals for Booking app - auto-set timestamps for state transitions
+Signals for Booking app - auto-set timestamps for state transitions and keep
+room-night facts (hotels.occupancy) in step with hotel booking status
 """
-from django.db.models.signals import post_save, pre_save
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Booking
+from hotels.occupancy import booking_stays, is_sold, record_stays
+from .models import Booking, HotelBooking
 import logging
 
 logger = logging.getLogger(__name__)
@@ -57,3 +61,69 @@ def log_booking_state_transition(sender, instance, created, **kwargs):
         user_email = instance.user.email if instance.user else instance.customer_email
         logger.info("[BOOKING_CREATED] booking=%s user=%s type=%s status=%s expires_at=%s", 
                    instance.booking_id, user_email, instance.booking_type, instance.status, instance.expires_at)
+
+
+# Room-night facts (hotels.occupancy): a hotel booking's nights count as sold
+# while the booking is confirmed/completed, with its total_amount as revenue.
+
+@receiver(pre_save, sender=Booking)
+def remember_sold_state(sender, instance, raw=False, **kwargs):
+    instance._was_sold, instance._previous_total = False, None
+    if raw or instance.pk is None or instance.booking_type != 'hotel':
+        return
+    previous = Booking.objects.filter(pk=instance.pk).values_list('status', 'total_amount').first()
+    if previous:
+        instance._was_sold, instance._previous_total = is_sold(previous[0]), previous[1]
+
+
+@receiver(post_save, sender=Booking)
+def update_room_night_facts_for_booking(sender, instance, raw=False, **kwargs):
+    if raw or instance.booking_type != 'hotel':
+        return
+    was_sold = getattr(instance, '_was_sold', False)
+    now_sold = is_sold(instance.status)
+    if was_sold != now_sold:
+        record_stays(booking_stays([instance.pk]), 1 if now_sold else -1)
+        return
+    previous_total = getattr(instance, '_previous_total', None)
+    if now_sold and previous_total is not None and Decimal(str(instance.total_amount)) != previous_total:
+        # Re-priced while sold: move the nights' revenue from the old amount to the new one
+        stays = booking_stays([instance.pk])
+        record_stays([stay[:-1] + (previous_total,) for stay in stays], -1)
+        record_stays(stays)
+
+
+@receiver(pre_save, sender=HotelBooking)
+def remember_stay(sender, instance, raw=False, **kwargs):
+    instance._previous_stay = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_stay = HotelBooking.objects.filter(pk=instance.pk).values_list(
+        'room_type__hotel_id', 'room_type_id', 'check_in', 'check_out', 'number_of_rooms', 'booking__total_amount',
+    ).first()
+
+
+@receiver(post_save, sender=HotelBooking)
+def update_room_night_facts_for_stay(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if not is_sold(Booking.objects.filter(pk=instance.booking_id).values_list('status', flat=True).first()):
+        return
+    stays = booking_stays([instance.booking_id])
+    previous = getattr(instance, '_previous_stay', None)
+    if previous == (stays[0] if stays else None):
+        return
+    if previous:
+        record_stays([previous], -1)
+    record_stays(stays)
+
+
+@receiver(post_delete, sender=HotelBooking)
+def remove_room_night_facts_for_stay(sender, instance, **kwargs):
+    # Also runs when the parent Booking is deleted: children go first, so the
+    # booking row is still readable here
+    if is_sold(instance.booking.status):
+        record_stays([(
+            instance.room_type.hotel_id, instance.room_type_id, instance.check_in, instance.check_out,
+            instance.number_of_rooms, instance.booking.total_amount,
+        )], -1)
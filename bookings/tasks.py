@@ -14,82 +14,51 @@ def auto_expire_reservations():
     Auto-expire bookings that haven't been paid in 10 minutes.
     Releases inventory and marks booking as EXPIRED.
     
+    Bookings are claimed and expired in chunks (see bookings.expiry); each
+    chunk's expiry emails are queued as one job, which writes them to the
+    notification outbox in a single batch. Returns throughput metrics for the run.
+    
     This task should be run every 5 minutes via RQ scheduler.
     """
-    from bookings.models import Booking
-    from hotels.models import Hotel, RoomAvailability
-    from buses.models import BusSchedule, BusBookingSeat
+    from bookings.expiry import expire_reservations
     
-    now = timezone.now()
-    ten_min_ago = now - timedelta(minutes=10)
+    return expire_reservations(enqueue_emails=send_booking_expired_emails_job.delay)
+
+
+@job
+def send_booking_reminders():
+    """
+    Queue reminders for confirmed bookings starting within REMINDER_LEAD_DAYS
+    (see bookings.reminders); re-running is safe. Returns throughput/lag metrics.
     
-    # Find expired reservations
-    expired_bookings = Booking.objects.filter(
-        status='reserved',
-        reserved_at__lte=ten_min_ago,
-        is_deleted=False
-    )
+    Run hourly via RQ scheduler (or the send_booking_reminders command from cron).
+    """
+    from bookings.reminders import send_reminders
     
-    updated_count = 0
-    
-    for booking in expired_bookings:
-        try:
-            # Release inventory based on booking type
-            if booking.booking_type == 'hotel':
-                release_hotel_inventory(booking)
-            elif booking.booking_type == 'bus':
-                release_bus_inventory(booking)
-            elif booking.booking_type == 'package':
-                release_package_inventory(booking)
-            
-            # Mark as expired
-            booking.status = 'expired'
-            booking.cancelled_at = now
-            booking.save(update_fields=['status', 'cancelled_at', 'updated_at'])
-            try:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.info("[BOOKING_EXPIRED] booking=%s status=expired reserved_at=%s", booking.booking_id, booking.reserved_at)
-                payload = {'booking_id': str(booking.booking_id), 'event': 'booking_expired'}
-                logger.info("[NOTIFICATION_EMAIL] payload=%s", payload)
-                logger.info("[NOTIFICATION_SMS] payload=%s", payload)
-                logger.info("[NOTIFICATION_WHATSAPP] payload=%s", payload)
-            except Exception:
-                pass
-            
-            # Send email to user
-            send_booking_expired_email(booking)
-            
-            updated_count += 1
-        except Exception as e:
-            print(f"Error expiring booking {booking.booking_id}: {str(e)}")
+    return send_reminders()
+
+
+@job
+def send_booking_expired_emails_job(booking_pks):
+    """Queue the expiry emails for one chunk of bookings (queued by auto_expire_reservations)"""
+    from bookings.expiry import queue_expiry_notices
     
-    return {
-        'expired_count': updated_count,
-        'timestamp': str(now),
-        'status': 'completed'
-    }
+    return queue_expiry_notices(booking_pks)
 
 
 def release_hotel_inventory(booking):
     """Release hotel room back to availability"""
-    from hotels.models import RoomAvailability
+    from bookings.inventory_utils import restore_inventory
     
     hotel_booking = booking.hotel_details
     
-    # Restore available rooms for each night
-    for i in range(hotel_booking.total_nights):
-        current_date = hotel_booking.check_in + timedelta(days=i)
-        
-        availability, created = RoomAvailability.objects.get_or_create(
-            hotel=hotel_booking.room_type.hotel,
-            date=current_date,
-            defaults={'available_rooms': hotel_booking.number_of_rooms}
-        )
-        
-        if not created:
-            availability.available_rooms += hotel_booking.number_of_rooms
-            availability.save(update_fields=['available_rooms', 'updated_at'])
+    # Restore available rooms for every night in one UPDATE
+    restore_inventory(
+        room_type=hotel_booking.room_type_id,
+        check_in=hotel_booking.check_in,
+        check_out=hotel_booking.check_out,
+        num_rooms=hotel_booking.number_of_rooms or 1,
+    )
 
 
 def release_bus_inventory(booking):
@@ -0,0 +1,142 @@
+"""
+Reservation expiry tests
+Chunked, set-based expiry of bookings and stale inventory locks
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import City
+from hotels.channel_manager_service import InternalInventoryService, expire_stale_locks
+from hotels.models import Hotel, RoomAvailability, RoomType
+from packages.models import Package, PackageDeparture
+from notifications import resolution
+from notifications.models import Notification
+from .expiry import expire_reservations, queue_expiry_notices
+from .inventory_utils import reserve_inventory
+from .models import Booking, HotelBooking, InventoryLock, PackageBooking
+
+
+class ReservationExpiryTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+        city = City.objects.create(name='Goa', state='Goa')
+        self.hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a',
+            contact_phone='1', contact_email='h@x.com',
+        )
+        self.room_type = RoomType.objects.create(
+            hotel=self.hotel, name='Std', description='d',
+            base_price=Decimal('2500.00'), total_rooms=10,
+        )
+        package = Package.objects.create(
+            name='Goa Escape', description='d', package_type='beach',
+            duration_days=3, duration_nights=2, starting_price=Decimal('9999.00'),
+        )
+        self.departure = PackageDeparture.objects.create(
+            package=package, departure_date=date.today() + timedelta(days=30),
+            return_date=date.today() + timedelta(days=33),
+            available_slots=4, price_per_person=Decimal('9999.00'),
+        )
+        self.check_in = date.today() + timedelta(days=7)
+        self.check_out = self.check_in + timedelta(days=3)
+        self.stale = timezone.now() - timedelta(minutes=30)
+
+    def _booking(self, booking_type, reserved_at):
+        booking = Booking.objects.create(
+            user=self.user, booking_type=booking_type, status='reserved',
+            total_amount=Decimal('100.00'), customer_name='G', customer_email='g@x.com', customer_phone='9',
+        )
+        # pre_save stamps reserved_at on create; backdate it afterwards
+        Booking.objects.filter(pk=booking.pk).update(reserved_at=reserved_at)
+        return booking
+
+    def _hotel_booking(self, reserved_at, rooms=1):
+        booking = self._booking('hotel', reserved_at)
+        reserve_inventory(self.room_type, self.check_in, self.check_out, rooms)
+        HotelBooking.objects.create(
+            booking=booking, room_type=self.room_type, check_in=self.check_in,
+            check_out=self.check_out, number_of_rooms=rooms, total_nights=3,
+        )
+        return booking
+
+    def test_expires_in_chunks_and_restores_inventory(self):
+        stale_hotel = [self._hotel_booking(self.stale, rooms=r) for r in (1, 2, 2)]
+        fresh = self._hotel_booking(timezone.now())
+        package_booking = self._booking('package', self.stale)
+        PackageBooking.objects.create(booking=package_booking, package_departure=self.departure)
+
+        queued = []
+        with self.captureOnCommitCallbacks(execute=True):
+            metrics = expire_reservations(enqueue_email=queued.append, chunk_size=2)
+
+        self.assertEqual(metrics['expired_count'], 4)
+        self.assertEqual(metrics['chunks'], 2)
+        self.assertEqual(metrics['availability_rows_updated'], 6)
+        self.assertEqual(metrics['package_slots_released'], 1)
+        self.assertEqual(metrics['bookings_handed_off'], 4)
+        self.assertIn('bookings_per_second', metrics)
+        self.assertCountEqual(queued, [b.pk for b in stale_hotel] + [package_booking.pk])
+
+        self.assertEqual(
+            set(Booking.objects.filter(status='expired').values_list('pk', flat=True)),
+            {b.pk for b in stale_hotel} | {package_booking.pk},
+        )
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'reserved')
+        # Only the fresh reservation's room is still held
+        self.assertEqual(
+            set(RoomAvailability.objects.filter(room_type=self.room_type).values_list('available_rooms', flat=True)),
+            {9},
+        )
+        self.departure.refresh_from_db()
+        self.assertEqual(self.departure.available_slots, 5)
+
+    def test_nothing_to_expire(self):
+        metrics = expire_reservations()
+        self.assertEqual(metrics['expired_count'], 0)
+        self.assertEqual(metrics['chunks'], 0)
+
+    def test_expiry_notices_are_queued_per_chunk(self):
+        bookings = [self._booking('package', self.stale) for _ in range(3)]
+        chunks = []
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_reservations(enqueue_emails=chunks.append, chunk_size=2)
+        self.assertEqual(sorted(len(chunk) for chunk in chunks), [1, 2])
+
+        # Bookings, preferences, templates (first use in this process), one INSERT
+        resolution.reset()
+        with self.assertNumQueries(4):
+            self.assertEqual(queue_expiry_notices([b.pk for b in bookings]), 3)
+        notice = Notification.objects.filter(booking_id=str(bookings[0].booking_id)).get()
+        self.assertEqual((notice.status, notice.recipient), ('pending', 'g@x.com'))
+        self.assertIn('expired due to non-payment', notice.body)
+
+    def test_expire_stale_locks(self):
+        service = InternalInventoryService(self.hotel)
+        stale_locks = [
+            service.lock_inventory(self.room_type, self.check_in, self.check_out, num_rooms=n) for n in (1, 3)
+        ]
+        live = service.lock_inventory(self.room_type, self.check_in, self.check_out, num_rooms=2)
+        external = InventoryLock.objects.create(
+            hotel=self.hotel, room_type=self.room_type, reference_id='EXT-1', source='external_cm',
+            check_in=self.check_in, check_out=self.check_out, expires_at=self.stale,
+        )
+        InventoryLock.objects.filter(pk__in=[lock.pk for lock in stale_locks]).update(expires_at=self.stale)
+
+        totals = expire_stale_locks(chunk_size=2)
+
+        self.assertEqual(totals, {'released': 2, 'expired': 1, 'availability_rows_updated': 3})
+        statuses = dict(InventoryLock.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[live.pk], 'active')
+        self.assertEqual(statuses[external.pk], 'expired')
+        self.assertTrue(all(statuses[lock.pk] == 'released' for lock in stale_locks))
+        self.assertEqual(
+            set(RoomAvailability.objects.filter(room_type=self.room_type).values_list('available_rooms', flat=True)),
+            {8},
+        )
@@ -0,0 +1,92 @@
+"""
+Inventory reservation tests
+Set-based reserve/restore on RoomAvailability and the internal CM lock path
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core.models import City
+from hotels.channel_manager_service import InternalInventoryService, InventoryLockError
+from hotels.models import Hotel, RoomAvailability, RoomType
+from .inventory_utils import InsufficientInventoryError, reserve_inventory, restore_inventory
+
+
+class InventoryReservationTests(TestCase):
+
+    def setUp(self):
+        city = City.objects.create(name='Goa', state='Goa')
+        self.hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a',
+            contact_phone='1', contact_email='h@x.com',
+        )
+        self.room_type = RoomType.objects.create(
+            hotel=self.hotel, name='Std', description='d',
+            base_price=Decimal('2500.00'), total_rooms=5,
+        )
+        self.check_in = date.today() + timedelta(days=10)
+        self.check_out = self.check_in + timedelta(days=14)
+
+    def _rooms_by_date(self):
+        return dict(
+            RoomAvailability.objects.filter(room_type=self.room_type).values_list('date', 'available_rooms')
+        )
+
+    def test_reserve_creates_missing_nights_and_decrements(self):
+        RoomAvailability.objects.create(
+            room_type=self.room_type, date=self.check_in + timedelta(days=3),
+            available_rooms=4, price=Decimal('2600.00'),
+        )
+
+        reserve_inventory(self.room_type, self.check_in, self.check_out, 2)
+
+        rooms = self._rooms_by_date()
+        self.assertEqual(len(rooms), 14)
+        self.assertEqual(rooms[self.check_in], 3)
+        self.assertEqual(rooms[self.check_in + timedelta(days=3)], 2)
+
+    def test_query_count_independent_of_stay_length(self):
+        with self.assertNumQueries(4):
+            reserve_inventory(self.room_type, self.check_in, self.check_in + timedelta(days=2), 1)
+        with self.assertNumQueries(4):
+            reserve_inventory(self.room_type, self.check_in, self.check_out, 1)
+
+    def test_shortage_rolls_back_every_night(self):
+        short_date = self.check_in + timedelta(days=6)
+        RoomAvailability.objects.create(
+            room_type=self.room_type, date=short_date, available_rooms=1, price=Decimal('2500.00'),
+        )
+        reserve_inventory(self.room_type, self.check_in, self.check_in + timedelta(days=1), 1)
+        before = self._rooms_by_date()
+
+        with self.assertRaises(InsufficientInventoryError) as ctx:
+            reserve_inventory(self.room_type, self.check_in, self.check_out, 2)
+
+        self.assertEqual(ctx.exception.date, short_date)
+        self.assertEqual(str(ctx.exception), f'Only 1 rooms available on {short_date}')
+        after = self._rooms_by_date()
+        self.assertEqual({d: after[d] for d in before}, before)
+        self.assertTrue(all(value == 5 for d, value in after.items() if d not in before))
+
+    def test_restore_only_touches_stored_nights(self):
+        reserve_inventory(self.room_type, self.check_in, self.check_in + timedelta(days=2), 2)
+
+        restored = restore_inventory(self.room_type, self.check_in, self.check_out, 2)
+
+        self.assertEqual(restored, 2)
+        self.assertEqual(set(self._rooms_by_date().values()), {5})
+
+    def test_internal_lock_and_release(self):
+        service = InternalInventoryService(self.hotel)
+        lock = service.lock_inventory(self.room_type, self.check_in, self.check_out, num_rooms=5)
+        self.assertEqual(set(self._rooms_by_date().values()), {0})
+
+        with self.assertRaisesMessage(InventoryLockError, 'Only 0 rooms left for'):
+            service.lock_inventory(self.room_type, self.check_in, self.check_out, num_rooms=1)
+
+        service.release_lock(lock)
+        lock.refresh_from_db()
+        self.assertEqual(lock.status, 'released')
+        self.assertEqual(set(self._rooms_by_date().values()), {5})
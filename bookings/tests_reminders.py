@@ -0,0 +1,102 @@
+"""
+Booking reminder tests
+Chunked selection of upcoming check-ins/departures, de-duplication and outbox hand-off
+"""
+
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import City
+from hotels.models import Hotel, RoomType
+from notifications import resolution
+from notifications.models import Notification, NotificationPreference
+from notifications.outbox import RateLimiter
+from packages.models import Package, PackageDeparture
+from .models import Booking, HotelBooking, PackageBooking
+from .reminders import send_reminders
+
+
+class BookingReminderTests(TestCase):
+
+    def setUp(self):
+        resolution.reset()
+        self.addCleanup(resolution.reset)
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+        NotificationPreference.objects.create(user=self.user, sms_booking_reminder=True, phone_number='919000000001')
+        city = City.objects.create(name='Goa', state='Goa')
+        hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+        )
+        self.room_type = RoomType.objects.create(
+            hotel=hotel, name='Std', description='d', base_price=Decimal('2500.00'), total_rooms=10,
+        )
+        package = Package.objects.create(
+            name='Goa Escape', description='d', package_type='beach',
+            duration_days=3, duration_nights=2, starting_price=Decimal('9999.00'),
+        )
+        self.departure = PackageDeparture.objects.create(
+            package=package, departure_date=timezone.localdate() + timedelta(days=1),
+            return_date=timezone.localdate() + timedelta(days=4), available_slots=4, price_per_person=Decimal('9999.00'),
+        )
+
+    def _booking(self, booking_type, user=None, status='confirmed', email='g@x.com'):
+        return Booking.objects.create(
+            user=user, booking_type=booking_type, status=status, total_amount=Decimal('100.00'),
+            customer_name='Guest', customer_email=email, customer_phone='9',
+        )
+
+    def _hotel(self, days_ahead, **kwargs):
+        booking = self._booking('hotel', **kwargs)
+        check_in = timezone.localdate() + timedelta(days=days_ahead)
+        HotelBooking.objects.create(
+            booking=booking, room_type=self.room_type, check_in=check_in,
+            check_out=check_in + timedelta(days=2), total_nights=2,
+        )
+        return booking
+
+    def test_queues_due_reminders_once_in_chunks(self):
+        due = [self._hotel(1, user=self.user) for _ in range(3)] + [self._hotel(0, email='walkin@x.com')]
+        self._hotel(5, user=self.user)
+        self._hotel(1, user=self.user, status='cancelled')
+        package = self._booking('package', user=self.user)
+        PackageBooking.objects.create(booking=package, package_departure=self.departure)
+
+        metrics = send_reminders(chunk_size=2)
+        self.assertEqual(metrics['by_type'], {'hotel': 4, 'bus': 0, 'package': 1})
+        self.assertEqual((metrics['scanned'], metrics['chunks'], metrics['skipped_duplicate']), (5, 3, 0))
+        # email + SMS for the user's four bookings, email only for the walk-in guest
+        self.assertEqual(metrics['notifications'], 9)
+        self.assertGreaterEqual(metrics['max_lag_seconds'], metrics['avg_lag_seconds'])
+
+        walkin = Notification.objects.get(booking_id=str(due[-1].booking_id))
+        self.assertEqual((walkin.kind, walkin.recipient, walkin.status), ('reminder', 'walkin@x.com', 'pending'))
+        self.assertIn('Sea View', walkin.body)
+        self.assertIn('Check-in from 14:00', walkin.body)
+
+        Notification.objects.filter(booking_id=str(due[0].booking_id)).update(status='dead')
+        again = send_reminders(chunk_size=2)
+        self.assertEqual((again['queued'], again['skipped_duplicate']), (1, 4))
+
+    def test_dry_run_and_command(self):
+        self._hotel(1, user=self.user)
+        self.assertEqual(send_reminders(dry_run=True)['queued'], 1)
+        self.assertFalse(Notification.objects.exists())
+
+        out = io.StringIO()
+        call_command('send_booking_reminders', types=['hotel'], stdout=out)
+        self.assertIn('Queued 1 reminders (2 notifications)', out.getvalue())
+        self.assertEqual(Notification.objects.filter(kind='reminder').count(), 2)
+
+    def test_rate_limiter_spaces_batches(self):
+        clock = [0.0]
+        limiter = RateLimiter(10, clock=lambda: clock[0], sleep=lambda s: clock.__setitem__(0, clock[0] + s))
+        self.assertEqual(limiter.acquire(10), 0.0)
+        self.assertAlmostEqual(limiter.acquire(5), 0.5)
+        self.assertAlmostEqual(limiter.acquire(25), 1.0)
+        self.assertAlmostEqual(clock[0], 1.5)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BusesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'buses'
+
+    def ready(self):
+        """Register signals when app is ready"""
+        import buses.signals  # noqa
@@ -0,0 +1,25 @@
+"""
+Management command to rebuild the bus trip search index (BusTripIndex).
+Drops past dates and regenerates the forward window; schedule it daily so the
+window keeps rolling:
+python manage.py rebuild_bus_trip_index --days 60
+"""
+from django.core.management.base import BaseCommand
+
+from buses.trip_index import rebuild_trip_index
+
+
+class Command(BaseCommand):
+    help = 'Regenerate BusTripIndex rows for every route over the forward window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Days to generate from today (default: settings.BUS_TRIP_INDEX_DAYS or 60)',
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_trip_index(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} bus trips'))
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BACKFILL_DAYS = 60
+WEEKDAY_FLAGS = (
+    'operates_monday', 'operates_tuesday', 'operates_wednesday', 'operates_thursday',
+    'operates_friday', 'operates_saturday', 'operates_sunday',
+)
+
+
+def backfill_trip_index(apps, schema_editor):
+    """Generate the first window of trips; rebuild_bus_trip_index rolls it forward."""
+    BusRoute = apps.get_model('buses', 'BusRoute')
+    BusSchedule = apps.get_model('buses', 'BusSchedule')
+    BusTripIndex = apps.get_model('buses', 'BusTripIndex')
+
+    start = date.today()
+    end = start + timedelta(days=BACKFILL_DAYS)
+    schedules = {
+        (schedule.route_id, schedule.date): schedule
+        for schedule in BusSchedule.objects.filter(date__gte=start, date__lt=end)
+    }
+    rows = []
+    for route in BusRoute.objects.filter(is_active=True, bus__operator__isnull=False).select_related('bus__operator'):
+        bus = route.bus
+        operator = bus.operator
+        visible = bool(bus.is_active and operator.approval_status == 'approved' and operator.is_active)
+        for offset in range(BACKFILL_DAYS):
+            day = start + timedelta(days=offset)
+            schedule = schedules.get((route.id, day))
+            if schedule is not None:
+                if not schedule.is_active or schedule.is_cancelled:
+                    continue
+            elif not getattr(route, WEEKDAY_FLAGS[day.weekday()]):
+                continue
+            rows.append(BusTripIndex(
+                route_id=route.id,
+                schedule_id=schedule.id if schedule else None,
+                bus_id=bus.id,
+                operator_id=operator.id,
+                source_city_id=route.source_city_id,
+                destination_city_id=route.destination_city_id,
+                date=day,
+                departure_time=route.departure_time,
+                arrival_time=route.arrival_time,
+                fare=schedule.fare if schedule else route.base_fare,
+                available_seats=schedule.available_seats if schedule else bus.total_seats,
+                total_seats=bus.total_seats,
+                bus_type=bus.bus_type,
+                has_ac=bus.has_ac,
+                manufacturing_year=bus.manufacturing_year,
+                operator_rating=operator.rating,
+                is_visible=visible,
+            ))
+    BusTripIndex.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_corporateaccount'),
+        ('buses', '0007_busscheduleimport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusTripIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('departure_time', models.TimeField()),
+                ('arrival_time', models.TimeField()),
+                ('fare', models.DecimalField(decimal_places=2, help_text='Schedule fare, or the route base fare', max_digits=10)),
+                ('available_seats', models.IntegerField(help_text='Schedule seats, or bus capacity when no schedule exists yet')),
+                ('total_seats', models.IntegerField()),
+                ('bus_type', models.CharField(max_length=20)),
+                ('has_ac', models.BooleanField(default=False)),
+                ('manufacturing_year', models.IntegerField(blank=True, null=True)),
+                ('operator_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('is_visible', models.BooleanField(default=True, help_text='Bus active and operator approved + active')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='buses.bus')),
+                ('destination_city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.city')),
+                ('operator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='buses.busoperator')),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trip_index_rows', to='buses.busroute')),
+                ('schedule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='buses.busschedule')),
+                ('source_city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.city')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source_city', 'destination_city', 'date', 'departure_time'], name='buses_trip_search_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bustripindex',
+            constraint=models.UniqueConstraint(fields=('route', 'date'), name='buses_trip_route_date_uniq'),
+        ),
+        migrations.RunPython(backfill_trip_index, migrations.RunPython.noop),
+    ]
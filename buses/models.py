@@ -4,7 +4,7 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.conf import settings
 from django.core.files.base import ContentFile
-from core.models import TimeStampedModel, City
+from core.models import ResponsiveImageMixin, TimeStampedModel, City
 from core.soft_delete import SoftDeleteMixin, SoftDeleteManager, AllObjectsManager
 from datetime import date
 
@@ -269,14 +269,9 @@ class Bus(TimeStampedModel):
     
     @property
     def primary_image_url(self):
-        """Get primary image URL"""
-        image = self.get_primary_image()
-        if self._image_exists(image):
-            try:
-                return image.url
-            except Exception:
-                return ''
-        return ''
+        """Get primary image URL (content-hash versioned, from the image manifest)"""
+        from core.image_manifest import display_url
+        return display_url(self)
     
     @property
     def display_image_url(self):
@@ -284,8 +279,14 @@ class Bus(TimeStampedModel):
         from django.templatetags.static import static
         return self.primary_image_url or static('images/bus_placeholder.svg')
 
+    @property
+    def image_variants(self):
+        """WebP/JPEG srcsets and card URL of the display image ({} until derivatives exist)."""
+        from core.image_manifest import display_variants
+        return display_variants(self)
+
 
-class BusImage(models.Model):
+class BusImage(ResponsiveImageMixin, models.Model):
     """Gallery images for buses (Phase 3: Multi-image support)"""
     bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='buses/gallery/')
@@ -511,6 +512,46 @@ class BusSchedule(TimeStampedModel):
         return self.occupancy_percentage > 80
 
 
+class BusTripIndex(models.Model):
+    """Denormalized search row: one per operated (route, date), kept in sync by buses.trip_index"""
+    route = models.ForeignKey(BusRoute, on_delete=models.CASCADE, related_name='trip_index_rows')
+    schedule = models.ForeignKey(BusSchedule, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    bus = models.ForeignKey(Bus, on_delete=models.CASCADE, related_name='+')
+    operator = models.ForeignKey(BusOperator, on_delete=models.CASCADE, related_name='+')
+    source_city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='+')
+    destination_city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    departure_time = models.TimeField()
+    arrival_time = models.TimeField()
+
+    fare = models.DecimalField(max_digits=10, decimal_places=2, help_text="Schedule fare, or the route base fare")
+    available_seats = models.IntegerField(help_text="Schedule seats, or bus capacity when no schedule exists yet")
+    total_seats = models.IntegerField()
+
+    # Filter columns copied from Bus / BusOperator
+    bus_type = models.CharField(max_length=20)
+    has_ac = models.BooleanField(default=False)
+    manufacturing_year = models.IntegerField(null=True, blank=True)
+    operator_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    is_visible = models.BooleanField(default=True, help_text="Bus active and operator approved + active")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['route', 'date'], name='buses_trip_route_date_uniq'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['source_city', 'destination_city', 'date', 'departure_time'],
+                name='buses_trip_search_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.route_id} on {self.date} ({self.available_seats} seats)"
+
+
 class SeatLayout(models.Model):
     """Seat layout for buses"""
     SEAT_TYPES = [
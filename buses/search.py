@@ -0,0 +1,194 @@
+"""
+Bus search
+
+Builds the bus_list result set from one BusRoute query instead of one or
+two ``bus.routes`` lookups per bus:
+- routes are filtered on the bus/operator columns and the search criteria,
+  joined to bus, operator and cities, and ordered so the first route seen
+  for a bus is its best fit
+- the schedule for the travel date is prefetched in one extra query and
+  supplies the seats shown on each card
+- when both cities and a date inside the BusTripIndex window are given,
+  the whole search is one range scan on the trip index instead
+"""
+from datetime import date
+
+from django.db.models import Prefetch
+
+from .models import Bus, BusRoute, BusSchedule, BusTripIndex
+from .trip_index import in_index_window
+
+VISIBLE_BUS_FILTERS = {
+    'operator__isnull': False,
+    'operator__approval_status': 'approved',
+    'operator__is_active': True,
+    'is_active': True,
+}
+
+# Bus listing order (operator rating, operator name, bus number), then the
+# BusRoute default ordering to pick each bus's route
+ROUTE_SEARCH_ORDERING = (
+    '-bus__operator__rating',
+    'bus__operator__name',
+    'bus__bus_number',
+    'source_city__name',
+    'destination_city__name',
+    'departure_time',
+)
+
+
+# Same order for trip index rows, read from the denormalized columns
+TRIP_SEARCH_ORDERING = (
+    '-operator_rating',
+    'operator__name',
+    'bus__bus_number',
+    'departure_time',
+)
+
+
+def parse_travel_date(value):
+    """Return a date for an ISO ``YYYY-MM-DD`` string, or None."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def _city_filter(field, city_obj, raw_value):
+    if city_obj is not None:
+        return {field: city_obj}
+    if raw_value:
+        return {f'{field}__name__iexact': raw_value}
+    return {}
+
+
+def _attribute_filters(bus_type=None, ac=None, bus_age_min=None, bus_age_max=None, prefix=''):
+    filters = {}
+    if bus_type:
+        filters[f'{prefix}bus_type'] = bus_type
+    if ac == 'ac':
+        filters[f'{prefix}has_ac'] = True
+    elif ac == 'non_ac':
+        filters[f'{prefix}has_ac'] = False
+    current_year = date.today().year
+    if bus_age_min:
+        filters[f'{prefix}manufacturing_year__gte'] = current_year - int(bus_age_min)
+    if bus_age_max:
+        filters[f'{prefix}manufacturing_year__lte'] = current_year - int(bus_age_max)
+    return filters
+
+
+def _bus_filters(bus_type=None, ac=None, bus_age_min=None, bus_age_max=None, prefix=''):
+    filters = {f'{prefix}{key}': value for key, value in VISIBLE_BUS_FILTERS.items()}
+    filters.update(_attribute_filters(bus_type, ac, bus_age_min, bus_age_max, prefix))
+    return filters
+
+
+def _trip_filters(bus_type=None, ac=None, bus_age_min=None, bus_age_max=None, departure_time=None):
+    """Filters answered from BusTripIndex's denormalized columns."""
+    filters = {'is_visible': True, **_attribute_filters(bus_type, ac, bus_age_min, bus_age_max)}
+    if departure_time == 'early':
+        filters['departure_time__lt'] = '12:00:00'
+    elif departure_time == 'late':
+        filters['departure_time__gte'] = '12:00:00'
+    return filters
+
+
+def search_trips(source_city, destination_city, travel_date, bus_type=None, ac=None,
+                 bus_age_min=None, bus_age_max=None, departure_time=None):
+    """BusTripIndex rows for one city pair and date, with route/bus/operator joined."""
+    return (
+        BusTripIndex.objects.filter(
+            source_city=source_city,
+            destination_city=destination_city,
+            date=travel_date,
+            **_trip_filters(bus_type, ac, bus_age_min, bus_age_max, departure_time),
+        )
+        .select_related(
+            'route__source_city', 'route__destination_city', 'bus__operator', 'schedule',
+        )
+    )
+
+
+def _search_trip_index(source_city, destination_city, travel_date, **filters):
+    buses = []
+    route_map = {}
+    trips = search_trips(source_city, destination_city, travel_date, **filters).order_by(*TRIP_SEARCH_ORDERING)
+    for trip in trips:
+        bus = trip.bus
+        if bus.id in route_map:
+            continue
+        bus.selected_route = trip.route
+        bus.selected_schedule = trip.schedule
+        bus.available_seats = trip.available_seats
+        route_map[bus.id] = trip.route
+        buses.append(bus)
+    return buses, route_map
+
+
+def search_buses(source_city=None, destination_city=None, source_value=None, destination_value=None,
+                 travel_date=None, bus_type=None, ac=None, bus_age_min=None, bus_age_max=None,
+                 departure_time=None):
+    """
+    Return ``(buses, route_map)`` for the bus listing.
+
+    ``source_city``/``destination_city`` are resolved City objects; the raw
+    ``*_value`` strings are matched by name when they did not resolve.
+    Each bus gets ``selected_route``, ``selected_schedule`` (the schedule on
+    ``travel_date`` or None) and ``available_seats``. Without any route
+    criteria, buses that have no routes yet are listed too, as before.
+    """
+    if source_city and destination_city and travel_date and in_index_window(travel_date):
+        return _search_trip_index(
+            source_city, destination_city, travel_date,
+            bus_type=bus_type, ac=ac, bus_age_min=bus_age_min, bus_age_max=bus_age_max,
+            departure_time=departure_time,
+        )
+
+    routes = BusRoute.objects.filter(
+        **_bus_filters(bus_type, ac, bus_age_min, bus_age_max, prefix='bus__'),
+        **_city_filter('source_city', source_city, source_value),
+        **_city_filter('destination_city', destination_city, destination_value),
+    )
+    if departure_time == 'early':
+        routes = routes.filter(departure_time__lt='12:00:00')
+    elif departure_time == 'late':
+        routes = routes.filter(departure_time__gte='12:00:00')
+
+    routes = routes.select_related('bus__operator', 'source_city', 'destination_city').order_by(*ROUTE_SEARCH_ORDERING)
+    if travel_date:
+        routes = routes.prefetch_related(Prefetch(
+            'schedules',
+            queryset=BusSchedule.objects.filter(date=travel_date, is_active=True),
+            to_attr='travel_date_schedules',
+        ))
+
+    buses = []
+    route_map = {}
+    for route in routes:
+        bus = route.bus
+        if bus.id in route_map:
+            continue
+        schedules = getattr(route, 'travel_date_schedules', None) or [None]
+        bus.selected_route = route
+        bus.selected_schedule = schedules[0]
+        bus.available_seats = schedules[0].available_seats if schedules[0] else bus.total_seats
+        route_map[bus.id] = route
+        buses.append(bus)
+
+    has_route_criteria = source_value or destination_value or departure_time in ('early', 'late')
+    if not has_route_criteria:
+        routeless = Bus.objects.filter(
+            **_bus_filters(bus_type, ac, bus_age_min, bus_age_max),
+            routes__isnull=True,
+        ).select_related('operator')
+        for bus in routeless:
+            bus.selected_route = None
+            bus.selected_schedule = None
+            bus.available_seats = bus.total_seats
+            buses.append(bus)
+        buses.sort(key=lambda bus: (-bus.operator.rating, bus.operator.name, bus.bus_number))
+
+    return buses, route_map
@@ -0,0 +1,64 @@
+"""
+Signals for Buses app - keep BusTripIndex in sync with routes, buses, operators and schedules,
+and the image manifest in sync with bus images
+"""
+from datetime import timedelta
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.image_manifest import gallery_image_changed, owner_deleted
+from .models import Bus, BusImage, BusOperator, BusRoute, BusSchedule
+from .trip_index import in_index_window, sync_routes, sync_schedule
+
+
+@receiver(post_save, sender=BusRoute)
+def sync_trips_for_route(sender, instance, raw=False, **kwargs):
+    """Times, fares, cities and operating days all live on the route."""
+    if raw:
+        return
+    sync_routes([instance.pk])
+
+
+@receiver(post_save, sender=Bus)
+def sync_trips_for_bus(sender, instance, raw=False, created=False, **kwargs):
+    """Bus type, AC, age, capacity and is_active are denormalized onto each trip."""
+    if raw or created:
+        return
+    sync_routes(instance.routes.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=BusOperator)
+def sync_trips_for_operator(sender, instance, raw=False, created=False, **kwargs):
+    """Approval status, is_active and rating decide visibility and ordering."""
+    if raw or created:
+        return
+    sync_routes(BusRoute.objects.filter(bus__operator=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=BusSchedule)
+def sync_trip_for_schedule(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_schedule(instance)
+
+
+@receiver(post_delete, sender=BusSchedule)
+def restore_trip_for_deleted_schedule(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), (BusRoute, Bus, BusOperator)):
+        # Cascade from a route/bus/operator delete: the trips go with it
+        return
+    if not in_index_window(instance.date):
+        return
+    sync_routes([instance.route_id], instance.date, instance.date + timedelta(days=1))
+
+
+@receiver(post_save, sender=BusImage)
+@receiver(post_delete, sender=BusImage)
+def refresh_bus_image_manifest(sender, instance, **kwargs):
+    gallery_image_changed(instance, 'bus', **kwargs)
+
+
+@receiver(post_delete, sender=Bus)
+def forget_bus_image_manifest(sender, instance, **kwargs):
+    owner_deleted(instance, **kwargs)
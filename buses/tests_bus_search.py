@@ -0,0 +1,112 @@
+"""
+Bus search tests
+Best-fit route selection, seats from BusSchedule and a fixed query count for bus_list
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import City
+from .models import Bus, BusOperator, BusRoute, BusSchedule
+from .search import search_buses
+
+
+class BusListSearchTests(TestCase):
+
+    def setUp(self):
+        self.chennai = City.objects.create(name='Chennai', state='Tamil Nadu', code='MAA')
+        self.mumbai = City.objects.create(name='Mumbai', state='Maharashtra', code='BOM')
+        self.pune = City.objects.create(name='Pune', state='Maharashtra', code='PNQ')
+        self.operator = BusOperator.objects.create(
+            name='Approved Travels', contact_phone='9999999999', contact_email='op@example.com',
+            approval_status='approved', rating=Decimal('4.5'),
+        )
+        self.travel_date = date.today() + timedelta(days=2)
+        self.bus_count = 0
+
+    def _add_bus(self, with_schedule=True, operator=None):
+        self.bus_count += 1
+        bus = Bus.objects.create(
+            operator=operator or self.operator, bus_number=f'TN01-{self.bus_count:04d}',
+            bus_name=f'Express {self.bus_count}', bus_type='ac_sleeper', total_seats=40, has_ac=True,
+        )
+        # A non-matching route that sorts first; the search must not pick it
+        BusRoute.objects.create(
+            bus=bus, route_name='CHN-PNQ', source_city=self.chennai, destination_city=self.pune,
+            departure_time='06:00', arrival_time='20:00', duration_hours=14, distance_km=1100, base_fare=900,
+        )
+        route = BusRoute.objects.create(
+            bus=bus, route_name='CHN-BOM', source_city=self.chennai, destination_city=self.mumbai,
+            departure_time='20:00', arrival_time='08:00', duration_hours=12, distance_km=1300, base_fare=1200,
+        )
+        if with_schedule:
+            BusSchedule.objects.create(route=route, date=self.travel_date, available_seats=17, fare=1200)
+        return bus, route
+
+    def _list(self):
+        return self.client.get('/buses/', {
+            'source_city': self.chennai.id,
+            'dest_city': self.mumbai.id,
+            'travel_date': self.travel_date.isoformat(),
+        })
+
+    def test_picks_matching_route_and_schedule_seats(self):
+        bus, route = self._add_bus()
+        unscheduled, _ = self._add_bus(with_schedule=False)
+
+        buses, route_map = search_buses(
+            source_city=self.chennai, destination_city=self.mumbai,
+            source_value=str(self.chennai.id), destination_value=str(self.mumbai.id),
+            travel_date=self.travel_date,
+        )
+
+        self.assertEqual([b.id for b in buses], [bus.id, unscheduled.id])
+        self.assertEqual(route_map[bus.id], route)
+        self.assertEqual(buses[0].available_seats, 17)
+        self.assertEqual(buses[1].available_seats, 40)
+
+    def test_route_query_without_date_uses_fixed_queries(self):
+        for _ in range(5):
+            self._add_bus()
+        with self.assertNumQueries(1):
+            buses, _ = search_buses(
+                source_city=self.chennai, destination_city=self.mumbai,
+                source_value=str(self.chennai.id), destination_value=str(self.mumbai.id),
+            )
+        self.assertEqual(len(buses), 5)
+        self.assertTrue(all(bus.available_seats == 40 for bus in buses))
+
+    def test_unapproved_operator_hidden(self):
+        pending = BusOperator.objects.create(
+            name='Pending Travels', contact_phone='1', contact_email='p@example.com', approval_status='pending',
+        )
+        self._add_bus(operator=pending)
+        buses, _ = search_buses()
+        self.assertEqual(buses, [])
+
+    def test_query_count_does_not_grow_with_results(self):
+        self._add_bus()
+        self._list()  # warm the city dropdown cache
+        with CaptureQueriesContext(connection) as few:
+            response = self._list()
+        self.assertEqual(len(response.context['buses']), 1)
+
+        for _ in range(10):
+            self._add_bus()
+        with CaptureQueriesContext(connection) as many:
+            response = self._list()
+        self.assertEqual(len(response.context['buses']), 11)
+        self.assertContains(response, '17 seats available')
+
+        self.assertEqual(len(many), len(few))
+        # 2 city lookups + one BusTripIndex scan (route/bus/operator joined);
+        # the rest is the recent-search session write
+        search_queries = [
+            q['sql'] for q in many.captured_queries
+            if 'django_session' not in q['sql'] and 'SAVEPOINT' not in q['sql']
+        ]
+        self.assertEqual(len(search_queries), 3)
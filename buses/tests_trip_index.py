@@ -0,0 +1,85 @@
+"""
+Bus trip index tests
+Row generation from operating days, schedule seat sync and visibility
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import City
+from .models import Bus, BusOperator, BusRoute, BusSchedule, BusTripIndex
+from .search import search_trips
+from .trip_index import WEEKDAY_FLAGS, rebuild_trip_index, refresh_schedule_seats
+
+
+class BusTripIndexTests(TestCase):
+
+    def setUp(self):
+        self.src = City.objects.create(name='Bengaluru', state='Karnataka', code='BLR')
+        self.dst = City.objects.create(name='Chennai', state='Tamil Nadu', code='MAA')
+        self.operator = BusOperator.objects.create(
+            name='Approved Travels', contact_phone='1', contact_email='op@example.com',
+            approval_status='approved', rating=Decimal('4.2'),
+        )
+        self.bus = Bus.objects.create(
+            operator=self.operator, bus_number='KA01-0001', bus_name='Night Rider',
+            bus_type='ac_sleeper', total_seats=36, has_ac=True, manufacturing_year=2020,
+        )
+        self.today = timezone.localdate()
+        # Runs every day except tomorrow's weekday
+        self.skipped = self.today + timedelta(days=1)
+        flags = {flag: True for flag in WEEKDAY_FLAGS}
+        flags[WEEKDAY_FLAGS[self.skipped.weekday()]] = False
+        self.route = BusRoute.objects.create(
+            bus=self.bus, route_name='BLR-MAA', source_city=self.src, destination_city=self.dst,
+            departure_time='22:00', arrival_time='05:00', duration_hours=7, distance_km=350,
+            base_fare=Decimal('800'), **flags,
+        )
+
+    def _trip(self, day):
+        return BusTripIndex.objects.filter(route=self.route, date=day).first()
+
+    def test_rows_follow_operating_days(self):
+        self.assertIsNotNone(self._trip(self.today))
+        self.assertIsNone(self._trip(self.skipped))
+        trip = self._trip(self.today)
+        self.assertEqual((trip.available_seats, trip.fare, trip.has_ac), (36, Decimal('800'), True))
+
+    def test_schedule_seats_synced_on_save(self):
+        day = self.today + timedelta(days=3)
+        schedule = BusSchedule.objects.create(route=self.route, date=day, available_seats=36, fare=Decimal('950'))
+        schedule.book_seats(4)
+        trip = self._trip(day)
+        self.assertEqual((trip.schedule_id, trip.available_seats, trip.fare), (schedule.id, 32, Decimal('950')))
+
+        schedule.is_cancelled = True
+        schedule.save()
+        self.assertIsNone(self._trip(day))
+
+    def test_schedule_on_non_operating_day_adds_trip(self):
+        BusSchedule.objects.create(route=self.route, date=self.skipped, available_seats=10, fare=Decimal('900'))
+        self.assertEqual(self._trip(self.skipped).available_seats, 10)
+
+    def test_queryset_updates_refreshed_in_one_statement(self):
+        day = self.today + timedelta(days=2)
+        schedule = BusSchedule.objects.create(route=self.route, date=day, available_seats=20, fare=Decimal('800'))
+        BusSchedule.objects.filter(id=schedule.id).update(available_seats=25)
+        with self.assertNumQueries(1):
+            refresh_schedule_seats([schedule.id])
+        self.assertEqual(self._trip(day).available_seats, 25)
+
+    def test_operator_suspension_hides_trips(self):
+        self.assertEqual(search_trips(self.src, self.dst, self.today).count(), 1)
+        self.operator.is_active = False
+        self.operator.save()
+        self.assertEqual(search_trips(self.src, self.dst, self.today).count(), 0)
+
+    def test_rebuild_drops_past_rows_and_covers_window(self):
+        stale = self._trip(self.today)
+        BusTripIndex.objects.filter(pk=stale.pk).update(date=self.today - timedelta(days=5))
+        written = rebuild_trip_index(days=14)
+        self.assertEqual(written, 12)  # two of the 14 days fall on the skipped weekday
+        self.assertFalse(BusTripIndex.objects.filter(date__lt=self.today).exists())
@@ -0,0 +1,163 @@
+"""
+Bus trip search index
+
+Keeps BusTripIndex (one row per operated route/date) in sync with the
+source tables so bus search is a single range scan on
+(source_city, destination_city, date, departure_time):
+- a route operates on a date when its ``operates_<weekday>`` flag is set or
+  an active schedule exists; a cancelled/inactive schedule removes the date
+- rows are generated BUS_TRIP_INDEX_DAYS forward from today
+  (``rebuild_bus_trip_index`` rolls the window daily)
+- seat counts follow BusSchedule on save, and via refresh_schedule_seats()
+  after queryset updates that bypass save()
+
+Signals in buses/signals.py call these helpers.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import BusRoute, BusSchedule, BusTripIndex
+
+WEEKDAY_FLAGS = (
+    'operates_monday',
+    'operates_tuesday',
+    'operates_wednesday',
+    'operates_thursday',
+    'operates_friday',
+    'operates_saturday',
+    'operates_sunday',
+)
+
+
+def index_days():
+    return getattr(settings, 'BUS_TRIP_INDEX_DAYS', 60)
+
+
+def index_window(start=None, days=None):
+    """Return ``(first_date, end_date)``; end is exclusive."""
+    start = start or timezone.localdate()
+    return start, start + timedelta(days=days or index_days())
+
+
+def in_index_window(day):
+    start, end = index_window()
+    return start <= day < end
+
+
+def operates_on(route, day):
+    return getattr(route, WEEKDAY_FLAGS[day.weekday()])
+
+
+def is_bus_visible(bus):
+    operator = bus.operator
+    return bool(
+        bus.is_active and operator is not None
+        and operator.approval_status == 'approved' and operator.is_active
+    )
+
+
+def _trip_row(route, day, schedule):
+    bus = route.bus
+    return BusTripIndex(
+        route=route,
+        schedule=schedule,
+        bus=bus,
+        operator_id=bus.operator_id,
+        source_city_id=route.source_city_id,
+        destination_city_id=route.destination_city_id,
+        date=day,
+        departure_time=route.departure_time,
+        arrival_time=route.arrival_time,
+        fare=schedule.fare if schedule else route.base_fare,
+        available_seats=schedule.available_seats if schedule else bus.total_seats,
+        total_seats=bus.total_seats,
+        bus_type=bus.bus_type,
+        has_ac=bus.has_ac,
+        manufacturing_year=bus.manufacturing_year,
+        operator_rating=bus.operator.rating,
+        is_visible=is_bus_visible(bus),
+    )
+
+
+def build_trip_rows(routes, start, end):
+    """Return unsaved BusTripIndex rows for ``routes`` on dates in [start, end)."""
+    routes = [route for route in routes if route.is_active and route.bus.operator_id]
+    schedules = {
+        (schedule.route_id, schedule.date): schedule
+        for schedule in BusSchedule.objects.filter(
+            route__in=[route.id for route in routes], date__gte=start, date__lt=end,
+        )
+    }
+    rows = []
+    for route in routes:
+        day = start
+        while day < end:
+            schedule = schedules.get((route.id, day))
+            if schedule is not None:
+                if schedule.is_active and not schedule.is_cancelled:
+                    rows.append(_trip_row(route, day, schedule))
+            elif operates_on(route, day):
+                rows.append(_trip_row(route, day, None))
+            day += timedelta(days=1)
+    return rows
+
+
+def sync_routes(route_ids, start=None, end=None):
+    """Regenerate index rows for these routes in the window. Returns rows written."""
+    route_ids = list(route_ids)
+    if not route_ids:
+        return 0
+    if start is None or end is None:
+        start, end = index_window(start)
+    routes = BusRoute.objects.filter(id__in=route_ids).select_related('bus__operator')
+    rows = build_trip_rows(routes, start, end)
+    with transaction.atomic():
+        BusTripIndex.objects.filter(route_id__in=route_ids, date__gte=start, date__lt=end).delete()
+        BusTripIndex.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def sync_schedule(schedule):
+    """Apply one schedule's seats/fare/status to its index row."""
+    if not schedule.is_active or schedule.is_cancelled:
+        BusTripIndex.objects.filter(route_id=schedule.route_id, date=schedule.date).delete()
+        return
+    updated = BusTripIndex.objects.filter(route_id=schedule.route_id, date=schedule.date).update(
+        schedule=schedule,
+        available_seats=schedule.available_seats,
+        fare=schedule.fare,
+        updated_at=timezone.now(),
+    )
+    if not updated and in_index_window(schedule.date):
+        # A schedule on a day the route does not normally run
+        sync_routes([schedule.route_id], schedule.date, schedule.date + timedelta(days=1))
+
+
+def refresh_schedule_seats(schedule_ids):
+    """Copy seat counts for these schedules into the index in one UPDATE."""
+    schedule_ids = list(schedule_ids)
+    if not schedule_ids:
+        return 0
+    return BusTripIndex.objects.filter(schedule_id__in=schedule_ids).update(
+        available_seats=Subquery(
+            BusSchedule.objects.filter(id=OuterRef('schedule_id')).values('available_seats')[:1]
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild_trip_index(days=None, batch_size=200):
+    """Drop past rows and regenerate the forward window for every route."""
+    start, end = index_window(days=days)
+    BusTripIndex.objects.filter(date__lt=start).delete()
+    route_ids = list(BusRoute.objects.order_by('id').values_list('id', flat=True))
+    written = 0
+    for offset in range(0, len(route_ids), batch_size):
+        written += sync_routes(route_ids[offset:offset + batch_size], start, end)
+    # Rows beyond the window if BUS_TRIP_INDEX_DAYS was reduced
+    BusTripIndex.objects.filter(date__gte=end).delete()
+    return written
@@ -12,22 +12,19 @@ from decimal import Decimal
 import json
 from .models import Bus, BusRoute, BusSchedule, BusOperator
 from core.models import CorporateDiscount
-from core.utils import update_recent_search, get_recent_searches
+from core.utils import get_city_choices, update_recent_search, get_recent_searches
 from bookings.models import Booking
+from .search import parse_travel_date, search_buses, search_trips
+from .trip_index import in_index_window
 from .serializers import BusRouteSerializer, BusScheduleSerializer
 from hotels.models import City
 
 
 def bus_list(request):
     """Display all buses with search and filter"""
-    # Session 3: Only show buses from APPROVED operators (backend enforcement)
-    buses = Bus.objects.filter(
-        operator__isnull=False,
-        operator__approval_status='approved',  # CRITICAL: Backend enforcement
-        operator__is_active=True,
-        is_active=True
-    ).select_related('operator')
-    
+    # Session 3: Only buses from APPROVED operators are listed; search_buses
+    # enforces this on the backend (buses.search.VISIBLE_BUS_FILTERS)
+
     # Search by source and destination cities
     def _resolve_city(value):
         if not value:
@@ -55,78 +52,24 @@ def bus_list(request):
     
     has_search = any([source_city, destination_city, travel_date, bus_type, ac_filter, bus_age_min, bus_age_max, departure_time])
     
-    # Filter buses by routes if search parameters provided
-    if source_city or destination_city:
-        routes = BusRoute.objects.all()
-        if source_city_obj:
-            routes = routes.filter(source_city=source_city_obj)
-        elif source_city:
-            routes = routes.filter(source_city__name__iexact=source_city)
-
-        if destination_city_obj:
-            routes = routes.filter(destination_city=destination_city_obj)
-        elif destination_city:
-            routes = routes.filter(destination_city__name__iexact=destination_city)
+    # One BusRoute query picks the best-fit route per bus; schedules for the
+    # travel date are prefetched so each card can show its available seats
+    buses, route_map = search_buses(
+        source_city=source_city_obj,
+        destination_city=destination_city_obj,
+        source_value=source_city,
+        destination_value=destination_city,
+        travel_date=parse_travel_date(travel_date),
+        bus_type=bus_type,
+        ac=ac_filter,
+        bus_age_min=bus_age_min,
+        bus_age_max=bus_age_max,
+        departure_time=departure_time,
+    )
 
-        bus_ids = routes.values_list('bus_id', flat=True)
-        buses = buses.filter(id__in=bus_ids)
-    
-    # Filter by bus type
-    if bus_type:
-        buses = buses.filter(bus_type=bus_type)
-    
-    # Filter by AC/Non-AC
-    if ac_filter == 'ac':
-        buses = buses.filter(has_ac=True)
-    elif ac_filter == 'non_ac':
-        buses = buses.filter(has_ac=False)
-    
-    # Filter by bus age (manufacturing year)
-    current_year = date.today().year
-    if bus_age_min:
-        min_mfg_year = current_year - int(bus_age_min)
-        buses = buses.filter(manufacturing_year__gte=min_mfg_year)
-    if bus_age_max:
-        max_mfg_year = current_year - int(bus_age_max)
-        buses = buses.filter(manufacturing_year__lte=max_mfg_year)
-    
-    # Filter by departure time (filter routes)
-    if departure_time:
-        routes = BusRoute.objects.filter(bus__in=buses)
-        if departure_time == 'early':
-            routes = routes.filter(departure_time__lt='12:00:00')
-        elif departure_time == 'late':
-            routes = routes.filter(departure_time__gte='12:00:00')
-        bus_ids = routes.values_list('bus_id', flat=True).distinct()
-        buses = buses.filter(id__in=bus_ids)
-    
     # Get all cities for search dropdown
-    cities = City.objects.all().order_by('name')
+    cities = get_city_choices()
 
-    # Map a best-fit route per bus (respecting search params when provided)
-    route_map = {}
-    for bus in buses:
-        route = None
-        if source_city_obj and destination_city_obj:
-            route = bus.routes.filter(source_city=source_city_obj, destination_city=destination_city_obj).first()
-        elif source_city_obj and destination_city:
-            route = bus.routes.filter(source_city=source_city_obj, destination_city__name__iexact=destination_city).first()
-        elif destination_city_obj and source_city:
-            route = bus.routes.filter(source_city__name__iexact=source_city, destination_city=destination_city_obj).first()
-        elif source_city and destination_city:
-            # Accept either numeric IDs or city names
-            try:
-                scid = int(source_city)
-                dcid = int(destination_city)
-                route = bus.routes.filter(source_city_id=scid, destination_city_id=dcid).first()
-            except (ValueError, TypeError):
-                route = bus.routes.filter(source_city__name__iexact=source_city, destination_city__name__iexact=destination_city).first()
-        if not route:
-            route = bus.routes.first()
-        if route:
-            route_map[bus.id] = route
-            bus.selected_route = route
-    
     if has_search:
         update_recent_search(
             request.session,
@@ -170,7 +113,7 @@ def bus_detail(request, bus_id):
     from datetime import datetime
     
     bus = get_object_or_404(Bus, id=bus_id)
-    cities = City.objects.all().order_by('name')
+    cities = get_city_choices()
     route_id = request.GET.get('route_id')
     travel_date = request.GET.get('travel_date', '')
 
@@ -463,40 +406,86 @@ class BusSearchView(generics.ListAPIView):
         
         return queryset.order_by('route__departure_time')
     
+    def get_trip_index_queryset(self):
+        """Trip index rows when the search is city ids + a date inside the index window."""
+        try:
+            source_id = int(self.request.query_params.get('source'))
+            destination_id = int(self.request.query_params.get('destination'))
+        except (TypeError, ValueError):
+            return None
+        travel_date = parse_travel_date(self.request.query_params.get('date'))
+        if not travel_date or not in_index_window(travel_date):
+            return None
+        return search_trips(source_id, destination_id, travel_date).order_by('departure_time')
+
+    @staticmethod
+    def trip_result(trip):
+        """API row for a BusTripIndex trip; the schedule may not exist yet."""
+        return {
+            'id': trip.bus.id,
+            'route_id': trip.route.id,
+            'schedule_id': trip.schedule_id,
+            'bus_number': trip.bus.bus_number,
+            'bus_name': trip.bus.bus_name,
+            'bus_type': trip.bus_type,
+            'operator': trip.bus.operator.name,
+            'source_city': trip.route.source_city.name,
+            'destination_city': trip.route.destination_city.name,
+            'departure_time': trip.departure_time.strftime('%H:%M'),
+            'arrival_time': trip.arrival_time.strftime('%H:%M'),
+            'duration_hours': float(trip.route.duration_hours) if trip.route.duration_hours else 0,
+            'distance_km': int(trip.route.distance_km) if trip.route.distance_km else 0,
+            'base_fare': float(trip.route.base_fare) if trip.route.base_fare else 0,
+            'available_seats': trip.available_seats,
+            'fare': float(trip.fare) if trip.fare else 0,
+            'amenities': {
+                'ac': trip.has_ac,
+                'wifi': trip.bus.has_wifi,
+                'charging': trip.bus.has_charging_point,
+                'blanket': trip.bus.has_blanket,
+                'water': trip.bus.has_water_bottle,
+                'tv': trip.bus.has_tv,
+            }
+        }
+
     def list(self, request, *args, **kwargs):
         """Override list to provide custom response format"""
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Transform the data for better frontend consumption
-        results = []
-        for schedule in queryset:
-            if schedule.route and schedule.route.bus:
-                results.append({
-                    'id': schedule.route.bus.id,
-                    'route_id': schedule.route.id,
-                    'schedule_id': schedule.id,
-                    'bus_number': schedule.route.bus.bus_number,
-                    'bus_name': schedule.route.bus.bus_name,
-                    'bus_type': schedule.route.bus.bus_type,
-                    'operator': schedule.route.bus.operator.name if schedule.route.bus.operator else 'Unknown',
-                    'source_city': schedule.route.source_city.name,
-                    'destination_city': schedule.route.destination_city.name,
-                    'departure_time': schedule.route.departure_time.strftime('%H:%M') if schedule.route.departure_time else '--:--',
-                    'arrival_time': schedule.route.arrival_time.strftime('%H:%M') if schedule.route.arrival_time else '--:--',
-                    'duration_hours': float(schedule.route.duration_hours) if schedule.route.duration_hours else 0,
-                    'distance_km': int(schedule.route.distance_km) if schedule.route.distance_km else 0,
-                    'base_fare': float(schedule.route.base_fare) if schedule.route.base_fare else 0,
-                    'available_seats': schedule.available_seats,
-                    'fare': float(schedule.fare) if schedule.fare else 0,
-                    'amenities': {
-                        'ac': schedule.route.bus.has_ac,
-                        'wifi': schedule.route.bus.has_wifi,
-                        'charging': schedule.route.bus.has_charging_point,
-                        'blanket': schedule.route.bus.has_blanket,
-                        'water': schedule.route.bus.has_water_bottle,
-                        'tv': schedule.route.bus.has_tv,
-                    }
-                })
+        trips = self.get_trip_index_queryset()
+        if trips is not None:
+            results = [self.trip_result(trip) for trip in trips]
+        else:
+            queryset = self.filter_queryset(self.get_queryset())
+
+            # Transform the data for better frontend consumption
+            results = []
+            for schedule in queryset:
+                if schedule.route and schedule.route.bus:
+                    results.append({
+                        'id': schedule.route.bus.id,
+                        'route_id': schedule.route.id,
+                        'schedule_id': schedule.id,
+                        'bus_number': schedule.route.bus.bus_number,
+                        'bus_name': schedule.route.bus.bus_name,
+                        'bus_type': schedule.route.bus.bus_type,
+                        'operator': schedule.route.bus.operator.name if schedule.route.bus.operator else 'Unknown',
+                        'source_city': schedule.route.source_city.name,
+                        'destination_city': schedule.route.destination_city.name,
+                        'departure_time': schedule.route.departure_time.strftime('%H:%M') if schedule.route.departure_time else '--:--',
+                        'arrival_time': schedule.route.arrival_time.strftime('%H:%M') if schedule.route.arrival_time else '--:--',
+                        'duration_hours': float(schedule.route.duration_hours) if schedule.route.duration_hours else 0,
+                        'distance_km': int(schedule.route.distance_km) if schedule.route.distance_km else 0,
+                        'base_fare': float(schedule.route.base_fare) if schedule.route.base_fare else 0,
+                        'available_seats': schedule.available_seats,
+                        'fare': float(schedule.fare) if schedule.fare else 0,
+                        'amenities': {
+                            'ac': schedule.route.bus.has_ac,
+                            'wifi': schedule.route.bus.has_wifi,
+                            'charging': schedule.route.bus.has_charging_point,
+                            'blanket': schedule.route.bus.has_blanket,
+                            'water': schedule.route.bus.has_water_bottle,
+                            'tv': schedule.route.bus.has_tv,
+                        }
+                    })
 
         # Persist recent bus search for home recents widget
         src_city_obj = City.objects.filter(id=request.query_params.get('source')).first()
@@ -0,0 +1,211 @@
+"""
+Tiered cache backend
+
+A per-process LRU tier in front of a shared cache alias:
+- reads check the in-process tier first and fall back to the shared tier,
+  copying hits into the local tier for at most LOCAL_TIMEOUT seconds
+- writes and deletes go to the shared tier and update or drop the local copy
+- counters (incr/decr) always run on the shared tier
+
+Another worker's write can therefore be hidden for up to LOCAL_TIMEOUT
+seconds. Data that must be coherent across workers (sessions, locks,
+invalidation generations) should use the shared alias directly.
+
+Configured in settings.CACHES (see docs/CACHING.md):
+
+    "default": {
+        "BACKEND": "core.cache_backends.TieredCache",
+        "LOCATION": "goexplorer-local",
+        "OPTIONS": {"SHARED_ALIAS": "shared", "LOCAL_MAX_ENTRIES": 1000, "LOCAL_TIMEOUT": 5},
+    }
+"""
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# One local tier per LOCATION per process, shared by every thread's backend instance
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class LocalLRU:
+    """Thread-safe LRU of pickled values with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.counters = Counter()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def get(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, payload = entry
+            if expires_at <= now:
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+        return True, pickle.loads(payload)
+
+    def set(self, key, value, ttl):
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.counters.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache(BaseCache):
+    """In-process LRU in front of the cache alias named by OPTIONS['SHARED_ALIAS']."""
+
+    def __init__(self, name, params):
+        options = dict(params.get("OPTIONS") or {})
+        self.shared_alias = options.pop("SHARED_ALIAS", "shared")
+        self.local_max_entries = int(options.pop("LOCAL_MAX_ENTRIES", 1000))
+        self.local_timeout = float(options.pop("LOCAL_TIMEOUT", 5))
+        super().__init__({**params, "OPTIONS": options})
+        with _local_tiers_lock:
+            self.local = _local_tiers.setdefault(name, LocalLRU(self.local_max_entries))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    # -- helpers ------------------------------------------------------
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _local_ttl(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(self.local_timeout, timeout - time.time())
+
+    def stats(self):
+        counters = self.local.counters
+        hits = counters["local_hits"] + counters["shared_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            "local_hits": counters["local_hits"],
+            "shared_hits": counters["shared_hits"],
+            "misses": counters["misses"],
+            "local_entries": len(self.local),
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+    # -- reads --------------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        found, value = self.local.get(local_key)
+        if found:
+            self.local.count("local_hits")
+            return value
+        sentinel = object()
+        value = self.shared.get(key, sentinel, version=version)
+        if value is sentinel:
+            self.local.count("misses")
+            return default
+        self.local.count("shared_hits")
+        self.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        now = time.monotonic()
+        for key in keys:
+            hit, value = self.local.get(self._local_key(key, version), now)
+            if hit:
+                found[key] = value
+            else:
+                missing.append(key)
+        self.local.count("local_hits", len(found))
+        if missing:
+            shared_values = self.shared.get_many(missing, version=version)
+            self.local.count("shared_hits", len(shared_values))
+            self.local.count("misses", len(missing) - len(shared_values))
+            for key, value in shared_values.items():
+                self.local.set(self._local_key(key, version), value, self.local_timeout)
+            found.update(shared_values)
+        return found
+
+    def has_key(self, key, version=None):
+        found, _ = self.local.get(self._local_key(key, version))
+        return found or self.shared.has_key(key, version=version)
+
+    # -- writes -------------------------------------------------------
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.shared.set(key, value, timeout, version=version)
+        local_key = self._local_key(key, version)
+        self.local.delete(local_key)
+        self.local.set(local_key, value, self._local_ttl(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self.local.set(self._local_key(key, version), value, self._local_ttl(timeout))
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        failed = self.shared.set_many(data, timeout, version=version)
+        ttl = self._local_ttl(timeout)
+        for key, value in data.items():
+            local_key = self._local_key(key, version)
+            self.local.delete(local_key)
+            if key not in failed:
+                self.local.set(local_key, value, ttl)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        self.local.delete(self._local_key(key, version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.local.delete(self._local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
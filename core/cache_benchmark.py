@@ -0,0 +1,80 @@
+"""
+Per-request query benchmark for cache/session configurations
+
+Replays GET requests through the Django test client under each profile in
+CACHE_PROFILES and records how many SQL queries (and how long) every
+request takes once caches are warm. Used by the ``benchmark_cache_tiers``
+management command and by core/tests_cache.py.
+"""
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+CACHE_PROFILES = {
+    # The configuration this project used before the tiered cache
+    'database': {
+        'CACHES': {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'LOCATION': 'goexplorer_cache',
+            },
+        },
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'SESSION_CACHE_ALIAS': 'default',
+    },
+    # Tiered cache with the in-process fake standing in for the shared tier
+    'tiered': {
+        'CACHES': {
+            'default': {
+                'BACKEND': 'core.cache_backends.TieredCache',
+                'LOCATION': 'goexplorer-benchmark-local',
+                'OPTIONS': {'SHARED_ALIAS': 'shared', 'LOCAL_MAX_ENTRIES': 1000, 'LOCAL_TIMEOUT': 5},
+            },
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'goexplorer-benchmark-shared',
+            },
+        },
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'SESSION_CACHE_ALIAS': 'shared',
+    },
+}
+
+
+def measure_request_queries(paths, profile, user=None, repeat=3):
+    """
+    Return ``{path: {'queries': float, 'ms': float, 'status': int}}`` for one profile.
+
+    Each path is requested once to warm caches and the session, then
+    ``repeat`` more times; the numbers are averages over the measured runs.
+    """
+    overrides = dict(CACHE_PROFILES[profile])
+    overrides['ALLOWED_HOSTS'] = [*settings.ALLOWED_HOSTS, 'testserver']
+    results = {}
+    with override_settings(**overrides):
+        if profile == 'database':
+            call_command('createcachetable', verbosity=0)
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        for path in paths:
+            status = client.get(path).status_code
+            queries = 0
+            started = time.perf_counter()
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as captured:
+                    status = client.get(path).status_code
+                queries += len(captured.captured_queries)
+            elapsed = time.perf_counter() - started
+            results[path] = {
+                'queries': round(queries / repeat, 1),
+                'ms': round(elapsed * 1000 / repeat, 1),
+                'status': status,
+            }
+        if user is not None:
+            client.logout()
+    return results
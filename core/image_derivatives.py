@@ -0,0 +1,191 @@
+"""
+Responsive image derivatives
+
+Every stored image (a StoredImage from the image manifest) gets resized,
+recompressed copies so pages stop serving full-size originals:
+- named widths from IMAGE_DERIVATIVE_SIZES (card, gallery, hero), never
+  upscaled, each written as WebP and as a progressive JPEG fallback
+- derivative files are content addressed
+  (``derivatives/<hash prefix>/<size>.<ext>``), so a replaced original
+  gets new URLs and CDN/browser caches can keep them forever
+- work is queued, not done in the request: record_files() marks new or
+  changed files ``pending`` and enqueue() hands them to the task runner
+  (core.tasks.generate_image_derivatives) after commit; when no runner is
+  installed they stay pending for ``process_image_derivatives``, which is
+  also the backfill for existing media and reports the bytes saved
+
+srcset() and variants_for() turn ImageDerivative rows into ``srcset``
+strings; the image manifest stores them per owner and the gallery image
+models expose them as ``srcset_webp``/``srcset_jpeg``/``card_url``.
+"""
+import io
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import ImageDerivative, StoredImage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {'card': 480, 'gallery': 1024, 'hero': 1920}
+
+# format -> (Pillow format, file extension, save options)
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_sizes():
+    return getattr(settings, 'IMAGE_DERIVATIVE_SIZES', DEFAULT_SIZES)
+
+
+def derivative_name(content_hash, size, fmt):
+    return f'derivatives/{content_hash[:2]}/{content_hash[:16]}/{size}.{FORMATS[fmt][1]}'
+
+
+def _encode(image, fmt):
+    pil_format, _, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG has no alpha: flatten onto white
+        from PIL import Image
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def render_derivatives(stored, storage=None):
+    """Write every size/format of ``stored`` to storage and return the unsaved ImageDerivative rows."""
+    from PIL import Image, ImageOps
+
+    storage = storage or default_storage
+    with storage.open(stored.name, 'rb') as handle:
+        original = Image.open(handle)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info or original.mode in ('LA', 'PA') else 'RGB')
+
+    rows = []
+    for size, width in derivative_sizes().items():
+        resized = original.copy()
+        if resized.width > width:
+            resized.thumbnail((width, round(resized.height * width / resized.width) or 1), Image.LANCZOS)
+        for fmt in FORMATS:
+            data = _encode(resized, fmt)
+            name = derivative_name(stored.content_hash, size, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(data))
+            rows.append(ImageDerivative(
+                source=stored, size=size, format=fmt, name=name,
+                width=resized.width, height=resized.height, bytes=len(data),
+            ))
+    return rows
+
+
+def generate(names, storage=None):
+    """
+    Render derivatives for the stored images ``names`` and refresh the
+    manifests that show them. Returns a report with byte counts.
+    """
+    from .image_manifest import refresh_variants
+
+    report = {'processed': 0, 'failed': 0, 'original_bytes': 0, 'card_bytes': 0, 'derivative_bytes': 0}
+    done = []
+    for stored in StoredImage.objects.filter(name__in=list(names), exists=True).exclude(content_hash=''):
+        try:
+            rows = render_derivatives(stored, storage)
+        except Exception:
+            logger.exception('Image derivatives failed for %s', stored.name)
+            StoredImage.objects.filter(pk=stored.pk).update(derivatives_status='failed')
+            report['failed'] += 1
+            continue
+        with transaction.atomic():
+            ImageDerivative.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['source', 'size', 'format'],
+                update_fields=['name', 'width', 'height', 'bytes'],
+            )
+            StoredImage.objects.filter(pk=stored.pk).update(derivatives_status='ready')
+        done.append(stored.name)
+        report['processed'] += 1
+        report['original_bytes'] += stored.size or 0
+        card = [row.bytes for row in rows if row.size == 'card']
+        report['card_bytes'] += min(card) if card else stored.size or 0
+        report['derivative_bytes'] += sum(row.bytes for row in rows)
+    if done:
+        refresh_variants(done)
+    report['saved_bytes'] = max(report['original_bytes'] - report['card_bytes'], 0)
+    return report
+
+
+def process_pending(limit=100, storage=None):
+    """Generate derivatives for up to ``limit`` pending images (oldest first)."""
+    names = list(
+        StoredImage.objects.filter(derivatives_status='pending', exists=True).exclude(content_hash='')
+        .order_by('checked_at', 'pk').values_list('name', flat=True)[:limit]
+    )
+    return generate(names, storage)
+
+
+def enqueue(names):
+    """Hand pending images to the task runner after commit; without one they wait for process_image_derivatives."""
+    names = [name for name in names if name]
+    if not names:
+        return
+
+    def dispatch():
+        try:
+            from core.tasks import generate_image_derivatives
+        except ImportError:
+            return
+        for name in names:
+            try:
+                generate_image_derivatives.delay(name)
+            except Exception:
+                logger.warning('Could not queue image derivatives for %s; left pending', name, exc_info=True)
+
+    transaction.on_commit(dispatch)
+
+
+# srcset
+
+
+def derivatives_by_source(names):
+    """{source name: [ImageDerivative, ...]} for ``names`` in one query."""
+    grouped = defaultdict(list)
+    names = [name for name in names if name]
+    if names:
+        for row in ImageDerivative.objects.filter(source__name__in=names).select_related('source').order_by('width'):
+            grouped[row.source.name].append(row)
+    return grouped
+
+
+def srcset(rows, fmt, storage=None):
+    """``url 480w, url 1024w, ...`` for one format (duplicate widths collapse)."""
+    storage = storage or default_storage
+    seen = {}
+    for row in rows:
+        if row.format == fmt:
+            seen.setdefault(row.width, storage.url(row.name))
+    return ', '.join(f'{url} {width}w' for width, url in sorted(seen.items()))
+
+
+def variants_for(rows, storage=None):
+    """{'webp': srcset, 'jpeg': srcset, 'card': card JPEG URL} or {} before derivatives exist."""
+    if not rows:
+        return {}
+    storage = storage or default_storage
+    card = next((row for row in rows if row.size == 'card' and row.format == 'jpeg'), None)
+    return {
+        'webp': srcset(rows, 'webp', storage),
+        'jpeg': srcset(rows, 'jpeg', storage),
+        'card': storage.url(card.name) if card else '',
+    }
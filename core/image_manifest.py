@@ -0,0 +1,330 @@
+"""
+Image manifest and URL cache
+
+Card and detail pages used to resolve every image through
+``get_primary_image``: up to four ``storage.exists()`` calls plus gallery
+queries per object, ignoring any prefetch. The manifest moves that work to
+write time:
+- StoredImage records, per stored file, whether it exists, its dimensions,
+  size and SHA-256 content hash (inspected once, when first seen or when the
+  file is saved again)
+- ImageManifest records, per owner (hotel, room type, bus, package), the
+  resolved display image and its URL, versioned by content hash
+  (``?v=<hash prefix>``) so the URL only changes when the bytes do
+- the URLs (plus WebP/JPEG srcsets once core.image_derivatives has made
+  them) are also kept in the default cache, so attach_image_urls() resolves
+  a whole page of cards with one cache round trip and at most one manifest
+  query, and never touches storage
+
+Signals in each app refresh an owner's manifest when its own ``image`` or a
+gallery image is saved or deleted. ``rebuild_image_manifest`` re-resolves
+everything (optionally re-hashing every file) for files changed outside the
+app.
+"""
+import hashlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.images import get_image_dimensions
+from django.core.files.storage import default_storage
+from django.db.models import Model, Q, prefetch_related_objects
+
+from .image_derivatives import derivatives_by_source, enqueue, variants_for
+from .models import ImageManifest, StoredImage
+
+CACHE_PREFIX = 'image-manifest'
+
+FILE_FIELDS = ('exists', 'width', 'height', 'size', 'content_hash', 'checked_at', 'derivatives_status')
+
+# Models with a display image resolved through the manifest
+OWNER_MODELS = ('hotels.Hotel', 'hotels.RoomType', 'buses.Bus', 'packages.Package')
+
+
+def cache_timeout():
+    return getattr(settings, 'IMAGE_MANIFEST_CACHE_TIMEOUT', 6 * 60 * 60)
+
+
+def owner_type(owner):
+    return owner._meta.label_lower
+
+
+def cache_key(owner):
+    return f'{CACHE_PREFIX}:{owner_type(owner)}:{owner.pk}'
+
+
+# Files
+
+
+def inspect_file(name, storage=None):
+    """Existence, size, dimensions and content hash of one stored file."""
+    storage = storage or default_storage
+    try:
+        if not storage.exists(name):
+            return {'exists': False}
+        digest = hashlib.sha256()
+        size = 0
+        with storage.open(name, 'rb') as handle:
+            for chunk in handle.chunks():
+                digest.update(chunk)
+                size += len(chunk)
+            handle.seek(0)
+            width, height = get_image_dimensions(handle)
+    except Exception:
+        return {'exists': False}
+    return {'exists': True, 'width': width, 'height': height, 'size': size, 'content_hash': digest.hexdigest()}
+
+
+def record_files(names, reinspect=()):
+    """
+    {name: StoredImage} for ``names``; files never seen before (or listed in
+    ``reinspect``, or every file when ``reinspect is True``) are inspected and saved.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    known = {stored.name: stored for stored in StoredImage.objects.filter(name__in=names)}
+    todo = names if reinspect is True else (names - set(known)) | (names & set(reinspect))
+    if todo:
+        rows = []
+        for name in sorted(todo):
+            row = StoredImage(name=name, **inspect_file(name))
+            previous = known.get(name)
+            if previous and previous.content_hash == row.content_hash:
+                row.derivatives_status = previous.derivatives_status
+            else:
+                # New or changed bytes need fresh derivatives
+                row.derivatives_status = 'pending' if row.exists else ''
+            rows.append(row)
+        StoredImage.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['name'], update_fields=list(FILE_FIELDS),
+        )
+        known.update((row.name, row) for row in rows)
+        enqueue([row.name for row in rows if row.derivatives_status == 'pending'])
+    return known
+
+
+def versioned_url(name, content_hash, storage=None):
+    """Storage URL for ``name`` with a content-hash version parameter."""
+    url = (storage or default_storage).url(name)
+    if not content_hash:
+        return url
+    separator = '&' if '?' in url else '?'
+    return f'{url}{separator}v={content_hash[:12]}'
+
+
+# Owners
+
+
+def candidate_names(owner):
+    """Image names in display preference: own image, primary gallery images, the rest of the gallery."""
+    names = []
+    own = getattr(owner, 'image', None)
+    if own and getattr(own, 'name', None):
+        names.append(own.name)
+    gallery = list(owner.images.all()) if hasattr(owner, 'images') else []
+    names += [image.image.name for image in gallery if image.is_primary and image.image]
+    names += [image.image.name for image in gallery if not image.is_primary and image.image]
+    return list(dict.fromkeys(names))
+
+
+def refresh_manifests(owners, reinspect=()):
+    """Re-resolve and store the display image for ``owners``. Returns {cache_key: {'url', 'variants'}}."""
+    owners = [owner for owner in owners if owner.pk is not None]
+    if not owners:
+        return {}
+    candidates = {cache_key(owner): (owner, candidate_names(owner)) for owner in owners}
+    files = record_files({name for _, names in candidates.values() for name in names}, reinspect)
+
+    chosen = {
+        key: next((name for name in names if name in files and files[name].exists), '')
+        for key, (_, names) in candidates.items()
+    }
+    derivatives = derivatives_by_source(set(chosen.values()))
+
+    rows, entries = [], {}
+    for key, (owner, _) in candidates.items():
+        name = chosen[key]
+        entry = {
+            'url': versioned_url(name, files[name].content_hash) if name else '',
+            'variants': variants_for(derivatives.get(name)) if name else {},
+        }
+        rows.append(ImageManifest(
+            owner_type=owner_type(owner), owner_id=owner.pk, image_name=name,
+            url=entry['url'], variants=entry['variants'],
+        ))
+        entries[key] = entry
+        _set_entry(owner, entry)
+    ImageManifest.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['owner_type', 'owner_id'],
+        update_fields=['image_name', 'url', 'variants', 'updated_at'],
+    )
+    cache.set_many(entries, cache_timeout())
+    return entries
+
+
+def refresh_variants(names):
+    """Store new srcsets on every manifest showing one of ``names`` (after derivatives are generated)."""
+    derivatives = derivatives_by_source(names)
+    manifests = list(ImageManifest.objects.filter(image_name__in=list(names)))
+    entries = {}
+    for manifest in manifests:
+        manifest.variants = variants_for(derivatives.get(manifest.image_name))
+        entries[f'{CACHE_PREFIX}:{manifest.owner_type}:{manifest.owner_id}'] = {
+            'url': manifest.url, 'variants': manifest.variants,
+        }
+    ImageManifest.objects.bulk_update(manifests, ['variants'])
+    cache.set_many(entries, cache_timeout())
+    return len(manifests)
+
+
+def _set_entry(owner, entry):
+    owner._manifest_image_url = entry['url']
+    owner._manifest_image_variants = entry['variants']
+
+
+def attach_image_urls(owners):
+    """
+    Set ``_manifest_image_url`` ('' when there is no usable image) and
+    ``_manifest_image_variants`` on each owner from the cache, then the
+    manifest table; owners with no manifest yet are resolved once (gallery
+    prefetched per type) and stored.
+    """
+    owners = [owner for owner in owners if owner is not None and owner.pk is not None]
+    if not owners:
+        return owners
+    by_key = {}
+    for owner in owners:
+        by_key.setdefault(cache_key(owner), []).append(owner)
+    found = cache.get_many(list(by_key))
+
+    missing = [key for key in by_key if key not in found]
+    if missing:
+        ids_by_type = defaultdict(list)
+        for key in missing:
+            owner = by_key[key][0]
+            ids_by_type[owner_type(owner)].append(owner.pk)
+        condition = Q()
+        for label, ids in ids_by_type.items():
+            condition |= Q(owner_type=label, owner_id__in=ids)
+        stored = {
+            f'{CACHE_PREFIX}:{label}:{owner_id}': {'url': url, 'variants': variants}
+            for label, owner_id, url, variants in ImageManifest.objects.filter(condition).values_list(
+                'owner_type', 'owner_id', 'url', 'variants',
+            )
+        }
+        if stored:
+            cache.set_many(stored, cache_timeout())
+            found.update(stored)
+
+        unresolved = [by_key[key][0] for key in missing if key not in stored]
+        groups = defaultdict(list)
+        for owner in unresolved:
+            groups[type(owner)].append(owner)
+        for model, group in groups.items():
+            if hasattr(model, 'images'):
+                prefetch_related_objects(group, 'images')
+            found.update(refresh_manifests(group))
+
+    for key, same in by_key.items():
+        for owner in same:
+            _set_entry(owner, found.get(key) or {'url': '', 'variants': {}})
+    return owners
+
+
+def display_url(owner):
+    """Versioned URL of the owner's display image, or '' when it has none."""
+    if not hasattr(owner, '_manifest_image_url'):
+        attach_image_urls([owner])
+    return getattr(owner, '_manifest_image_url', '')
+
+
+def display_variants(owner):
+    """{'webp': srcset, 'jpeg': srcset, 'card': url} for the owner's display image ({} until derivatives exist)."""
+    if not hasattr(owner, '_manifest_image_variants'):
+        attach_image_urls([owner])
+    return getattr(owner, '_manifest_image_variants', {})
+
+
+def forget_owner(owner):
+    ImageManifest.objects.filter(owner_type=owner_type(owner), owner_id=owner.pk).delete()
+    cache.delete(cache_key(owner))
+
+
+# Gallery images
+
+
+def attach_gallery_urls(images):
+    """
+    Set ``_versioned_url`` and ``_derivative_variants`` on gallery image rows
+    (HotelImage, RoomImage, ...) with one file query and one derivative query.
+    """
+    images = [image for image in images if image.image]
+    files = record_files(image.image.name for image in images)
+    derivatives = derivatives_by_source(files)
+    for image in images:
+        stored = files.get(image.image.name)
+        image._versioned_url = versioned_url(image.image.name, stored.content_hash if stored else '')
+        image._derivative_variants = variants_for(derivatives.get(image.image.name))
+    return images
+
+
+def gallery_url(image):
+    if not image.image:
+        return ''
+    if not hasattr(image, '_versioned_url'):
+        attach_gallery_urls([image])
+    return image._versioned_url
+
+
+def gallery_variants(image):
+    if not image.image:
+        return {}
+    if not hasattr(image, '_derivative_variants'):
+        attach_gallery_urls([image])
+    return image._derivative_variants
+
+
+# Signal helpers
+
+
+def _cascading(instance, origin):
+    return isinstance(origin, Model) and origin is not instance
+
+
+def owner_saving(instance, raw=False, update_fields=None, **kwargs):
+    """pre_save for an owner model: note whether its own image file is new (uploaded or renamed)."""
+    image = getattr(instance, 'image', None)
+    if raw or not image or (update_fields is not None and 'image' not in update_fields):
+        instance._image_changed = False
+        return
+    if not image._committed:
+        instance._image_changed = True
+        return
+    previous = type(instance)._base_manager.filter(pk=instance.pk).values_list('image', flat=True).first() if instance.pk else None
+    instance._image_changed = previous != image.name
+
+
+def owner_saved(instance, raw=False, update_fields=None, **kwargs):
+    """post_save for an owner model: refresh when its own image may have changed, re-inspecting only a new file."""
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+    image = getattr(instance, 'image', None)
+    reinspect = [image.name] if image and getattr(instance, '_image_changed', True) else ()
+    refresh_manifests([instance], reinspect=reinspect)
+
+
+def owner_deleted(instance, **kwargs):
+    forget_owner(instance)
+
+
+def gallery_image_changed(instance, owner_attr, raw=False, origin=None, created=None, **kwargs):
+    """post_save/post_delete for a gallery image: refresh its owner's manifest."""
+    if raw or _cascading(instance, origin):
+        return
+    owner = getattr(instance, owner_attr, None)
+    if owner is None:
+        return
+    getattr(owner, '_prefetched_objects_cache', {}).pop('images', None)
+    reinspect = [instance.image.name] if created is not None and instance.image else ()
+    refresh_manifests([owner], reinspect=reinspect)
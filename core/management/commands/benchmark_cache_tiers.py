@@ -0,0 +1,45 @@
+"""
+Management command comparing per-request query counts across cache profiles.
+Runs hotel_list and bus_list (or --path URLs) under the legacy database
+cache/sessions and under the tiered cache with cached_db sessions:
+python manage.py benchmark_cache_tiers --username demo --repeat 5
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.cache_benchmark import CACHE_PROFILES, measure_request_queries
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request SQL query counts for each cache/session profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Log in as this user so session lookups are included')
+        parser.add_argument('--repeat', type=int, default=3, help='Measured requests per URL (default: 3)')
+        parser.add_argument('--path', action='append', dest='paths', help='URL to request (repeatable)')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            User = get_user_model()
+            try:
+                user = User.objects.get(**{User.USERNAME_FIELD: options['username']})
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['username']}' not found")
+
+        paths = options['paths'] or [reverse('hotels:hotel_list'), reverse('buses:bus_list')]
+        results = {
+            profile: measure_request_queries(paths, profile, user=user, repeat=options['repeat'])
+            for profile in CACHE_PROFILES
+        }
+
+        self.stdout.write(f"{'path':<40} {'profile':<10} {'queries':>8} {'ms':>8} {'status':>7}")
+        for path in paths:
+            for profile, measured in results.items():
+                row = measured[path]
+                self.stdout.write(
+                    f"{path:<40} {profile:<10} {row['queries']:>8} {row['ms']:>8} {row['status']:>7}"
+                )
+            saved = results['database'][path]['queries'] - results['tiered'][path]['queries']
+            self.stdout.write(self.style.SUCCESS(f'{path}: {saved:g} fewer queries per request with the tiered cache'))
@@ -0,0 +1,55 @@
+"""
+Management command to render WebP/JPEG derivatives for pending images.
+Uploads are queued automatically; run this from cron when no task worker is installed, and once with
+--backfill to queue every image recorded before derivatives existed (--retry-failed re-queues failures):
+python manage.py process_image_derivatives [--backfill] [--retry-failed] [--batch-size 50] [--limit 1000]
+"""
+from django.core.management.base import BaseCommand
+
+from core.image_derivatives import process_pending
+from core.models import StoredImage
+
+
+def _megabytes(value):
+    return f"{value / (1024 * 1024):.1f} MB"
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG derivatives for pending images and report the bytes saved'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='Queue every existing image that has no derivatives yet')
+        parser.add_argument('--retry-failed', action='store_true', help='Queue images whose derivatives failed before')
+        parser.add_argument('--batch-size', type=int, default=50, help='Images rendered per batch (default: 50)')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many images (default: all pending)')
+
+    def handle(self, *args, **options):
+        queue = StoredImage.objects.filter(exists=True).exclude(content_hash='')
+        if options['backfill']:
+            queued = queue.filter(derivatives_status='').update(derivatives_status='pending')
+            self.stdout.write(f"  Queued {queued} existing images")
+        if options['retry_failed']:
+            queued = queue.filter(derivatives_status='failed').update(derivatives_status='pending')
+            self.stdout.write(f"  Re-queued {queued} failed images")
+
+        batch_size = max(options['batch_size'], 1)
+        limit = options['limit']
+        totals = {'processed': 0, 'failed': 0, 'original_bytes': 0, 'card_bytes': 0, 'derivative_bytes': 0, 'saved_bytes': 0}
+        while not limit or totals['processed'] + totals['failed'] < limit:
+            size = batch_size if not limit else min(batch_size, limit - totals['processed'] - totals['failed'])
+            report = process_pending(limit=size)
+            if not report['processed'] and not report['failed']:
+                break
+            for key in totals:
+                totals[key] += report[key]
+            self.stdout.write(f"  Batch: {report['processed']} rendered, {report['failed']} failed")
+
+        pending = StoredImage.objects.filter(derivatives_status='pending').count()
+        self.stdout.write(
+            f"  Originals {_megabytes(totals['original_bytes'])}, card JPEGs {_megabytes(totals['card_bytes'])}, "
+            f"all derivatives {_megabytes(totals['derivative_bytes'])}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Image derivatives: {totals['processed']} rendered, {totals['failed']} failed, {pending} still pending, "
+            f"{_megabytes(totals['saved_bytes'])} ({totals['saved_bytes']} bytes) saved per card view"
+        ))
@@ -0,0 +1,43 @@
+"""
+Management command to rebuild the image manifest for hotels, room types, buses and packages.
+Signals keep it current on upload/delete; run this once after deploying the tables, and with
+--reinspect after files were replaced or removed outside the app:
+python manage.py rebuild_image_manifest [--model hotels.Hotel] [--reinspect]
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.image_manifest import OWNER_MODELS, refresh_manifests
+from core.models import StoredImage
+
+
+class Command(BaseCommand):
+    help = 'Re-resolve display images for every owner and record file existence, size and hashes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models', help=f'Limit to one of {", ".join(OWNER_MODELS)} (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Owners resolved per batch (default: 200)')
+        parser.add_argument('--reinspect', action='store_true', help='Re-hash every file instead of only new ones')
+
+    def handle(self, *args, **options):
+        labels = options['models'] or OWNER_MODELS
+        unknown = set(labels) - set(OWNER_MODELS)
+        if unknown:
+            raise CommandError(f"Unknown model(s): {', '.join(sorted(unknown))}")
+
+        batch_size = max(options['batch_size'], 1)
+        for label in labels:
+            model = apps.get_model(label)
+            queryset = model._default_manager.order_by('pk').prefetch_related('images')
+            owners = with_image = 0
+            for offset in range(0, queryset.count(), batch_size):
+                entries = refresh_manifests(
+                    list(queryset[offset:offset + batch_size]), reinspect=options['reinspect'] or (),
+                )
+                owners += len(entries)
+                with_image += sum(1 for entry in entries.values() if entry['url'])
+            self.stdout.write(f"  {label}: {owners} resolved, {owners - with_image} without a usable image")
+
+        files = StoredImage.objects.count()
+        missing = StoredImage.objects.filter(exists=False).count()
+        self.stdout.write(self.style.SUCCESS(f"Image manifest rebuilt: {files} files recorded, {missing} missing from storage"))
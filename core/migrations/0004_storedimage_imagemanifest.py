@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_corporateaccount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage path of the file', max_length=255, unique=True)),
+                ('exists', models.BooleanField(default=False)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('size', models.PositiveBigIntegerField(blank=True, help_text='Bytes', null=True)),
+                ('content_hash', models.CharField(blank=True, help_text='SHA-256 of the file contents', max_length=64)),
+                ('checked_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImageManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner_type', models.CharField(help_text='app_label.model of the owner', max_length=60)),
+                ('owner_id', models.BigIntegerField()),
+                ('image_name', models.CharField(blank=True, help_text='Blank when no usable image exists', max_length=255)),
+                ('url', models.CharField(blank=True, max_length=500)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('owner_type', 'owner_id'), name='core_image_manifest_owner_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_storedimage_imagemanifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedimage',
+            name='derivatives_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, help_text='Resized WebP/JPEG derivatives (core.image_derivatives)', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='imagemanifest',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='srcset strings per format and the card URL'),
+        ),
+        migrations.CreateModel(
+            name='ImageDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(help_text='Named size, e.g. card, gallery, hero', max_length=20)),
+                ('format', models.CharField(help_text='webp or jpeg', max_length=10)),
+                ('name', models.CharField(help_text='Storage path of the derivative', max_length=255)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('bytes', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='core.storedimage')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'size', 'format'), name='core_image_derivative_uniq')],
+            },
+        ),
+    ]
@@ -7,6 +7,26 @@ from datetime import timedelta
 from decimal import Decimal
 
 
+class ResponsiveImageMixin:
+    """srcset/card URLs for gallery image rows (``image`` field) from core.image_derivatives."""
+
+    @property
+    def srcset_webp(self):
+        from core.image_manifest import gallery_variants
+        return gallery_variants(self).get('webp', '')
+
+    @property
+    def srcset_jpeg(self):
+        from core.image_manifest import gallery_variants
+        return gallery_variants(self).get('jpeg', '')
+
+    @property
+    def card_url(self):
+        """Small JPEG for cards and thumbnails, falling back to the original."""
+        from core.image_manifest import gallery_url, gallery_variants
+        return gallery_variants(self).get('card') or gallery_url(self)
+
+
 class TimeStampedModel(models.Model):
     """Abstract base model with created and updated timestamps"""
     created_at = models.DateTimeField(auto_now_add=True)
@@ -558,3 +578,67 @@ class CorporateAccount(TimeStampedModel):
             return cls.objects.get(email_domain=domain, status='approved', is_active=True)
         except cls.DoesNotExist:
             return None
+
+
+class StoredImage(models.Model):
+    """Image manifest: existence, dimensions and content hash of one stored file.
+
+    Filled by core.image_manifest on upload/save so pages never stat storage.
+    """
+    name = models.CharField(max_length=255, unique=True, help_text="Storage path of the file")
+    exists = models.BooleanField(default=False)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True, help_text="Bytes")
+    content_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the file contents")
+    checked_at = models.DateTimeField(auto_now=True)
+    DERIVATIVE_STATUS = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    derivatives_status = models.CharField(
+        max_length=10, choices=DERIVATIVE_STATUS, blank=True, db_index=True,
+        help_text="Resized WebP/JPEG derivatives (core.image_derivatives)",
+    )
+
+    def __str__(self):
+        return self.name
+
+
+class ImageDerivative(models.Model):
+    """A resized, recompressed copy of a StoredImage at one named size and format."""
+    source = models.ForeignKey(StoredImage, on_delete=models.CASCADE, related_name='derivatives')
+    size = models.CharField(max_length=20, help_text="Named size, e.g. card, gallery, hero")
+    format = models.CharField(max_length=10, help_text="webp or jpeg")
+    name = models.CharField(max_length=255, help_text="Storage path of the derivative")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    bytes = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'size', 'format'], name='core_image_derivative_uniq'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageManifest(models.Model):
+    """Resolved display image (and its versioned URL) for one hotel, room type, bus or package."""
+    owner_type = models.CharField(max_length=60, help_text="app_label.model of the owner")
+    owner_id = models.BigIntegerField()
+    image_name = models.CharField(max_length=255, blank=True, help_text="Blank when no usable image exists")
+    url = models.CharField(max_length=500, blank=True)
+    variants = models.JSONField(default=dict, blank=True, help_text="srcset strings per format and the card URL")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner_type', 'owner_id'], name='core_image_manifest_owner_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_type}#{self.owner_id}: {self.image_name or '-'}"
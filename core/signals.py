@@ -0,0 +1,15 @@
+"""
+Core signals
+Drop cached reference data when the underlying rows change.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import City
+from core.utils import invalidate_city_choices
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def city_changed(sender, instance, **kwargs):
+    invalidate_city_choices()
@@ -84,3 +84,11 @@ def generate_invoice_pdf(invoice_id):
     from payments.models import Invoice
     # Implement PDF generation logic here
     return f"Invoice PDF generated for {invoice_id}"
+
+
+@shared_task
+def generate_image_derivatives(name):
+    """Render WebP/JPEG derivatives for one stored image"""
+    from core.image_derivatives import generate
+
+    return generate([name])
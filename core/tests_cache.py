@@ -0,0 +1,109 @@
+"""
+Tiered cache tests
+Local LRU behaviour, shared-tier coherence and per-request query counts
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.cache_backends import TieredCache
+from core.cache_benchmark import measure_request_queries
+from core.models import City
+from core.utils import get_city_choices
+
+SHARED_FAKE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-tests-shared'}
+
+
+def _tier(location, **options):
+    """A TieredCache acting like one worker process over the shared fake."""
+    options = {'SHARED_ALIAS': 'shared', 'LOCAL_MAX_ENTRIES': 3, 'LOCAL_TIMEOUT': 5, **options}
+    cache = TieredCache(location, {'OPTIONS': options})
+    cache.local.clear()
+    return cache
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'LOCATION': 'tiered-tests-default',
+        'OPTIONS': {'SHARED_ALIAS': 'shared'},
+    },
+    'shared': SHARED_FAKE,
+})
+class TieredCacheTests(TestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.worker_a = _tier('tiered-tests-a')
+        self.worker_b = _tier('tiered-tests-b')
+
+    def test_local_hit_skips_shared_tier(self):
+        self.worker_a.set('k', {'v': 1})
+        caches['shared'].delete('k')
+        self.assertEqual(self.worker_a.get('k'), {'v': 1})
+        self.assertEqual(self.worker_a.stats()['local_hits'], 1)
+
+    def test_values_are_copied_not_shared(self):
+        self.worker_a.set('k', {'v': 1})
+        self.worker_a.get('k')['v'] = 2
+        self.assertEqual(self.worker_a.get('k'), {'v': 1})
+
+    def test_lru_evicts_oldest_entry(self):
+        for key in ('a', 'b', 'c'):
+            self.worker_a.set(key, key)
+        self.worker_a.get('a')
+        self.worker_a.set('d', 'd')
+        self.assertEqual(len(self.worker_a.local), 3)
+        self.assertFalse(self.worker_a.local.get(self.worker_a._local_key('b', None))[0])
+        self.assertEqual(self.worker_a.get('b'), 'b')  # still served by the shared tier
+
+    def test_other_worker_sees_write_after_local_timeout(self):
+        worker_b = _tier('tiered-tests-b2', LOCAL_TIMEOUT=0.05)
+        self.worker_a.set('k', 1)
+        self.assertEqual(worker_b.get('k'), 1)
+        self.worker_a.set('k', 2)
+        self.assertEqual(worker_b.get('k'), 1)
+        time.sleep(0.06)
+        self.assertEqual(worker_b.get('k'), 2)
+
+    def test_delete_and_incr_reach_shared_tier(self):
+        self.worker_a.set('n', 1)
+        self.worker_b.get('n')
+        self.assertEqual(self.worker_b.incr('n'), 2)
+        self.assertEqual(self.worker_b.get('n'), 2)
+        self.worker_b.delete('n')
+        self.assertIsNone(caches['shared'].get('n'))
+
+    def test_get_many_merges_tiers(self):
+        self.worker_a.set('x', 1)
+        caches['shared'].set('y', 2)
+        self.assertEqual(self.worker_a.get_many(['x', 'y', 'z']), {'x': 1, 'y': 2})
+
+    def test_city_choices_invalidated_on_save(self):
+        City.objects.create(name='Pune', state='MH', code='PNQ')
+        self.assertEqual([c.name for c in get_city_choices()], ['Pune'])
+        City.objects.create(name='Agra', state='UP', code='AGR')
+        self.assertEqual([c.name for c in get_city_choices()], ['Agra', 'Pune'])
+        with self.assertNumQueries(0):
+            get_city_choices()
+
+
+class RequestQueryBenchmarkTests(TestCase):
+
+    def setUp(self):
+        City.objects.create(name='Goa', state='Goa', code='GOI')
+        self.user = get_user_model().objects.create_user(
+            username='cache-bench', email='cache-bench@example.com', password='pw'
+        )
+
+    def test_tiered_profile_issues_fewer_queries(self):
+        paths = [reverse('hotels:hotel_list'), reverse('buses:bus_list')]
+        legacy = measure_request_queries(paths, 'database', user=self.user, repeat=2)
+        tiered = measure_request_queries(paths, 'tiered', user=self.user, repeat=2)
+        for path in paths:
+            self.assertEqual(tiered[path]['status'], 200)
+            self.assertLess(tiered[path]['queries'], legacy[path]['queries'], path)
@@ -0,0 +1,150 @@
+"""
+Image derivative tests
+Uploads queued for WebP/JPEG card/gallery/hero derivatives, rendered by the backfill command and served as srcsets
+"""
+
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.image_manifest import record_files
+from core.models import City, ImageDerivative, ImageManifest, StoredImage
+from hotels.models import Hotel, HotelImage
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='derivative-tests-')
+
+
+def _png(name, size, color='red', mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'derivative-tests'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'derivative-tests-shared'},
+    },
+)
+class ImageDerivativeTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Goa', state='Goa', code='GOI')
+
+    def _hotel(self, name, image=None):
+        return Hotel.objects.create(
+            name=name, description='d', city=self.city, address='a', contact_phone='1', contact_email='h@x.com',
+            image=image,
+        )
+
+    def _process(self, **options):
+        out = io.StringIO()
+        call_command('process_image_derivatives', stdout=out, **options)
+        return out.getvalue()
+
+    def test_upload_is_queued_then_rendered_at_every_size(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            hotel = self._hotel('Sea View', image=_png('big.png', (2400, 1200)))
+        stored = StoredImage.objects.get(name=hotel.image.name)
+        # No task worker here: the upload waits for the command
+        self.assertEqual(stored.derivatives_status, 'pending')
+        self.assertEqual(Hotel.objects.get(pk=hotel.pk).image_variants, {})
+
+        out = self._process()
+        self.assertIn('1 rendered, 0 failed, 0 still pending', out)
+        self.assertIn('saved per card view', out)
+        stored.refresh_from_db()
+        self.assertEqual(stored.derivatives_status, 'ready')
+
+        widths = {(row.size, row.format): (row.width, row.height) for row in stored.derivatives.all()}
+        self.assertEqual(widths[('card', 'webp')], (480, 240))
+        self.assertEqual(widths[('gallery', 'jpeg')], (1024, 512))
+        self.assertEqual(widths[('hero', 'webp')], (1920, 960))
+        for row in stored.derivatives.all():
+            with Image.open(f'{MEDIA_ROOT}/{row.name}') as image:
+                self.assertEqual(image.format, 'WEBP' if row.format == 'webp' else 'JPEG')
+            self.assertIn(stored.content_hash[:16], row.name)
+
+        variants = ImageManifest.objects.get(owner_type='hotels.hotel', owner_id=hotel.pk).variants
+        self.assertRegex(variants['webp'], r'card\.webp 480w, .*gallery\.webp 1024w, .*hero\.webp 1920w$')
+        self.assertTrue(variants['card'].endswith('/card.jpg'))
+        cache.clear()
+        fresh = Hotel.objects.get(pk=hotel.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(fresh.image_variants, variants)
+
+    def test_small_images_are_not_upscaled(self):
+        hotel = self._hotel('Small', image=_png('small.png', (300, 200)))
+        self._process()
+        rows = ImageDerivative.objects.filter(source__name=hotel.image.name)
+        self.assertEqual({(row.width, row.height) for row in rows}, {(300, 200)})
+        self.assertEqual(rows.count(), 6)
+        variants = Hotel.objects.get(pk=hotel.pk).image_variants
+        self.assertEqual(variants['jpeg'].count('w'), 1)
+        self.assertTrue(variants['jpeg'].endswith(' 300w'))
+
+    def test_gallery_images_expose_srcsets_and_card_url(self):
+        hotel = self._hotel('Gallery')
+        image = HotelImage.objects.create(hotel=hotel, image=_png('alpha.png', (1200, 800), (0, 0, 255, 128), 'RGBA'))
+        fresh = HotelImage.objects.get(pk=image.pk)
+        self.assertEqual(fresh.srcset_webp, '')
+        self.assertEqual(fresh.card_url, fresh.get_url_with_cache_busting())
+
+        self._process()
+        fresh = HotelImage.objects.get(pk=image.pk)
+        self.assertIn('card.webp 480w', fresh.srcset_webp)
+        self.assertIn('gallery.jpg 1024w', fresh.srcset_jpeg)
+        self.assertTrue(fresh.card_url.endswith('/card.jpg'))
+        self.assertIn('card.webp', Hotel.objects.get(pk=hotel.pk).image_variants['webp'])
+
+    def test_changed_bytes_requeue_and_unchanged_keep_ready(self):
+        hotel = self._hotel('Sea View', image=_png('own.png', (800, 600)))
+        self._process()
+        record_files([hotel.image.name], reinspect=[hotel.image.name])
+        self.assertEqual(StoredImage.objects.get(name=hotel.image.name).derivatives_status, 'ready')
+
+        with hotel.image.storage.open(hotel.image.name, 'wb') as handle:
+            Image.new('RGB', (640, 480), 'black').save(handle, format='PNG')
+        record_files([hotel.image.name], reinspect=[hotel.image.name])
+        stored = StoredImage.objects.get(name=hotel.image.name)
+        self.assertEqual(stored.derivatives_status, 'pending')
+
+        self._process()
+        self.assertTrue(all(stored.content_hash[:16] in row.name for row in stored.derivatives.all()))
+        self.assertEqual(stored.derivatives.get(size='card', format='jpeg').height, 360)
+
+    def test_backfill_queues_existing_images_and_records_failures(self):
+        hotel = self._hotel('Sea View', image=_png('old.png', (1000, 500)))
+        StoredImage.objects.update(derivatives_status='')
+        broken = self._hotel('Broken', image=SimpleUploadedFile('broken.png', b'not an image', content_type='image/png'))
+        StoredImage.objects.filter(name=broken.image.name).update(exists=True, content_hash='0' * 64, derivatives_status='')
+
+        self.assertIn('0 rendered', self._process())
+        with self.assertLogs('core.image_derivatives', 'ERROR'):
+            out = self._process(backfill=True)
+        self.assertIn('Queued 2 existing images', out)
+        self.assertIn('1 rendered, 1 failed', out)
+        self.assertEqual(StoredImage.objects.get(name=hotel.image.name).derivatives_status, 'ready')
+        self.assertEqual(StoredImage.objects.get(name=broken.image.name).derivatives_status, 'failed')
+        self.assertIn('Re-queued 1 failed images', self._process(retry_failed=True))
+
+    def test_hotel_list_serves_picture_sources(self):
+        self._hotel('Sea View', image=_png('list.png', (1600, 900)))
+        self._process()
+        response = self.client.get('/hotels/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, 'card.webp 480w')
@@ -0,0 +1,153 @@
+"""
+Image manifest tests
+Display images resolved once from storage, then served from the manifest/cache with content-hash versioned URLs
+"""
+
+import hashlib
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core import image_manifest
+from core.image_manifest import attach_image_urls
+from core.models import City, ImageManifest, StoredImage
+from hotels.models import Hotel, HotelImage, RoomImage, RoomType
+from packages.models import Package
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='manifest-tests-')
+
+
+def _png(name, color, size=(8, 6)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'manifest-tests'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'manifest-tests-shared'},
+    },
+)
+class ImageManifestTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.city = City.objects.create(name='Goa', state='Goa', code='GOI')
+
+    def _hotel(self, name, image=None):
+        return Hotel.objects.create(
+            name=name, description='d', city=self.city, address='a', contact_phone='1', contact_email='h@x.com',
+            image=image,
+        )
+
+    def test_resolves_once_then_no_storage_calls(self):
+        hotels = [self._hotel(f'Hotel {i}', image=_png(f'h{i}.png', (i * 40, 0, 0))) for i in range(3)]
+        gallery_only = self._hotel('Gallery only')
+        HotelImage.objects.create(hotel=gallery_only, image=_png('g.png', 'blue'), is_primary=True)
+        bare = self._hotel('Bare')
+
+        stored = StoredImage.objects.get(name=hotels[0].image.name)
+        self.assertEqual((stored.exists, stored.width, stored.height), (True, 8, 6))
+        with open(f'{MEDIA_ROOT}/{hotels[0].image.name}', 'rb') as handle:
+            self.assertEqual(stored.content_hash, hashlib.sha256(handle.read()).hexdigest())
+
+        page = list(Hotel.objects.order_by('id'))
+        cache.clear()
+        with mock.patch.object(default_storage, 'exists', side_effect=AssertionError('storage touched')):
+            with self.assertNumQueries(1):
+                attach_image_urls(page)
+            with self.assertNumQueries(0):
+                attach_image_urls([Hotel(pk=hotel.pk) for hotel in page])
+                urls = [hotel.display_image_url for hotel in page]
+
+        self.assertEqual(urls[0], f'/media/{hotels[0].image.name}?v={stored.content_hash[:12]}')
+        self.assertIn('hotels/gallery/', urls[3])
+        self.assertEqual(urls[4], '/static/images/hotel_placeholder.svg')
+        self.assertEqual(ImageManifest.objects.get(owner_type='hotels.hotel', owner_id=bare.pk).image_name, '')
+
+    def test_missing_file_falls_back_to_gallery(self):
+        hotel = self._hotel('Sea View', image='hotels/never-uploaded.png')
+        self.assertFalse(StoredImage.objects.get(name='hotels/never-uploaded.png').exists)
+        HotelImage.objects.create(hotel=hotel, image=_png('first.png', 'green'))
+        primary = HotelImage.objects.create(hotel=hotel, image=_png('primary.png', 'blue'), is_primary=True)
+
+        self.assertTrue(Hotel.objects.get(pk=hotel.pk).display_image_url.startswith(f'/media/{primary.image.name}?v='))
+        primary.delete()
+        self.assertIn('first', Hotel.objects.get(pk=hotel.pk).display_image_url)
+
+    def test_room_gallery_upload_updates_url_and_gallery_versions(self):
+        hotel = self._hotel('Sea View')
+        room = RoomType.objects.create(hotel=hotel, name='Std', description='d', base_price=Decimal('2500.00'))
+        self.assertEqual(RoomType.objects.get(pk=room.pk).display_image_url, '/static/images/room_placeholder.svg')
+
+        image = RoomImage.objects.create(room_type=room, image=_png('room.png', 'white'))
+        url = RoomType.objects.get(pk=room.pk).display_image_url
+        content_hash = StoredImage.objects.get(name=image.image.name).content_hash
+        self.assertEqual(url, f'/media/{image.image.name}?v={content_hash[:12]}')
+        self.assertEqual(RoomImage.objects.get(pk=image.pk).image_url_with_cache_busting, url)
+
+    def test_hotel_detail_and_package_list_read_manifest(self):
+        hotel = self._hotel('Sea View', image=_png('own.png', 'red'))
+        for i in range(3):
+            HotelImage.objects.create(hotel=hotel, image=_png(f'g{i}.png', (0, i * 50, 0)))
+        Package.objects.create(
+            name='Goa Escape', description='d', package_type='beach', duration_days=3, duration_nights=2, starting_price=Decimal('9999'),
+            image=_png('pkg.png', 'yellow'),
+        )
+        with mock.patch.object(default_storage, 'exists', side_effect=AssertionError('storage touched')):
+            response = self.client.get(f'/hotels/{hotel.pk}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, f'{hotel.image.name}?v=')
+            response = self.client.get('/packages/')
+            self.assertContains(response, 'packages/')
+            self.assertContains(response, '.png?v=')
+
+    def test_owner_save_reinspects_only_a_new_image(self):
+        hotel = self._hotel('Sea View', image=_png('own.png', 'red'))
+        other = self._hotel('Hill View', image=_png('other.png', 'blue'))
+        with mock.patch.object(image_manifest, 'inspect_file', wraps=image_manifest.inspect_file) as inspect:
+            hotel.name = 'Sea View Resort'
+            hotel.save()
+            self.assertEqual(inspect.call_count, 0)
+
+            hotel.image = other.image.name
+            hotel.save()
+            self.assertEqual([call.args[0] for call in inspect.call_args_list], [other.image.name])
+
+            hotel.image = _png('fresh.png', 'green')
+            hotel.save()
+            self.assertEqual(inspect.call_count, 2)
+            self.assertEqual(inspect.call_args.args[0], hotel.image.name)
+
+    def test_rebuild_command_reinspects_changed_files(self):
+        hotel = self._hotel('Sea View', image=_png('own.png', 'red'))
+        before = Hotel.objects.get(pk=hotel.pk).display_image_url
+        with hotel.image.storage.open(hotel.image.name, 'wb') as handle:
+            Image.new('RGB', (4, 4), 'black').save(handle, format='PNG')
+
+        call_command('rebuild_image_manifest', model=['hotels.Hotel'], stdout=io.StringIO())
+        self.assertEqual(Hotel.objects.get(pk=hotel.pk).display_image_url, before)
+
+        out = io.StringIO()
+        call_command('rebuild_image_manifest', model=['hotels.Hotel'], reinspect=True, stdout=out)
+        cache.clear()
+        after = Hotel.objects.get(pk=hotel.pk).display_image_url
+        self.assertNotEqual(after, before)
+        self.assertEqual(StoredImage.objects.get(name=hotel.image.name).width, 4)
+        self.assertIn('hotels.Hotel: 1 resolved', out.getvalue())
@@ -1,7 +1,29 @@
+from django.core.cache import cache
 from django.utils import timezone
 
 ALLOWED_RECENT_SEARCH_KEYS = ('hotels', 'buses', 'packages')
 
+CITY_CHOICES_CACHE_KEY = 'core:city-choices'
+CITY_CHOICES_TIMEOUT = 60 * 10
+
+
+def get_city_choices():
+    """Return all cities ordered by name, cached for search dropdowns.
+
+    Invalidated by core.signals whenever a City is saved or deleted.
+    """
+    cities = cache.get(CITY_CHOICES_CACHE_KEY)
+    if cities is None:
+        from core.models import City
+
+        cities = list(City.objects.all().order_by('name'))
+        cache.set(CITY_CHOICES_CACHE_KEY, cities, CITY_CHOICES_TIMEOUT)
+    return cities
+
+
+def invalidate_city_choices():
+    cache.delete(CITY_CHOICES_CACHE_KEY)
+
 
 def get_recent_searches(session):
     """Return normalized recent searches stored in session."""
@@ -1,9 +1,11 @@
 from django.shortcuts import render
 from django.views.generic import TemplateView
 from hotels.models import Hotel
+from hotels.cm_cache import availability_cache
 from buses.models import Bus
 from packages.models import Package
 from core.models import City
+from core.image_manifest import attach_image_urls
 from core.utils import get_recent_searches
 from django.http import JsonResponse
 from django.db import connection
@@ -19,8 +21,8 @@ class HomeView(TemplateView):
         context = super().get_context_data(**kwargs)
         # Show full city list in the search dropdown so users can find any destination
         context['popular_cities'] = City.objects.all().order_by('name')
-        context['featured_hotels'] = Hotel.objects.filter(is_featured=True)[:6]
-        context['featured_packages'] = Package.objects.filter(is_active=True)[:4]
+        context['featured_hotels'] = attach_image_urls(Hotel.objects.filter(is_featured=True)[:6])
+        context['featured_packages'] = attach_image_urls(Package.objects.filter(is_active=True)[:4])
         context['recent_searches'] = get_recent_searches(self.request.session)
         context['show_location_prompt'] = not self.request.session.get('location_prompt_shown', False)
         if context['show_location_prompt']:
@@ -45,6 +47,8 @@ def healthz(request):
     Returns 200 only when:
     - DB responds to a simple SELECT
     - Cache set/get succeeds (if configured)
+
+    Also reports this worker's channel manager availability cache counters.
     """
     status = {
         'status': 'ok',
@@ -72,5 +76,7 @@ def healthz(request):
         status['cache'] = f'fail: {type(e).__name__}'
         status['status'] = 'fail'
 
+    status['cm_availability_cache'] = availability_cache.stats()
+
     http_status = 200 if status['status'] == 'ok' else 503
     return JsonResponse(status, status=http_status)
@@ -6,6 +6,7 @@ from datetime import date, timedelta
 from bookings.models import Booking, BusBooking
 from buses.models import BusSchedule, Bus
 from hotels.models import Hotel
+from hotels.occupancy import occupancy_totals
 from packages.models import Package
 
 
@@ -90,6 +91,9 @@ def dashboard(request):
     
     overall_occupancy = (booked_seats / total_seats * 100) if total_seats > 0 else 0
     
+    # Hotel occupancy over the last 30 nights, from the room-night rollups
+    hotel_occupancy = occupancy_totals(today - timedelta(days=30), today)
+    
     # Booking type breakdown
     booking_types = Booking.objects.filter(
         is_deleted=False
@@ -119,6 +123,7 @@ def dashboard(request):
         'bus_schedules': bus_schedules,
         'overall_occupancy': round(overall_occupancy, 1),
         'bus_occupancy_data': bus_occupancy_data,
+        'hotel_occupancy': hotel_occupancy,
         'booking_types': booking_types,
         'recent_bookings': recent_bookings,
         'pending_approvals': pending_approvals,
@@ -9,6 +9,7 @@ from bookings.models import Booking
 from payments.models import Invoice
 from hotels.models import Hotel
 from property_owners.models import Property
+from . import listings, rollups
 from .models import OwnerPayout, PlatformLedger
 from .serializers import (
     InvoiceSerializer,
@@ -43,43 +44,14 @@ def dashboard_metrics_api(request):
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
     
-    bookings = Booking.objects.all()
+    # Summary metrics from the daily finance rollup
+    summary = rollups.summary(rollups.parse_day(date_from), rollups.parse_day(date_to))
     
-    if date_from:
-        bookings = bookings.filter(created_at__date__gte=date_from)
-    if date_to:
-        bookings = bookings.filter(created_at__date__lte=date_to)
-    
-    # Calculate metrics
-    total_bookings = bookings.count()
-    
-    total_revenue = bookings.filter(
-        status='confirmed'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-    
-    # Service fee from price_snapshot
-    total_service_fee = Decimal('0')
-    for booking in bookings.filter(status='confirmed'):
-        if hasattr(booking, 'hotel_details'):
-            price_snapshot = getattr(booking.hotel_details, 'price_snapshot', {}) or {}
-            total_service_fee += Decimal(str(price_snapshot.get('service_fee', 0)))
-    
-    # Wallet usage
-    total_wallet_used = Decimal('0')
-    for booking in bookings.filter(status='confirmed'):
-        if booking.wallet_balance_before and booking.wallet_balance_after:
-            total_wallet_used += (booking.wallet_balance_before - booking.wallet_balance_after)
-    
-    cancellations_count = bookings.filter(status='cancelled').count()
     active_properties = Property.objects.filter(status='APPROVED', is_active=True).count()
     pending_approvals = Property.objects.filter(status='PENDING', is_active=True).count()
     
     data = {
-        'total_bookings': total_bookings,
-        'total_revenue': total_revenue,
-        'total_service_fee': total_service_fee,
-        'total_wallet_used': total_wallet_used,
-        'cancellations_count': cancellations_count,
+        **summary,
         'active_properties': active_properties,
         'pending_approvals': pending_approvals,
     }
@@ -94,7 +66,7 @@ def invoices_api(request):
     """
     GET /api/admin/invoices
     Required role: SUPER_ADMIN or FINANCE_ADMIN
-    Returns: List of all invoices with filters
+    Returns: Keyset-paginated invoice list with filters
     """
     if not has_admin_role(request.user, 'SUPER_ADMIN', 'FINANCE_ADMIN'):
         return Response(
@@ -102,23 +74,21 @@ def invoices_api(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    invoices = Invoice.objects.select_related('booking').all()
-    
-    # Filters
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    
-    if date_from:
-        invoices = invoices.filter(invoice_date__gte=date_from)
-    if date_to:
-        invoices = invoices.filter(invoice_date__lte=date_to)
+    # Filters: date_from/date_to (invoice date), property, status, payment_mode, wallet_used
+    invoices = listings.invoice_rows(request.GET)
     
-    invoices = invoices.order_by('-created_at')
+    # Keyset pagination: pass next_cursor back as ?cursor= for the following page
+    try:
+        page, next_cursor = listings.keyset_page(
+            invoices, request.GET.get('cursor'), listings.page_size(request.GET.get('page_size'))
+        )
+    except listings.InvalidCursor as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = InvoiceSerializer(invoices, many=True)
+    serializer = InvoiceSerializer(page, many=True)
     return Response({
-        'count': invoices.count(),
-        'invoices': serializer.data
+        'invoices': serializer.data,
+        'next_cursor': next_cursor,
     })
 
 
@@ -128,7 +98,7 @@ def bookings_api(request):
     """
     GET /api/admin/bookings
     Required role: Any admin role
-    Returns: Filterable booking list
+    Returns: Keyset-paginated, filterable booking list
     """
     if not has_admin_role(request.user, 'SUPER_ADMIN', 'FINANCE_ADMIN', 'PROPERTY_ADMIN', 'SUPPORT_ADMIN'):
         return Response(
@@ -136,29 +106,21 @@ def bookings_api(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    bookings = Booking.objects.select_related('user').all()
-    
-    # Filters
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
-    status_filter = request.GET.get('status')
-    property_id = request.GET.get('property_id')
-    
-    if date_from:
-        bookings = bookings.filter(created_at__date__gte=date_from)
-    if date_to:
-        bookings = bookings.filter(created_at__date__lte=date_to)
-    if status_filter:
-        bookings = bookings.filter(status=status_filter)
-    if property_id:
-        bookings = bookings.filter(hotel_booking__room_type__hotel_id=property_id)
+    # Filters: date_from/date_to (created), property_id, status, payment_mode, wallet_used
+    bookings = listings.booking_rows(request.GET)
     
-    bookings = bookings.order_by('-created_at')
+    # Keyset pagination: pass next_cursor back as ?cursor= for the following page
+    try:
+        page, next_cursor = listings.keyset_page(
+            bookings, request.GET.get('cursor'), listings.page_size(request.GET.get('page_size'))
+        )
+    except listings.InvalidCursor as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
     
-    serializer = BookingListSerializer(bookings, many=True)
+    serializer = BookingListSerializer(page, many=True)
     return Response({
-        'count': bookings.count(),
-        'bookings': serializer.data
+        'bookings': serializer.data,
+        'next_cursor': next_cursor,
     })
 
 
@@ -5,3 +5,7 @@ from django.apps import AppConfig
 class FinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'finance'
+
+    def ready(self):
+        """Register signals when app is ready"""
+        import finance.signals  # noqa
@@ -0,0 +1,212 @@
+"""
+Finance listings and exports
+
+Booking and invoice listings for the finance table, APIs and exports:
+- filter_bookings()/filter_invoices() apply the shared admin filters (local-day
+  date range, property, status, payment mode, wallet used) as indexable
+  ranges and EXISTS subqueries, so joins never duplicate rows
+- keyset pagination: rows are ordered by (created_at, id) descending and a
+  page continues strictly after an opaque cursor holding the last row's
+  (created_at, id); deep pages cost the same as the first one and need no
+  COUNT(*)
+- stream_bookings() yields CSV or NDJSON lines from a values() iterator
+  (server-side cursor on PostgreSQL) for StreamingHttpResponse, so exports
+  of any size run in constant memory
+"""
+import base64
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from bookings.models import Booking
+from payments.models import Invoice, Payment
+from . import rollups
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# (column name, Booking values() path)
+EXPORT_COLUMNS = (
+    ('booking_id', 'booking_id'),
+    ('created_at', 'created_at'),
+    ('confirmed_at', 'confirmed_at'),
+    ('status', 'status'),
+    ('booking_type', 'booking_type'),
+    ('customer_name', 'customer_name'),
+    ('customer_email', 'customer_email'),
+    ('customer_phone', 'customer_phone'),
+    ('property_id', 'hotel_details__room_type__hotel_id'),
+    ('property_name', 'hotel_details__room_type__hotel__name'),
+    ('check_in', 'hotel_details__check_in'),
+    ('check_out', 'hotel_details__check_out'),
+    ('total_amount', 'total_amount'),
+    ('service_fee', 'service_fee_amount'),
+    ('gst', 'gst_amount'),
+    ('wallet_used', 'wallet_used_amount'),
+    ('refund_amount', 'refund_amount'),
+    ('invoice_number', 'invoice__invoice_number'),
+    ('payment_mode', 'invoice__payment_mode'),
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def page_size(value):
+    """Requested page size clamped to FINANCE_LIST_MAX_PAGE_SIZE."""
+    default = getattr(settings, 'FINANCE_LIST_PAGE_SIZE', 50)
+    try:
+        size = int(value) if value else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, getattr(settings, 'FINANCE_LIST_MAX_PAGE_SIZE', 500)))
+
+
+# Filters
+
+
+def filter_bookings(bookings, params):
+    """Apply the admin booking filters from a GET QueryDict (or dict)."""
+    bookings = rollups.filter_created(
+        bookings, rollups.parse_day(params.get('date_from')), rollups.parse_day(params.get('date_to')),
+    )
+    if params.get('status'):
+        bookings = bookings.filter(status=params['status'])
+    property_id = params.get('property') or params.get('property_id')
+    if property_id:
+        bookings = bookings.filter(hotel_details__room_type__hotel_id=property_id)
+    if params.get('payment_mode'):
+        bookings = bookings.filter(Exists(Payment.objects.filter(
+            booking=OuterRef('pk'), status='success', payment_method=params['payment_mode'],
+        )))
+    wallet_filter = params.get('wallet_used')
+    if wallet_filter == 'yes':
+        bookings = bookings.filter(wallet_used_amount__gt=0)
+    elif wallet_filter == 'no':
+        bookings = bookings.filter(Q(wallet_used_amount__isnull=True) | Q(wallet_used_amount=0))
+    return bookings
+
+
+def filter_invoices(invoices, params):
+    """Apply the admin filters to invoices (dates are invoice dates)."""
+    date_from, date_to = rollups.parse_day(params.get('date_from')), rollups.parse_day(params.get('date_to'))
+    if date_from:
+        invoices = invoices.filter(invoice_date__gte=date_from)
+    if date_to:
+        invoices = invoices.filter(invoice_date__lte=date_to)
+    if params.get('status'):
+        invoices = invoices.filter(booking__status=params['status'])
+    property_id = params.get('property') or params.get('property_id')
+    if property_id:
+        invoices = invoices.filter(booking__hotel_details__room_type__hotel_id=property_id)
+    if params.get('payment_mode'):
+        invoices = invoices.filter(payment_mode=params['payment_mode'])
+    wallet_filter = params.get('wallet_used')
+    if wallet_filter == 'yes':
+        invoices = invoices.filter(wallet_used__gt=0)
+    elif wallet_filter == 'no':
+        invoices = invoices.filter(wallet_used=0)
+    return invoices
+
+
+def booking_rows(params):
+    """Filtered bookings with everything the table and serializers read joined in."""
+    bookings = Booking.objects.select_related('user', 'hotel_details__room_type__hotel', 'invoice').prefetch_related(
+        Prefetch('payments', queryset=Payment.objects.filter(status='success'), to_attr='successful_payments'),
+    )
+    return filter_bookings(bookings, params)
+
+
+def invoice_rows(params):
+    return filter_invoices(Invoice.objects.select_related('booking'), params)
+
+
+# Keyset pagination
+
+
+def encode_cursor(row):
+    raw = f'{row.created_at.isoformat()}|{row.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, pk) from an opaque cursor; raises InvalidCursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        moment, pk = raw.rsplit('|', 1)
+        created_at = parse_datetime(moment)
+        if created_at is None:
+            raise ValueError(moment)
+        return created_at, int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from exc
+
+
+def keyset_page(queryset, cursor=None, size=None):
+    """
+    One page of ``queryset`` newest first, continuing after ``cursor``.
+    Returns (rows, next cursor or None).
+    """
+    size = size or page_size(None)
+    queryset = queryset.order_by('-created_at', '-pk')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(rows[-1])
+
+
+# Streaming export
+
+
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if value is None:
+        return ''
+    return str(value) if not isinstance(value, (int, float, str)) else value
+
+
+def export_rows(params, chunk_size=EXPORT_CHUNK_SIZE):
+    """Filtered export rows as tuples, fetched ``chunk_size`` at a time."""
+    bookings = filter_bookings(Booking.objects.all(), params).order_by('-created_at', '-pk')
+    return bookings.values_list(*(path for _, path in EXPORT_COLUMNS)).iterator(chunk_size)
+
+
+def stream_bookings(params, export_format='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the filtered bookings as CSV or NDJSON lines."""
+    names = [name for name, _ in EXPORT_COLUMNS]
+    rows = export_rows(params, chunk_size)
+    if export_format == 'ndjson':
+        for row in rows:
+            yield json.dumps(dict(zip(names, map(_plain, row)))) + '\n'
+        return
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow([_plain(value) for value in row])
@@ -0,0 +1,56 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0025_roomnightfact_hoteloccupancyrollup'),
+        ('finance', '0002_ownerpayout_bank_account_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinanceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bookings_confirmed', models.IntegerField(default=0)),
+                ('gross_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('service_fee', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gst', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('wallet_used', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancellations', models.IntegerField(default=0)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(unique=True)),
+                ('bookings_created', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PropertyDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bookings_confirmed', models.IntegerField(default=0)),
+                ('gross_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('service_fee', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('gst', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('wallet_used', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancellations', models.IntegerField(default=0)),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='finance_rollups', to='hotels.hotel')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'hotel'], name='finance_prop_rollup_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='propertydailyrollup',
+            constraint=models.UniqueConstraint(fields=('hotel', 'date'), name='finance_property_rollup_uniq'),
+        ),
+    ]
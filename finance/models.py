@@ -222,6 +222,54 @@ class OwnerPayout(TimeStampedModel):
         return payout
 
 
+class RollupTotals(models.Model):
+    """Money and counts a rollup row accumulates (see finance.rollups)"""
+    
+    bookings_confirmed = models.IntegerField(default=0)
+    gross_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    service_fee = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    gst = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    wallet_used = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancellations = models.IntegerField(default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+
+
+class FinanceDailyRollup(RollupTotals):
+    """Platform-wide totals per local day - maintained incrementally by finance.signals"""
+    
+    date = models.DateField(unique=True)
+    bookings_created = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"Rollup {self.date} - Revenue: ₹{self.gross_revenue}"
+
+
+class PropertyDailyRollup(RollupTotals):
+    """Per-hotel totals per local day - maintained incrementally by finance.signals"""
+    
+    date = models.DateField()
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='finance_rollups')
+    
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'date'], name='finance_property_rollup_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'hotel'], name='finance_prop_rollup_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Rollup {self.date} {self.hotel_id} - Revenue: ₹{self.gross_revenue}"
+
+
 class PlatformLedger(TimeStampedModel):
     """System-wide financial ledger - aggregated daily"""
     
@@ -246,56 +294,27 @@ class PlatformLedger(TimeStampedModel):
     
     @classmethod
     def compute_for_date(cls, target_date):
-        """Compute or update ledger for a specific date"""
-        from django.db.models import Sum, Count
+        """Compute or update ledger for a specific date from the daily rollup"""
+        from django.db.models import Sum
         from payments.models import Wallet
         
-        # Get all confirmed bookings for the date
-        bookings = Booking.objects.filter(
-            confirmed_at__date=target_date,
-            status='confirmed'
-        )
-        
-        total_bookings_count = bookings.count()
-        total_revenue = bookings.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-        
-        # Sum service fees
-        total_service_fee = Decimal('0')
-        for booking in bookings:
-            pricing_data = getattr(booking, 'pricing_data', {}) or {}
-            service_fee = Decimal(str(pricing_data.get('service_fee', 0)))
-            total_service_fee += service_fee
+        rollup = FinanceDailyRollup.objects.filter(date=target_date).first() or FinanceDailyRollup(date=target_date)
         
         # Wallet liability (all active wallets)
         wallet_liability = Wallet.objects.filter(is_active=True).aggregate(
             total=Sum('balance')
         )['total'] or Decimal('0')
         
-        # Cancellations
-        cancellations = Booking.objects.filter(
-            cancelled_at__date=target_date,
-            status='cancelled'
-        ).count()
-        
-        # Refunds
-        total_refunds = Booking.objects.filter(
-            cancelled_at__date=target_date,
-            status='cancelled'
-        ).aggregate(total=Sum('refund_amount'))['total'] or Decimal('0')
-        
-        # Net revenue
-        net_revenue = total_service_fee - total_refunds
-        
         ledger, created = cls.objects.update_or_create(
             date=target_date,
             defaults={
-                'total_bookings': total_bookings_count,
-                'total_revenue': total_revenue,
-                'total_service_fee_collected': total_service_fee,
+                'total_bookings': rollup.bookings_confirmed,
+                'total_revenue': rollup.gross_revenue,
+                'total_service_fee_collected': rollup.service_fee,
                 'wallet_liability': wallet_liability,
-                'total_refunds': total_refunds,
-                'net_revenue': net_revenue,
-                'total_cancellations': cancellations,
+                'total_refunds': rollup.refunds,
+                'net_revenue': rollup.service_fee - rollup.refunds,
+                'total_cancellations': rollup.cancellations,
             }
         )
         return ledger
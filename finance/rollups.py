@@ -0,0 +1,310 @@
+"""
+Finance rollups
+
+Booking money is stamped onto Booking columns when a booking is finalized
+(service_fee_amount, gst_amount, wallet_used_amount; refund_amount on
+cancellation) and folded into per-day rollup rows as it changes, so finance
+pages sum a handful of rows instead of walking bookings in Python:
+- FinanceDailyRollup: platform totals per local day
+- PropertyDailyRollup: the same per hotel per day
+- a booking counts as created on its created_at day, as confirmed (revenue,
+  service fee, GST, wallet used) on its confirmed_at day once it reaches
+  confirmed/completed/cancelled/refunded, and as a cancellation (refund) on
+  its cancelled_at day once it is cancelled/refunded
+- finance.signals applies the difference between a booking's previous and
+  current contribution as it is saved (inside the payment finalization
+  transaction); rebuild() recomputes everything from the booking table
+  (rebuild_finance_rollups command)
+- summary() serves the admin dashboard and metrics API; booking filters use
+  created_at ranges built by day_range() so the created_at index is used
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from bookings.models import Booking, HotelBooking
+from .models import FinanceDailyRollup, PropertyDailyRollup
+
+REBUILD_BATCH_SIZE = 2000
+
+CONFIRMED_STATUSES = ('confirmed', 'completed', 'cancelled', 'refunded')
+CANCELLED_STATUSES = ('cancelled', 'refunded')
+
+MONEY_FIELDS = ('gross_revenue', 'service_fee', 'gst', 'wallet_used', 'refunds')
+
+ZERO = Decimal('0.00')
+
+
+class FinanceState(NamedTuple):
+    """The Booking columns a rollup contribution depends on."""
+    status: str
+    created_at: datetime
+    confirmed_at: datetime
+    cancelled_at: datetime
+    total_amount: Decimal
+    service_fee_amount: Decimal
+    gst_amount: Decimal
+    wallet_used_amount: Decimal
+    refund_amount: Decimal
+
+
+STATE_FIELDS = FinanceState._fields
+
+
+def state_of(booking):
+    return FinanceState(*(getattr(booking, field) for field in STATE_FIELDS))
+
+
+def _money(value):
+    return Decimal(str(value)) if value not in (None, '') else ZERO
+
+
+def _day(moment):
+    return timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+
+
+def day_range(date_from=None, date_to=None):
+    """Aware [start, end) datetimes covering local days date_from..date_to (either may be None)."""
+    start = end = None
+    if date_from:
+        start = timezone.make_aware(datetime.combine(date_from, time.min))
+    if date_to:
+        end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+    return start, end
+
+
+def parse_day(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+# Stamping
+
+
+def amounts_from_snapshot(booking):
+    """(service fee, GST, wallet used) for a booking finalized without explicit amounts."""
+    details = getattr(booking, 'hotel_details', None) if booking.booking_type == 'hotel' else None
+    snapshot = (getattr(details, 'price_snapshot', None) or {}) if details else {}
+    wallet_used = ZERO
+    if booking.wallet_balance_before is not None and booking.wallet_balance_after is not None:
+        wallet_used = max(booking.wallet_balance_before - booking.wallet_balance_after, ZERO)
+    return _money(snapshot.get('service_fee')), _money(snapshot.get('gst_amount')), wallet_used
+
+
+def stamp_amounts(booking):
+    """Fill missing money columns on a confirmed booking from its price snapshot and wallet audit."""
+    if booking.service_fee_amount is not None and booking.wallet_used_amount is not None and booking.gst_amount is not None:
+        return False
+    service_fee, gst, wallet_used = amounts_from_snapshot(booking)
+    values = {
+        field: value for field, value in (
+            ('service_fee_amount', service_fee), ('gst_amount', gst), ('wallet_used_amount', wallet_used),
+        ) if getattr(booking, field) is None
+    }
+    Booking.objects.filter(pk=booking.pk).update(**values)
+    for field, value in values.items():
+        setattr(booking, field, value)
+    return True
+
+
+# Contributions
+
+
+def contributions(state, hotel_id=None):
+    """{(date, hotel_id or None): {field: amount}} this booking state adds to the rollups."""
+    rows = defaultdict(lambda: defaultdict(lambda: 0))
+    if state is None or state.created_at is None:
+        return rows
+    rows[(_day(state.created_at), None)]['bookings_created'] += 1
+
+    if state.status in CONFIRMED_STATUSES:
+        confirmed_day = _day(state.confirmed_at or state.created_at)
+        for key in [(confirmed_day, None)] + ([(confirmed_day, hotel_id)] if hotel_id else []):
+            row = rows[key]
+            row['bookings_confirmed'] += 1
+            row['gross_revenue'] += _money(state.total_amount)
+            row['service_fee'] += _money(state.service_fee_amount)
+            row['gst'] += _money(state.gst_amount)
+            row['wallet_used'] += _money(state.wallet_used_amount)
+    if state.status in CANCELLED_STATUSES and state.cancelled_at:
+        cancelled_day = _day(state.cancelled_at)
+        for key in [(cancelled_day, None)] + ([(cancelled_day, hotel_id)] if hotel_id else []):
+            rows[key]['cancellations'] += 1
+            rows[key]['refunds'] += _money(state.refund_amount)
+    return rows
+
+
+def _difference(previous, current, hotel_id):
+    delta = defaultdict(dict)
+    before, after = contributions(previous, hotel_id), contributions(current, hotel_id)
+    for key in set(before) | set(after):
+        for field in set(before.get(key, {})) | set(after.get(key, {})):
+            change = after.get(key, {}).get(field, 0) - before.get(key, {}).get(field, 0)
+            if change:
+                delta[key][field] = change
+    return delta
+
+
+def _apply(delta):
+    for (day, hotel_id), changes in delta.items():
+        if hotel_id is None:
+            model, lookup = FinanceDailyRollup, {'date': day}
+        else:
+            model, lookup = PropertyDailyRollup, {'date': day, 'hotel_id': hotel_id}
+            changes = {field: value for field, value in changes.items() if field != 'bookings_created'}
+            if not changes:
+                continue
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**{field: F(field) + value for field, value in changes.items()})
+
+
+def hotel_for(booking_pk):
+    return HotelBooking.objects.filter(booking_id=booking_pk).values_list('room_type__hotel_id', flat=True).first()
+
+
+def booking_changed(booking, previous):
+    """Fold the change from ``previous`` (a FinanceState, None when new) to the booking's current state."""
+    current = state_of(booking)
+    if previous == current:
+        return
+    affects_properties = any(
+        state is not None and state.status in CONFIRMED_STATUSES for state in (previous, current)
+    )
+    hotel_id = hotel_for(booking.pk) if affects_properties and booking.booking_type == 'hotel' else None
+    _apply(_difference(previous, current, hotel_id))
+
+
+def bookings_updated(previous):
+    """
+    Fold a queryset update of bookings, which skips finance.signals, into the rollups.
+    ``previous`` maps booking pk -> FinanceState read before the update; call inside its transaction.
+    """
+    hotels = dict(HotelBooking.objects.filter(booking_id__in=previous).values_list('booking_id', 'room_type__hotel_id'))
+    for pk, *current in Booking.objects.filter(pk__in=previous).values_list('pk', *STATE_FIELDS):
+        _apply(_difference(previous[pk], FinanceState(*current), hotels.get(pk)))
+
+
+def booking_removed(booking):
+    hotel_id = hotel_for(booking.pk) if booking.booking_type == 'hotel' else None
+    _apply(_difference(state_of(booking), None, hotel_id))
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute every rollup row from the booking table. Returns (daily rows, property rows)."""
+    totals = defaultdict(lambda: defaultdict(lambda: 0))
+    bookings = Booking.objects.order_by().values_list(*STATE_FIELDS, 'hotel_details__room_type__hotel_id')
+    for row in bookings.iterator(batch_size):
+        for key, values in contributions(FinanceState(*row[:-1]), row[-1]).items():
+            for field, value in values.items():
+                totals[key][field] += value
+
+    daily, properties = [], []
+    for (day, hotel_id), values in totals.items():
+        if hotel_id is None:
+            daily.append(FinanceDailyRollup(date=day, **values))
+        else:
+            values.pop('bookings_created', None)
+            properties.append(PropertyDailyRollup(date=day, hotel_id=hotel_id, **values))
+    with transaction.atomic():
+        FinanceDailyRollup.objects.all().delete()
+        PropertyDailyRollup.objects.all().delete()
+        FinanceDailyRollup.objects.bulk_create(daily, batch_size=batch_size)
+        PropertyDailyRollup.objects.bulk_create(properties, batch_size=batch_size)
+    return len(daily), len(properties)
+
+
+def backfill_amounts(batch_size=REBUILD_BATCH_SIZE):
+    """Stamp money columns on confirmed bookings finalized before they existed. Returns the count."""
+    pending = Booking.objects.filter(status__in=CONFIRMED_STATUSES).filter(
+        Q(service_fee_amount__isnull=True) | Q(gst_amount__isnull=True) | Q(wallet_used_amount__isnull=True)
+    )
+    stamped = 0
+    for booking in pending.select_related('hotel_details').order_by('pk').iterator(batch_size):
+        stamped += stamp_amounts(booking)
+    return stamped
+
+
+# Reading
+
+
+def _sum(field):
+    return Coalesce(Sum(field), Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _totals():
+    totals = {field: _sum(field) for field in MONEY_FIELDS}
+    totals.update({field: Coalesce(Sum(field), 0) for field in ('bookings_confirmed', 'cancellations')})
+    return totals
+
+
+def _in_days(rows, date_from, date_to):
+    if date_from:
+        rows = rows.filter(date__gte=date_from)
+    if date_to:
+        rows = rows.filter(date__lte=date_to)
+    return rows
+
+
+def rollup_totals(date_from=None, date_to=None):
+    """Summed platform rollup columns for local days date_from..date_to."""
+    return _in_days(FinanceDailyRollup.objects.all(), date_from, date_to).aggregate(
+        bookings_created=Coalesce(Sum('bookings_created'), 0), **_totals(),
+    )
+
+
+def property_totals(hotel_ids, date_from=None, date_to=None):
+    """{hotel id: summed rollup columns} in one grouped query."""
+    rows = _in_days(PropertyDailyRollup.objects.filter(hotel_id__in=hotel_ids), date_from, date_to)
+    return {row.pop('hotel_id'): row for row in rows.order_by().values('hotel_id').annotate(**_totals())}
+
+
+def filter_created(bookings, date_from=None, date_to=None):
+    """Apply a local-day created_at filter as an indexable datetime range."""
+    start, end = day_range(date_from, date_to)
+    if start:
+        bookings = bookings.filter(created_at__gte=start)
+    if end:
+        bookings = bookings.filter(created_at__lt=end)
+    return bookings
+
+
+def summary(date_from=None, date_to=None, status=None):
+    """
+    Dashboard totals for local days date_from..date_to. Without a status
+    filter they come from the daily rollup (revenue by confirmation day,
+    cancellations by cancellation day); with one, from a single aggregate over
+    the stamped columns of matching bookings created in the range.
+    """
+    if not status:
+        totals = rollup_totals(date_from, date_to)
+        return {
+            'total_bookings': totals['bookings_created'],
+            'total_revenue': totals['gross_revenue'],
+            'total_service_fee': totals['service_fee'],
+            'total_wallet_used': totals['wallet_used'],
+            'cancellations_count': totals['cancellations'],
+        }
+    bookings = filter_created(Booking.objects.filter(status=status), date_from, date_to)
+    confirmed = status in CONFIRMED_STATUSES
+    totals = bookings.aggregate(
+        count=Count('pk'),
+        revenue=_sum('total_amount'),
+        service_fee=_sum('service_fee_amount'),
+        wallet_used=_sum('wallet_used_amount'),
+    )
+    return {
+        'total_bookings': totals['count'],
+        'total_revenue': totals['revenue'] if confirmed else ZERO,
+        'total_service_fee': totals['service_fee'] if confirmed else ZERO,
+        'total_wallet_used': totals['wallet_used'] if confirmed else ZERO,
+        'cancellations_count': totals['count'] if status in CANCELLED_STATUSES else 0,
+    }
@@ -64,19 +64,39 @@ class DashboardMetricsSerializer(serializers.Serializer):
 
 
 class BookingListSerializer(serializers.ModelSerializer):
-    """Serializer for booking list in admin"""
+    """Serializer for booking list in admin (expects finance.listings.booking_rows joins)"""
     customer_email = serializers.EmailField()
     wallet_used = serializers.SerializerMethodField()
+    property_name = serializers.SerializerMethodField()
+    invoice_number = serializers.SerializerMethodField()
+    payment_mode = serializers.SerializerMethodField()
     
     class Meta:
         model = Booking
         fields = [
             'id', 'booking_id', 'customer_name', 'customer_email',
             'status', 'total_amount', 'wallet_used',
+            'property_name', 'invoice_number', 'payment_mode',
             'created_at'
         ]
     
     def get_wallet_used(self, obj):
+        if obj.wallet_used_amount is not None:
+            return obj.wallet_used_amount
         if obj.wallet_balance_before and obj.wallet_balance_after:
             return obj.wallet_balance_before - obj.wallet_balance_after
         return Decimal('0')
+    
+    def get_property_name(self, obj):
+        details = getattr(obj, 'hotel_details', None)
+        return details.room_type.hotel.name if details else None
+    
+    def get_invoice_number(self, obj):
+        invoice = getattr(obj, 'invoice', None)
+        return invoice.invoice_number if invoice else None
+    
+    def get_payment_mode(self, obj):
+        payments = getattr(obj, 'successful_payments', None)
+        if payments is None:
+            payments = obj.payments.filter(status='success')
+        return payments[0].payment_method if payments else None
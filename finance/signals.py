@@ -0,0 +1,34 @@
+"""
+Signals for Finance app - stamp booking money columns at finalization and keep the daily rollups in step
+"""
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from bookings.models import Booking
+from . import rollups
+
+
+@receiver(pre_save, sender=Booking)
+def remember_finance_state(sender, instance, raw=False, **kwargs):
+    instance._previous_finance_state = None
+    if raw or instance.pk is None:
+        return
+    row = Booking.objects.filter(pk=instance.pk).values_list(*rollups.STATE_FIELDS).first()
+    if row:
+        instance._previous_finance_state = rollups.FinanceState(*row)
+
+
+@receiver(post_save, sender=Booking)
+def update_finance_rollups(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.status in rollups.CONFIRMED_STATUSES:
+        # Paths that confirm without passing amounts (admin, legacy views) get them from the snapshot
+        rollups.stamp_amounts(instance)
+    rollups.booking_changed(instance, getattr(instance, '_previous_finance_state', None))
+
+
+@receiver(pre_delete, sender=Booking)
+def remove_from_finance_rollups(sender, instance, **kwargs):
+    # pre_delete: the hotel booking row is still there to attribute the property
+    rollups.booking_removed(instance)
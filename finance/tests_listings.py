@@ -0,0 +1,123 @@
+"""
+Finance listing and export tests
+Keyset pagination of the booking/invoice APIs, shared filters, joined rows and streaming CSV/NDJSON exports
+"""
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from bookings.models import Booking, HotelBooking
+from core.models import City
+from hotels.models import Hotel, RoomType
+from payments.models import Invoice, Payment
+from . import listings
+from .api_views import bookings_api, invoices_api
+from .views import export_bookings
+
+
+class FinanceListingTests(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_user(username='finance', email='f@x.com', password='pw')
+        self.admin.groups.add(Group.objects.get_or_create(name='FINANCE_ADMIN')[0])
+        city = City.objects.create(name='Goa', state='Goa')
+        self.hotels = [
+            Hotel.objects.create(
+                name=f'Hotel {i}', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+            )
+            for i in range(2)
+        ]
+        self.room_types = [
+            RoomType.objects.create(hotel=hotel, name='Std', description='d', base_price=Decimal('1000.00'), total_rooms=5)
+            for hotel in self.hotels
+        ]
+        today = timezone.localdate()
+        self.bookings = []
+        for i in range(7):
+            booking = Booking.objects.create(
+                user=self.admin, booking_type='hotel', status='confirmed', total_amount=Decimal('1000.00') + i,
+                customer_name=f'Guest {i}', customer_email='g@x.com', customer_phone='9',
+                wallet_used_amount=Decimal('50.00') if i % 3 == 0 else Decimal('0.00'),
+                service_fee_amount=Decimal('10.00'), gst_amount=Decimal('0.00'),
+            )
+            HotelBooking.objects.create(
+                booking=booking, room_type=self.room_types[i % 2], check_in=today + timedelta(days=3),
+                check_out=today + timedelta(days=4), number_of_rooms=1, total_nights=1,
+            )
+            payment = Payment.objects.create(
+                booking=booking, amount=booking.total_amount, status='success',
+                payment_method='upi' if i % 2 else 'card',
+            )
+            Invoice.create_for_booking(booking, payment)
+            self.bookings.append(booking)
+        # Several rows share a timestamp so the id tie-breaker matters
+        Booking.objects.filter(pk__in=[b.pk for b in self.bookings[2:5]]).update(created_at=self.bookings[2].created_at)
+
+    def _api(self, view, **params):
+        request = APIRequestFactory().get('/api/finance/', params)
+        force_authenticate(request, user=self.admin)
+        return view(request)
+
+    def test_bookings_api_pages_by_cursor_with_joins(self):
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 3, **({'cursor': cursor} if cursor else {})}
+            # Permission check, page, prefetched payments
+            with self.assertNumQueries(3):
+                response = self._api(bookings_api, **params)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['bookings']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+        expected = list(Booking.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+        row = self._api(bookings_api, page_size=1).data['bookings'][0]
+        newest = self.bookings[6]
+        self.assertEqual(
+            (row['property_name'], row['invoice_number'], row['payment_mode']),
+            ('Hotel 0', newest.invoice.invoice_number, 'card'),
+        )
+        self.assertEqual(self._api(bookings_api, cursor='not-a-cursor').status_code, 400)
+
+    def test_filters_are_shared_by_api_and_invoices(self):
+        data = self._api(bookings_api, wallet_used='yes', payment_mode='card', property_id=self.hotels[0].pk).data
+        self.assertEqual([row['customer_name'] for row in data['bookings']], ['Guest 6', 'Guest 0'])
+
+        first = self._api(invoices_api, page_size=2, payment_mode='upi')
+        rest = self._api(invoices_api, page_size=2, payment_mode='upi', cursor=first.data['next_cursor'])
+        self.assertEqual(
+            [row['booking_id'] for row in first.data['invoices'] + rest.data['invoices']],
+            [str(self.bookings[i].booking_id) for i in (5, 3, 1)],
+        )
+        self.assertIsNone(rest.data['next_cursor'])
+
+        status_filtered = listings.filter_bookings(Booking.objects.all(), {'status': 'cancelled', 'wallet_used': 'no'})
+        self.assertFalse(status_filtered.exists())
+
+    def test_export_streams_csv_and_ndjson(self):
+        request = RequestFactory().get('/finance/admin/bookings/export/', {'wallet_used': 'no'})
+        request.user = self.admin
+        response = export_bookings(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row['wallet_used'] for row in rows}, {'0.00'})
+        self.assertTrue(all(row['invoice_number'].startswith('INV-') for row in rows))
+
+        request = RequestFactory().get('/finance/admin/bookings/export/', {'format': 'ndjson', 'property': self.hotels[1].pk})
+        request.user = self.admin
+        lines = b''.join(export_bookings(request).streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record['customer_name'] for record in records], ['Guest 5', 'Guest 3', 'Guest 1'])
+        self.assertEqual((records[0]['property_name'], records[0]['payment_mode']), ('Hotel 1', 'upi'))
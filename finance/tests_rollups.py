@@ -0,0 +1,146 @@
+"""
+Finance rollup tests
+Money columns stamped at confirmation, incremental daily/property rollups, rebuild parity and rollup-backed dashboards
+"""
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from bookings.admin import BookingAdmin
+from bookings.models import Booking, HotelBooking
+from core.models import City
+from hotels.models import Hotel, RoomType
+from . import rollups
+from .api_views import dashboard_metrics_api
+from .models import FinanceDailyRollup, PlatformLedger, PropertyDailyRollup
+
+
+class FinanceRollupTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+        city = City.objects.create(name='Goa', state='Goa')
+        self.hotels = [
+            Hotel.objects.create(
+                name=f'Hotel {i}', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+            )
+            for i in range(2)
+        ]
+        self.room_types = [
+            RoomType.objects.create(hotel=hotel, name='Std', description='d', base_price=Decimal('1000.00'), total_rooms=5)
+            for hotel in self.hotels
+        ]
+        self.today = timezone.localdate()
+
+    def _booking(self, total, fee, hotel=0, wallet=None):
+        booking = Booking.objects.create(
+            user=self.user, booking_type='hotel', status='reserved', total_amount=Decimal(total),
+            customer_name='G', customer_email='g@x.com', customer_phone='9',
+        )
+        HotelBooking.objects.create(
+            booking=booking, room_type=self.room_types[hotel], check_in=self.today + timedelta(days=3),
+            check_out=self.today + timedelta(days=5), number_of_rooms=1, total_nights=2,
+            price_snapshot={'service_fee': fee, 'total_amount': total},
+        )
+        if wallet:
+            booking.wallet_balance_before, booking.wallet_balance_after = Decimal('500.00'), Decimal('500.00') - Decimal(wallet)
+        return booking
+
+    def _confirm(self, booking):
+        booking.status = 'confirmed'
+        booking.save()
+        return booking
+
+    def _day(self):
+        return FinanceDailyRollup.objects.get(date=self.today)
+
+    def test_confirmation_stamps_columns_and_updates_rollups(self):
+        first = self._confirm(self._booking('1200.00', '60.00', wallet='100.00'))
+        self._confirm(self._booking('2100.00', 105, hotel=1))
+        self._booking('900.00', '45.00')  # never paid
+
+        first.refresh_from_db()
+        self.assertEqual(
+            (first.service_fee_amount, first.gst_amount, first.wallet_used_amount),
+            (Decimal('60.00'), Decimal('0.00'), Decimal('100.00')),
+        )
+        day = self._day()
+        self.assertEqual((day.bookings_created, day.bookings_confirmed), (3, 2))
+        self.assertEqual((day.gross_revenue, day.service_fee, day.wallet_used), (Decimal('3300.00'), Decimal('165.00'), Decimal('100.00')))
+        self.assertEqual(PropertyDailyRollup.objects.get(hotel=self.hotels[1], date=self.today).gross_revenue, Decimal('2100.00'))
+
+        first.status, first.cancelled_at, first.refund_amount = 'cancelled', timezone.now(), Decimal('1000.00')
+        first.save()
+        day = self._day()
+        self.assertEqual((day.bookings_confirmed, day.cancellations, day.refunds), (2, 1, Decimal('1000.00')))
+
+        ledger = PlatformLedger.compute_for_date(self.today)
+        self.assertEqual((ledger.total_service_fee_collected, ledger.net_revenue), (Decimal('165.00'), Decimal('-835.00')))
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for total, fee, hotel in (('1200.00', '60.00', 0), ('800.00', '40.00', 1), ('500.00', '25.00', 0)):
+            self._confirm(self._booking(total, fee, hotel=hotel))
+        booking = Booking.objects.order_by('pk').last()
+        booking.status, booking.cancelled_at, booking.refund_amount = 'refunded', timezone.now(), Decimal('500.00')
+        booking.save()
+        columns = ('date', 'bookings_created', 'bookings_confirmed', 'gross_revenue', 'service_fee', 'cancellations', 'refunds')
+        incremental = list(FinanceDailyRollup.objects.values_list(*columns))
+        per_property = list(PropertyDailyRollup.objects.order_by('hotel_id').values_list('hotel_id', 'gross_revenue', 'refunds'))
+
+        Booking.objects.filter(pk=booking.pk).update(service_fee_amount=None)
+        FinanceDailyRollup.objects.update(gross_revenue=0)
+        call_command('rebuild_finance_rollups', stdout=io.StringIO())
+
+        self.assertEqual(list(FinanceDailyRollup.objects.values_list(*columns)), incremental)
+        self.assertEqual(list(PropertyDailyRollup.objects.order_by('hotel_id').values_list('hotel_id', 'gross_revenue', 'refunds')), per_property)
+        self.assertEqual(rollups.property_totals([self.hotels[0].id])[self.hotels[0].id]['refunds'], Decimal('500.00'))
+
+    def test_admin_cancel_action_updates_rollups(self):
+        for total, fee, hotel in (('1200.00', '60.00', 0), ('800.00', '40.00', 1)):
+            self._confirm(self._booking(total, fee, hotel=hotel))
+        self._booking('500.00', '25.00')
+
+        BookingAdmin(Booking, AdminSite()).cancel_booking(mock.Mock(), Booking.objects.all())
+        self.assertEqual(Booking.objects.filter(status='cancelled', cancelled_at__isnull=False).count(), 3)
+        day = self._day()
+        self.assertEqual((day.bookings_confirmed, day.gross_revenue, day.cancellations), (3, Decimal('2500.00'), 3))
+        self.assertEqual(PropertyDailyRollup.objects.get(hotel=self.hotels[1], date=self.today).cancellations, 1)
+
+        columns = ('date', 'bookings_created', 'bookings_confirmed', 'gross_revenue', 'cancellations', 'refunds')
+        incremental = list(FinanceDailyRollup.objects.values_list(*columns))
+        per_property = list(PropertyDailyRollup.objects.order_by('hotel_id').values_list('hotel_id', 'cancellations'))
+        rollups.rebuild()
+        self.assertEqual(list(FinanceDailyRollup.objects.values_list(*columns)), incremental)
+        self.assertEqual(list(PropertyDailyRollup.objects.order_by('hotel_id').values_list('hotel_id', 'cancellations')), per_property)
+
+    def test_dashboard_metrics_read_rollups(self):
+        admin = get_user_model().objects.create_user(username='finance', email='f@x.com', password='pw')
+        admin.groups.add(Group.objects.get_or_create(name='FINANCE_ADMIN')[0])
+        for _ in range(3):
+            self._confirm(self._booking('1000.00', '50.00', wallet='20.00'))
+
+        request = APIRequestFactory().get('/api/finance/dashboard/metrics/', {'date_from': str(self.today), 'date_to': str(self.today)})
+        force_authenticate(request, user=admin)
+        # Permission check, one rollup aggregate, two property counts - independent of booking volume
+        with self.assertNumQueries(4):
+            response = dashboard_metrics_api(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['total_bookings'], response.data['total_revenue'], response.data['total_service_fee'], response.data['total_wallet_used']),
+            (3, '3000.00', '150.00', '60.00'),
+        )
+
+        tomorrow = self.today + timedelta(days=1)
+        self.assertEqual(rollups.summary(tomorrow, tomorrow)['total_bookings'], 0)
+        self.assertEqual(rollups.summary(self.today, self.today, status='confirmed')['total_service_fee'], Decimal('150.00'))
+        start, end = rollups.day_range(self.today, self.today)
+        self.assertEqual(Booking.objects.filter(created_at__gte=start, created_at__lt=end).count(), 3)
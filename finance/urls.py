@@ -7,6 +7,7 @@ urlpatterns = [
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/properties/', views.property_metrics, name='property_metrics'),
     path('admin/bookings/', views.booking_table, name='booking_table'),
+    path('admin/bookings/export/', views.export_bookings, name='export_bookings'),
     path('owner/earnings/', views.owner_earnings, name='owner_earnings'),
     path('invoice/<int:invoice_id>/download/', views.download_invoice, name='download_invoice'),
 ]
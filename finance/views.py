@@ -1,8 +1,10 @@
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db.models import Sum, Count, Q, Avg
 from django.utils import timezone
 from datetime import timedelta
+from urllib.parse import urlencode
 from decimal import Decimal
 
 from bookings.models import Booking
@@ -10,6 +12,7 @@ from payments.models import Invoice, Payment
 from hotels.models import Hotel
 from property_owners.models import Property
 from users.models import User
+from . import listings, rollups
 from .models import OwnerPayout, PlatformLedger
 
 
@@ -39,39 +42,14 @@ def admin_dashboard(request):
     # Base queryset
     bookings = Booking.objects.select_related('user').all()
     
-    # Apply filters
-    if date_from:
-        bookings = bookings.filter(created_at__date__gte=date_from)
-    if date_to:
-        bookings = bookings.filter(created_at__date__lte=date_to)
+    # Apply filters (local-day bounds as datetime ranges so the created_at index is used)
+    day_from, day_to = rollups.parse_day(date_from), rollups.parse_day(date_to)
+    bookings = rollups.filter_created(bookings, day_from, day_to)
     if status:
         bookings = bookings.filter(status=status)
     
-    # Calculate summary metrics
-    total_bookings = bookings.count()
-    
-    total_revenue = bookings.filter(
-        status='confirmed'
-    ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-    
-    # Calculate service fee from hotel_details.price_snapshot
-    total_service_fee = Decimal('0')
-    for booking in bookings.filter(status='confirmed'):
-        try:
-            if hasattr(booking, 'hotel_details') and booking.hotel_details:
-                price_snapshot = booking.hotel_details.price_snapshot or {}
-                service_fee = price_snapshot.get('service_fee', 0)
-                if isinstance(service_fee, (int, float)):
-                    total_service_fee += Decimal(str(service_fee))
-        except:
-            pass
-    
-    total_wallet_used = Decimal('0')
-    for booking in bookings.filter(status='confirmed'):
-        if booking.wallet_balance_before and booking.wallet_balance_after:
-            total_wallet_used += (booking.wallet_balance_before - booking.wallet_balance_after)
-    
-    cancellations_count = bookings.filter(status='cancelled').count()
+    # Summary metrics from the daily finance rollup
+    summary = rollups.summary(day_from, day_to, status)
     
     active_properties = Property.objects.filter(status='APPROVED', is_active=True).count()
     pending_approvals = Property.objects.filter(status='PENDING', is_active=True).count()
@@ -83,11 +61,7 @@ def admin_dashboard(request):
     properties = Hotel.objects.filter(is_active=True).values('id', 'name')
     
     context = {
-        'total_bookings': total_bookings,
-        'total_revenue': total_revenue,
-        'total_service_fee': total_service_fee,
-        'total_wallet_used': total_wallet_used,
-        'cancellations_count': cancellations_count,
+        **summary,
         'active_properties': active_properties,
         'pending_approvals': pending_approvals,
         'booking_list': booking_list,
@@ -113,36 +87,28 @@ def property_metrics(request):
     # Get all approved properties
     properties = Property.objects.filter(status='APPROVED', is_active=True).select_related('owner')
     
+    hotels = {hotel.owner_property_id: hotel for hotel in Hotel.objects.filter(owner_property__in=properties)}
+    totals = rollups.property_totals([hotel.id for hotel in hotels.values()])
+    
     property_data = []
     for property_obj in properties:
         # Get linked hotel if exists
-        try:
-            hotel = Hotel.objects.get(owner_property=property_obj)
-        except Hotel.DoesNotExist:
+        hotel = hotels.get(property_obj.id)
+        if hotel is None:
             continue
         
-        # Get revenue for this property
-        hotel_bookings = Booking.objects.filter(
-            hotel_booking__room_type__hotel=hotel,
-            status='confirmed'
-        )
-        
-        revenue = hotel_bookings.aggregate(total=Sum('total_amount'))['total'] or Decimal('0')
-        
-        # Calculate service fee from price_snapshot
-        service_fee = Decimal('0')
-        for booking in hotel_bookings:
-            if hasattr(booking, 'hotel_details'):
-                price_snapshot = getattr(booking.hotel_details, 'price_snapshot', {}) or {}
-                service_fee += Decimal(str(price_snapshot.get('service_fee', 0)))
+        # Revenue and service fee from the per-property finance rollup
+        hotel_totals = totals.get(hotel.id, {})
+        revenue = hotel_totals.get('gross_revenue', Decimal('0'))
+        service_fee = hotel_totals.get('service_fee', Decimal('0'))
         
         # Get payout info
         total_payout = OwnerPayout.objects.filter(
-            property=hotel
+            hotel=hotel
         ).aggregate(total=Sum('net_payable_to_owner'))['total'] or Decimal('0')
         
         pending_payout = OwnerPayout.objects.filter(
-            property=hotel,
+            hotel=hotel,
             settlement_status='pending'
         ).aggregate(total=Sum('net_payable_to_owner'))['total'] or Decimal('0')
         
@@ -175,37 +141,54 @@ def booking_table(request):
     payment_mode = request.GET.get('payment_mode')
     wallet_filter = request.GET.get('wallet_used')
     
-    bookings = Booking.objects.select_related('user').all()
-    
-    if date_from:
-        bookings = bookings.filter(created_at__date__gte=date_from)
-    if date_to:
-        bookings = bookings.filter(created_at__date__lte=date_to)
-    if status:
-        bookings = bookings.filter(status=status)
-    if property_id:
-        bookings = bookings.filter(hotel_booking__room_type__hotel_id=property_id)
+    bookings = listings.booking_rows(request.GET)
     
-    bookings = bookings.order_by('-created_at')
+    # Keyset pagination: the "Next" link carries the last row's cursor
+    try:
+        page, next_cursor = listings.keyset_page(
+            bookings, request.GET.get('cursor'), listings.page_size(request.GET.get('page_size'))
+        )
+    except listings.InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
     
     properties = Hotel.objects.filter(is_active=True).values('id', 'name')
     
+    filters = {
+        'date_from': date_from,
+        'date_to': date_to,
+        'property': property_id,
+        'status': status,
+        'payment_mode': payment_mode,
+        'wallet_used': wallet_filter,
+    }
+    
     context = {
-        'bookings': bookings,
+        'bookings': page,
+        'next_cursor': next_cursor,
+        'filter_query': urlencode({key: value for key, value in filters.items() if value}),
         'properties': properties,
-        'filters': {
-            'date_from': date_from,
-            'date_to': date_to,
-            'property': property_id,
-            'status': status,
-            'payment_mode': payment_mode,
-            'wallet_used': wallet_filter,
-        }
+        'payment_modes': Payment.PAYMENT_METHOD,
+        'filters': filters,
     }
     
     return render(request, 'finance/booking_table.html', context)
 
 
+@login_required
+@user_passes_test(is_admin_user)
+def export_bookings(request):
+    """Stream the filtered booking table as CSV (default) or NDJSON (?format=ndjson)"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in listings.EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unsupported export format')
+    
+    content_type, extension = listings.EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(listings.stream_bookings(request.GET, export_format), content_type=content_type)
+    filename = f"bookings-{timezone.localdate():%Y%m%d}.{extension}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def owner_earnings(request):
     """Owner dashboard showing bookings and earnings"""
@@ -271,55 +254,24 @@ def owner_earnings(request):
 
 @login_required
 def download_invoice(request, invoice_id):
-    """Download user invoice PDF"""
-    from django.http import HttpResponse, Http404
+    """Download the user invoice document (rendered once, then served from storage)"""
+    from django.http import FileResponse, Http404
+    from payments.invoice_documents import open_document
     
     try:
-        invoice = Invoice.objects.get(id=invoice_id)
-        
-        # Check permission: owner of booking or admin
-        if invoice.booking.user != request.user and not is_admin_user(request.user):
-            raise Http404("Invoice not found")
-        
-        # For now, return invoice data as text
-        # In production, generate PDF using reportlab or weasyprint
-        response = HttpResponse(content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.txt"'
-        
-        content = f"""
-INVOICE: {invoice.invoice_number}
-Date: {invoice.invoice_date}
-
-BILLING TO:
-{invoice.billing_name}
-{invoice.billing_email}
-{invoice.billing_phone}
-
-BOOKING DETAILS:
-Property: {invoice.property_name}
-Check-in: {invoice.check_in}
-Check-out: {invoice.check_out}
-Rooms: {invoice.num_rooms}
-Meal Plan: {invoice.meal_plan}
-
-AMOUNT BREAKDOWN:
-Subtotal: ₹{invoice.subtotal}
-Service Fee: ₹{invoice.service_fee}
-Tax: ₹{invoice.tax_amount}
-Discount: ₹{invoice.discount_amount}
-Wallet Used: ₹{invoice.wallet_used}
----
-Total: ₹{invoice.total_amount}
-Paid: ₹{invoice.paid_amount}
-
-Payment Mode: {invoice.payment_mode}
-Payment Time: {invoice.payment_timestamp}
-
-Thank you for your booking!
-"""
-        
-        response.write(content)
-        return response
-        
+        invoice = Invoice.objects.select_related('booking').get(id=invoice_id)
     except Invoice.DoesNotExist:
         raise Http404("Invoice not found")
+    
+    # Check permission: owner of booking or admin
+    if invoice.booking.user != request.user and not is_admin_user(request.user):
+        raise Http404("Invoice not found")
+    
+    handle, content_type = open_document(invoice)
+    extension = handle.name.rsplit('.', 1)[-1]
+    response = FileResponse(
+        handle, as_attachment=True, filename=f"invoice_{invoice.invoice_number}.{extension}", content_type=content_type,
+    )
+    # Documents are content addressed: the ETag changes only when the bytes do
+    response['ETag'] = f'"{invoice.document_hash}"'
+    return response
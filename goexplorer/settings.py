@@ -3,9 +3,11 @@ Django settings for GoExplorer (DEV)
 Simple, predictable, easy to maintain.
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 # --------------------------------------------------
 # Base
@@ -321,15 +323,52 @@ REST_FRAMEWORK = {
 }
 
 # --------------------------------------------------
-# Cache & Sessions (simple DB cache)
+# Cache & Sessions (tiered: per-process LRU -> shared tier)
 # --------------------------------------------------
+# "default" keeps hot entries in process memory for CACHE_LOCAL_TIMEOUT
+# seconds in front of "shared". CACHE_SHARED_URL picks the shared tier:
+#   file:///var/cache/goexplorer  file-based (default, under the temp dir)
+#   redis://localhost:6379/1       Redis (needs the redis package)
+#   locmem://goexplorer-shared     in-process fake for tests / single worker
+#   db://goexplorer_cache          legacy DatabaseCache table
+# CACHE_LOCAL_MAX_ENTRIES=0 turns the local tier off. See docs/CACHING.md.
+CACHE_SHARED_URL = config(
+    "CACHE_SHARED_URL",
+    default=f"file://{Path(tempfile.gettempdir()) / 'goexplorer_cache'}",
+)
+
+
+def _shared_cache(url):
+    scheme, _, location = url.partition("://")
+    if scheme in ("redis", "rediss", "unix"):
+        return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": url}
+    if scheme == "locmem":
+        return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": location}
+    if scheme == "db":
+        return {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": location or "goexplorer_cache"}
+    if scheme == "file":
+        return {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}
+    raise ImproperlyConfigured(f"Unsupported CACHE_SHARED_URL scheme: {url}")
+
+
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
-        "LOCATION": "goexplorer_cache",
-    }
+        "BACKEND": "core.cache_backends.TieredCache",
+        "LOCATION": "goexplorer-local",
+        "OPTIONS": {
+            "SHARED_ALIAS": "shared",
+            "LOCAL_MAX_ENTRIES": config("CACHE_LOCAL_MAX_ENTRIES", default=1000, cast=int),
+            "LOCAL_TIMEOUT": config("CACHE_LOCAL_TIMEOUT", default=5, cast=int),
+        },
+    },
+    "shared": _shared_cache(CACHE_SHARED_URL),
 }
-SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+# cached_db reads sessions from the shared tier and only hits the database on
+# a miss or a write; "django.contrib.sessions.backends.signed_cookies" avoids
+# the database entirely (keep session payloads small if you switch).
+SESSION_ENGINE = config("SESSION_ENGINE", default="django.contrib.sessions.backends.cached_db")
+SESSION_CACHE_ALIAS = "shared"
 
 # --------------------------------------------------
 # Crispy Forms
@@ -4,6 +4,7 @@ from .models import (
     Hotel, HotelImage, RoomType, RoomMealPlan, RoomAvailability, RoomBlock,
     ChannelManagerRoomMapping, MealPlan, PolicyCategory, PropertyPolicy
 )
+from .search_index import refresh_search_documents
 from core.admin_mixins import PrimaryImageValidationMixin
 from core.admin_utils import SoftDeleteAdminMixin, soft_delete_selected, restore_selected
 
@@ -155,28 +156,38 @@ class HotelAdmin(SoftDeleteAdminMixin, PrimaryImageValidationMixin, admin.ModelA
     image_preview.short_description = 'Preview'
     
     def make_active(self, request, queryset):
+        hotel_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_active=True)
+        refresh_search_documents(hotel_ids)
         self.message_user(request, f"✓ Activated {updated} hotel(s)")
     make_active.short_description = "✓ Mark selected as active"
     
     def make_inactive(self, request, queryset):
+        hotel_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_active=False)
+        refresh_search_documents(hotel_ids)
         self.message_user(request, f"✗ Deactivated {updated} hotel(s)")
     make_inactive.short_description = "✗ Mark selected as inactive"
     
     def feature_hotels(self, request, queryset):
+        hotel_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_featured=True)
+        refresh_search_documents(hotel_ids)
         self.message_user(request, f"⭐ Featured {updated} hotel(s)")
     feature_hotels.short_description = "⭐ Feature selected"
     
     def unfeature_hotels(self, request, queryset):
+        hotel_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(is_featured=False)
+        refresh_search_documents(hotel_ids)
         self.message_user(request, f"⭐ Unfeatured {updated} hotel(s)")
     unfeature_hotels.short_description = "☆ Unfeature selected"
     
     def enable_amenities(self, request, queryset):
         """Bulk action: Enable WiFi + Pool + Gym for selected hotels"""
+        hotel_ids = list(queryset.values_list('id', flat=True))
         updated = queryset.update(has_wifi=True, has_pool=True, has_gym=True)
+        refresh_search_documents(hotel_ids)
         self.message_user(request, f"[OK] WiFi + Pool + Gym enabled on {updated} hotel(s)")
     enable_amenities.short_description = "Enable WiFi/Pool/Gym on selected"
 
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class HotelsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hotels'
+
+    def ready(self):
+        """Register signals when app is ready"""
+        import hotels.signals  # noqa
@@ -0,0 +1,524 @@
+"""
+Hotel search autocomplete index
+
+An in-memory index answering the search box (search_suggestions,
+universal_search) without touching the database:
+- entries are cities, areas (AREA_MAPPINGS sub-regions), hotels and
+  landmarks (comma-separated address parts shared by hotels), each with its
+  property count computed when the entry is built; cities and areas with no
+  active hotel are left out
+- names are normalized (lowercase, accents and punctuation stripped);
+  1-2 character queries use whole-name and word prefix postings kept in
+  popularity order, longer queries intersect trigram postings and verify
+  the substring, then fall back to trigram similarity for typos
+- results rank by match quality (exact, name prefix, word prefix,
+  substring, fuzzy), then popularity (property count, reviews, featured)
+
+Each worker process holds an AutocompleteIndex snapshot. Snapshots are
+versioned and published to the shared cache tier (AUTOCOMPLETE_CACHE_ALIAS,
+default "shared"), so a change applied in one worker reaches the others
+within AUTOCOMPLETE_SYNC_SECONDS without any of them rebuilding:
+- hotel, room type and city changes (hotels.signals) are recorded in the
+  shared cache after commit (changed()) and published by an RQ job
+  (hotels.tasks); publish_changes() folds every recorded change into one
+  snapshot, re-reading only the affected cities (two queries) and swapping
+  their entries into a copy of the latest snapshot; hotel saves limited to
+  other fields are not recorded
+- one worker publishes at a time (a shared-cache lock, never waited on by
+  requests): a worker that finds it taken leaves its change to the holder,
+  which checks for new changes after letting go; version numbers come from
+  an atomic counter, so two snapshots never share one
+- replaced entries are tombstoned and compacted away once they pile up
+- ``rebuild_autocomplete_index`` (or a missing snapshot) rebuilds it all
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+
+from core.models import City
+
+from .models import Hotel
+
+CITY, AREA, HOTEL, LANDMARK = 'city', 'area', 'hotel', 'landmark'
+
+# Match quality, best first
+EXACT, NAME_PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = 4, 3, 2, 1, 0
+
+SHORT_QUERY = 2
+FUZZY_MIN_LENGTH = 4
+FUZZY_MIN_SIMILARITY = 0.6
+COMPACT_RATIO = 0.25
+
+VERSION_KEY = 'hotels:autocomplete:version'
+SNAPSHOT_KEY = 'hotels:autocomplete:snapshot:{}'
+VERSION_SEQ_KEY = 'hotels:autocomplete:version-seq'
+LOCK_KEY = 'hotels:autocomplete:lock'
+LOCK_TIMEOUT = 30
+LOCK_POLL_SECONDS = 0.05
+PENDING_SEQ_KEY = 'hotels:autocomplete:pending'
+PENDING_KEY = 'hotels:autocomplete:pending:{}'
+APPLIED_KEY = 'hotels:autocomplete:applied'
+MAX_PENDING = 500
+
+# Hotel columns the entries are built from; saves limited to other fields leave the index alone
+HOTEL_FIELDS = frozenset({
+    'name', 'address', 'city', 'city_id', 'latitude', 'longitude', 'is_active',
+    'review_count', 'review_rating', 'is_featured',
+})
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def trigrams(norm):
+    return {norm[i:i + 3] for i in range(len(norm) - 2)}
+
+
+class Entry(NamedTuple):
+    kind: str
+    key: tuple
+    id: int
+    name: str
+    norm: str
+    city: str
+    city_id: int
+    count: int
+    popularity: float
+
+
+def _entry(kind, key, name, city_name, city_id, count, popularity, entry_id=None):
+    norm = normalize(name)
+    return Entry(kind, key, entry_id, name, norm, city_name, city_id, count, popularity)
+
+
+# Building entries
+
+
+def _landmarks(address, city_name):
+    seen = set()
+    for part in str(address or '').split(','):
+        label = ' '.join(part.split())
+        norm = normalize(label)
+        if len(norm) < 3 or norm.replace(' ', '').isdigit() or norm == normalize(city_name) or norm in seen:
+            continue
+        seen.add(norm)
+        yield label, norm
+
+
+def _in_area(hotel, bounds):
+    if hotel['latitude'] is None or hotel['longitude'] is None:
+        return False
+    return (bounds['lat_min'] <= hotel['latitude'] <= bounds['lat_max']
+            and bounds['lon_min'] <= hotel['longitude'] <= bounds['lon_max'])
+
+
+def build_entries(city_ids=None):
+    """Every entry for ``city_ids`` (default: all cities), in two queries."""
+    from .views import AREA_MAPPINGS
+
+    cities = City.objects.order_by()
+    hotels = Hotel.objects.filter(is_active=True).order_by()
+    if city_ids is not None:
+        cities = cities.filter(pk__in=city_ids)
+        hotels = hotels.filter(city_id__in=city_ids)
+    city_rows = {row['id']: row for row in cities.values('id', 'name', 'is_popular')}
+    by_city = defaultdict(list)
+    for hotel in hotels.annotate(rooms=Count('room_types')).values(
+        'id', 'name', 'city_id', 'address', 'latitude', 'longitude', 'review_count', 'is_featured', 'rooms',
+    ):
+        by_city[hotel['city_id']].append(hotel)
+
+    entries = []
+    for city_id, city in city_rows.items():
+        city_hotels = by_city.get(city_id, [])
+        if not city_hotels:
+            continue
+        city_name = city['name']
+        entries.append(_entry(
+            CITY, (CITY, city_id), city_name, city_name, city_id, len(city_hotels),
+            len(city_hotels) + (50 if city['is_popular'] else 0), entry_id=city_id,
+        ))
+        for area_name, bounds in AREA_MAPPINGS.get(city_name, {}).items():
+            count = sum(1 for hotel in city_hotels if _in_area(hotel, bounds))
+            if count:
+                entries.append(_entry(AREA, (AREA, city_id, area_name), area_name, city_name, city_id, count, count))
+        landmarks = {}
+        for hotel in city_hotels:
+            entries.append(_entry(
+                HOTEL, (HOTEL, hotel['id']), hotel['name'], city_name, city_id, hotel['rooms'],
+                (hotel['review_count'] or 0) / 10 + (5 if hotel['is_featured'] else 0), entry_id=hotel['id'],
+            ))
+            for label, norm in _landmarks(hotel['address'], city_name):
+                landmarks.setdefault(norm, [label, 0])[1] += 1
+        for norm, (label, count) in landmarks.items():
+            entries.append(_entry(LANDMARK, (LANDMARK, city_id, norm), label, city_name, city_id, count, count))
+    return entries, set(city_rows)
+
+
+# The index
+
+
+class AutocompleteIndex:
+    """One immutable-by-convention snapshot; apply() returns a new one."""
+
+    def __init__(self, entries=(), version=0):
+        self.version = version
+        self.built_at = time.time()
+        self.entries = []
+        self.ranks = []
+        self.keys = {}
+        self.by_city = defaultdict(set)
+        self.grams = defaultdict(list)
+        self.name_prefixes = defaultdict(list)
+        self.word_prefixes = defaultdict(list)
+        self.dead = 0
+        for entry in sorted(entries, key=self._rank):
+            self._add(entry, sort=False)
+
+    @staticmethod
+    def _rank(entry):
+        return -entry.popularity, entry.norm
+
+    def _rank_of(self, slot):
+        # ranks outlive tombstoned entries, so postings stay sortable
+        return self.ranks[slot]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _add(self, entry, sort=True):
+        slot = len(self.entries)
+        self.entries.append(entry)
+        self.ranks.append(self._rank(entry))
+        self.keys[entry.key] = slot
+        self.by_city[entry.city_id].add(slot)
+        for gram in trigrams(entry.norm):
+            self.grams[gram].append(slot)
+        lengths = range(1, SHORT_QUERY + 1)
+        for postings, words in ((self.name_prefixes, [entry.norm]), (self.word_prefixes, entry.norm.split()[1:])):
+            for prefix in {word[:length] for word in words for length in lengths if len(word) >= length}:
+                if sort:
+                    bisect.insort(postings[prefix], slot, key=self._rank_of)
+                else:
+                    postings[prefix].append(slot)
+
+    def _copy(self):
+        clone = AutocompleteIndex.__new__(AutocompleteIndex)
+        clone.version, clone.built_at, clone.dead = self.version, time.time(), self.dead
+        clone.entries = list(self.entries)
+        clone.ranks = list(self.ranks)
+        clone.keys = dict(self.keys)
+        clone.by_city = defaultdict(set, {city: set(slots) for city, slots in self.by_city.items()})
+        # Postings are copied lazily: only lists that change are replaced
+        clone.grams = defaultdict(list, {gram: postings for gram, postings in self.grams.items()})
+        clone.name_prefixes = defaultdict(list, {key: list(value) for key, value in self.name_prefixes.items()})
+        clone.word_prefixes = defaultdict(list, {key: list(value) for key, value in self.word_prefixes.items()})
+        return clone
+
+    def apply(self, city_ids, entries, version=None):
+        """A new snapshot (``version``, default the next one) with every entry of ``city_ids`` replaced by ``entries``."""
+        clone = self._copy()
+        for city_id in city_ids:
+            for slot in clone.by_city.pop(city_id, ()):
+                entry = clone.entries[slot]
+                if entry is not None:
+                    del clone.keys[entry.key]
+                    clone.entries[slot] = None
+                    clone.dead += 1
+        touched = set()
+        for entry in entries:
+            for gram in trigrams(entry.norm):
+                if gram not in touched:
+                    clone.grams[gram] = list(clone.grams.get(gram, ()))
+                    touched.add(gram)
+            clone._add(entry)
+        clone.version = self.version + 1 if version is None else version
+        if clone.dead > COMPACT_RATIO * max(len(clone.entries), 1):
+            return AutocompleteIndex([entry for entry in clone.entries if entry is not None], clone.version)
+        return clone
+
+    # Lookups
+
+    def _live(self, slots, kinds):
+        for slot in slots:
+            entry = self.entries[slot]
+            if entry is not None and (kinds is None or entry.kind in kinds):
+                yield entry
+
+    def _short(self, query, kinds, limit):
+        results, seen = [], set()
+        for postings, quality in ((self.name_prefixes, NAME_PREFIX), (self.word_prefixes, WORD_PREFIX)):
+            for entry in self._live(postings.get(query, ()), kinds):
+                if entry.key in seen:
+                    continue
+                seen.add(entry.key)
+                results.append((EXACT if entry.norm == query else quality, entry))
+                if len(results) >= limit:
+                    return results
+        return results
+
+    def _long(self, query, kinds, limit):
+        grams = trigrams(query)
+        postings = sorted((self.grams.get(gram, ()) for gram in grams), key=len)
+        matches = []
+        if postings and postings[0]:
+            candidates = set(postings[0])
+            for other in postings[1:]:
+                candidates.intersection_update(other)
+                if not candidates:
+                    break
+            for entry in self._live(candidates, kinds):
+                position = entry.norm.find(query)
+                if position < 0:
+                    continue
+                if entry.norm == query:
+                    quality = EXACT
+                elif position == 0:
+                    quality = NAME_PREFIX
+                elif entry.norm[position - 1] == ' ':
+                    quality = WORD_PREFIX
+                else:
+                    quality = SUBSTRING
+                matches.append((quality, entry))
+        if len(matches) < limit and len(query) >= FUZZY_MIN_LENGTH:
+            found = {entry.key for _, entry in matches}
+            shared = Counter(slot for gram in grams for slot in self.grams.get(gram, ()))
+            for slot, hits in shared.items():
+                entry = self.entries[slot]
+                if entry is None or entry.key in found or (kinds is not None and entry.kind not in kinds):
+                    continue
+                # Share of the query's trigrams found in the name, so long names are not penalised
+                if hits / len(grams) >= FUZZY_MIN_SIMILARITY:
+                    matches.append((FUZZY, entry))
+        matches.sort(key=lambda match: (-match[0], -match[1].popularity, match[1].norm))
+        return matches[:limit]
+
+    def suggest(self, query, kinds=None, limit=10):
+        """[(quality, Entry)] best first."""
+        query = normalize(query)
+        if not query:
+            return []
+        kinds = set(kinds) if kinds else None
+        if len(query) <= SHORT_QUERY:
+            return self._short(query, kinds, limit)
+        return self._long(query, kinds, limit)
+
+
+# Process snapshot and shared publication
+
+
+_lock = threading.Lock()
+_current = None
+_checked_at = 0.0
+
+
+def _cache():
+    return caches[getattr(settings, 'AUTOCOMPLETE_CACHE_ALIAS', 'shared')]
+
+
+def _sync_seconds():
+    return getattr(settings, 'AUTOCOMPLETE_SYNC_SECONDS', 2)
+
+
+def _timeout():
+    return getattr(settings, 'AUTOCOMPLETE_SNAPSHOT_TIMEOUT', 24 * 3600)
+
+
+def _next_version(cache):
+    """A version number no other publisher can get (atomic increment in the shared cache)."""
+    current = _current.version if _current is not None else 0
+    cache.add(VERSION_SEQ_KEY, max(cache.get(VERSION_KEY) or 0, current), None)
+    return cache.incr(VERSION_SEQ_KEY)
+
+
+def publish(index):
+    cache = _cache()
+    cache.set(SNAPSHOT_KEY.format(index.version), index, _timeout())
+    cache.set(VERSION_KEY, index.version, _timeout())
+    _install(index)
+    return index
+
+
+def _install(index):
+    global _current, _checked_at
+    with _lock:
+        if _current is None or index.version >= _current.version:
+            _current = index
+        _checked_at = time.monotonic()
+
+
+def _acquire(cache, wait=False):
+    """Take the publication lock; returns its token, or None when another worker holds it."""
+    token = uuid.uuid4().hex
+    # A holder that died releases the lock when it expires, so waiting is bounded by LOCK_TIMEOUT
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(LOCK_KEY, token, LOCK_TIMEOUT):
+        if not wait or time.monotonic() >= deadline:
+            return None
+        time.sleep(LOCK_POLL_SECONDS)
+    return token
+
+
+def _release(cache, token):
+    if cache.get(LOCK_KEY) == token:
+        cache.delete(LOCK_KEY)
+
+
+def _rebuild_locked(cache):
+    recorded = cache.get(PENDING_SEQ_KEY) or 0
+    entries, _ = build_entries()
+    index = publish(AutocompleteIndex(entries, version=_next_version(cache)))
+    # The build read every change recorded before it started
+    cache.set(APPLIED_KEY, recorded, None)
+    return index
+
+
+def rebuild(wait=True):
+    """
+    Build the whole index from the database and publish it as the next version.
+    Without ``wait``, a worker that finds another one publishing only installs its build locally.
+    """
+    cache = _cache()
+    token = _acquire(cache, wait)
+    if token is None:
+        entries, _ = build_entries()
+        index = AutocompleteIndex(entries)
+        _install(index)
+        return index
+    try:
+        return _rebuild_locked(cache)
+    finally:
+        _release(cache, token)
+
+
+def _latest():
+    """The newest published snapshot, or None when it is missing from the shared cache."""
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        return None
+    if _current is not None and _current.version == version:
+        return _current
+    return cache.get(SNAPSHOT_KEY.format(version))
+
+
+def get_index():
+    """This process's snapshot, re-synced with the shared version every AUTOCOMPLETE_SYNC_SECONDS."""
+    index = _current
+    if index is not None and time.monotonic() - _checked_at < _sync_seconds():
+        return index
+    latest = _latest()
+    if latest is None:
+        return rebuild(wait=False)
+    _install(latest)
+    return _current
+
+
+# Recording and publishing changes
+
+
+def record_changes(hotel_ids=(), city_ids=()):
+    """Note hotels/cities whose entries changed; publish_changes() folds them into the next snapshot."""
+    cache = _cache()
+    cache.add(PENDING_SEQ_KEY, 0, None)
+    seq = cache.incr(PENDING_SEQ_KEY)
+    cache.set(PENDING_KEY.format(seq), (sorted(hotel_ids), sorted(city_ids)), _timeout())
+    return seq
+
+
+def _has_pending(cache):
+    return (cache.get(PENDING_SEQ_KEY) or 0) > (cache.get(APPLIED_KEY) or 0)
+
+
+def _publish_pending(cache):
+    applied = cache.get(APPLIED_KEY) or 0
+    recorded = cache.get(PENDING_SEQ_KEY) or 0
+    if recorded <= applied:
+        return None
+    keys = [PENDING_KEY.format(seq) for seq in range(applied + 1, recorded + 1)] if recorded - applied <= MAX_PENDING else []
+    changes = cache.get_many(keys)
+    base = _latest()
+    if base is None or not keys or len(changes) < len(keys):
+        # No snapshot, too many changes, or a change expired (or is still being written): rebuild it all
+        return _rebuild_locked(cache)
+
+    hotel_ids, city_ids = set(), set()
+    for changed_hotels, changed_cities in changes.values():
+        hotel_ids.update(changed_hotels)
+        city_ids.update(changed_cities)
+    for hotel_id in hotel_ids:
+        slot = base.keys.get((HOTEL, hotel_id))
+        if slot is not None:
+            city_ids.add(base.entries[slot].city_id)
+    city_ids.update(Hotel.all_objects.filter(pk__in=list(hotel_ids)).values_list('city_id', flat=True))
+    entries, _ = build_entries(city_ids)
+    index = publish(base.apply(city_ids, entries, version=_next_version(cache)))
+    cache.set(APPLIED_KEY, recorded, None)
+    cache.delete_many(keys)
+    return index
+
+
+def publish_changes():
+    """
+    Fold every recorded change into one new snapshot (re-reading only the affected
+    cities). Returns the last snapshot published, or None when there was nothing to
+    do or another worker is publishing; that worker checks for new changes after it
+    releases the lock, so none are left behind.
+    """
+    cache = _cache()
+    published = None
+    while _has_pending(cache):
+        token = _acquire(cache)
+        if token is None:
+            break
+        try:
+            published = _publish_pending(cache) or published
+        finally:
+            _release(cache, token)
+    return published
+
+
+_no_worker_logged = False
+
+
+def changed(hotel_ids=(), city_ids=()):
+    """Record a change and queue its publication (inline when django-rq is not installed)."""
+    global _no_worker_logged
+    record_changes(hotel_ids, city_ids)
+    try:
+        from hotels.tasks import publish_autocomplete_changes
+    except ImportError:
+        if not _no_worker_logged:
+            _no_worker_logged = True
+            logger.warning("[AUTOCOMPLETE] django-rq is not installed, publishing changes inline")
+        publish_changes()
+        return
+    publish_autocomplete_changes.delay()
+
+
+def reset():
+    """Forget this process's snapshot (tests)."""
+    global _current, _checked_at
+    with _lock:
+        _current, _checked_at = None, 0.0
+
+
+def suggest(query, kinds=None, limit=None):
+    return get_index().suggest(query, kinds, limit or getattr(settings, 'AUTOCOMPLETE_LIMIT', 10))
@@ -0,0 +1,145 @@
+"""
+Interval availability engine
+
+Sellable inventory for a room type comes from four sources:
+- RoomAvailability: per-night allotment/price counters (a missing night is
+  full capacity at base price)
+- RoomBlock: owner blocks, inclusive ``blocked_from``..``blocked_to``
+- HotelBooking: stays whose booking still holds rooms (HOLDING_STATUSES)
+- InventoryLock: active, unexpired internal holds not yet attached to a booking
+
+AvailabilityWindow loads all four for any number of room types in one query
+each and turns the intervals into per-night totals with a difference-array
+sweep: every interval adds at its first night and subtracts after its last,
+and one running sum over the window yields the rooms committed (and whether a
+block is open) on every night, so the cost is O(intervals + nights) with no
+per-day expansion of individual stays or blocks.
+
+A night's sellable rooms are ``min(allotment, capacity - committed)``, or 0
+when blocked. The counters already net out holds taken through
+reserve_inventory, so taking the minimum never double counts them, while
+stays that never touched the counters still reduce what can be sold.
+"""
+from datetime import timedelta
+from typing import Dict, NamedTuple, Optional
+
+from django.utils import timezone
+
+from .models import RoomAvailability, RoomBlock, RoomType
+
+HOLDING_STATUSES = ('reserved', 'payment_pending', 'confirmed', 'completed')
+
+
+class Night(NamedTuple):
+    date: object
+    capacity: int
+    allotment: int
+    committed: int
+    blocked: bool
+    sellable: int
+    price: object
+
+
+class SellCheck(NamedTuple):
+    """Answer to "can I sell N rooms for these nights"."""
+    ok: bool
+    available: Optional[int]
+    short_night: Optional[object] = None
+    blocked: bool = False
+
+
+class AvailabilityWindow:
+    """Per-night sellable inventory for a set of room types over [start, end)."""
+
+    def __init__(self, room_types, start, end):
+        self.room_types: Dict[int, RoomType] = {room_type.pk: room_type for room_type in room_types}
+        self.start = start
+        self.end = end
+        self.length = max((end - start).days, 0)
+        self._nights: Dict[int, list] = {}
+        if self.room_types and self.length:
+            self._load()
+
+    def _index(self, day):
+        return min(max((day - self.start).days, 0), self.length)
+
+    def _add(self, diff, first, end, amount):
+        """Add ``amount`` on nights [first, end) of the window."""
+        i, j = self._index(first), self._index(end)
+        if i < j:
+            diff[i] += amount
+            diff[j] -= amount
+
+    def _load(self):
+        from bookings.models import HotelBooking, InventoryLock
+
+        ids = list(self.room_types)
+        committed = {room_type_id: [0] * (self.length + 1) for room_type_id in ids}
+        blocks = {room_type_id: [0] * (self.length + 1) for room_type_id in ids}
+        counters = {room_type_id: {} for room_type_id in ids}
+
+        for room_type_id, day, available, price in RoomAvailability.objects.filter(
+            room_type_id__in=ids, date__gte=self.start, date__lt=self.end,
+        ).order_by().values_list('room_type_id', 'date', 'available_rooms', 'price'):
+            counters[room_type_id][day] = (available, price)
+
+        for room_type_id, blocked_from, blocked_to in RoomBlock.objects.filter(
+            room_type_id__in=ids, is_active=True, blocked_from__lt=self.end, blocked_to__gte=self.start,
+        ).order_by().values_list('room_type_id', 'blocked_from', 'blocked_to'):
+            self._add(blocks[room_type_id], blocked_from, blocked_to + timedelta(days=1), 1)
+
+        for room_type_id, check_in, check_out, rooms in HotelBooking.objects.filter(
+            room_type_id__in=ids, booking__status__in=HOLDING_STATUSES,
+            check_in__lt=self.end, check_out__gt=self.start,
+        ).order_by().values_list('room_type_id', 'check_in', 'check_out', 'number_of_rooms'):
+            self._add(committed[room_type_id], check_in, check_out, rooms or 1)
+
+        for room_type_id, check_in, check_out, rooms in InventoryLock.objects.filter(
+            room_type_id__in=ids, source='internal_cm', status='active', booking__isnull=True,
+            expires_at__gt=timezone.now(), check_in__lt=self.end, check_out__gt=self.start,
+        ).order_by().values_list('room_type_id', 'check_in', 'check_out', 'num_rooms'):
+            self._add(committed[room_type_id], check_in, check_out, rooms or 1)
+
+        for room_type_id, room_type in self.room_types.items():
+            capacity = room_type.total_rooms or 0
+            nights = []
+            running_committed = running_blocks = 0
+            for offset in range(self.length):
+                day = self.start + timedelta(days=offset)
+                running_committed += committed[room_type_id][offset]
+                running_blocks += blocks[room_type_id][offset]
+                allotment, price = counters[room_type_id].get(day, (capacity, room_type.base_price))
+                blocked = running_blocks > 0
+                sellable = 0 if blocked else max(min(allotment, capacity - running_committed), 0)
+                nights.append(Night(day, capacity, allotment, running_committed, blocked, sellable, price))
+            self._nights[room_type_id] = nights
+
+    def nights(self, room_type_id, start=None, end=None):
+        """Night rows for one room type, optionally narrowed to [start, end)."""
+        nights = self._nights.get(room_type_id, [])
+        if start is None and end is None:
+            return nights
+        return nights[self._index(start or self.start):self._index(end or self.end)]
+
+    def sellable(self, room_type_id, start=None, end=None):
+        """Rooms sellable on every night of the range (None for an empty range)."""
+        nights = self.nights(room_type_id, start, end)
+        return min(night.sellable for night in nights) if nights else None
+
+    def min_rate(self, room_type_id, start=None, end=None):
+        nights = self.nights(room_type_id, start, end)
+        return min(night.price for night in nights) if nights else None
+
+    def can_sell(self, room_type_id, num_rooms=1, start=None, end=None) -> SellCheck:
+        nights = self.nights(room_type_id, start, end)
+        if not nights:
+            return SellCheck(False, None)
+        for night in nights:
+            if night.sellable < num_rooms:
+                return SellCheck(False, self.sellable(room_type_id, start, end), night.date, night.blocked)
+        return SellCheck(True, min(night.sellable for night in nights))
+
+
+def can_sell(room_type, check_in, check_out, num_rooms=1) -> SellCheck:
+    """Whether ``num_rooms`` of ``room_type`` can be sold for every night in [check_in, check_out)."""
+    return AvailabilityWindow([room_type], check_in, check_out).can_sell(room_type.pk, num_rooms)
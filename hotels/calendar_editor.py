@@ -0,0 +1,357 @@
+"""
+Bulk owner calendar edits
+
+An edit is one inclusive date range on one room type with an action:
+- ``block``: add a RoomBlock over the range
+- ``unblock``: cut the range out of the room type's active blocks (blocks
+  fully inside are deleted, blocks overlapping an edge are trimmed, a block
+  spanning the whole range is split in two)
+- ``set_price`` / ``set_available``: write RoomAvailability price or
+  available_rooms for every night of the range
+
+apply_calendar_edits validates every range up front against one
+AvailabilityWindow over all touched room types (so bookings and holds are
+read once, not per range), then applies the valid edits with bulk
+inserts/updates inside one transaction. Blocks and availability edits are
+checked again there with their nights locked (available_rooms is the count
+left to sell, so it can't exceed the rooms not yet booked or held), and
+price/availability edits only UPDATE their own column, so concurrent
+reservations are never lost. Unblocks act on blocks that existed
+before the request; blocks from the same request are added after them, and
+later price/availability edits win over earlier ones for the same night.
+
+The result has a per-range report and a per-night diff (blocked, price,
+available_rooms, sellable before and after) for the calendar UI.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import AvailabilityWindow
+from .models import RoomAvailability, RoomBlock
+from .occupancy import refresh_blocked
+
+ACTIONS = ('block', 'unblock', 'set_price', 'set_available')
+
+# Edits that depend on the rooms already committed, re-checked with their nights locked
+LOCKED_ACTIONS = ('block', 'set_available')
+
+
+class CalendarEditError(ValueError):
+    pass
+
+
+class CalendarEdit(NamedTuple):
+    room_type_id: int
+    start: date
+    end: date  # inclusive, like RoomBlock.blocked_to
+    action: str
+    price: Optional[Decimal] = None
+    available_rooms: Optional[int] = None
+    reason: str = ''
+
+    @property
+    def stop(self):
+        """Exclusive end for [start, stop) night arithmetic."""
+        return self.end + timedelta(days=1)
+
+
+def max_range_nights():
+    return getattr(settings, 'OWNER_CALENDAR_MAX_RANGE_NIGHTS', 366)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(str(value), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise CalendarEditError(f'Invalid date: {value!r}')
+
+
+def parse_edit(data, default_reason=''):
+    """Build a CalendarEdit from one request range, raising CalendarEditError."""
+    if not isinstance(data, dict):
+        raise CalendarEditError('Each range must be an object')
+    action = data.get('action', 'block')
+    if action not in ACTIONS:
+        raise CalendarEditError(f'Unknown action: {action!r}')
+    try:
+        room_type_id = int(data.get('room_type'))
+    except (TypeError, ValueError):
+        raise CalendarEditError('room_type is required')
+    start = _parse_date(data.get('from'))
+    end = _parse_date(data.get('to', data.get('from')))
+    if end < start:
+        raise CalendarEditError('End date must be after or equal to start date')
+    if start < timezone.localdate():
+        raise CalendarEditError('Cannot edit past dates')
+    if (end - start).days + 1 > max_range_nights():
+        raise CalendarEditError(f'Ranges are limited to {max_range_nights()} nights')
+
+    price = available_rooms = None
+    if action == 'set_price':
+        try:
+            price = Decimal(str(data.get('price')))
+        except (InvalidOperation, ValueError):
+            raise CalendarEditError('price must be a number')
+        if not price.is_finite() or price <= 0:
+            raise CalendarEditError('price must be greater than zero')
+    elif action == 'set_available':
+        try:
+            available_rooms = int(data.get('available_rooms'))
+        except (TypeError, ValueError):
+            raise CalendarEditError('available_rooms must be a whole number')
+        if available_rooms < 0:
+            raise CalendarEditError('available_rooms cannot be negative')
+    reason = str(data.get('reason', default_reason) or '').strip()[:255]
+    return CalendarEdit(room_type_id, start, end, action, price, available_rooms, reason)
+
+
+def _subtract(block_from, block_to, cuts):
+    """Pieces of the inclusive block range left after removing the inclusive ``cuts``."""
+    pieces = [(block_from, block_to)]
+    for cut_from, cut_to in cuts:
+        remaining = []
+        for piece_from, piece_to in pieces:
+            if cut_to < piece_from or cut_from > piece_to:
+                remaining.append((piece_from, piece_to))
+                continue
+            if piece_from < cut_from:
+                remaining.append((piece_from, cut_from - timedelta(days=1)))
+            if cut_to < piece_to:
+                remaining.append((cut_to + timedelta(days=1), piece_to))
+        pieces = remaining
+    return pieces
+
+
+def _night_state(night):
+    return {
+        'blocked': night.blocked,
+        'price': str(night.price),
+        'available_rooms': night.allotment,
+        'sellable': night.sellable,
+    }
+
+
+def calendar_diff(before, after, room_type_ids):
+    """Nights whose state changed between two AvailabilityWindows over the same span."""
+    diff = []
+    for room_type_id in room_type_ids:
+        for old, new in zip(before.nights(room_type_id), after.nights(room_type_id)):
+            old_state, new_state = _night_state(old), _night_state(new)
+            changes = {
+                field: [old_state[field], new_state[field]]
+                for field in old_state if old_state[field] != new_state[field]
+            }
+            if changes:
+                diff.append({'room_type': room_type_id, 'date': old.date.isoformat(), 'changes': changes})
+    return diff
+
+
+class CalendarEditor:
+    """Validate and apply a batch of CalendarEdits for the given (already authorised) room types."""
+
+    def __init__(self, room_types, user=None):
+        self.room_types = {room_type.pk: room_type for room_type in room_types}
+        self.user = user
+
+    def _check(self, edit, window):
+        room_type = self.room_types.get(edit.room_type_id)
+        if room_type is None:
+            return 'Room type not found'
+        if edit.action == 'set_available':
+            if edit.available_rooms > (room_type.total_rooms or 0):
+                return f'available_rooms cannot exceed the {room_type.total_rooms} rooms of this type'
+            # available_rooms is what is left to sell (reserve_inventory decrements it), so rooms already
+            # taken by bookings and holds can't be handed out again
+            for night in window.nights(edit.room_type_id, edit.start, edit.stop):
+                if edit.available_rooms > night.capacity - night.committed:
+                    return (f'available_rooms cannot exceed the {max(night.capacity - night.committed, 0)} '
+                            f'unbooked rooms on {night.date.isoformat()}')
+        if edit.action == 'block':
+            taken = [night.date for night in window.nights(edit.room_type_id, edit.start, edit.stop) if night.committed]
+            if taken:
+                dates = ', '.join(day.isoformat() for day in taken[:3])
+                return f'Cannot block dates with existing bookings: {dates}'
+        return None
+
+    def apply(self, edits):
+        """
+        ``edits`` is a list of CalendarEdit or CalendarEditError (from parse_edit).
+        Returns {'report': [...], 'diff': [...], 'applied': n, 'failed': n}.
+        """
+        report = []
+        valid = [edit for edit in edits if isinstance(edit, CalendarEdit) and edit.room_type_id in self.room_types]
+        touched = sorted({edit.room_type_id for edit in valid})
+        start = min((edit.start for edit in valid), default=None)
+        stop = max((edit.stop for edit in valid), default=None)
+        room_types = [self.room_types[room_type_id] for room_type_id in touched]
+        before = AvailabilityWindow(room_types, start, stop) if valid else None
+
+        accepted = []
+        for index, edit in enumerate(edits):
+            if isinstance(edit, CalendarEdit):
+                error = self._check(edit, before) if before else 'Room type not found'
+            else:
+                error = str(edit)
+            entry = {'index': index, 'status': 'error' if error else 'applied'}
+            if isinstance(edit, CalendarEdit):
+                entry.update({
+                    'room_type': edit.room_type_id, 'action': edit.action,
+                    'from': edit.start.isoformat(), 'to': edit.end.isoformat(),
+                    'nights': (edit.stop - edit.start).days,
+                })
+            if error:
+                entry['error'] = error
+            else:
+                accepted.append((entry, edit))
+            report.append(entry)
+
+        if accepted:
+            with transaction.atomic():
+                accepted = self._recheck_locked(accepted)
+                edits_to_write = [edit for _, edit in accepted]
+                block_spans = self._write_blocks(edits_to_write)
+                self._write_nights(edits_to_write)
+                for room_type_id, (span_start, span_stop) in block_spans.items():
+                    refresh_blocked(self.room_types[room_type_id], span_start, span_stop)
+
+        diff = []
+        if accepted:
+            after = AvailabilityWindow(room_types, start, stop)
+            diff = calendar_diff(before, after, touched)
+        failed = sum(1 for entry in report if entry['status'] == 'error')
+        return {'report': report, 'diff': diff, 'applied': len(accepted), 'failed': failed}
+
+    def _recheck_locked(self, accepted):
+        """
+        Lock the nights of the accepted blocks and availability edits and validate
+        them again against a fresh window, so a reservation that landed after the
+        first read can't end up under a block or be handed out again. Returns the
+        (entry, edit) pairs still accepted.
+        """
+        locked = [edit for _, edit in accepted if edit.action in LOCKED_ACTIONS]
+        if not locked:
+            return accepted
+        self._ensure_rows(locked)
+        nights = Q()
+        for edit in locked:
+            nights |= Q(room_type_id=edit.room_type_id, date__gte=edit.start, date__lt=edit.stop)
+        # reserve_inventory decrements these rows, so holding their locks serialises with it
+        list(RoomAvailability.objects.select_for_update().filter(nights).order_by('pk').values_list('pk', flat=True))
+        window = AvailabilityWindow(
+            [self.room_types[room_type_id] for room_type_id in sorted({edit.room_type_id for edit in locked})],
+            min(edit.start for edit in locked), max(edit.stop for edit in locked),
+        )
+        still_accepted = []
+        for entry, edit in accepted:
+            error = self._check(edit, window) if edit.action in LOCKED_ACTIONS else None
+            if error:
+                entry.update({'status': 'error', 'error': error})
+            else:
+                still_accepted.append((entry, edit))
+        return still_accepted
+
+    def _ensure_rows(self, edits):
+        """Insert missing RoomAvailability nights of ``edits`` at full capacity and base price, in one INSERT."""
+        rows = {}
+        for edit in edits:
+            room_type = self.room_types[edit.room_type_id]
+            for offset in range((edit.stop - edit.start).days):
+                day = edit.start + timedelta(days=offset)
+                rows[(room_type.pk, day)] = RoomAvailability(
+                    room_type=room_type, date=day, available_rooms=room_type.total_rooms or 0, price=room_type.base_price,
+                )
+        if rows:
+            RoomAvailability.objects.bulk_create(rows.values(), batch_size=1000, ignore_conflicts=True)
+
+    def _write_blocks(self, edits):
+        """Apply unblocks to existing blocks, then add new blocks. Returns {room_type_id: (start, stop)} touched."""
+        spans = {}
+
+        def touch(room_type_id, first, stop):
+            if room_type_id in spans:
+                first, stop = min(first, spans[room_type_id][0]), max(stop, spans[room_type_id][1])
+            spans[room_type_id] = (first, stop)
+
+        cuts = defaultdict(list)
+        for edit in edits:
+            if edit.action == 'unblock':
+                cuts[edit.room_type_id].append((edit.start, edit.end))
+        if cuts:
+            overlapping = Q()
+            for room_type_id, ranges in cuts.items():
+                for cut_from, cut_to in ranges:
+                    overlapping |= Q(room_type_id=room_type_id, blocked_from__lte=cut_to, blocked_to__gte=cut_from)
+            to_delete, to_update, to_create = [], [], []
+            for block in RoomBlock.objects.filter(overlapping, is_active=True):
+                pieces = _subtract(block.blocked_from, block.blocked_to, cuts[block.room_type_id])
+                touch(block.room_type_id, block.blocked_from, block.blocked_to + timedelta(days=1))
+                if not pieces:
+                    to_delete.append(block.pk)
+                    continue
+                (block.blocked_from, block.blocked_to), rest = pieces[0], pieces[1:]
+                block.updated_at = timezone.now()
+                to_update.append(block)
+                to_create.extend(
+                    RoomBlock(
+                        room_type_id=block.room_type_id, blocked_from=piece_from, blocked_to=piece_to,
+                        reason=block.reason, created_by_id=block.created_by_id,
+                    )
+                    for piece_from, piece_to in rest
+                )
+            if to_delete:
+                RoomBlock.objects.filter(pk__in=to_delete).delete()
+            if to_update:
+                RoomBlock.objects.bulk_update(to_update, ['blocked_from', 'blocked_to', 'updated_at'])
+            RoomBlock.objects.bulk_create(to_create)
+
+        new_blocks = [
+            RoomBlock(
+                room_type_id=edit.room_type_id, blocked_from=edit.start, blocked_to=edit.end,
+                reason=edit.reason, created_by=self.user,
+            )
+            for edit in edits if edit.action == 'block'
+        ]
+        RoomBlock.objects.bulk_create(new_blocks)
+        for block in new_blocks:
+            touch(block.room_type_id, block.blocked_from, block.blocked_to + timedelta(days=1))
+        return spans
+
+    def _write_nights(self, edits):
+        """
+        Write price/available_rooms for price/availability edits. Missing nights
+        are inserted at their defaults first (ignoring rows created meanwhile),
+        then each edit UPDATEs only its own column, so a concurrent
+        reserve_inventory decrement is never overwritten by a price edit.
+        """
+        night_edits = [edit for edit in edits if edit.action in ('set_price', 'set_available')]
+        self._ensure_rows(night_edits)
+        values = {'price': {}, 'available_rooms': {}}
+        for edit in night_edits:
+            field, value = ('price', edit.price) if edit.action == 'set_price' else ('available_rooms', edit.available_rooms)
+            for offset in range((edit.stop - edit.start).days):
+                values[field][(edit.room_type_id, edit.start + timedelta(days=offset))] = value
+        for field, nights in values.items():
+            # One UPDATE per (room type, value); later edits for a night already won above
+            groups = defaultdict(list)
+            for (room_type_id, day), value in nights.items():
+                groups[(room_type_id, value)].append(day)
+            for (room_type_id, value), days in groups.items():
+                RoomAvailability.objects.filter(room_type_id=room_type_id, date__in=days).update(**{field: value})
+
+
+def apply_calendar_edits(room_types, ranges, user=None, default_reason=''):
+    """Parse raw request ranges and apply them to ``room_types``."""
+    edits = []
+    for data in ranges:
+        try:
+            edits.append(parse_edit(data, default_reason))
+        except CalendarEditError as exc:
+            edits.append(exc)
+    return CalendarEditor(room_types, user=user).apply(edits)
@@ -1,16 +1,27 @@
 import logging
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import date, datetime, timedelta
 from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Min
 from django.utils import timezone
 
+from bookings.inventory_utils import (
+    InsufficientInventoryError,
+    ensure_availability_rows,
+    reserve_inventory,
+    restore_inventory,
+    restore_inventory_bulk,
+)
 from bookings.models import InventoryLock
-from .models import ChannelManagerRoomMapping, Hotel, RoomAvailability, RoomType
+from .availability import AvailabilityWindow
+from .cm_cache import FRESH, availability_cache
+from .models import ChannelManagerRoomMapping, Hotel, RoomType
 
 logger = logging.getLogger(__name__)
 
@@ -36,14 +47,41 @@ def _date_range(start: date, end: date):
         current += timedelta(days=1)
 
 
+# Keep-alive sessions shared by every client for the same provider/endpoint
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+CM_TIMEOUT_MESSAGE = "Channel manager did not respond in time"
+
+
+def get_cm_session(provider: str, base_url: Optional[str]) -> requests.Session:
+    """Return the pooled HTTP session for a provider, creating it on first use."""
+    key = (provider, base_url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            pool_size = getattr(settings, "CHANNEL_MANAGER_POOL_SIZE", 10)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[key] = session
+        return session
+
+
 class ExternalChannelManagerClient:
-    """Simple HTTP client for external channel manager integrations."""
+    """HTTP client for external channel manager integrations (pooled per provider)."""
 
     def __init__(self, provider: str = "generic", base_url: Optional[str] = None, api_key: Optional[str] = None, timeout: Optional[int] = None):
         self.provider = provider
         self.base_url = base_url or getattr(settings, "CHANNEL_MANAGER_API_BASE_URL", None)
         self.api_key = api_key or getattr(settings, "CHANNEL_MANAGER_API_KEY", None)
         self.timeout = timeout or getattr(settings, "CHANNEL_MANAGER_TIMEOUT", 10)
+        self.session = get_cm_session(provider, self.base_url)
+
+    @property
+    def is_configured(self):
+        return bool(self.base_url and self.api_key)
 
     def _headers(self):
         headers = {"Content-Type": "application/json"}
@@ -59,13 +97,7 @@ class ExternalChannelManagerClient:
             "restrictions": {},
         }
 
-    def fetch_availability(self, mapping: ChannelManagerRoomMapping, check_in, check_out, num_rooms: int = 1):
-        check_in = _ensure_date(check_in)
-        check_out = _ensure_date(check_out)
-
-        if not self.base_url or not self.api_key:
-            return self._stub_rate(mapping)
-
+    def _request_availability(self, mapping: ChannelManagerRoomMapping, check_in: date, check_out: date, num_rooms: int, timeout=None):
         payload = {
             "room_id": mapping.external_room_id,
             "rooms": num_rooms,
@@ -73,11 +105,11 @@ class ExternalChannelManagerClient:
             "checkout": check_out.isoformat(),
         }
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url.rstrip('/')}/availability",
                 json=payload,
                 headers=self._headers(),
-                timeout=self.timeout,
+                timeout=timeout or self.timeout,
             )
             response.raise_for_status()
             return response.json()
@@ -85,14 +117,29 @@ class ExternalChannelManagerClient:
             logger.exception("Failed to fetch availability from CM", exc_info=exc)
             raise AvailabilityError(str(exc)) from exc
 
+    def fetch_availability(self, mapping: ChannelManagerRoomMapping, check_in, check_out, num_rooms: int = 1):
+        check_in = _ensure_date(check_in)
+        check_out = _ensure_date(check_out)
+
+        if not self.is_configured:
+            return self._stub_rate(mapping)
+
+        return availability_cache.get_or_fetch(
+            mapping, check_in, check_out, num_rooms,
+            lambda: self._request_availability(mapping, check_in, check_out, num_rooms),
+            wait_timeout=self.timeout,
+        )
+
     def lock_inventory(self, mapping: ChannelManagerRoomMapping, check_in, check_out, num_rooms: int = 1, hold_minutes: int = 10):
         check_in = _ensure_date(check_in)
         check_out = _ensure_date(check_out)
 
-        if not self.base_url or not self.api_key:
+        if not self.is_configured:
             expires_at = timezone.now() + timedelta(minutes=hold_minutes)
             return {"lock_id": f"SIM-{uuid.uuid4().hex}", "expires_at": expires_at}
 
+        availability_cache.invalidate(mapping.room_type_id)
+
         payload = {
             "room_id": mapping.external_room_id,
             "rooms": num_rooms,
@@ -101,7 +148,7 @@ class ExternalChannelManagerClient:
             "reference_id": f"GOEXP-{uuid.uuid4().hex[:10].upper()}",
         }
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url.rstrip('/')}/locks",
                 json=payload,
                 headers=self._headers(),
@@ -123,13 +170,15 @@ class ExternalChannelManagerClient:
             logger.exception("Failed to lock inventory with CM", exc_info=exc)
             raise InventoryLockError(str(exc)) from exc
 
-    def confirm_booking(self, lock_id: str, reference_id: str):
-        if not self.base_url or not self.api_key:
+    def confirm_booking(self, lock_id: str, reference_id: str, room_type_id: Optional[int] = None):
+        if room_type_id:
+            availability_cache.invalidate(room_type_id)
+        if not self.is_configured:
             return {"cm_booking_id": f"SIM-BOOK-{uuid.uuid4().hex[:12].upper()}", "status": "confirmed"}
 
         payload = {"lock_id": lock_id, "reference_id": reference_id}
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url.rstrip('/')}/confirm",
                 json=payload,
                 headers=self._headers(),
@@ -141,12 +190,14 @@ class ExternalChannelManagerClient:
             logger.exception("Failed to confirm booking with CM", exc_info=exc)
             raise InventoryLockError(str(exc)) from exc
 
-    def release_lock(self, lock_id: str):
-        if not self.base_url or not self.api_key:
+    def release_lock(self, lock_id: str, room_type_id: Optional[int] = None):
+        if room_type_id:
+            availability_cache.invalidate(room_type_id)
+        if not self.is_configured:
             return {"status": "released"}
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url.rstrip('/')}/locks/{lock_id}/release",
                 headers=self._headers(),
                 timeout=self.timeout,
@@ -158,6 +209,111 @@ class ExternalChannelManagerClient:
             raise InventoryLockError(str(exc)) from exc
 
 
+def fetch_availability_batch(mappings, check_in, check_out, num_rooms: int = 1, deadline: Optional[float] = None, max_concurrency: Optional[int] = None):
+    """Fetch availability for many mappings at once.
+
+    Fresh answers come from the availability cache. Misses fan out over a
+    bounded thread pool sharing the pooled sessions; identical misses already
+    in flight in this process are awaited rather than repeated. Whatever has
+    not answered when ``deadline`` seconds have passed falls back to a stale
+    cached answer, or is reported in ``errors`` with ``CM_TIMEOUT_MESSAGE``
+    instead of failing the caller. Returns ``(results, errors)`` keyed by mapping id.
+    """
+    check_in = _ensure_date(check_in)
+    check_out = _ensure_date(check_out)
+    deadline = deadline or getattr(settings, "CHANNEL_MANAGER_BATCH_DEADLINE", 3.0)
+    max_concurrency = max_concurrency or getattr(settings, "CHANNEL_MANAGER_MAX_CONCURRENCY", 8)
+
+    results, errors = {}, {}
+    clients = {}
+    configured = []
+    for mapping in mappings:
+        client = clients.get(mapping.provider)
+        if client is None:
+            client = clients[mapping.provider] = ExternalChannelManagerClient(provider=mapping.provider)
+        if client.is_configured:
+            configured.append((client, mapping))
+        else:
+            results[mapping.id] = client._stub_rate(mapping)
+
+    if not configured:
+        return results, errors
+
+    # Serve fresh cache entries; only the leader for each missing key goes upstream.
+    cached = availability_cache.lookup_many([mapping for _, mapping in configured], check_in, check_out, num_rooms)
+    remote, followers, stale, claimed = [], [], {}, []
+    for client, mapping in configured:
+        key, state, data = cached[mapping.id]
+        if state == FRESH:
+            availability_cache.count("hits")
+            results[mapping.id] = data
+            continue
+        leader, event = availability_cache.claim(key)
+        if leader:
+            claimed.append(key)
+            remote.append((client, mapping, key))
+            if data is not None:
+                stale[mapping.id] = data
+        elif data is not None:
+            availability_cache.count("stale")
+            results[mapping.id] = data
+        else:
+            followers.append((mapping, key, event))
+
+    try:
+        _fetch_remote(remote, check_in, check_out, num_rooms, deadline, max_concurrency, results, errors, stale)
+    finally:
+        for key in claimed:
+            availability_cache.release(key)
+
+    for mapping, key, event in followers:
+        event.wait(deadline)
+        state, data = availability_cache.read(key)
+        if state is not None:
+            availability_cache.count("coalesced")
+            results[mapping.id] = data
+        else:
+            errors[mapping.id] = CM_TIMEOUT_MESSAGE
+    return results, errors
+
+
+def _fetch_remote(remote, check_in, check_out, num_rooms, deadline, max_concurrency, results, errors, stale):
+    """Run upstream availability calls for the batch leader keys under one deadline."""
+    if not remote:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(remote)), thread_name_prefix="cm-fetch")
+    futures = {
+        executor.submit(
+            client._request_availability, mapping, check_in, check_out, num_rooms, min(client.timeout, deadline)
+        ): (mapping, key)
+        for client, mapping, key in remote
+    }
+    availability_cache.count("misses", len(futures))
+    done, pending = wait(futures, timeout=deadline)
+    # Do not hold the caller for stragglers; their own timeout ends them.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future in done:
+        mapping, key = futures[future]
+        try:
+            results[mapping.id] = future.result()
+            availability_cache.store(key, results[mapping.id])
+        except AvailabilityError as exc:
+            errors[mapping.id] = str(exc)
+    for future in pending:
+        mapping, key = futures[future]
+        logger.warning("CM availability for mapping %s exceeded %.1fs deadline", mapping.id, deadline)
+        errors[mapping.id] = CM_TIMEOUT_MESSAGE
+
+    # A stale answer beats an error for the page
+    for mapping_id in list(errors):
+        if mapping_id in stale:
+            availability_cache.count("stale")
+            results[mapping_id] = stale[mapping_id]
+            del errors[mapping_id]
+
+
 class InternalInventoryService:
     """Inventory and locking for properties managed internally."""
 
@@ -165,41 +321,23 @@ class InternalInventoryService:
         self.hotel = hotel
 
     def ensure_availability_rows(self, room_type: RoomType, check_in: date, check_out: date):
-        for day in _date_range(check_in, check_out):
-            RoomAvailability.objects.get_or_create(
-                room_type=room_type,
-                date=day,
-                defaults={"available_rooms": room_type.total_rooms, "price": room_type.base_price},
-            )
+        ensure_availability_rows(room_type, check_in, check_out)
 
     def summarize(self, room_type: RoomType, check_in: date, check_out: date):
-        self.ensure_availability_rows(room_type, check_in, check_out)
-        qs = RoomAvailability.objects.filter(room_type=room_type, date__gte=check_in, date__lt=check_out)
-        available = qs.aggregate(min_rooms=Min("available_rooms")).get("min_rooms")
-        rate = qs.aggregate(min_rate=Min("price")).get("min_rate") or room_type.base_price
-        return {"available_rooms": available, "rate": float(rate), "currency": "INR"}
+        """Sellable rooms and lowest nightly rate, counting blocks, holds and bookings."""
+        return BulkAvailabilityService(check_in, check_out).summarize_room_types([room_type])[room_type.id]
 
     def lock_inventory(self, room_type: RoomType, check_in, check_out, num_rooms: int = 1, hold_minutes: int = 10):
         check_in = _ensure_date(check_in)
         check_out = _ensure_date(check_out)
 
         with transaction.atomic():
-            self.ensure_availability_rows(room_type, check_in, check_out)
-            slots = list(
-                RoomAvailability.objects.select_for_update()
-                .filter(room_type=room_type, date__gte=check_in, date__lt=check_out)
-                .order_by("date")
-            )
-
-            for slot in slots:
-                if slot.available_rooms < num_rooms:
-                    raise InventoryLockError(
-                        f"Only {slot.available_rooms} rooms left for {slot.date}. Requested {num_rooms}."
-                    )
-
-            for slot in slots:
-                slot.available_rooms -= num_rooms
-                slot.save(update_fields=["available_rooms"])
+            try:
+                reserve_inventory(room_type, check_in, check_out, num_rooms)
+            except InsufficientInventoryError as exc:
+                raise InventoryLockError(
+                    f"Only {exc.available} rooms left for {exc.date}. Requested {num_rooms}."
+                ) from exc
 
             reference_id = f"ICM-{uuid.uuid4().hex[:10].upper()}"
             lock = InventoryLock.objects.create(
@@ -231,14 +369,7 @@ class InternalInventoryService:
         check_in = lock.check_in
         check_out = lock.check_out
         with transaction.atomic():
-            slots = list(
-                RoomAvailability.objects.select_for_update()
-                .filter(room_type=lock.room_type, date__gte=check_in, date__lt=check_out)
-                .order_by("date")
-            )
-            for slot in slots:
-                slot.available_rooms += lock.num_rooms
-                slot.save(update_fields=["available_rooms"])
+            restore_inventory(lock.room_type_id, check_in, check_out, lock.num_rooms)
             lock.status = "released"
             lock.save(update_fields=["status", "updated_at"])
         return lock
@@ -274,6 +405,115 @@ def get_hotel_availability_snapshot(hotel: Hotel, check_in, check_out, num_rooms
     return summary
 
 
+class BulkAvailabilityService:
+    """Availability snapshots for a whole result set in a constant number of queries.
+
+    Mirrors ``get_hotel_availability_snapshot`` for every hotel passed in, but
+    loads room types, channel mappings and the hotels.availability interval
+    sources with one query each instead of one round of queries per hotel.
+    Nights without a ``RoomAvailability`` row fall back to
+    ``RoomType.total_rooms`` and ``RoomType.base_price`` in memory; no rows
+    are written.
+    """
+
+    def __init__(self, check_in, check_out, num_rooms: int = 1):
+        self.check_in = _ensure_date(check_in)
+        self.check_out = _ensure_date(check_out)
+        self.num_rooms = num_rooms
+        self.nights = max((self.check_out - self.check_in).days, 0)
+
+    def summarize_room_types(self, room_types):
+        """Return ``{room_type_id: summary}`` from one AvailabilityWindow over the stay."""
+        room_types = list(room_types)
+        if not room_types:
+            return {}
+
+        window = AvailabilityWindow(room_types, self.check_in, self.check_out)
+        summaries = {}
+        for room_type in room_types:
+            available = window.sellable(room_type.id)
+            rate = window.min_rate(room_type.id)
+            summaries[room_type.id] = {
+                "available_rooms": room_type.total_rooms if available is None else available,
+                "rate": float(rate or room_type.base_price),
+                "currency": "INR",
+            }
+        return summaries
+
+    def snapshot_hotels(self, hotels):
+        """Return ``(snapshots, errors)`` keyed by hotel id.
+
+        ``errors`` holds the message for hotels whose availability could not be
+        resolved, in the same wording ``get_hotel_availability_snapshot`` raises.
+        """
+        hotels = list(hotels)
+        snapshots, errors = {}, {}
+        hotel_ids = [hotel.id for hotel in hotels]
+        if not hotel_ids:
+            return snapshots, errors
+
+        # Cheapest room type per hotel, i.e. what ``hotel.room_types.first()`` resolves to.
+        lead_room_types = {}
+        for room_type in RoomType.objects.filter(hotel_id__in=hotel_ids).order_by("hotel_id", "base_price", "id"):
+            lead_room_types.setdefault(room_type.hotel_id, room_type)
+
+        mappings = {}
+        external_ids = [hotel.id for hotel in hotels if hotel.inventory_source == "external_cm"]
+        if external_ids:
+            for mapping in (
+                ChannelManagerRoomMapping.objects.filter(hotel_id__in=external_ids, is_active=True)
+                .select_related("room_type")
+                .order_by("hotel__name", "room_type__name")
+            ):
+                mappings.setdefault(mapping.hotel_id, mapping)
+
+        internal_summaries = self.summarize_room_types(
+            room_type
+            for hotel_id, room_type in lead_room_types.items()
+            if hotel_id not in external_ids
+        )
+
+        # All external CM calls for the page go out concurrently under one deadline.
+        external_data, external_errors = fetch_availability_batch(
+            mappings.values(), self.check_in, self.check_out, self.num_rooms
+        )
+
+        for hotel in hotels:
+            if hotel.inventory_source == "external_cm":
+                mapping = mappings.get(hotel.id)
+                if not mapping:
+                    errors[hotel.id] = "No active channel manager mapping for this hotel"
+                    continue
+                if mapping.id in external_errors:
+                    errors[hotel.id] = external_errors[mapping.id]
+                    continue
+                data = external_data[mapping.id]
+                snapshots[hotel.id] = {
+                    "source": "external_cm",
+                    "available_rooms": data.get("available_rooms"),
+                    "rate": data.get("rate"),
+                    "currency": data.get("currency", "INR"),
+                    "restrictions": data.get("restrictions", {}),
+                    "provider": mapping.provider,
+                }
+                continue
+
+            room_type = lead_room_types.get(hotel.id)
+            if not room_type:
+                errors[hotel.id] = "Hotel has no configured room types"
+                continue
+            summary = dict(internal_summaries[room_type.id])
+            summary.update({"source": "internal_cm", "provider": "internal"})
+            snapshots[hotel.id] = summary
+
+        return snapshots, errors
+
+
+def get_bulk_availability_snapshots(hotels, check_in, check_out, num_rooms: int = 1):
+    """Batched counterpart of ``get_hotel_availability_snapshot`` for search results."""
+    return BulkAvailabilityService(check_in, check_out, num_rooms).snapshot_hotels(hotels)
+
+
 def finalize_booking_after_payment(booking, payment_reference: Optional[str] = None):
     """Finalize inventory after successful payment."""
     from django.utils import timezone
@@ -290,7 +530,7 @@ def finalize_booking_after_payment(booking, payment_reference: Optional[str] = N
 
     if lock.source == "external_cm":
         client = ExternalChannelManagerClient(provider=lock.provider)
-        response = client.confirm_booking(lock.lock_id or lock.reference_id, str(booking.booking_id))
+        response = client.confirm_booking(lock.lock_id or lock.reference_id, str(booking.booking_id), room_type_id=lock.room_type_id)
         booking.cm_booking_id = response.get("cm_booking_id", booking.cm_booking_id)
         booking.inventory_channel = "external_cm"
         lock.status = "confirmed"
@@ -312,7 +552,9 @@ def release_inventory_on_failure(booking):
 
     if lock.source == "external_cm":
         try:
-            ExternalChannelManagerClient(provider=lock.provider).release_lock(lock.lock_id or lock.reference_id)
+            ExternalChannelManagerClient(provider=lock.provider).release_lock(
+                lock.lock_id or lock.reference_id, room_type_id=lock.room_type_id
+            )
             lock.status = "released"
             lock.save(update_fields=["status", "updated_at"])
         except InventoryLockError:
@@ -321,15 +563,43 @@ def release_inventory_on_failure(booking):
         InternalInventoryService(lock.hotel).release_lock(lock)
 
 
-def expire_stale_locks():
-    """Expire active locks whose hold window has elapsed."""
+STALE_LOCK_CHUNK_SIZE = 500
+
+
+def expire_stale_locks(chunk_size: int = STALE_LOCK_CHUNK_SIZE):
+    """Expire active locks whose hold window has elapsed.
+
+    Locks are claimed in chunks with ``select_for_update(skip_locked=True)``.
+    Internal holds give their nights back through aggregated per-(room type, night)
+    updates and are marked released; external holds are marked expired. Each
+    chunk costs a fixed handful of statements regardless of its size.
+    Returns counts for the run.
+    """
     now = timezone.now()
-    stale_locks = InventoryLock.objects.filter(status="active", expires_at__lte=now)
+    totals = {"released": 0, "expired": 0, "availability_rows_updated": 0}
 
-    for lock in stale_locks:
-        if lock.source == "internal_cm":
-            InternalInventoryService(lock.hotel).release_lock(lock)
-        else:
-            lock.status = "expired"
-            lock.save(update_fields=["status", "updated_at"])
+    while True:
+        with transaction.atomic():
+            claimed = list(
+                InventoryLock.objects.select_for_update(skip_locked=True)
+                .filter(status="active", expires_at__lte=now)
+                .order_by("id")
+                .values_list("id", "source", "room_type_id", "check_in", "check_out", "num_rooms")[:chunk_size]
+            )
+            if not claimed:
+                break
+
+            internal = [row for row in claimed if row[1] == "internal_cm"]
+            external_ids = [row[0] for row in claimed if row[1] != "internal_cm"]
+
+            totals["availability_rows_updated"] += restore_inventory_bulk(row[2:] for row in internal)
+            if internal:
+                InventoryLock.objects.filter(id__in=[row[0] for row in internal]).update(status="released", updated_at=now)
+            if external_ids:
+                InventoryLock.objects.filter(id__in=external_ids).update(status="expired", updated_at=now)
+
+        totals["released"] += len(internal)
+        totals["expired"] += len(external_ids)
+
+    return totals
 
@@ -0,0 +1,175 @@
+"""
+Channel manager availability cache
+
+Read-through cache for external CM availability answers, keyed by
+(mapping, check_in, check_out, num_rooms):
+- entries are fresh for CHANNEL_MANAGER_CACHE_TTL seconds, then kept as
+  stale for CHANNEL_MANAGER_CACHE_STALE_TTL more; a stale entry is served
+  while another request refreshes it or when the refresh fails
+- concurrent identical misses in a process are coalesced into one upstream
+  call; the others wait for it (bounded) and read its result
+- lock/confirm/release bump a per-room-type generation so every cached
+  date range for that mapping is dropped at once
+
+Entries live in the shared cache tier (CHANNEL_MANAGER_CACHE_ALIAS, default
+"shared") rather than the tiered default, so an invalidation in one worker
+is seen by all of them immediately. Counters are per process and reported
+by ``stats()`` (also on /healthz).
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+class AvailabilityCache:
+    """Shared-cache storage plus in-process request coalescing and counters."""
+
+    def __init__(self, alias=None):
+        self.alias = alias
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._counters = Counter()
+        self._counters_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias or getattr(settings, "CHANNEL_MANAGER_CACHE_ALIAS", "shared")]
+
+    @property
+    def ttl(self):
+        return getattr(settings, "CHANNEL_MANAGER_CACHE_TTL", 30)
+
+    @property
+    def stale_ttl(self):
+        return getattr(settings, "CHANNEL_MANAGER_CACHE_STALE_TTL", 120)
+
+    # -- counters -----------------------------------------------------
+
+    def count(self, name, amount=1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        with self._counters_lock:
+            stats = {name: self._counters[name] for name in ("hits", "misses", "stale", "coalesced", "invalidations")}
+        lookups = stats["hits"] + stats["misses"] + stats["stale"] + stats["coalesced"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._counters_lock:
+            self._counters.clear()
+
+    # -- keys ---------------------------------------------------------
+
+    @staticmethod
+    def _generation_key(room_type_id):
+        return f"cm-avail-gen:{room_type_id}"
+
+    def _entry_keys(self, mappings, check_in, check_out, num_rooms):
+        generation_keys = {mapping.id: self._generation_key(mapping.room_type_id) for mapping in mappings}
+        generations = self.cache.get_many(list(set(generation_keys.values())))
+        return {
+            mapping.id: (
+                f"cm-avail:{mapping.id}:{generations.get(generation_keys[mapping.id], 0)}:"
+                f"{check_in.isoformat()}:{check_out.isoformat()}:{num_rooms}"
+            )
+            for mapping in mappings
+        }
+
+    # -- storage ------------------------------------------------------
+
+    def _classify(self, entry, now):
+        if entry is None:
+            return None, None
+        age = now - entry["fetched_at"]
+        if age <= self.ttl:
+            return FRESH, entry["data"]
+        if age <= self.ttl + self.stale_ttl:
+            return STALE, entry["data"]
+        return None, None
+
+    def lookup_many(self, mappings, check_in, check_out, num_rooms):
+        """Return ``{mapping_id: (key, state, data)}``; state is FRESH, STALE or None."""
+        keys = self._entry_keys(mappings, check_in, check_out, num_rooms)
+        entries = self.cache.get_many(list(keys.values()))
+        now = time.time()
+        return {
+            mapping_id: (key, *self._classify(entries.get(key), now))
+            for mapping_id, key in keys.items()
+        }
+
+    def store(self, key, data):
+        self.cache.set(key, {"data": data, "fetched_at": time.time()}, self.ttl + self.stale_ttl)
+
+    def read(self, key):
+        return self._classify(self.cache.get(key), time.time())
+
+    def invalidate(self, room_type_id):
+        """Drop every cached answer for the mapping on this room type."""
+        key = self._generation_key(room_type_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, 1, None)
+        self.count("invalidations")
+
+    # -- coalescing ---------------------------------------------------
+
+    def claim(self, key):
+        """Return ``(is_leader, event)``; only the leader should call upstream."""
+        with self._inflight_lock:
+            event = self._inflight.get(key)
+            if event is not None:
+                return False, event
+            event = self._inflight[key] = threading.Event()
+            return True, event
+
+    def release(self, key):
+        with self._inflight_lock:
+            event = self._inflight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def get_or_fetch(self, mapping, check_in, check_out, num_rooms, fetch, wait_timeout=None):
+        """Read-through lookup for a single mapping; ``fetch()`` calls upstream."""
+        key, state, data = self.lookup_many([mapping], check_in, check_out, num_rooms)[mapping.id]
+        if state == FRESH:
+            self.count("hits")
+            return data
+
+        leader, event = self.claim(key)
+        if not leader:
+            if state == STALE:
+                self.count("stale")
+                return data
+            event.wait(wait_timeout)
+            shared_state, shared = self.read(key)
+            if shared_state is not None:
+                self.count("coalesced")
+                return shared
+            # The leader failed; fall through and try upstream ourselves.
+            leader, event = self.claim(key)
+
+        try:
+            self.count("misses")
+            data = fetch()
+            self.store(key, data)
+            return data
+        except Exception:
+            if state == STALE:
+                self.count("stale")
+                return data
+            raise
+        finally:
+            if leader:
+                self.release(key)
+
+
+availability_cache = AvailabilityCache()
@@ -0,0 +1,147 @@
+"""
+Local stub channel manager server
+
+Speaks the subset of the CM API that ExternalChannelManagerClient uses
+(/availability, /locks, /locks/<id>/release, /confirm) so the pooled and
+concurrent client paths can be exercised offline.
+
+In tests:
+    with StubChannelManagerServer(delays={"SLOW-1": 2.0}) as server:
+        client = ExternalChannelManagerClient(base_url=server.url, api_key="test")
+
+Standalone (point CHANNEL_MANAGER_API_BASE_URL at it):
+    python -m hotels.cm_stub_server --port 8765
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def log_message(self, format, *args):  # noqa: A002 - stdlib signature
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        stub = self.server.stub
+        payload = self._read_json()
+        stub.record(self.path, payload, self.client_address)
+
+        if self.path == "/availability":
+            room_id = payload.get("room_id")
+            with stub.lock:
+                stub.in_flight += 1
+                stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+            try:
+                time.sleep(stub.delays.get(room_id, stub.default_delay))
+            finally:
+                with stub.lock:
+                    stub.in_flight -= 1
+            if room_id in stub.failures:
+                self._send_json(503, {"error": "unavailable"})
+                return
+            self._send_json(200, {
+                "available_rooms": stub.available_rooms.get(room_id, 5),
+                "rate": stub.rates.get(room_id, 3000.0),
+                "currency": "INR",
+                "restrictions": {},
+            })
+        elif self.path == "/locks":
+            self._send_json(200, {"lock_id": f"STUB-{uuid.uuid4().hex[:12]}"})
+        elif self.path == "/confirm":
+            self._send_json(200, {"cm_booking_id": f"STUB-BOOK-{uuid.uuid4().hex[:8]}", "status": "confirmed"})
+        elif self.path.startswith("/locks/") and self.path.endswith("/release"):
+            self._send_json(200, {"status": "released"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that hit their deadline hang up mid-response; that is expected here.
+        pass
+
+
+class StubChannelManagerServer:
+    """Threaded in-process CM stub with per-room delays, failures and call stats."""
+
+    def __init__(self, host="127.0.0.1", port=0, delays=None, default_delay=0.0, failures=(), rates=None, available_rooms=None):
+        self.delays = dict(delays or {})
+        self.default_delay = default_delay
+        self.failures = set(failures)
+        self.rates = dict(rates or {})
+        self.available_rooms = dict(available_rooms or {})
+        self.lock = threading.Lock()
+        self.calls = []
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._httpd = _QuietHTTPServer((host, port), _StubHandler)
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, path, payload, client_address):
+        with self.lock:
+            self.calls.append((path, payload))
+            self.connections.add(client_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="cm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stub channel manager")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each availability answer")
+    args = parser.parse_args()
+
+    server = StubChannelManagerServer(host=args.host, port=args.port, default_delay=args.delay)
+    print(f"Stub channel manager listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Hotel geospatial index
+Grid-cell pre-filter for radius ("near me") searches:
+- every HotelSearchDocument stores the integer id of the lat/lng grid cell it sits in
+- a radius query expands to one contiguous cell-id range per grid row, plus a
+  lat/lng bounding box, so the database only returns nearby candidates
+- exact haversine distances for those candidates are computed in one vectorized pass
+
+Plain integer/decimal columns keep this identical on SQLite and Postgres.
+The bounding box is clamped at +/-180 longitude (no antimeridian wrap).
+"""
+
+from math import asin, cos, floor, radians, sin, sqrt
+
+from django.db.models import Q
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - scalar fallback below
+    np = None
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+# ~11 km cells; cell ids are persisted in HotelSearchDocument.geo_cell
+GRID_CELL_DEGREES = 0.1
+GRID_COLUMNS = int(round(360 / GRID_CELL_DEGREES))
+GRID_ROWS = int(round(180 / GRID_CELL_DEGREES))
+
+# Above this many grid rows a single cell-id range (still bounded by the bbox) is used
+MAX_CELL_RANGES = 64
+
+
+def _row_col(lat, lng):
+    row = min(max(int(floor((lat + 90.0) / GRID_CELL_DEGREES)), 0), GRID_ROWS - 1)
+    col = min(max(int(floor((lng + 180.0) / GRID_CELL_DEGREES)), 0), GRID_COLUMNS - 1)
+    return row, col
+
+
+def grid_cell_for(latitude, longitude):
+    """Grid cell id for a coordinate pair, or None when either is missing."""
+    if latitude is None or longitude is None:
+        return None
+    row, col = _row_col(float(latitude), float(longitude))
+    return row * GRID_COLUMNS + col
+
+
+def bounding_box(lat, lng, radius_km):
+    """(lat_min, lat_max, lng_min, lng_max) enclosing the radius circle."""
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    d_lng = radius_km / (KM_PER_DEGREE_LAT * max(cos(radians(lat)), 0.01))
+    return (
+        max(lat - d_lat, -90.0),
+        min(lat + d_lat, 90.0),
+        max(lng - d_lng, -180.0),
+        min(lng + d_lng, 180.0),
+    )
+
+
+def cell_ranges(lat_min, lat_max, lng_min, lng_max):
+    """Inclusive (low, high) cell-id ranges covering a bounding box, one per grid row."""
+    row_min, col_min = _row_col(lat_min, lng_min)
+    row_max, col_max = _row_col(lat_max, lng_max)
+    if row_max - row_min + 1 > MAX_CELL_RANGES:
+        return [(row_min * GRID_COLUMNS + col_min, row_max * GRID_COLUMNS + col_max)]
+    return [
+        (row * GRID_COLUMNS + col_min, row * GRID_COLUMNS + col_max)
+        for row in range(row_min, row_max + 1)
+    ]
+
+
+def within_radius_candidates(queryset, lat, lng, radius_km, prefix='search_document__'):
+    """Narrow a hotel queryset to rows whose grid cell/bbox can be within radius_km."""
+    lat_min, lat_max, lng_min, lng_max = bounding_box(lat, lng, radius_km)
+    cells = Q()
+    for low, high in cell_ranges(lat_min, lat_max, lng_min, lng_max):
+        cells |= Q(**{f'{prefix}geo_cell__range': (low, high)})
+    return queryset.filter(cells).filter(**{
+        f'{prefix}latitude__range': (lat_min, lat_max),
+        f'{prefix}longitude__range': (lng_min, lng_max),
+    })
+
+
+def haversine_km(lat, lng, latitudes, longitudes):
+    """Distances in km from (lat, lng) to each coordinate pair."""
+    if np is None:
+        return [_haversine_scalar(lat, lng, la, lo) for la, lo in zip(latitudes, longitudes)]
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    d_lat = lat2 - lat1
+    d_lng = np.radians(np.asarray(longitudes, dtype=float) - lng)
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _haversine_scalar(lat1, lon1, lat2, lon2):
+    d_lat = radians(lat2 - lat1)
+    d_lon = radians(lon2 - lon1)
+    a = sin(d_lat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0)))
+
+
+def rank_by_distance(hotels, lat, lng, radius_km=None):
+    """
+    [(hotel, distance_km)] nearest first. Hotels without coordinates are skipped;
+    with radius_km, only hotels inside the radius are kept.
+    """
+    located = [hotel for hotel in hotels if hotel.latitude is not None and hotel.longitude is not None]
+    if not located:
+        return []
+    distances = haversine_km(
+        float(lat), float(lng),
+        [float(hotel.latitude) for hotel in located],
+        [float(hotel.longitude) for hotel in located],
+    )
+    ranked = sorted(zip(located, (float(d) for d in distances)), key=lambda pair: pair[1])
+    if radius_km is not None:
+        ranked = [pair for pair in ranked if pair[1] <= radius_km]
+    return ranked
+
+
+def nearby_hotels(queryset, lat, lng, radius_km, prefix='search_document__'):
+    """Hotels from queryset within radius_km of (lat, lng), nearest first, with distances."""
+    candidates = within_radius_candidates(queryset, lat, lng, radius_km, prefix=prefix)
+    return rank_by_distance(candidates, lat, lng, radius_km)
@@ -0,0 +1,16 @@
+"""
+Management command to rebuild the search autocomplete index.
+Signals apply hotel/room type/city edits incrementally; run this after bulk imports or raw SQL edits:
+python manage.py rebuild_autocomplete_index
+"""
+from django.core.management.base import BaseCommand
+
+from hotels.autocomplete import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the in-memory city/area/hotel/landmark autocomplete index and publish it to the shared cache'
+
+    def handle(self, *args, **options):
+        index = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Published autocomplete index v{index.version} with {len(index)} entries'))
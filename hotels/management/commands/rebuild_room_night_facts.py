@@ -0,0 +1,44 @@
+"""
+Management command to reconcile RoomNightFact and its rollups against bookings and blocks.
+Signals keep facts current; run this once after deploying the tables and nightly as a check:
+python manage.py rebuild_room_night_facts [--start 2024-01-01 --end 2024-04-01] [--dry-run]
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotels.occupancy import default_window, reconcile_facts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild room-night facts from bookings, blocks and room types and report corrections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First night (YYYY-MM-DD, default: 90 days ago)')
+        parser.add_argument('--end', help='Night after the last one (YYYY-MM-DD, default: 365 days ahead)')
+        parser.add_argument('--hotel', type=int, action='append', dest='hotels', help='Limit to this hotel id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Hotels reconciled per batch (default: 200)')
+        parser.add_argument('--dry-run', action='store_true', help='Report mismatches without writing')
+
+    def handle(self, *args, **options):
+        start, end = default_window()
+        try:
+            if options['start']:
+                start = date.fromisoformat(options['start'])
+            if options['end']:
+                end = date.fromisoformat(options['end'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if end <= start:
+            raise CommandError('--end must be after --start')
+
+        report = reconcile_facts(
+            start, end, hotel_ids=options['hotels'], batch_size=options['batch_size'], dry_run=options['dry_run'],
+        )
+        for mismatch in report['mismatches']:
+            self.stdout.write(f"  mismatch {mismatch}")
+        verb = 'Would write' if options['dry_run'] else 'Wrote'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {report['checked']} room-nights {start}..{end}: "
+            f"{verb} {report['created']} new and {report['corrected']} corrected facts"
+        ))
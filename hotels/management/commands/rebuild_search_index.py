@@ -0,0 +1,24 @@
+"""
+Management command to rebuild the hotel search index (HotelSearchDocument).
+Signals keep documents current; run this after bulk imports or raw SQL edits:
+python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from hotels.search_index import REBUILD_BATCH_SIZE, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild denormalized hotel search documents from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=REBUILD_BATCH_SIZE,
+            help=f'Hotels refreshed per batch (default: {REBUILD_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        written = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} hotel search documents'))
@@ -0,0 +1,109 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+AMENITY_FLAGS = (
+    'has_wifi',
+    'has_parking',
+    'has_pool',
+    'has_gym',
+    'has_restaurant',
+    'has_spa',
+    'has_ac',
+)
+
+
+def populate_search_documents(apps, schema_editor):
+    """Build a search document for every existing hotel"""
+    Hotel = apps.get_model('hotels', 'Hotel')
+    RoomType = apps.get_model('hotels', 'RoomType')
+    HotelSearchDocument = apps.get_model('hotels', 'HotelSearchDocument')
+
+    price_ranges = {
+        row['hotel_id']: (row['min_price'], row['max_price'])
+        for row in RoomType.objects.values('hotel_id').annotate(
+            min_price=models.Min('base_price'), max_price=models.Max('base_price')
+        )
+    }
+
+    documents = []
+    for hotel in Hotel.objects.select_related('owner_property').iterator():
+        prop = hotel.owner_property
+        visible = hotel.is_active and not hotel.is_deleted and (
+            prop is None or (prop.status == 'APPROVED' and prop.is_active)
+        )
+        mask = 0
+        for bit, field in enumerate(AMENITY_FLAGS):
+            if getattr(hotel, field, False):
+                mask |= 1 << bit
+        min_price, max_price = price_ranges.get(hotel.id, (None, None))
+        documents.append(HotelSearchDocument(
+            hotel_id=hotel.id,
+            name=hotel.name,
+            city_id=hotel.city_id,
+            is_visible=visible,
+            is_featured=hotel.is_featured,
+            star_rating=hotel.star_rating,
+            property_type=hotel.property_type,
+            min_price=min_price,
+            max_price=max_price,
+            review_rating=hotel.review_rating,
+            review_count=hotel.review_count,
+            amenity_mask=mask,
+            latitude=hotel.latitude,
+            longitude=hotel.longitude,
+        ))
+
+    HotelSearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_corporateaccount'),
+        ('hotels', '0022_hotel_owner_property'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotelSearchDocument',
+            fields=[
+                ('hotel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='hotels.hotel')),
+                ('name', models.CharField(max_length=200)),
+                ('is_visible', models.BooleanField(default=False, help_text='Active, not deleted and approved (or admin-created)')),
+                ('is_featured', models.BooleanField(default=False)),
+                ('star_rating', models.PositiveSmallIntegerField(default=3)),
+                ('property_type', models.CharField(default='hotel', max_length=20)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('review_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('review_count', models.IntegerField(default=0)),
+                ('amenity_mask', models.PositiveIntegerField(default=0, help_text='Bitmask of hotels.search_index.AMENITY_FLAGS')),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.city')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='hotelsearchdocument',
+            index=models.Index(fields=['is_visible', 'city', 'min_price'], name='hotels_hsd_city_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotelsearchdocument',
+            index=models.Index(fields=['is_visible', 'city', '-review_rating'], name='hotels_hsd_city_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotelsearchdocument',
+            index=models.Index(fields=['is_visible', 'city', 'star_rating'], name='hotels_hsd_city_star_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotelsearchdocument',
+            index=models.Index(fields=['is_visible', 'min_price'], name='hotels_hsd_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hotelsearchdocument',
+            index=models.Index(fields=['is_visible', '-review_rating'], name='hotels_hsd_rating_idx'),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
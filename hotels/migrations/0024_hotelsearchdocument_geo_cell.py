@@ -0,0 +1,43 @@
+from math import floor
+
+from django.db import migrations, models
+
+
+GRID_CELL_DEGREES = 0.1
+GRID_COLUMNS = 3600
+GRID_ROWS = 1800
+
+
+def populate_geo_cells(apps, schema_editor):
+    """Assign grid cells to existing search documents with coordinates"""
+    HotelSearchDocument = apps.get_model('hotels', 'HotelSearchDocument')
+
+    documents = list(
+        HotelSearchDocument.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    )
+    for doc in documents:
+        row = min(max(int(floor((float(doc.latitude) + 90.0) / GRID_CELL_DEGREES)), 0), GRID_ROWS - 1)
+        col = min(max(int(floor((float(doc.longitude) + 180.0) / GRID_CELL_DEGREES)), 0), GRID_COLUMNS - 1)
+        doc.geo_cell = row * GRID_COLUMNS + col
+
+    HotelSearchDocument.objects.bulk_update(documents, ['geo_cell'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotels', '0023_hotelsearchdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hotelsearchdocument',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, help_text='Grid cell id from hotels.geo_index', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='hotelsearchdocument',
+            index=models.Index(fields=['geo_cell', 'latitude', 'longitude'], name='hotels_hsd_geo_cell_idx'),
+        ),
+        migrations.RunPython(populate_geo_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """Facts start empty; run ``manage.py rebuild_room_night_facts`` once after deploying."""
+
+    dependencies = [
+        ('hotels', '0024_hotelsearchdocument_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNightFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.PositiveIntegerField(default=0, help_text='RoomType.total_rooms for the night')),
+                ('sold', models.IntegerField(default=0, help_text='Rooms in confirmed/completed bookings')),
+                ('blocked', models.PositiveIntegerField(default=0, help_text='Rooms held back by active RoomBlocks')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('arrivals', models.IntegerField(default=0, help_text='Bookings checking in on this night')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_night_facts', to='hotels.hotel')),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='night_facts', to='hotels.roomtype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hotel', 'date'], name='hotels_night_fact_hotel_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='roomnightfact',
+            constraint=models.UniqueConstraint(fields=('room_type', 'date'), name='hotels_night_fact_uniq'),
+        ),
+        migrations.CreateModel(
+            name='HotelOccupancyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('days', models.PositiveSmallIntegerField(default=1, help_text='Nights in the period that have facts')),
+                ('capacity', models.PositiveIntegerField(default=0)),
+                ('sold', models.IntegerField(default=0)),
+                ('blocked', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('arrivals', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancy_rollups', to='hotels.hotel')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='hoteloccupancyrollup',
+            constraint=models.UniqueConstraint(fields=('hotel', 'period', 'period_start'), name='hotels_occupancy_rollup_uniq'),
+        ),
+    ]
@@ -6,7 +6,7 @@ from django.core.files.storage import default_storage
 from django.templatetags.static import static
 from decimal import Decimal
 from datetime import datetime, date
-from core.models import TimeStampedModel, City
+from core.models import ResponsiveImageMixin, TimeStampedModel, City
 from core.soft_delete import SoftDeleteMixin, SoftDeleteManager, AllObjectsManager
 from django.core.exceptions import ValidationError
 
@@ -266,25 +266,20 @@ class Hotel(SoftDeleteMixin, TimeStampedModel):
 
     @property
     def primary_image_url(self):
-        image = self.get_primary_image()
-        if self._image_exists(image):
-            try:
-                return image.url
-            except Exception:
-                return ''
-        return ''
+        """Content-hash versioned URL of the display image, from the image manifest."""
+        from core.image_manifest import display_url
+        return display_url(self)
 
     @property
     def display_image_url(self):
-        """Return primary image URL with cache-busting or fallback placeholder"""
-        image_url = self.primary_image_url
-        if image_url:
-            # Add cache-busting based on updated_at timestamp
-            from django.utils import timezone
-            timestamp = int(self.updated_at.timestamp()) if hasattr(self, 'updated_at') and self.updated_at else int(timezone.now().timestamp())
-            separator = '&' if '?' in image_url else '?'
-            return f"{image_url}{separator}v={timestamp}"
-        return '/static/images/hotel_placeholder.svg'
+        """Return primary image URL or fallback placeholder"""
+        return self.primary_image_url or '/static/images/hotel_placeholder.svg'
+
+    @property
+    def image_variants(self):
+        """WebP/JPEG srcsets and card URL of the display image ({} until derivatives exist)."""
+        from core.image_manifest import display_variants
+        return display_variants(self)
 
     def can_cancel_booking(self, check_in_date):
         """Check if a booking can be cancelled based on property rules.
@@ -373,7 +368,7 @@ class Hotel(SoftDeleteMixin, TimeStampedModel):
         }
 
 
-class HotelImage(TimeStampedModel):
+class HotelImage(ResponsiveImageMixin, TimeStampedModel):
     """Additional images for hotels"""
     hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='hotels/gallery/')
@@ -400,14 +395,9 @@ class HotelImage(TimeStampedModel):
         return f"{self.hotel.name} - Image"
     
     def get_url_with_cache_busting(self):
-        """Return image URL with cache-busting timestamp"""
-        if self.image:
-            from django.utils import timezone
-            timestamp = int(self.updated_at.timestamp()) if self.updated_at else int(timezone.now().timestamp())
-            url = self.image.url
-            separator = '&' if '?' in url else '?'
-            return f"{url}{separator}v={timestamp}"
-        return ''
+        """Return image URL versioned by content hash (image manifest)"""
+        from core.image_manifest import gallery_url
+        return gallery_url(self)
 
 
 class PropertyPolicy(TimeStampedModel):
@@ -626,14 +616,14 @@ class RoomType(TimeStampedModel):
 
     @property
     def display_image_url(self):
-        img = self.get_primary_image()
-        if img and self._image_exists(img):
-            try:
-                return img.url
-            except Exception:
-                pass
-        from django.templatetags.static import static
-        return static('images/room_placeholder.svg')
+        from core.image_manifest import display_url
+        return display_url(self) or static('images/room_placeholder.svg')
+
+    @property
+    def image_variants(self):
+        """WebP/JPEG srcsets and card URL of the display image ({} until derivatives exist)."""
+        from core.image_manifest import display_variants
+        return display_variants(self)
     
     @property
     def is_draft(self):
@@ -979,7 +969,7 @@ class PriceLog(TimeStampedModel):
     def __str__(self):
         return f"{self.room_type} - {self.old_price} -> {self.new_price}"
 
-class RoomImage(TimeStampedModel):
+class RoomImage(ResponsiveImageMixin, TimeStampedModel):
     """Multiple images for room types with cache-busting support.
     
     GUARANTEE: Exactly one primary image per room_type at all times.
@@ -1010,13 +1000,9 @@ class RoomImage(TimeStampedModel):
     
     @property
     def image_url_with_cache_busting(self):
-        """Return image URL with cache-busting parameter"""
-        if self.image:
-            base_url = self.image.url
-            timestamp = int(self.updated_at.timestamp())
-            separator = '&' if '?' in base_url else '?'
-            return f"{base_url}{separator}v={timestamp}"
-        return None
+        """Return image URL versioned by content hash (image manifest)"""
+        from core.image_manifest import gallery_url
+        return gallery_url(self) or None
 
 
 class RoomBlock(TimeStampedModel):
@@ -1069,15 +1055,16 @@ class RoomBlock(TimeStampedModel):
         
         # Check for existing confirmed bookings in this date range
         from bookings.models import HotelBooking
+        from hotels.availability import HOLDING_STATUSES
         overlapping_bookings = HotelBooking.objects.filter(
             room_type=self.room_type,
-            check_in_date__lte=self.blocked_to,
-            check_out_date__gte=self.blocked_from,
-            status__in=['RESERVED', 'CONFIRMED', 'CHECKED_IN']
+            check_in__lte=self.blocked_to,
+            check_out__gt=self.blocked_from,
+            booking__status__in=HOLDING_STATUSES
         )
         
         if overlapping_bookings.exists():
-            booking_ids = ', '.join([f"#{b.id}" for b in overlapping_bookings[:3]])
+            booking_ids = ', '.join([f"#{b.booking_id}" for b in overlapping_bookings[:3]])
             raise ValidationError(
                 f"Cannot block dates with existing bookings: {booking_ids}"
             )
@@ -1109,6 +1096,102 @@ class RoomBlock(TimeStampedModel):
         return True, ""
 
 
+class HotelSearchDocument(models.Model):
+    """Denormalized, search-ready copy of a hotel (one row per hotel).
+
+    Maintained by hotels.signals on Hotel, RoomType and owner-property
+    approval changes; rebuilt from scratch by ``manage.py rebuild_search_index``.
+    Search endpoints filter and sort on these columns instead of aggregating
+    room types and joining the approval tables on every request.
+    """
+    hotel = models.OneToOneField(Hotel, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    name = models.CharField(max_length=200)
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='+')
+    is_visible = models.BooleanField(default=False, help_text="Active, not deleted and approved (or admin-created)")
+    is_featured = models.BooleanField(default=False)
+    star_rating = models.PositiveSmallIntegerField(default=3)
+    property_type = models.CharField(max_length=20, default='hotel')
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    review_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    review_count = models.IntegerField(default=0)
+    amenity_mask = models.PositiveIntegerField(default=0, help_text="Bitmask of hotels.search_index.AMENITY_FLAGS")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geo_cell = models.IntegerField(null=True, blank=True, help_text="Grid cell id from hotels.geo_index")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_visible', 'city', 'min_price'], name='hotels_hsd_city_price_idx'),
+            models.Index(fields=['is_visible', 'city', '-review_rating'], name='hotels_hsd_city_rating_idx'),
+            models.Index(fields=['is_visible', 'city', 'star_rating'], name='hotels_hsd_city_star_idx'),
+            models.Index(fields=['is_visible', 'min_price'], name='hotels_hsd_price_idx'),
+            models.Index(fields=['is_visible', '-review_rating'], name='hotels_hsd_rating_idx'),
+            models.Index(fields=['geo_cell', 'latitude', 'longitude'], name='hotels_hsd_geo_cell_idx'),
+        ]
+
+    def __str__(self):
+        return f"Search document: {self.name}"
+
+
+class RoomNightFact(models.Model):
+    """One row per room type per night: capacity, rooms sold, rooms blocked, revenue.
+
+    Maintained incrementally by hotels.occupancy when bookings are confirmed,
+    cancelled or expired and when RoomBlocks change; reconciled against the
+    source tables by ``manage.py rebuild_room_night_facts``. Nights nobody
+    has touched have no row (full capacity, nothing sold).
+    """
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='room_night_facts')
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name='night_facts')
+    date = models.DateField()
+    capacity = models.PositiveIntegerField(default=0, help_text="RoomType.total_rooms for the night")
+    sold = models.IntegerField(default=0, help_text="Rooms in confirmed/completed bookings")
+    blocked = models.PositiveIntegerField(default=0, help_text="Rooms held back by active RoomBlocks")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    arrivals = models.IntegerField(default=0, help_text="Bookings checking in on this night")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'date'], name='hotels_night_fact_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['hotel', 'date'], name='hotels_night_fact_hotel_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.room_type_id} @ {self.date}: {self.sold}/{self.capacity}"
+
+
+class HotelOccupancyRollup(models.Model):
+    """Per-hotel daily and monthly sums of RoomNightFact, refreshed with the facts."""
+    PERIODS = [
+        ('day', 'Day'),
+        ('month', 'Month'),
+    ]
+
+    hotel = models.ForeignKey(Hotel, on_delete=models.CASCADE, related_name='occupancy_rollups')
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    days = models.PositiveSmallIntegerField(default=1, help_text="Nights in the period that have facts")
+    capacity = models.PositiveIntegerField(default=0)
+    sold = models.IntegerField(default=0)
+    blocked = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    arrivals = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['hotel', 'period', 'period_start'], name='hotels_occupancy_rollup_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.hotel_id} {self.period} {self.period_start}"
+
+
 class CompetitorPriceSnapshot(TimeStampedModel):
     """Logged-out competitor price capture with evidence for auditability."""
 
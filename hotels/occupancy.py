@@ -0,0 +1,402 @@
+"""
+Room-night facts and occupancy rollups
+
+RoomNightFact keeps one row per (room type, night) with capacity, rooms
+sold, rooms blocked and revenue, so occupancy questions read O(days) rows
+instead of scanning bookings:
+- a booking counts as sold while its status is in SOLD_STATUSES; signals in
+  bookings/signals.py add or remove its nights when it enters or leaves
+  that set (confirm, cancel, expire, delete) or when its stay changes
+- a night covered by an active RoomBlock has every room blocked;
+  hotels/signals.py recomputes the block's nights on save/delete
+- revenue is Booking.total_amount spread evenly over the stay's nights
+  (the rounding remainder goes on the first night)
+- whenever facts for a hotel change, its HotelOccupancyRollup day rows and
+  month rows for the touched dates are re-summed from the facts
+
+Nights without a fact row are treated as full capacity with nothing sold.
+``rebuild_room_night_facts`` reconciles the facts against bookings and
+blocks and reports what it had to correct.
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import HotelOccupancyRollup, RoomBlock, RoomNightFact, RoomType
+
+SOLD_STATUSES = ('confirmed', 'completed')
+
+CENT = Decimal('0.01')
+
+FACT_FIELDS = ('capacity', 'sold', 'blocked', 'revenue', 'arrivals')
+
+
+def is_sold(status):
+    return status in SOLD_STATUSES
+
+
+def nights_between(start, end):
+    day = start
+    while day < end:
+        yield day
+        day += timedelta(days=1)
+
+
+def split_revenue(amount, nights):
+    """Spread ``amount`` over ``nights`` in whole paise; the first night takes the remainder."""
+    amount = Decimal(amount or 0)
+    share = (amount / nights).quantize(CENT, rounding=ROUND_DOWN)
+    shares = [share] * nights
+    shares[0] += amount - share * nights
+    return shares
+
+
+def stay_deltas(stays, sign=1):
+    """
+    Per-night changes for ``stays``.
+
+    ``stays`` yields ``(hotel_id, room_type_id, check_in, check_out, rooms, amount)``.
+    Returns ``({(room_type_id, date): [sold, revenue, arrivals]}, {room_type_id: hotel_id})``.
+    """
+    deltas = defaultdict(lambda: [0, Decimal('0.00'), 0])
+    hotel_of = {}
+    for hotel_id, room_type_id, check_in, check_out, rooms, amount in stays:
+        nights = list(nights_between(check_in, check_out))
+        if not nights:
+            continue
+        hotel_of[room_type_id] = hotel_id
+        for index, (day, share) in enumerate(zip(nights, split_revenue(amount, len(nights)))):
+            delta = deltas[(room_type_id, day)]
+            delta[0] += sign * (rooms or 1)
+            delta[1] += sign * share
+            delta[2] += sign * (1 if index == 0 else 0)
+    return deltas, hotel_of
+
+
+def _spans(keys, hotel_of):
+    """{hotel_id: (first_date, end_date)} covering ``(room_type_id, date)`` keys; end is exclusive."""
+    spans = {}
+    for room_type_id, day in keys:
+        hotel_id = hotel_of[room_type_id]
+        start, end = spans.get(hotel_id, (day, day + timedelta(days=1)))
+        spans[hotel_id] = (min(start, day), max(end, day + timedelta(days=1)))
+    return spans
+
+
+def _span_filter(spans):
+    condition = Q()
+    for hotel_id, (start, end) in spans.items():
+        condition |= Q(hotel_id=hotel_id, date__gte=start, date__lt=end)
+    return condition
+
+
+def blocked_nights(room_type_ids, start, end):
+    """{(room_type_id, date)} covered by an active RoomBlock in [start, end)."""
+    nights = set()
+    blocks = RoomBlock.objects.filter(
+        room_type_id__in=list(room_type_ids), is_active=True,
+        blocked_from__lt=end, blocked_to__gte=start,
+    ).values_list('room_type_id', 'blocked_from', 'blocked_to')
+    for room_type_id, blocked_from, blocked_to in blocks:
+        for day in nights_between(max(blocked_from, start), min(blocked_to + timedelta(days=1), end)):
+            nights.add((room_type_id, day))
+    return nights
+
+
+def ensure_facts(spans):
+    """Create missing fact rows for every room type of each hotel over its span."""
+    if not spans:
+        return 0
+    room_types = list(RoomType.objects.filter(hotel_id__in=list(spans)).values_list('id', 'hotel_id', 'total_rooms'))
+    existing = set(RoomNightFact.objects.filter(_span_filter(spans)).values_list('room_type_id', 'date'))
+    first = min(start for start, _ in spans.values())
+    last = max(end for _, end in spans.values())
+    blocked = blocked_nights([room_type_id for room_type_id, _, _ in room_types], first, last)
+    rows = []
+    for room_type_id, hotel_id, total_rooms in room_types:
+        start, end = spans[hotel_id]
+        for day in nights_between(start, end):
+            if (room_type_id, day) in existing:
+                continue
+            rows.append(RoomNightFact(
+                hotel_id=hotel_id, room_type_id=room_type_id, date=day, capacity=total_rooms,
+                blocked=total_rooms if (room_type_id, day) in blocked else 0,
+            ))
+    RoomNightFact.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def refresh_rollups(spans):
+    """Re-sum day and month rollups for each hotel's span from the facts."""
+    sums = {field: Sum(field) for field in FACT_FIELDS}
+    for hotel_id, (start, end) in spans.items():
+        rows = [
+            HotelOccupancyRollup(hotel_id=hotel_id, period='day', period_start=row['date'], days=1,
+                                 **{field: row[field] or 0 for field in FACT_FIELDS})
+            for row in RoomNightFact.objects.filter(hotel_id=hotel_id, date__gte=start, date__lt=end)
+            .values('date').annotate(**sums).order_by('date')
+        ]
+        month_start = start.replace(day=1)
+        last_day = end - timedelta(days=1)
+        month_end = last_day.replace(day=calendar.monthrange(last_day.year, last_day.month)[1]) + timedelta(days=1)
+        rows += [
+            HotelOccupancyRollup(hotel_id=hotel_id, period='month', period_start=row['month'], days=row['days'],
+                                 **{field: row[field] or 0 for field in FACT_FIELDS})
+            for row in RoomNightFact.objects.filter(hotel_id=hotel_id, date__gte=month_start, date__lt=month_end)
+            .annotate(month=TruncMonth('date')).values('month')
+            .annotate(days=Count('date', distinct=True), **sums).order_by('month')
+        ]
+        HotelOccupancyRollup.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['hotel', 'period', 'period_start'],
+            update_fields=['days', *FACT_FIELDS, 'updated_at'],
+        )
+
+
+def record_stays(stays, sign=1):
+    """Add (sign=1) or remove (sign=-1) the nights of ``stays``. Returns fact rows touched."""
+    deltas, hotel_of = stay_deltas(stays, sign)
+    if not deltas:
+        return 0
+    spans = _spans(deltas, hotel_of)
+    with transaction.atomic():
+        ensure_facts(spans)
+        # Nights with the same change share one UPDATE
+        grouped = defaultdict(list)
+        for (room_type_id, day), (sold, revenue, arrivals) in deltas.items():
+            grouped[(room_type_id, sold, revenue, arrivals)].append(day)
+        for (room_type_id, sold, revenue, arrivals), days in grouped.items():
+            RoomNightFact.objects.filter(room_type_id=room_type_id, date__in=days).update(
+                sold=F('sold') + sold,
+                revenue=F('revenue') + revenue,
+                arrivals=F('arrivals') + arrivals,
+            )
+        refresh_rollups(spans)
+    return len(deltas)
+
+
+def booking_stays(booking_ids):
+    """Stay tuples for the hotel bookings behind these Booking ids."""
+    from bookings.models import HotelBooking
+
+    return list(
+        HotelBooking.objects.filter(booking_id__in=list(booking_ids)).values_list(
+            'room_type__hotel_id', 'room_type_id', 'check_in', 'check_out', 'number_of_rooms', 'booking__total_amount',
+        )
+    )
+
+
+def refresh_blocked(room_type, start, end):
+    """Recompute ``blocked`` for one room type over [start, end)."""
+    if start >= end:
+        return
+    spans = {room_type.hotel_id: (start, end)}
+    with transaction.atomic():
+        ensure_facts(spans)
+        nights = [day for _, day in blocked_nights([room_type.pk], start, end)]
+        facts = RoomNightFact.objects.filter(room_type=room_type, date__gte=start, date__lt=end)
+        facts.filter(date__in=nights).update(blocked=F('capacity'))
+        facts.exclude(date__in=nights).update(blocked=0)
+        refresh_rollups(spans)
+
+
+def refresh_capacity(room_type, start):
+    """Carry a changed RoomType.total_rooms into facts from ``start`` on."""
+    facts = RoomNightFact.objects.filter(room_type=room_type, date__gte=start)
+    with transaction.atomic():
+        if not facts.exclude(capacity=room_type.total_rooms).update(capacity=room_type.total_rooms):
+            return
+        facts.filter(blocked__gt=0).update(blocked=F('capacity'))
+        last = facts.order_by('-date').values_list('date', flat=True).first()
+        refresh_rollups({room_type.hotel_id: (start, last + timedelta(days=1))})
+
+
+# Reads
+
+
+def _periods(start, end):
+    """Split [start, end) into whole calendar months and the leftover days at either edge."""
+    months = []
+    day_ranges = []
+    cursor = start
+    while cursor < end:
+        month_days = calendar.monthrange(cursor.year, cursor.month)[1]
+        next_month = cursor.replace(day=1) + timedelta(days=month_days)
+        if cursor.day == 1 and next_month <= end:
+            months.append(cursor)
+        else:
+            day_ranges.append((cursor, min(next_month, end)))
+        cursor = next_month
+    return months, day_ranges
+
+
+def occupancy_by_hotel(start, end, hotel_ids=None):
+    """
+    ``{hotel_id: totals}`` over nights in [start, end) from the rollups.
+
+    Whole months read one month row, the edges read day rows. Nights with no
+    facts count as full capacity (sum of the hotel's RoomType.total_rooms).
+    """
+    total_days = max((end - start).days, 0)
+    capacity_qs = RoomType.objects.values('hotel_id').annotate(total=Sum('total_rooms'))
+    rollups = HotelOccupancyRollup.objects.all()
+    if hotel_ids is not None:
+        hotel_ids = list(hotel_ids)
+        capacity_qs = capacity_qs.filter(hotel_id__in=hotel_ids)
+        rollups = rollups.filter(hotel_id__in=hotel_ids)
+
+    months, day_ranges = _periods(start, end)
+    condition = Q(period='month', period_start__in=months)
+    for range_start, range_end in day_ranges:
+        condition |= Q(period='day', period_start__gte=range_start, period_start__lt=range_end)
+    covered = {
+        row['hotel_id']: row
+        for row in rollups.filter(condition).values('hotel_id').annotate(
+            covered_days=Sum('days'), **{field: Sum(field) for field in FACT_FIELDS}
+        )
+    }
+
+    totals = {}
+    for row in capacity_qs:
+        hotel_id = row['hotel_id']
+        facts = covered.get(hotel_id, {})
+        untouched_days = total_days - (facts.get('covered_days') or 0)
+        totals[hotel_id] = {
+            'capacity': (facts.get('capacity') or 0) + untouched_days * (row['total'] or 0),
+            'sold': facts.get('sold') or 0,
+            'blocked': facts.get('blocked') or 0,
+            'revenue': facts.get('revenue') or Decimal('0.00'),
+            'arrivals': facts.get('arrivals') or 0,
+        }
+    return totals
+
+
+def occupancy_totals(start, end, hotel_ids=None):
+    """Summed ``occupancy_by_hotel`` plus ``occupancy_pct`` (sold / capacity)."""
+    totals = {'capacity': 0, 'sold': 0, 'blocked': 0, 'revenue': Decimal('0.00'), 'arrivals': 0}
+    for hotel_totals in occupancy_by_hotel(start, end, hotel_ids).values():
+        for key in totals:
+            totals[key] += hotel_totals[key]
+    totals['occupancy_pct'] = round(totals['sold'] / totals['capacity'] * 100, 1) if totals['capacity'] else 0
+    return totals
+
+
+def room_type_occupancy(room_type, start, end):
+    """Sold / capacity percentage for one room type from its fact rows."""
+    row = RoomNightFact.objects.filter(room_type=room_type, date__gte=start, date__lt=end).aggregate(
+        nights=Count('id'), capacity=Sum('capacity'), sold=Sum('sold'),
+    )
+    days = max((end - start).days, 0)
+    capacity = (row['capacity'] or 0) + (days - row['nights']) * room_type.total_rooms
+    return (row['sold'] or 0) / capacity * 100 if capacity > 0 else 0.0
+
+
+# Reconciliation
+
+
+def expected_facts(hotel_ids, start, end):
+    """Recompute facts for these hotels over [start, end) from bookings, blocks and room types."""
+    from bookings.models import HotelBooking
+
+    room_types = {
+        room_type_id: (hotel_id, total_rooms)
+        for room_type_id, hotel_id, total_rooms in RoomType.objects.filter(hotel_id__in=hotel_ids)
+        .values_list('id', 'hotel_id', 'total_rooms')
+    }
+    stays = HotelBooking.objects.filter(
+        room_type_id__in=list(room_types), booking__status__in=SOLD_STATUSES,
+        check_in__lt=end, check_out__gt=start,
+    ).values_list('room_type__hotel_id', 'room_type_id', 'check_in', 'check_out', 'number_of_rooms', 'booking__total_amount')
+    deltas, _ = stay_deltas(stays)
+    blocked = blocked_nights(room_types, start, end)
+
+    # Any touched night gets a row for every room type of its hotel, as ensure_facts does
+    touched = {(room_types[room_type_id][0], day) for room_type_id, day in set(deltas) | blocked
+               if start <= day < end}
+    by_hotel = defaultdict(list)
+    for room_type_id, (hotel_id, _) in room_types.items():
+        by_hotel[hotel_id].append(room_type_id)
+
+    expected = {}
+    for hotel_id, day in touched:
+        for room_type_id in by_hotel[hotel_id]:
+            capacity = room_types[room_type_id][1]
+            sold, revenue, arrivals = deltas.get((room_type_id, day), (0, Decimal('0.00'), 0))
+            expected[(room_type_id, day)] = {
+                'hotel_id': hotel_id,
+                'capacity': capacity,
+                'sold': sold,
+                'blocked': capacity if (room_type_id, day) in blocked else 0,
+                'revenue': revenue,
+                'arrivals': arrivals,
+            }
+    return expected, room_types
+
+
+def reconcile_facts(start, end, hotel_ids=None, batch_size=200, dry_run=False):
+    """
+    Compare stored facts with the source tables and (unless ``dry_run``) fix them.
+
+    Returns a report with rows checked/created/corrected and a sample of the
+    mismatches found.
+    """
+    from .models import Hotel
+
+    if hotel_ids is None:
+        hotel_ids = list(Hotel.all_objects.order_by('id').values_list('id', flat=True))
+    report = {'checked': 0, 'created': 0, 'corrected': 0, 'mismatches': []}
+    now = timezone.now()
+    for offset in range(0, len(hotel_ids), batch_size):
+        batch = hotel_ids[offset:offset + batch_size]
+        expected, room_types = expected_facts(batch, start, end)
+        stored = {
+            (fact.room_type_id, fact.date): fact
+            for fact in RoomNightFact.objects.filter(hotel_id__in=batch, date__gte=start, date__lt=end)
+        }
+        to_create, to_update = [], []
+        for key in set(expected) | set(stored):
+            room_type_id, day = key
+            hotel_id, capacity = room_types[room_type_id]
+            want = expected.get(key) or {
+                'hotel_id': hotel_id, 'capacity': capacity, 'sold': 0, 'blocked': 0,
+                'revenue': Decimal('0.00'), 'arrivals': 0,
+            }
+            fact = stored.get(key)
+            report['checked'] += 1
+            if fact is None:
+                to_create.append(RoomNightFact(room_type_id=room_type_id, date=day, **want))
+                continue
+            diff = {field: (getattr(fact, field), want[field]) for field in FACT_FIELDS
+                    if getattr(fact, field) != want[field]}
+            if diff:
+                if len(report['mismatches']) < 20:
+                    report['mismatches'].append({'room_type_id': room_type_id, 'date': day.isoformat(), **{
+                        field: {'stored': str(old), 'expected': str(new)} for field, (old, new) in diff.items()
+                    }})
+                for field in FACT_FIELDS:
+                    setattr(fact, field, want[field])
+                fact.updated_at = now
+                to_update.append(fact)
+        report['created'] += len(to_create)
+        report['corrected'] += len(to_update)
+        if dry_run or not (to_create or to_update):
+            continue
+        with transaction.atomic():
+            RoomNightFact.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+            RoomNightFact.objects.bulk_update(to_update, [*FACT_FIELDS, 'updated_at'], batch_size=1000)
+            touched = {room_types[fact.room_type_id][0] for fact in to_create + to_update}
+            refresh_rollups({hotel_id: (start, end) for hotel_id in touched})
+    return report
+
+
+def default_window(today=None):
+    """Reconcile window: 90 nights back to 365 forward."""
+    today = today or timezone.localdate()
+    return today - timedelta(days=90), today + timedelta(days=365)
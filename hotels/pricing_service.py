@@ -3,12 +3,123 @@ Hotel Pricing Service
 Handles complex pricing calculations with taxes, discounts, and surcharges
 """
 
+from collections import defaultdict
 from decimal import Decimal
 from datetime import date, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.db.models import Q
 
 from bookings.utils.pricing import calculate_total_pricing
-from .models import RoomAvailability, HotelDiscount, Hotel
+from .models import RoomAvailability, HotelDiscount, Hotel, RoomMealPlan, RoomType
+from .occupancy import occupancy_by_hotel, room_type_occupancy
+
+
+def stay_nights(check_in: date, check_out: date, stay_type: str = 'overnight') -> int:
+    """Billable nights (hourly stays are a single billing unit)."""
+    nights = 1 if stay_type == 'hourly' else (check_out - check_in).days
+    if nights <= 0:
+        raise ValueError("Check-out date must be after check-in date")
+    return nights
+
+
+def average_nightly_rate(prices, nights: int, base_price: Decimal) -> Decimal:
+    """
+    Average stored nightly price over the stay.
+    Falls back to the base price when no night has a stored price.
+    """
+    if not prices:
+        return base_price
+    total_price = sum(prices)
+    return total_price / Decimal(str(nights)) if nights > 0 else base_price
+
+
+def discount_result(discount: Optional[HotelDiscount], code: str, amount: Decimal) -> Tuple[Decimal, Dict]:
+    """Discount amount and details for an already looked-up HotelDiscount (or None)."""
+    if discount is None:
+        return Decimal('0.00'), {'error': 'Invalid discount code', 'is_valid': False}
+
+    if not discount.is_valid():
+        return Decimal('0.00'), {'error': 'Discount code has expired'}
+
+    discount_amount = discount.calculate_discount(amount)
+
+    return discount_amount, {
+        'code': code,
+        'description': discount.description,
+        'discount_type': discount.discount_type,
+        'discount_value': float(discount.discount_value),
+        'discount_amount': float(discount_amount),
+        'is_valid': True
+    }
+
+
+def build_quote(base_rate, nights: int, num_rooms: int, meal_plan=None, apply_discount=None) -> Dict:
+    """
+    Price one stay from already-resolved inputs.
+
+    ``apply_discount(subtotal)`` returns the ``(amount, details)`` pair for a
+    discount code, or is None when no code was given. Shared by
+    PricingCalculator and BatchQuoteEngine so both paths run the same
+    calculate_total_pricing slab logic.
+    """
+    meal_plan_delta = Decimal('0.00')
+    meal_plan_meta = None
+    if meal_plan:
+        meal_plan_delta = Decimal(str(getattr(meal_plan, 'price_delta', 0) or 0))
+        try:
+            meal_plan_meta = {
+                'id': meal_plan.id,
+                'name': meal_plan.meal_plan.name if getattr(meal_plan, 'meal_plan', None) else str(meal_plan),
+                'plan_type': meal_plan.meal_plan.plan_type if getattr(meal_plan, 'meal_plan', None) else None,
+                'price_delta': float(meal_plan_delta),
+            }
+        except Exception:
+            meal_plan_meta = None
+
+    subtotal = (Decimal(base_rate) + meal_plan_delta) * Decimal(str(num_rooms)) * Decimal(str(nights))
+
+    # Apply hotel discount code (affects base only)
+    discount_info = {}
+    discount_amount = Decimal('0.00')
+    if apply_discount is not None:
+        discount_amount, discount_info = apply_discount(subtotal)
+
+    # Delegate to unified pricing (budget/premium GST + capped service fee)
+    pricing = calculate_total_pricing(
+        base_amount=subtotal,
+        promo_discount=discount_amount,
+        booking_type='hotel'
+    )
+
+    return {
+        'base_price': float(base_rate),
+        'meal_plan_delta': float(meal_plan_delta),
+        'meal_plan': meal_plan_meta,
+        'num_nights': nights,
+        'num_rooms': num_rooms,
+        'subtotal': float(subtotal),
+        'discount_amount': float(discount_amount),
+        'subtotal_after_discount': float(pricing['discounted_base']),
+        'service_fee': pricing['service_fee'],
+        'gst_amount': pricing['gst_amount'],
+        'gst_rate_percent': pricing['gst_rate_percent'],
+        'gst_hidden': True,  # UI must not show GST % explicitly
+        'taxes_total': pricing['taxes_total'],
+        'total_amount': pricing['total_payable'],
+        'discount_details': discount_info,
+        'currency': 'INR',
+        'breakdown': {
+            'base_price_per_unit': float(base_rate + meal_plan_delta),
+            'base_price_x_nights': float((Decimal(base_rate) + meal_plan_delta) * Decimal(str(nights))),
+            'base_price_x_nights_x_rooms': float(subtotal),
+            'discount': float(discount_amount),
+            'service_fee': pricing['service_fee'],
+            'gst': pricing['gst_amount'],
+            'taxes_total': pricing['taxes_total'],
+            'gst_rate_percent': pricing['gst_rate_percent'],
+        }
+    }
 
 
 class PricingCalculator:
@@ -23,21 +134,14 @@ class PricingCalculator:
         Get base price for room for given dates
         Returns average price if multiple dates or base price
         """
-        availability_records = RoomAvailability.objects.filter(
-            room_type=room_type,
-            date__gte=check_in,
-            date__lt=check_out
-        ).order_by('date')
-        
-        if not availability_records.exists():
-            # If no availability records, use base price
-            return room_type.base_price
-        
-        # Calculate average price for stay duration
-        total_price = sum(rec.price for rec in availability_records)
-        nights = (check_out - check_in).days
-        
-        return total_price / Decimal(str(nights)) if nights > 0 else room_type.base_price
+        prices = list(
+            RoomAvailability.objects.filter(
+                room_type=room_type,
+                date__gte=check_in,
+                date__lt=check_out
+            ).values_list('price', flat=True)
+        )
+        return average_nightly_rate(prices, (check_out - check_in).days, room_type.base_price)
     
     def calculate_total_price(
         self,
@@ -58,9 +162,7 @@ class PricingCalculator:
         """
 
         # Nights calculation (hourly stays treated as a single billing unit)
-        nights = 1 if stay_type == 'hourly' else (check_out - check_in).days
-        if nights <= 0:
-            raise ValueError("Check-out date must be after check-in date")
+        nights = stay_nights(check_in, check_out, stay_type)
 
         # Base rate per unit
         if stay_type == 'hourly' and getattr(self.hotel, 'hourly_stays_enabled', False):
@@ -68,88 +170,20 @@ class PricingCalculator:
         else:
             base_rate = self.get_room_price(room_type, check_in, check_out)
 
-        meal_plan_delta = Decimal('0.00')
-        meal_plan_meta = None
-        if meal_plan:
-            meal_plan_delta = Decimal(str(getattr(meal_plan, 'price_delta', 0) or 0))
-            try:
-                meal_plan_meta = {
-                    'id': meal_plan.id,
-                    'name': meal_plan.meal_plan.name if getattr(meal_plan, 'meal_plan', None) else str(meal_plan),
-                    'plan_type': meal_plan.meal_plan.plan_type if getattr(meal_plan, 'meal_plan', None) else None,
-                    'price_delta': float(meal_plan_delta),
-                }
-            except Exception:
-                meal_plan_meta = None
-
-        subtotal = (Decimal(base_rate) + meal_plan_delta) * Decimal(str(num_rooms)) * Decimal(str(nights))
-
-        # Apply hotel discount code (affects base only)
-        discount_info = {}
-        discount_amount = Decimal('0.00')
+        apply_discount = None
         if discount_code:
-            discount_amount, discount_info = self._apply_discount(discount_code, subtotal)
-
-        # Delegate to unified pricing (budget/premium GST + capped service fee)
-        pricing = calculate_total_pricing(
-            base_amount=subtotal,
-            promo_discount=discount_amount,
-            booking_type='hotel'
-        )
+            apply_discount = lambda subtotal: self._apply_discount(discount_code, subtotal)
 
-        return {
-            'base_price': float(base_rate),
-            'meal_plan_delta': float(meal_plan_delta),
-            'meal_plan': meal_plan_meta,
-            'num_nights': nights,
-            'num_rooms': num_rooms,
-            'subtotal': float(subtotal),
-            'discount_amount': float(discount_amount),
-            'subtotal_after_discount': float(pricing['discounted_base']),
-            'service_fee': pricing['service_fee'],
-            'gst_amount': pricing['gst_amount'],
-            'gst_rate_percent': pricing['gst_rate_percent'],
-            'gst_hidden': True,  # UI must not show GST % explicitly
-            'taxes_total': pricing['taxes_total'],
-            'total_amount': pricing['total_payable'],
-            'discount_details': discount_info,
-            'currency': 'INR',
-            'breakdown': {
-                'base_price_per_unit': float(base_rate + meal_plan_delta),
-                'base_price_x_nights': float((Decimal(base_rate) + meal_plan_delta) * Decimal(str(nights))),
-                'base_price_x_nights_x_rooms': float(subtotal),
-                'discount': float(discount_amount),
-                'service_fee': pricing['service_fee'],
-                'gst': pricing['gst_amount'],
-                'taxes_total': pricing['taxes_total'],
-                'gst_rate_percent': pricing['gst_rate_percent'],
-            }
-        }
+        return build_quote(base_rate, nights, num_rooms, meal_plan=meal_plan, apply_discount=apply_discount)
     
     def _apply_discount(self, code: str, amount: Decimal) -> Tuple[Decimal, Dict]:
         """Apply discount code and return discount amount and details"""
-        try:
-            discount = HotelDiscount.objects.get(
-                code=code,
-                hotel=self.hotel,
-                is_active=True
-            )
-            
-            if not discount.is_valid():
-                return Decimal('0.00'), {'error': 'Discount code has expired'}
-            
-            discount_amount = discount.calculate_discount(amount)
-            
-            return discount_amount, {
-                'code': code,
-                'description': discount.description,
-                'discount_type': discount.discount_type,
-                'discount_value': float(discount.discount_value),
-                'discount_amount': float(discount_amount),
-                'is_valid': True
-            }
-        except HotelDiscount.DoesNotExist:
-            return Decimal('0.00'), {'error': 'Invalid discount code', 'is_valid': False}
+        discount = HotelDiscount.objects.filter(
+            code=code,
+            hotel=self.hotel,
+            is_active=True
+        ).first()
+        return discount_result(discount, code, amount)
     
     def check_availability(
         self,
@@ -220,6 +254,205 @@ class PricingCalculator:
         ]
 
 
+class QuoteRequest(NamedTuple):
+    """
+    One stay to price in a batch.
+
+    ``room_type`` and ``meal_plan`` may be model instances or primary keys;
+    ids are resolved by BatchQuoteEngine in one query per model.
+    """
+    room_type: Any
+    check_in: date
+    check_out: date
+    num_rooms: int = 1
+    discount_code: Optional[str] = None
+    meal_plan: Any = None
+    stay_type: str = 'overnight'
+    hourly_hours: Optional[int] = None
+
+
+class BatchQuoteEngine:
+    """
+    Price many stays across hotels and room types in a fixed number of queries.
+
+    PricingCalculator.calculate_total_price issues one availability query and
+    one discount query per quote. quote_many() loads everything up front:
+    - RoomType (+hotel) rows that were passed as ids
+    - RoomAvailability prices for all requested (room type, date range) pairs
+    - RoomMealPlan (+meal plan) rows that were passed as ids
+    - HotelDiscount rows for all requested codes
+    and then runs build_quote() per request, so totals match the single-quote
+    path exactly. At most four queries regardless of batch size.
+    """
+
+    def quote_many(self, requests: List[QuoteRequest]) -> List[Dict]:
+        """
+        Return one pricing dict per request, in order.
+
+        A request that cannot be priced (unknown room type or meal plan,
+        check-out not after check-in) yields ``{'error': message}`` instead of
+        raising, so one bad line does not sink the batch.
+        """
+        requests = list(requests)
+        room_types = self._load_room_types(requests)
+        meal_plans = self._load_meal_plans(requests)
+        prices = self._load_prices(requests, room_types)
+        discounts = self._load_discounts(requests, room_types)
+
+        quotes = []
+        for req in requests:
+            try:
+                quotes.append(self._quote(req, room_types, meal_plans, prices, discounts))
+            except ValueError as exc:
+                quotes.append({'error': str(exc)})
+        return quotes
+
+    def quote(self, request: QuoteRequest) -> Dict:
+        """Single quote through the batch path; raises ValueError like PricingCalculator."""
+        quote = self.quote_many([request])[0]
+        if 'error' in quote:
+            raise ValueError(quote['error'])
+        return quote
+
+    @staticmethod
+    def _pk(value):
+        return value.pk if hasattr(value, 'pk') else value
+
+    def _load_room_types(self, requests):
+        room_types = {}
+        missing = set()
+        for req in requests:
+            if isinstance(req.room_type, RoomType):
+                room_types[req.room_type.pk] = req.room_type
+            elif req.room_type is not None:
+                missing.add(req.room_type)
+        missing -= set(room_types)
+        if missing:
+            room_types.update(RoomType.objects.select_related('hotel').in_bulk(missing))
+        return room_types
+
+    def _load_meal_plans(self, requests):
+        meal_plans = {}
+        missing = set()
+        for req in requests:
+            if isinstance(req.meal_plan, RoomMealPlan):
+                meal_plans[req.meal_plan.pk] = req.meal_plan
+            elif req.meal_plan:
+                missing.add(req.meal_plan)
+        missing -= set(meal_plans)
+        if missing:
+            meal_plans.update(
+                RoomMealPlan.objects.filter(id__in=missing, is_active=True).select_related('meal_plan').in_bulk()
+            )
+        return meal_plans
+
+    @staticmethod
+    def _hourly_rate(req, hotel):
+        """Whether the request takes the hourly branch (same test as PricingCalculator.calculate_total_price)."""
+        return req.stay_type == 'hourly' and getattr(hotel, 'hourly_stays_enabled', False)
+
+    def _load_prices(self, requests, room_types):
+        """{room_type_id: {date: price}} covering every range priced by night (hourly requests fall back to it too)."""
+        ranges = defaultdict(list)
+        for req in requests:
+            room_type_id = self._pk(req.room_type)
+            room_type = room_types.get(room_type_id)
+            if room_type is None or req.check_out <= req.check_in or self._hourly_rate(req, room_type.hotel):
+                continue
+            ranges[room_type_id].append((req.check_in, req.check_out))
+        if not ranges:
+            return {}
+
+        condition = Q()
+        for room_type_id, spans in ranges.items():
+            # One covering span per room type keeps the OR list short
+            start = min(span[0] for span in spans)
+            end = max(span[1] for span in spans)
+            condition |= Q(room_type_id=room_type_id, date__gte=start, date__lt=end)
+
+        prices = defaultdict(dict)
+        for room_type_id, day, price in RoomAvailability.objects.filter(condition).values_list(
+            'room_type_id', 'date', 'price'
+        ):
+            prices[room_type_id][day] = price
+        return prices
+
+    def _load_discounts(self, requests, room_types):
+        """{(hotel_id, code): HotelDiscount} for active discounts on the requested codes."""
+        codes = set()
+        hotel_ids = set()
+        for req in requests:
+            room_type = room_types.get(self._pk(req.room_type))
+            if req.discount_code and room_type is not None:
+                codes.add(req.discount_code)
+                hotel_ids.add(room_type.hotel_id)
+        if not codes:
+            return {}
+        return {
+            (discount.hotel_id, discount.code): discount
+            for discount in HotelDiscount.objects.filter(code__in=codes, hotel_id__in=hotel_ids, is_active=True)
+        }
+
+    def _quote(self, req, room_types, meal_plans, prices, discounts):
+        room_type = room_types.get(self._pk(req.room_type))
+        if room_type is None:
+            raise ValueError("Room type not found")
+
+        meal_plan = None
+        if req.meal_plan:
+            meal_plan = meal_plans.get(self._pk(req.meal_plan))
+            if meal_plan is None or meal_plan.room_type_id != room_type.pk:
+                raise ValueError("Meal plan not available for this room type")
+
+        nights = stay_nights(req.check_in, req.check_out, req.stay_type)
+
+        if self._hourly_rate(req, room_type.hotel):
+            base_rate = room_type.get_hourly_price(req.hourly_hours or 0)
+        else:
+            by_date = prices.get(room_type.pk, {})
+            stay_prices = []
+            day = req.check_in
+            while day < req.check_out:
+                if day in by_date:
+                    stay_prices.append(by_date[day])
+                day += timedelta(days=1)
+            base_rate = average_nightly_rate(stay_prices, (req.check_out - req.check_in).days, room_type.base_price)
+
+        apply_discount = None
+        if req.discount_code:
+            discount = discounts.get((room_type.hotel_id, req.discount_code))
+            apply_discount = lambda subtotal: discount_result(discount, req.discount_code, subtotal)
+
+        return build_quote(base_rate, nights, req.num_rooms, meal_plan=meal_plan, apply_discount=apply_discount)
+
+
+def quote_lead_room_types(hotels, check_in: date, check_out: date, num_rooms: int = 1) -> Dict[int, Dict]:
+    """
+    Stay quote for each hotel's cheapest room type, keyed by hotel id.
+
+    Used by the search result pages: one room type query plus the batch
+    engine's availability query, however many hotels are on the page.
+    """
+    hotels = {hotel.id: hotel for hotel in hotels}
+    if not hotels or check_out <= check_in:
+        return {}
+    # Cheapest room type per hotel, the same lead room type availability snapshots use
+    lead = {}
+    for room_type in RoomType.objects.filter(hotel_id__in=list(hotels)).order_by('hotel_id', 'base_price', 'id'):
+        if room_type.hotel_id not in lead:
+            room_type.hotel = hotels[room_type.hotel_id]
+            lead[room_type.hotel_id] = room_type
+    room_types = list(lead.values())
+    quotes = BatchQuoteEngine().quote_many(
+        QuoteRequest(room_type, check_in, check_out, num_rooms=num_rooms) for room_type in room_types
+    )
+    return {
+        room_type.hotel_id: quote
+        for room_type, quote in zip(room_types, quotes)
+        if 'error' not in quote
+    }
+
+
 class BulkPricingCalculator:
     """Calculate prices for multiple rooms/dates"""
     
@@ -250,18 +483,19 @@ class BulkPricingCalculator:
             'rooms': []
         }
         
-        for config in room_configs:
-            from .models import RoomType
-            room_type = RoomType.objects.get(id=config['room_type_id'])
-            
-            pricing = self.calculator.calculate_total_price(
-                room_type,
+        requests = [
+            QuoteRequest(
+                config['room_type_id'],
                 date.fromisoformat(config['check_in']),
                 date.fromisoformat(config['check_out']),
                 num_rooms=config.get('num_rooms', 1),
-                discount_code=config.get('discount_code')
+                discount_code=config.get('discount_code'),
             )
-            
+            for config in room_configs
+        ]
+        for pricing in BatchQuoteEngine().quote_many(requests):
+            if 'error' in pricing:
+                raise ValueError(pricing['error'])
             total_breakdown['rooms'].append(pricing)
             total_breakdown['total_amount'] += pricing['total_amount']
             total_breakdown['total_gst'] += pricing['gst_amount']
@@ -271,7 +505,7 @@ class BulkPricingCalculator:
 
 
 class OccupancyCalculator:
-    """Calculate occupancy rates for hotels"""
+    """Calculate occupancy rates for hotels from the room-night facts"""
     
     @staticmethod
     def calculate_occupancy(
@@ -280,51 +514,26 @@ class OccupancyCalculator:
         check_out: date
     ) -> float:
         """Calculate occupancy percentage for room type"""
-        availability_records = RoomAvailability.objects.filter(
-            room_type=room_type,
-            date__gte=check_in,
-            date__lt=check_out
-        )
-        
-        if not availability_records.exists():
-            return 0.0
-        
-        total_rooms = availability_records.count() * room_type.total_rooms
-        available_rooms = sum(rec.available_rooms for rec in availability_records)
-        booked_rooms = total_rooms - available_rooms
-        
-        occupancy_pct = (booked_rooms / total_rooms * 100) if total_rooms > 0 else 0.0
-        return occupancy_pct
+        return room_type_occupancy(room_type, check_in, check_out)
     
     @staticmethod
     def get_hotel_occupancy_summary(hotel: Hotel, start_date: date, end_date: date) -> Dict:
-        """Get occupancy summary for entire hotel"""
-        room_types = hotel.room_types.all()
-        
-        total_rooms = sum(rt.total_rooms for rt in room_types)
-        total_available = 0
-        
-        availability_records = RoomAvailability.objects.filter(
-            room_type__hotel=hotel,
-            date__gte=start_date,
-            date__lte=end_date
-        )
-        
-        for record in availability_records:
-            total_available += record.available_rooms
-        
-        total_rooms_available = total_rooms * (end_date - start_date).days
-        booked_rooms = total_rooms_available - total_available
-        
-        occupancy_pct = (booked_rooms / total_rooms_available * 100) if total_rooms_available > 0 else 0.0
+        """Get occupancy summary for entire hotel (nights from start_date up to end_date)"""
+        totals = occupancy_by_hotel(start_date, end_date, [hotel.id]).get(hotel.id) or {
+            'capacity': 0, 'sold': 0, 'blocked': 0, 'revenue': Decimal('0.00'), 'arrivals': 0,
+        }
+        capacity = totals['capacity']
+        occupancy_pct = (totals['sold'] / capacity * 100) if capacity > 0 else 0.0
         
         return {
             'hotel_id': hotel.id,
             'hotel_name': hotel.name,
             'occupancy_percentage': round(occupancy_pct, 2),
-            'total_available_capacity': total_rooms_available,
-            'booked_rooms': booked_rooms,
-            'available_rooms': total_available,
+            'total_available_capacity': capacity,
+            'booked_rooms': totals['sold'],
+            'blocked_rooms': totals['blocked'],
+            'available_rooms': max(capacity - totals['sold'] - totals['blocked'], 0),
+            'revenue': float(totals['revenue']),
             'period_start': start_date.isoformat(),
             'period_end': end_date.isoformat(),
         }
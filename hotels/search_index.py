@@ -0,0 +1,125 @@
+"""
+Hotel search index
+
+Keeps HotelSearchDocument rows in step with the source tables so search
+endpoints can filter/sort on a single denormalized table:
+- visibility (active, not deleted, approved owner property or admin-created)
+- min/max room base price
+- amenity flags packed into one integer bitmask
+- grid cell for radius searches (see hotels.geo_index)
+"""
+
+from django.db import transaction
+from django.db.models import F, Max, Min
+
+from .geo_index import grid_cell_for
+from .models import Hotel, HotelSearchDocument, RoomType
+
+# Bit positions are persisted in HotelSearchDocument.amenity_mask - append only.
+AMENITY_FLAGS = (
+    'has_wifi',
+    'has_parking',
+    'has_pool',
+    'has_gym',
+    'has_restaurant',
+    'has_spa',
+    'has_ac',
+)
+
+REBUILD_BATCH_SIZE = 500
+
+
+def amenity_mask_for(flags):
+    """Pack an iterable of amenity field names into a bitmask."""
+    mask = 0
+    for bit, field in enumerate(AMENITY_FLAGS):
+        if field in flags:
+            mask |= 1 << bit
+    return mask
+
+
+def hotel_amenity_mask(hotel):
+    return amenity_mask_for([field for field in AMENITY_FLAGS if getattr(hotel, field, False)])
+
+
+def is_publicly_visible(hotel):
+    """Same rule the search querysets used to apply through owner_property."""
+    if not hotel.is_active or hotel.is_deleted:
+        return False
+    prop = hotel.owner_property
+    if prop is None:
+        return True
+    return prop.status == 'APPROVED' and prop.is_active
+
+
+def _build_document(hotel, price_range):
+    min_price, max_price = price_range
+    return HotelSearchDocument(
+        hotel_id=hotel.id,
+        name=hotel.name,
+        city_id=hotel.city_id,
+        is_visible=is_publicly_visible(hotel),
+        is_featured=hotel.is_featured,
+        star_rating=hotel.star_rating,
+        property_type=hotel.property_type,
+        min_price=min_price,
+        max_price=max_price,
+        review_rating=hotel.review_rating,
+        review_count=hotel.review_count,
+        amenity_mask=hotel_amenity_mask(hotel),
+        latitude=hotel.latitude,
+        longitude=hotel.longitude,
+        geo_cell=grid_cell_for(hotel.latitude, hotel.longitude),
+    )
+
+
+def _price_ranges(hotel_ids):
+    rows = (
+        RoomType.objects.filter(hotel_id__in=hotel_ids)
+        .values('hotel_id')
+        .annotate(min_price=Min('base_price'), max_price=Max('base_price'))
+    )
+    return {row['hotel_id']: (row['min_price'], row['max_price']) for row in rows}
+
+
+def refresh_search_documents(hotel_ids):
+    """Recompute the documents for the given hotels (3-4 queries regardless of count)."""
+    hotel_ids = {hotel_id for hotel_id in hotel_ids if hotel_id}
+    if not hotel_ids:
+        return 0
+
+    hotels = list(Hotel.all_objects.filter(id__in=hotel_ids).select_related('owner_property'))
+    price_ranges = _price_ranges(hotel_ids)
+    documents = [_build_document(hotel, price_ranges.get(hotel.id, (None, None))) for hotel in hotels]
+
+    with transaction.atomic():
+        # Hotels that vanished lose their document through the CASCADE; only upsert survivors.
+        HotelSearchDocument.objects.filter(hotel_id__in=[doc.hotel_id for doc in documents]).delete()
+        HotelSearchDocument.objects.bulk_create(documents)
+    return len(documents)
+
+
+def rebuild_search_index(batch_size=REBUILD_BATCH_SIZE):
+    """Drop and regenerate every document. Returns the number of documents written."""
+    written = 0
+    with transaction.atomic():
+        HotelSearchDocument.objects.all().delete()
+        hotel_ids = list(Hotel.all_objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(hotel_ids), batch_size):
+            written += refresh_search_documents(hotel_ids[start:start + batch_size])
+    return written
+
+
+def visible_hotels():
+    """Hotels visible in search, joined to their search document."""
+    return Hotel.objects.filter(search_document__is_visible=True)
+
+
+def filter_amenities(queryset, flags, prefix='search_document__'):
+    """Keep rows whose amenity bitmask contains every requested flag."""
+    required = amenity_mask_for(flags)
+    if not required:
+        return queryset
+    return queryset.annotate(
+        _amenity_match=F(f'{prefix}amenity_mask').bitand(required)
+    ).filter(_amenity_match=required)
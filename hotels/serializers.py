@@ -58,6 +58,8 @@ class HotelListSerializer(serializers.ModelSerializer):
     city_name = serializers.CharField(source='city.name', read_only=True)
     min_price = serializers.SerializerMethodField()
     amenities = serializers.SerializerMethodField()
+    availability = serializers.SerializerMethodField()
+    stay_quote = serializers.SerializerMethodField()
     
     class Meta:
         model = Hotel
@@ -65,14 +67,34 @@ class HotelListSerializer(serializers.ModelSerializer):
             'id', 'name', 'city', 'city_name', 'address', 'star_rating',
             'review_rating', 'review_count', 'image', 'is_featured',
             'property_type', 'latitude', 'longitude', 'min_price', 'amenities', 'has_wifi',
-            'has_parking', 'has_pool', 'has_gym', 'has_restaurant', 'has_spa'
+            'has_parking', 'has_pool', 'has_gym', 'has_restaurant', 'has_spa', 'availability',
+            'stay_quote'
         ]
     
     def get_min_price(self, obj):
         """Get minimum price from room types"""
-        min_price = obj.room_types.aggregate(min_price=Min('base_price'))['min_price']
+        min_price = getattr(obj, 'min_room_price', None)
+        if min_price is None:
+            min_price = obj.room_types.aggregate(min_price=Min('base_price'))['min_price']
         return float(min_price) if min_price else 0
     
+    def get_availability(self, obj):
+        """Availability snapshot precomputed by the view for the requested dates"""
+        return self.context.get('availability_snapshots', {}).get(obj.id)
+    
+    def get_stay_quote(self, obj):
+        """Lead room type stay total precomputed by the view (GST % hidden)"""
+        quote = self.context.get('stay_quotes', {}).get(obj.id)
+        if not quote:
+            return None
+        return {
+            'num_nights': quote['num_nights'],
+            'base_price': quote['base_price'],
+            'subtotal_after_discount': quote['subtotal_after_discount'],
+            'total_amount': quote['total_amount'],
+            'currency': quote['currency'],
+        }
+    
     def get_amenities(self, obj):
         return {
             'wifi': obj.has_wifi,
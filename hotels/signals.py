@@ -0,0 +1,165 @@
+"""
+Signals for Hotels app - keep HotelSearchDocument, room-night facts, the image manifest and the autocomplete index in sync with their sources
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.image_manifest import gallery_image_changed, owner_deleted, owner_saved, owner_saving
+from core.models import City
+from property_owners.models import Property
+from property_owners.property_approval_models import PropertyApprovalRequest
+from . import autocomplete
+from .models import Hotel, HotelImage, RoomBlock, RoomImage, RoomType
+from .occupancy import refresh_blocked, refresh_capacity
+from .search_index import refresh_search_documents
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Hotel)
+def refresh_hotel_document(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_search_documents([instance.pk])
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def refresh_document_for_room_type(sender, instance, raw=False, **kwargs):
+    """Room types drive the min/max price columns."""
+    if raw:
+        return
+    if isinstance(kwargs.get('origin'), Hotel):
+        # Cascade from a hotel delete: the document goes with the hotel
+        return
+    refresh_search_documents([instance.hotel_id])
+
+
+@receiver(post_save, sender=Property)
+def refresh_documents_for_property(sender, instance, raw=False, **kwargs):
+    """Approval status / is_active on the owner property decide visibility."""
+    if raw:
+        return
+    refresh_search_documents(Hotel.all_objects.filter(owner_property=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=PropertyApprovalRequest)
+def refresh_documents_for_approval_request(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_search_documents(
+        Hotel.all_objects.filter(owner_property_id=instance.property_id).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=RoomType)
+def refresh_room_night_capacity(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    refresh_capacity(instance, timezone.localdate())
+
+
+@receiver(pre_save, sender=RoomBlock)
+def remember_block_range(sender, instance, raw=False, **kwargs):
+    instance._previous_range = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_range = RoomBlock.objects.filter(pk=instance.pk).values_list(
+        'room_type_id', 'blocked_from', 'blocked_to'
+    ).first()
+
+
+def _refresh_block_nights(room_type, blocked_from, blocked_to):
+    refresh_blocked(room_type, blocked_from, blocked_to + timedelta(days=1))
+
+
+@receiver(post_save, sender=RoomBlock)
+def refresh_blocked_nights(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_range', None)
+    if previous and previous[0] != instance.room_type_id:
+        _refresh_block_nights(RoomType.objects.get(pk=previous[0]), previous[1], previous[2])
+        previous = None
+    start = min(instance.blocked_from, previous[1]) if previous else instance.blocked_from
+    end = max(instance.blocked_to, previous[2]) if previous else instance.blocked_to
+    _refresh_block_nights(instance.room_type, start, end)
+
+
+@receiver(post_delete, sender=RoomBlock)
+def release_blocked_nights(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), (Hotel, RoomType)):
+        # Cascade from a hotel/room type delete: the facts go too
+        return
+    _refresh_block_nights(instance.room_type, instance.blocked_from, instance.blocked_to)
+
+
+@receiver(pre_save, sender=Hotel)
+@receiver(pre_save, sender=RoomType)
+def remember_owner_image(sender, instance, **kwargs):
+    owner_saving(instance, **kwargs)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_save, sender=RoomType)
+def refresh_owner_image_manifest(sender, instance, **kwargs):
+    owner_saved(instance, **kwargs)
+
+
+@receiver(post_delete, sender=Hotel)
+@receiver(post_delete, sender=RoomType)
+def forget_owner_image_manifest(sender, instance, **kwargs):
+    owner_deleted(instance, **kwargs)
+
+
+@receiver(post_save, sender=HotelImage)
+@receiver(post_delete, sender=HotelImage)
+def refresh_hotel_image_manifest(sender, instance, **kwargs):
+    gallery_image_changed(instance, 'hotel', **kwargs)
+
+
+@receiver(post_save, sender=RoomImage)
+@receiver(post_delete, sender=RoomImage)
+def refresh_room_image_manifest(sender, instance, **kwargs):
+    gallery_image_changed(instance, 'room_type', **kwargs)
+
+
+def _refresh_autocomplete(hotel_ids=(), city_ids=()):
+    def record():
+        try:
+            autocomplete.changed(hotel_ids=hotel_ids, city_ids=city_ids)
+        except Exception:
+            # The save has committed; the change reaches the index with the next rebuild
+            logger.exception("[AUTOCOMPLETE] could not record changes hotels=%s cities=%s", list(hotel_ids), list(city_ids))
+
+    transaction.on_commit(record)
+
+
+@receiver(post_save, sender=Hotel)
+@receiver(post_delete, sender=Hotel)
+def refresh_autocomplete_for_hotel(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not autocomplete.HOTEL_FIELDS.intersection(update_fields)):
+        return
+    _refresh_autocomplete(hotel_ids=[instance.pk], city_ids=[instance.city_id])
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def refresh_autocomplete_for_room_type(sender, instance, raw=False, created=True, **kwargs):
+    """Room type counts feed the hotel suggestion; plain edits do not change them."""
+    if raw or not created or isinstance(kwargs.get('origin'), Hotel):
+        return
+    _refresh_autocomplete(hotel_ids=[instance.hotel_id])
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def refresh_autocomplete_for_city(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _refresh_autocomplete(city_ids=[instance.pk])
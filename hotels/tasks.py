@@ -0,0 +1,13 @@
+"""
+Background tasks for hotels using django-rq
+"""
+from django_rq import job
+
+
+@job
+def publish_autocomplete_changes():
+    """Publish the autocomplete changes recorded by hotels.signals (one snapshot for all of them)"""
+    from hotels.autocomplete import publish_changes
+
+    index = publish_changes()
+    return index.version if index is not None else None
@@ -0,0 +1,150 @@
+"""
+Search autocomplete index tests
+Match-quality ranking, zero-query lookups, incremental signal updates and the shared versioned snapshot
+"""
+
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.models import City
+from . import autocomplete
+from .models import Hotel, RoomType
+from .views import search_suggestions, universal_search
+
+
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'autocomplete-tests'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'autocomplete-tests'},
+    },
+    AUTOCOMPLETE_SYNC_SECONDS=60,
+)
+class AutocompleteIndexTests(TestCase):
+
+    def setUp(self):
+        # Publish inline, as without an RQ worker
+        patcher = mock.patch.dict('sys.modules', {'hotels.tasks': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        autocomplete.reset()
+        autocomplete._cache().clear()
+        self.addCleanup(autocomplete.reset)
+        self.coorg = City.objects.create(name='Coorg', code='CRG', state='Karnataka', is_popular=True)
+        self.goa = City.objects.create(name='Goa', code='GOI', state='Goa')
+        self.hotels = [
+            self._hotel('Coorg Jungle Resort', self.coorg, 'Galibeedu Road, Madikeri, Coorg', '12.45', '75.75', reviews=400),
+            self._hotel('Coffee Estate Stay', self.coorg, 'Madikeri, Coorg', '12.42', '75.71', reviews=20),
+            self._hotel('Taj Fort Aguada', self.goa, 'Sinquerim, Candolim, Goa', '15.49', '73.77', reviews=900),
+        ]
+        self.factory = RequestFactory()
+
+    def _hotel(self, name, city, address, lat, lng, reviews=0, rooms=1):
+        hotel = Hotel.objects.create(
+            name=name, description='d', city=city, address=address, contact_phone='1', contact_email='h@x.com',
+            latitude=Decimal(lat), longitude=Decimal(lng), review_count=reviews,
+        )
+        for i in range(rooms):
+            RoomType.objects.create(hotel=hotel, name=f'Room {i}', description='d', base_price=Decimal('2000.00'), total_rooms=2)
+        return hotel
+
+    def _names(self, query, **kwargs):
+        return [entry.name for _, entry in autocomplete.suggest(query, **kwargs)]
+
+    def test_ranks_by_match_quality_then_popularity(self):
+        self.assertEqual(self._names('coorg')[:2], ['Coorg', 'Coorg Jungle Resort'])
+        self.assertEqual(self._names('madikeri', kinds=['area', 'landmark']), ['Madikeri', 'Madikeri'])
+        # Word prefix beats substring; short queries only match name/word starts
+        self.assertEqual(self._names('co'), ['Coorg', 'Coorg Jungle Resort', 'Coffee Estate Stay'])
+        self.assertEqual(self._names('res'), ['Coorg Jungle Resort'])
+        self.assertEqual(self._names('agu'), ['Taj Fort Aguada'])
+        # Typo falls back to trigram similarity
+        self.assertEqual(self._names('aguadda'), ['Taj Fort Aguada'])
+        self.assertEqual(self._names('zz'), [])
+
+    def test_lookups_run_without_queries(self):
+        autocomplete.suggest('warm')
+        request = self.factory.get('/hotels/api/suggestions/', {'q': 'coorg'})
+        with self.assertNumQueries(0):
+            response = search_suggestions(request)
+        self.assertEqual(response.data['suggestions'][0], {
+            'type': 'city', 'id': self.coorg.id, 'name': 'Coorg', 'count': 2, 'display': 'Coorg (2 hotels)',
+        })
+        self.assertIn(
+            {'type': 'area', 'city': 'Coorg', 'name': 'Madikeri', 'count': 2, 'display': 'Madikeri (2 hotels)'},
+            search_suggestions(self.factory.get('/', {'q': 'madik'})).data['suggestions'],
+        )
+        with self.assertNumQueries(0):
+            results = universal_search(self.factory.get('/hotels/api/universal-search/', {'q': 'candolim'}))
+        self.assertIn(b'"label": "Candolim, Goa", "url": "/hotels/?q=Candolim"', results.content)
+
+    def test_signals_apply_changes_incrementally(self):
+        autocomplete.suggest('warm')
+        version = autocomplete.get_index().version
+        with self.captureOnCommitCallbacks(execute=True):
+            hotel = self._hotel('Coorg Riverside', self.coorg, 'Kushalnagar, Coorg', '12.35', '75.95', rooms=2)
+        index = autocomplete.get_index()
+        self.assertGreater(index.version, version)
+        self.assertIn('Coorg Riverside', self._names('riverside'))
+        self.assertEqual([entry.count for _, entry in index.suggest('coorg', kinds=['city'])], [3])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            hotel.city = self.goa
+            hotel.save()
+        self.assertEqual([entry.city for _, entry in autocomplete.suggest('riverside')], ['Goa'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotels[2].delete()
+        self.assertEqual(self._names('aguada'), [])
+        self.assertEqual(self._names('goa', kinds=['city']), ['Goa'])
+
+    def test_processes_share_the_published_snapshot(self):
+        call_command('rebuild_autocomplete_index', stdout=io.StringIO())
+        published = autocomplete.get_index()
+        autocomplete.reset()
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete.get_index().version, published.version)
+            self.assertIn('Coorg', self._names('coorg'))
+
+    def test_changes_are_coalesced_into_one_snapshot(self):
+        autocomplete.suggest('warm')
+        version = autocomplete.get_index().version
+        with mock.patch.object(autocomplete, 'changed') as changed:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.hotels[0].description = 'Renovated'
+                self.hotels[0].save(update_fields=['description'])
+            changed.assert_not_called()
+
+        # Another worker is publishing: saves are only recorded, and nobody waits for the lock
+        cache = autocomplete._cache()
+        cache.add(autocomplete.LOCK_KEY, 'other-worker')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hotels[1].name = 'Coffee Estate Bungalow'
+            self.hotels[1].save(update_fields=['name'])
+            self._hotel('Coorg Riverside', self.coorg, 'Kushalnagar, Coorg', '12.35', '75.95')
+        self.assertEqual(autocomplete.get_index().version, version)
+
+        # The holder picks them up after letting go: one new snapshot for both
+        cache.delete(autocomplete.LOCK_KEY)
+        index = autocomplete.publish_changes()
+        self.assertEqual(index.version, version + 1)
+        self.assertEqual(self._names('bungalow'), ['Coffee Estate Bungalow'])
+        self.assertEqual(self._names('riverside'), ['Coorg Riverside'])
+        self.assertIsNone(autocomplete.publish_changes())
+
+        # Versions come from one counter, so a rebuild racing a publisher never reuses a number
+        self.assertEqual(autocomplete.rebuild().version, version + 2)
+
+    def test_cache_errors_leave_the_change_for_the_next_rebuild(self):
+        autocomplete.suggest('warm')
+        version = autocomplete.get_index().version
+        with mock.patch.object(autocomplete, '_cache', side_effect=ConnectionError('cache down')), \
+                self.assertLogs('hotels.signals', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.hotels[1].name = 'Coffee Estate Villa'
+                self.hotels[1].save()
+        self.assertEqual(Hotel.objects.get(pk=self.hotels[1].pk).name, 'Coffee Estate Villa')
+        self.assertEqual(autocomplete.get_index().version, version)
@@ -0,0 +1,101 @@
+"""
+Interval availability tests
+Blocks, holds and bookings folded into per-night sellable rooms and the "can I sell N rooms" answer
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from bookings.models import Booking, HotelBooking
+from core.models import City
+from .availability import AvailabilityWindow, can_sell
+from .channel_manager_service import InternalInventoryService
+from .models import Hotel, RoomAvailability, RoomBlock, RoomType
+
+
+class AvailabilityWindowTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+        city = City.objects.create(name='Goa', state='Goa')
+        self.hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+        )
+        self.room = RoomType.objects.create(
+            hotel=self.hotel, name='Std', description='d', base_price=Decimal('2500.00'), total_rooms=10,
+        )
+        self.start = date(2031, 3, 1)
+        self.end = self.start + timedelta(days=5)
+
+    def _stay(self, offset, nights, rooms, status='confirmed'):
+        booking = Booking.objects.create(
+            user=self.user, booking_type='hotel', status=status, total_amount=Decimal('5000.00'),
+            customer_name='G', customer_email='g@x.com', customer_phone='9',
+        )
+        check_in = self.start + timedelta(days=offset)
+        HotelBooking.objects.create(
+            booking=booking, room_type=self.room, check_in=check_in,
+            check_out=check_in + timedelta(days=nights), number_of_rooms=rooms, total_nights=nights,
+        )
+        return booking
+
+    def _sellable(self):
+        return [night.sellable for night in AvailabilityWindow([self.room], self.start, self.end).nights(self.room.pk)]
+
+    def test_empty_window_is_full_capacity_at_base_price(self):
+        window = AvailabilityWindow([self.room], self.start, self.end)
+        self.assertEqual(self._sellable(), [10] * 5)
+        self.assertEqual(window.min_rate(self.room.pk), Decimal('2500.00'))
+
+    def test_overlapping_bookings_sweep(self):
+        self._stay(0, 3, 2)
+        self._stay(2, 2, 3)
+        self._stay(1, 1, 4, status='cancelled')
+        self.assertEqual(self._sellable(), [8, 8, 5, 7, 10])
+
+    def test_blocks_are_inclusive_and_zero_nights(self):
+        RoomBlock.objects.create(
+            room_type=self.room, blocked_from=self.start + timedelta(days=1), blocked_to=self.start + timedelta(days=2),
+        )
+        nights = AvailabilityWindow([self.room], self.start, self.end).nights(self.room.pk)
+        self.assertEqual([night.blocked for night in nights], [False, True, True, False, False])
+        self.assertEqual([night.sellable for night in nights], [10, 0, 0, 10, 10])
+
+    def test_counters_cap_sellable(self):
+        RoomAvailability.objects.create(room_type=self.room, date=self.start, available_rooms=3, price=Decimal('1800.00'))
+        self._stay(0, 1, 8)
+        window = AvailabilityWindow([self.room], self.start, self.end)
+        self.assertEqual(window.nights(self.room.pk)[0].sellable, 2)
+        self.assertEqual(window.min_rate(self.room.pk), Decimal('1800.00'))
+
+    def test_internal_hold_counted_once(self):
+        service = InternalInventoryService(self.hotel)
+        lock = service.lock_inventory(self.room, self.start, self.start + timedelta(days=2), num_rooms=2)
+        # The hold lowered the counters and is an open lock; the minimum counts it once
+        self.assertEqual(self._sellable(), [8, 8, 10, 10, 10])
+        service.release_lock(lock)
+        self.assertEqual(self._sellable(), [10] * 5)
+
+    def test_can_sell_reports_first_short_night(self):
+        self._stay(3, 1, 9)
+        check = can_sell(self.room, self.start, self.end, num_rooms=2)
+        self.assertFalse(check.ok)
+        self.assertEqual((check.available, check.short_night, check.blocked), (1, self.start + timedelta(days=3), False))
+        self.assertTrue(can_sell(self.room, self.start, self.start + timedelta(days=3), num_rooms=10).ok)
+
+        RoomBlock.objects.create(room_type=self.room, blocked_from=self.start, blocked_to=self.start)
+        self.assertTrue(can_sell(self.room, self.start, self.end).blocked)
+
+    def test_fixed_query_count_for_many_room_types(self):
+        rooms = [self.room] + [
+            RoomType.objects.create(
+                hotel=self.hotel, name=f'Room {i}', description='d', base_price=Decimal('3000.00'), total_rooms=4,
+            )
+            for i in range(5)
+        ]
+        with self.assertNumQueries(4):
+            window = AvailabilityWindow(rooms, self.start, self.start + timedelta(days=60))
+        self.assertEqual(window.sellable(rooms[-1].pk), 4)
@@ -0,0 +1,171 @@
+"""
+Batch quote engine tests
+Parity with PricingCalculator across hotels, room types, meal plans and discounts, and a fixed query count
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import City
+from .models import Hotel, HotelDiscount, MealPlan, RoomAvailability, RoomMealPlan, RoomType
+from .pricing_service import (
+    BatchQuoteEngine,
+    BulkPricingCalculator,
+    PricingCalculator,
+    QuoteRequest,
+    quote_lead_room_types,
+)
+
+
+class BatchQuoteEngineTests(TestCase):
+
+    def setUp(self):
+        self.city = City.objects.create(name='Goa', state='Goa', code='GOI')
+        self.check_in = date.today() + timedelta(days=5)
+        self.check_out = self.check_in + timedelta(days=3)
+        self.breakfast = MealPlan.objects.create(name='Breakfast Included', plan_type='breakfast')
+        self.hotels = []
+        self.room_types = []
+        for i in range(3):
+            hotel = Hotel.objects.create(
+                name=f'Batch Hotel {i}', description='d', city=self.city, address='a',
+                contact_phone='1', contact_email='h@x.com', hourly_stays_enabled=(i == 0),
+            )
+            self.hotels.append(hotel)
+            for j, base in enumerate((Decimal('900.00'), Decimal('4200.00'), Decimal('9000.00'))):
+                self.room_types.append(RoomType.objects.create(
+                    hotel=hotel, name=f'Room {j}', description='d', base_price=base + i, total_rooms=5,
+                    supports_hourly=True, hourly_price_6h=Decimal('700.00'),
+                ))
+        # Partial nightly prices: some nights stored, some missing
+        first = self.room_types[0]
+        RoomAvailability.objects.create(room_type=first, date=self.check_in, available_rooms=3, price=Decimal('1100.00'))
+        RoomAvailability.objects.create(
+            room_type=first, date=self.check_in + timedelta(days=2), available_rooms=3, price=Decimal('1300.00'),
+        )
+        for offset in range(3):
+            RoomAvailability.objects.create(
+                room_type=self.room_types[4], date=self.check_in + timedelta(days=offset),
+                available_rooms=2, price=Decimal('5000.00') + offset * 250,
+            )
+        self.meal_plan = RoomMealPlan.objects.create(
+            room_type=self.room_types[1], meal_plan=self.breakfast, price_delta=Decimal('350.00'),
+        )
+        valid_till = timezone.now() + timedelta(days=30)
+        HotelDiscount.objects.create(
+            hotel=self.hotels[0], discount_value=Decimal('10'), description='Ten off', code='TEN',
+            valid_till=valid_till,
+        )
+        HotelDiscount.objects.create(
+            hotel=self.hotels[1], discount_type='fixed', discount_value=Decimal('500'), description='Flat',
+            code='FLAT', valid_till=valid_till,
+        )
+        HotelDiscount.objects.create(
+            hotel=self.hotels[2], discount_value=Decimal('20'), description='Old', code='OLD',
+            valid_from=timezone.now() - timedelta(days=10), valid_till=timezone.now() - timedelta(days=1),
+        )
+
+    def _requests(self):
+        requests = []
+        for room_type in self.room_types:
+            requests.append(QuoteRequest(room_type.id, self.check_in, self.check_out))
+            requests.append(QuoteRequest(room_type.id, self.check_in, self.check_in + timedelta(days=1), num_rooms=2))
+        requests += [
+            QuoteRequest(self.room_types[1].id, self.check_in, self.check_out, meal_plan=self.meal_plan.id),
+            QuoteRequest(self.room_types[0].id, self.check_in, self.check_out, discount_code='TEN'),
+            QuoteRequest(self.room_types[4].id, self.check_in, self.check_out, num_rooms=3, discount_code='FLAT'),
+            QuoteRequest(self.room_types[7].id, self.check_in, self.check_out, discount_code='OLD'),
+            QuoteRequest(self.room_types[3].id, self.check_in, self.check_out, discount_code='TEN'),
+            QuoteRequest(self.room_types[0].id, self.check_in, self.check_in, stay_type='hourly', hourly_hours=6),
+        ]
+        return requests
+
+    def _single(self, request):
+        room_type = RoomType.objects.get(id=request.room_type)
+        meal_plan = RoomMealPlan.objects.get(id=request.meal_plan) if request.meal_plan else None
+        return PricingCalculator(room_type.hotel).calculate_total_price(
+            room_type, request.check_in, request.check_out, num_rooms=request.num_rooms,
+            discount_code=request.discount_code, meal_plan=meal_plan,
+            stay_type=request.stay_type, hourly_hours=request.hourly_hours,
+        )
+
+    def test_matches_single_quote_path(self):
+        requests = self._requests()
+        batch = BatchQuoteEngine().quote_many(requests)
+        self.assertEqual(len(batch), len(requests))
+        for request, quote in zip(requests, batch):
+            self.assertEqual(quote, self._single(request), request)
+
+    def test_hourly_request_without_hourly_stays_uses_stored_rates(self):
+        request = QuoteRequest(self.room_types[4].id, self.check_in, self.check_out, stay_type='hourly', hourly_hours=6)
+        quote = BatchQuoteEngine().quote(request)
+        self.assertEqual(quote, self._single(request))
+        self.assertEqual(quote['base_price'], 5250.0)
+
+    def test_fixed_query_count(self):
+        requests = self._requests()
+        with self.assertNumQueries(4):
+            BatchQuoteEngine().quote_many(requests)
+        with self.assertNumQueries(4):
+            BatchQuoteEngine().quote_many(requests * 5)
+
+    def test_bad_request_reported_per_item(self):
+        quotes = BatchQuoteEngine().quote_many([
+            QuoteRequest(self.room_types[0].id, self.check_out, self.check_in),
+            QuoteRequest(999999, self.check_in, self.check_out),
+            QuoteRequest(self.room_types[0].id, self.check_in, self.check_out, meal_plan=self.meal_plan.id),
+            QuoteRequest(self.room_types[0].id, self.check_in, self.check_out),
+        ])
+        self.assertEqual(quotes[0], {'error': 'Check-out date must be after check-in date'})
+        self.assertEqual(quotes[1], {'error': 'Room type not found'})
+        self.assertEqual(quotes[2], {'error': 'Meal plan not available for this room type'})
+        self.assertNotIn('error', quotes[3])
+
+    def test_bulk_calculator_uses_batch(self):
+        configs = [
+            {'room_type_id': room_type.id, 'check_in': self.check_in.isoformat(),
+             'check_out': self.check_out.isoformat(), 'num_rooms': 1}
+            for room_type in self.room_types
+        ]
+        hotel = Hotel.objects.get(id=self.hotels[0].id)
+        with self.assertNumQueries(2):
+            result = BulkPricingCalculator(hotel).calculate_multi_room_prices(configs)
+        expected = sum(
+            self._single(QuoteRequest(room_type.id, self.check_in, self.check_out))['total_amount']
+            for room_type in self.room_types
+        )
+        self.assertAlmostEqual(result['total_amount'], expected, places=2)
+
+    def test_lead_room_type_quotes_for_search(self):
+        with self.assertNumQueries(2):
+            quotes = quote_lead_room_types(self.hotels, self.check_in, self.check_out)
+        self.assertEqual(set(quotes), {hotel.id for hotel in self.hotels})
+        lead = self.room_types[0]
+        self.assertEqual(quotes[self.hotels[0].id], self._single(QuoteRequest(lead.id, self.check_in, self.check_out)))
+
+    def test_calculate_price_view_matches_calculator(self):
+        response = self.client.post('/hotels/api/calculate-price/', {
+            'room_type_id': self.room_types[1].id,
+            'meal_plan_id': self.meal_plan.id,
+            'check_in': self.check_in.isoformat(),
+            'check_out': self.check_out.isoformat(),
+            'num_rooms': 2,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        expected = self._single(QuoteRequest(
+            self.room_types[1].id, self.check_in, self.check_out, num_rooms=2, meal_plan=self.meal_plan.id,
+        ))
+        self.assertEqual(response.json()['pricing']['total_amount'], expected['total_amount'])
+        self.assertNotIn('gst_rate_percent', response.json()['pricing'])
+
+    def test_hotel_list_shows_stay_quote(self):
+        response = self.client.get('/hotels/', {
+            'city_id': self.city.id,
+            'checkin': self.check_in.isoformat(),
+            'checkout': self.check_out.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'for 3 nights + taxes')
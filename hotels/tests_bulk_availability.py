@@ -0,0 +1,104 @@
+"""
+Bulk availability snapshot tests
+Parity with the per-hotel snapshot path and constant query count
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+
+from core.models import City
+from .channel_manager_service import (
+    BulkAvailabilityService,
+    InternalInventoryService,
+    get_bulk_availability_snapshots,
+)
+from .models import ChannelManagerRoomMapping, Hotel, RoomAvailability, RoomType
+
+
+class BulkAvailabilitySnapshotTests(TestCase):
+
+    def setUp(self):
+        self.city = City.objects.create(name='Goa', state='Goa')
+        self.check_in = date.today() + timedelta(days=5)
+        self.check_out = self.check_in + timedelta(days=4)
+        self.hotels = []
+        for i in range(6):
+            hotel = Hotel.objects.create(
+                name=f'Hotel {i}',
+                description='desc',
+                city=self.city,
+                address='addr',
+                contact_phone='123',
+                contact_email='a@b.com',
+            )
+            cheap = RoomType.objects.create(
+                hotel=hotel, name='Standard', description='d',
+                base_price=Decimal('2000.00') + i, total_rooms=5,
+            )
+            RoomType.objects.create(
+                hotel=hotel, name='Suite', description='d',
+                base_price=Decimal('9000.00'), total_rooms=2,
+            )
+            # Partial coverage: only the first two nights have stored rows
+            for offset, (rooms, price) in enumerate([(3, Decimal('2500.00')), (4, Decimal('1800.00'))]):
+                RoomAvailability.objects.create(
+                    room_type=cheap,
+                    date=self.check_in + timedelta(days=offset),
+                    available_rooms=rooms,
+                    price=price,
+                )
+            self.hotels.append(hotel)
+
+    def test_matches_per_hotel_summary(self):
+        snapshots, errors = get_bulk_availability_snapshots(self.hotels, self.check_in, self.check_out)
+        self.assertEqual(errors, {})
+
+        for hotel in self.hotels:
+            expected = InternalInventoryService(hotel).summarize(
+                hotel.room_types.first(), self.check_in, self.check_out
+            )
+            expected.update({'source': 'internal_cm', 'provider': 'internal'})
+            self.assertEqual(snapshots[hotel.id], expected)
+
+    def test_missing_nights_use_room_defaults_without_writes(self):
+        before = RoomAvailability.objects.count()
+        room_type = self.hotels[0].room_types.first()
+
+        summary = BulkAvailabilityService(self.check_in, self.check_out).summarize_room_types([room_type])
+
+        self.assertEqual(RoomAvailability.objects.count(), before)
+        self.assertEqual(summary[room_type.id]['available_rooms'], 3)
+        self.assertEqual(summary[room_type.id]['rate'], 1800.0)
+
+    def test_query_count_is_constant(self):
+        # Room types + the four AvailabilityWindow sources, whatever the page size
+        with self.assertNumQueries(5):
+            get_bulk_availability_snapshots(self.hotels[:2], self.check_in, self.check_out)
+        with self.assertNumQueries(5):
+            get_bulk_availability_snapshots(self.hotels, self.check_in, self.check_out)
+
+    def test_errors_reported_per_hotel(self):
+        empty = Hotel.objects.create(
+            name='Empty', description='d', city=self.city, address='a',
+            contact_phone='1', contact_email='e@x.com',
+        )
+        external = self.hotels[1]
+        external.inventory_source = 'external_cm'
+        external.save(update_fields=['inventory_source'])
+
+        snapshots, errors = get_bulk_availability_snapshots(
+            [empty, external, self.hotels[0]], self.check_in, self.check_out
+        )
+
+        self.assertEqual(errors[empty.id], 'Hotel has no configured room types')
+        self.assertEqual(errors[external.id], 'No active channel manager mapping for this hotel')
+        self.assertIn(self.hotels[0].id, snapshots)
+
+        ChannelManagerRoomMapping.objects.create(
+            hotel=external, room_type=external.room_types.first(), external_room_id='EXT-1'
+        )
+        snapshots, errors = get_bulk_availability_snapshots([external], self.check_in, self.check_out)
+        self.assertEqual(snapshots[external.id]['source'], 'external_cm')
+        self.assertEqual(errors, {})
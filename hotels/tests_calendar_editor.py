@@ -0,0 +1,231 @@
+"""
+Bulk owner calendar tests
+Set-based block/unblock/price/availability edits across room types with a per-range report and per-night diff
+"""
+
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from unittest import mock
+
+from bookings.inventory_utils import reserve_inventory
+from bookings.models import Booking, HotelBooking
+from core.models import City
+from property_owners.models import Property, PropertyOwner
+from .calendar_editor import CalendarEditor, apply_calendar_edits
+from .models import Hotel, RoomAvailability, RoomBlock, RoomNightFact, RoomType
+
+
+class BulkCalendarTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='owner', email='o@x.com', password='pw')
+        city = City.objects.create(name='Goa', state='Goa')
+        owner = PropertyOwner.objects.create(
+            user=self.user, business_name='Biz', description='d', owner_name='Owner', owner_phone='9999999999',
+            owner_email='owner@x.com', city=city, address='a', pincode='400001',
+        )
+        prop = Property.objects.create(
+            owner=owner, name='Owned', description='d', city=city, address='a',
+            contact_phone='1', contact_email='o@x.com',
+        )
+        self.hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+            owner_property=prop,
+        )
+        self.standard = RoomType.objects.create(
+            hotel=self.hotel, name='Std', description='d', base_price=Decimal('2500.00'), total_rooms=10,
+        )
+        self.suite = RoomType.objects.create(
+            hotel=self.hotel, name='Suite', description='d', base_price=Decimal('8000.00'), total_rooms=2,
+        )
+        other = Hotel.objects.create(
+            name='Elsewhere', description='d', city=city, address='a', contact_phone='1', contact_email='e@x.com',
+        )
+        self.foreign = RoomType.objects.create(
+            hotel=other, name='Std', description='d', base_price=Decimal('1000.00'), total_rooms=5,
+        )
+        self.day = timezone.localdate() + timedelta(days=10)
+
+    def _iso(self, offset):
+        return (self.day + timedelta(days=offset)).isoformat()
+
+    def _range(self, room_type, first, last, action, **extra):
+        return {'room_type': room_type.pk, 'from': self._iso(first), 'to': self._iso(last), 'action': action, **extra}
+
+    def _post(self, ranges):
+        self.client.force_login(self.user)
+        return self.client.post(
+            '/properties/owner/calendar/bulk/', json.dumps({'ranges': ranges}), content_type='application/json',
+        )
+
+    def _book(self, room_type, offset, nights):
+        booking = Booking.objects.create(
+            user=self.user, booking_type='hotel', status='confirmed', total_amount=Decimal('5000.00'),
+            customer_name='G', customer_email='g@x.com', customer_phone='9',
+        )
+        check_in = self.day + timedelta(days=offset)
+        HotelBooking.objects.create(
+            booking=booking, room_type=room_type, check_in=check_in,
+            check_out=check_in + timedelta(days=nights), number_of_rooms=1, total_nights=nights,
+        )
+
+    def test_mixed_edits_report_and_diff(self):
+        response = self._post([
+            self._range(self.standard, 0, 2, 'block', reason='Maintenance'),
+            self._range(self.suite, 0, 1, 'set_price', price='9500'),
+            self._range(self.suite, 1, 3, 'set_available', available_rooms=1),
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['applied'], data['failed']), (3, 0))
+        self.assertEqual([entry['nights'] for entry in data['report']], [3, 2, 3])
+
+        block = RoomBlock.objects.get(room_type=self.standard)
+        self.assertEqual((block.blocked_from, block.blocked_to, block.reason), (self.day, self.day + timedelta(days=2), 'Maintenance'))
+        self.assertEqual(RoomNightFact.objects.get(room_type=self.standard, date=self.day).blocked, 10)
+        rows = {row.date: row for row in RoomAvailability.objects.filter(room_type=self.suite)}
+        self.assertEqual(len(rows), 4)
+        self.assertEqual((rows[self.day].price, rows[self.day].available_rooms), (Decimal('9500.00'), 2))
+        self.assertEqual((rows[self.day + timedelta(days=1)].price, rows[self.day + timedelta(days=1)].available_rooms), (Decimal('9500.00'), 1))
+        self.assertEqual(rows[self.day + timedelta(days=3)].price, Decimal('8000.00'))
+
+        diff = {(entry['room_type'], entry['date']): entry['changes'] for entry in data['diff']}
+        self.assertEqual(diff[(self.standard.pk, self._iso(0))], {'blocked': [False, True], 'sellable': [10, 0]})
+        self.assertEqual(diff[(self.suite.pk, self._iso(1))], {
+            'price': ['8000.00', '9500.00'], 'available_rooms': [2, 1], 'sellable': [2, 1],
+        })
+        self.assertNotIn((self.standard.pk, self._iso(3)), diff)
+
+    def test_conflicts_and_bad_ranges_reported_per_range(self):
+        self._book(self.standard, 1, 2)
+        response = self._post([
+            self._range(self.standard, 0, 1, 'block'),
+            self._range(self.standard, 3, 4, 'block'),
+            self._range(self.foreign, 0, 1, 'block'),
+            self._range(self.suite, 2, 1, 'block'),
+            self._range(self.suite, 0, 0, 'set_available', available_rooms=5),
+            {'room_type': self.suite.pk, 'from': (self.day - timedelta(days=30)).isoformat(), 'action': 'block'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        report = response.json()['report']
+        self.assertEqual([entry['status'] for entry in report], ['error', 'applied', 'error', 'error', 'error', 'error'])
+        self.assertIn(self._iso(1), report[0]['error'])
+        self.assertEqual(report[2]['error'], 'Room type not found')
+        self.assertIn('after or equal', report[3]['error'])
+        self.assertIn('cannot exceed', report[4]['error'])
+        self.assertEqual(report[5]['error'], 'Cannot edit past dates')
+        self.assertEqual(list(RoomBlock.objects.values_list('blocked_from', flat=True)), [self.day + timedelta(days=3)])
+
+    def test_unblock_trims_splits_and_deletes(self):
+        def block(first, last, room_type=self.standard):
+            return RoomBlock.objects.create(
+                room_type=room_type, blocked_from=self.day + timedelta(days=first),
+                blocked_to=self.day + timedelta(days=last), reason='Owner use',
+            )
+        spanning = block(0, 9)
+        inside = block(12, 13)
+        edge = block(14, 20)
+        untouched = block(0, 9, room_type=self.suite)
+
+        result = apply_calendar_edits([self.standard, self.suite], [
+            self._range(self.standard, 3, 4, 'unblock'),
+            self._range(self.standard, 11, 15, 'unblock'),
+        ])
+        self.assertEqual(result['failed'], 0)
+        ranges = sorted(
+            ((b.blocked_from - self.day).days, (b.blocked_to - self.day).days)
+            for b in RoomBlock.objects.filter(room_type=self.standard)
+        )
+        self.assertEqual(ranges, [(0, 2), (5, 9), (16, 20)])
+        self.assertFalse(RoomBlock.objects.filter(pk=inside.pk).exists())
+        self.assertTrue(RoomBlock.objects.filter(pk=spanning.pk).exists())
+        self.assertEqual(RoomBlock.objects.get(pk=edge.pk).blocked_from, self.day + timedelta(days=16))
+        self.assertEqual(RoomBlock.objects.get(pk=untouched.pk).blocked_to, self.day + timedelta(days=9))
+        self.assertEqual(RoomNightFact.objects.get(room_type=self.standard, date=self.day + timedelta(days=3)).blocked, 0)
+        self.assertEqual(RoomNightFact.objects.get(room_type=self.standard, date=self.day + timedelta(days=5)).blocked, 10)
+
+    def test_query_count_does_not_grow_with_ranges(self):
+        def edits(count):
+            # Same overall span (60 nights), split into more or fewer ranges
+            starts = [round(i * 57 / (count - 1)) for i in range(count)]
+            ranges = [self._range(self.standard, first, first + 2, 'block') for first in starts]
+            ranges += [self._range(self.suite, first, first + 2, 'set_price', price='7000') for first in starts]
+            return ranges
+
+        with CaptureQueriesContext(connection) as few:
+            apply_calendar_edits([self.standard, self.suite], edits(2))
+        RoomBlock.objects.all().delete()
+        RoomNightFact.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            apply_calendar_edits([self.standard, self.suite], edits(15))
+        self.assertEqual(RoomBlock.objects.count(), 15)
+        self.assertEqual(len(many), len(few))
+
+    def test_reservation_between_read_and_write_is_kept(self):
+        RoomAvailability.objects.create(room_type=self.suite, date=self.day, available_rooms=2, price=Decimal('8000.00'))
+        RoomAvailability.objects.create(room_type=self.standard, date=self.day, available_rooms=5, price=Decimal('2500.00'))
+        check = CalendarEditor._check
+
+        def reserve_mid_edit(editor, edit, window):
+            # A guest books after the editor read its window, before it writes
+            if edit.action == 'set_price':
+                reserve_inventory(self.standard, self.day, self.day + timedelta(days=1), 2)
+            elif edit.action == 'block' and not HotelBooking.objects.filter(room_type=self.suite).exists():
+                self._book(self.suite, 0, 1)
+            return check(editor, edit, window)
+
+        with mock.patch.object(CalendarEditor, '_check', reserve_mid_edit):
+            result = apply_calendar_edits([self.standard, self.suite], [
+                self._range(self.standard, 0, 1, 'set_price', price='3000'),
+                self._range(self.suite, 0, 0, 'block'),
+            ])
+        night = RoomAvailability.objects.get(room_type=self.standard, date=self.day)
+        self.assertEqual((night.available_rooms, night.price), (3, Decimal('3000.00')))
+        self.assertEqual(RoomAvailability.objects.get(room_type=self.standard, date=self.day + timedelta(days=1)).available_rooms, 10)
+        self.assertEqual([entry['status'] for entry in result['report']], ['applied', 'error'])
+        self.assertIn('existing bookings', result['report'][1]['error'])
+        self.assertFalse(RoomBlock.objects.filter(room_type=self.suite).exists())
+
+    def test_available_rooms_cannot_hand_out_booked_rooms(self):
+        self._book(self.suite, 1, 1)
+        result = apply_calendar_edits([self.suite], [
+            self._range(self.suite, 0, 1, 'set_available', available_rooms=2),
+            self._range(self.suite, 1, 1, 'set_available', available_rooms=1),
+        ])
+        self.assertEqual([entry['status'] for entry in result['report']], ['error', 'applied'])
+        self.assertIn(f'1 unbooked rooms on {self._iso(1)}', result['report'][0]['error'])
+        self.assertEqual(RoomAvailability.objects.get(room_type=self.suite, date=self.day + timedelta(days=1)).available_rooms, 1)
+
+        # A booking landing between the first read and the write is caught under the row lock
+        RoomAvailability.objects.create(room_type=self.suite, date=self.day + timedelta(days=2), available_rooms=0, price=Decimal('8000.00'))
+        check = CalendarEditor._check
+
+        def book_mid_edit(editor, edit, window):
+            if not HotelBooking.objects.filter(room_type=self.suite, check_in=self.day + timedelta(days=2)).exists():
+                self._book(self.suite, 2, 1)
+            return check(editor, edit, window)
+
+        with mock.patch.object(CalendarEditor, '_check', book_mid_edit):
+            result = apply_calendar_edits([self.suite], [self._range(self.suite, 2, 2, 'set_available', available_rooms=2)])
+        self.assertEqual(result['report'][0]['status'], 'error')
+        self.assertEqual(RoomAvailability.objects.get(room_type=self.suite, date=self.day + timedelta(days=2)).available_rooms, 0)
+
+    def test_bulk_block_dates_form_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.post(f'/properties/owner/room/{self.standard.pk}/bulk-block/', {
+            'ranges': json.dumps([{'from': self._iso(0), 'to': self._iso(1)}, {'from': self._iso(5), 'to': self._iso(5)}]),
+            'reason': 'Festival',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(set(RoomBlock.objects.values_list('reason', flat=True)), {'Festival'})
+
+        response = self.client.post(f'/properties/owner/room/{self.foreign.pk}/bulk-block/', {'ranges': '[]'})
+        self.assertEqual(response.status_code, 404)
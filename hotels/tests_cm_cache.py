@@ -0,0 +1,121 @@
+"""
+Channel manager availability cache tests
+Read-through hits, invalidation, stale fallback and request coalescing
+"""
+
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+
+from core.models import City
+from .channel_manager_service import ExternalChannelManagerClient, fetch_availability_batch
+from .cm_cache import availability_cache
+from .cm_stub_server import StubChannelManagerServer
+from .models import ChannelManagerRoomMapping, Hotel, RoomType
+
+
+@override_settings(
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cm-cache-tests'},
+        'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cm-cache-tests'},
+    },
+    CHANNEL_MANAGER_API_KEY='test-key',
+    CHANNEL_MANAGER_TIMEOUT=5,
+)
+class AvailabilityCacheTests(TestCase):
+
+    def setUp(self):
+        self.server = StubChannelManagerServer(default_delay=0.05).start()
+        self.addCleanup(self.server.stop)
+        url_override = override_settings(CHANNEL_MANAGER_API_BASE_URL=self.server.url)
+        url_override.enable()
+        self.addCleanup(url_override.disable)
+        availability_cache.cache.clear()
+        availability_cache.reset_stats()
+
+        city = City.objects.create(name='Goa', state='Goa')
+        self.mappings = []
+        for i in range(3):
+            hotel = Hotel.objects.create(
+                name=f'CM Hotel {i}', description='d', city=city, address='a',
+                contact_phone='1', contact_email='h@x.com', inventory_source='external_cm',
+            )
+            room_type = RoomType.objects.create(
+                hotel=hotel, name='Std', description='d', base_price=Decimal('2000.00'), total_rooms=4,
+            )
+            self.mappings.append(ChannelManagerRoomMapping.objects.create(
+                hotel=hotel, room_type=room_type, external_room_id=f'EXT-{i}',
+            ))
+        self.client_cm = ExternalChannelManagerClient()
+        self.check_in = date.today() + timedelta(days=3)
+        self.check_out = self.check_in + timedelta(days=2)
+
+    def _availability_calls(self):
+        return [payload for path, payload in self.server.calls if path == '/availability']
+
+    def test_repeat_lookup_is_served_from_cache(self):
+        first = self.client_cm.fetch_availability(self.mappings[0], self.check_in, self.check_out)
+        second = self.client_cm.fetch_availability(self.mappings[0], self.check_in, self.check_out)
+        self.client_cm.fetch_availability(self.mappings[0], self.check_in, self.check_out, num_rooms=2)
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self._availability_calls()), 2)
+        stats = availability_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_lock_confirm_release_invalidate(self):
+        mapping = self.mappings[0]
+        self.client_cm.fetch_availability(mapping, self.check_in, self.check_out)
+
+        self.client_cm.lock_inventory(mapping, self.check_in, self.check_out)
+        self.client_cm.fetch_availability(mapping, self.check_in, self.check_out)
+        self.client_cm.confirm_booking('L1', 'R1', room_type_id=mapping.room_type_id)
+        self.client_cm.fetch_availability(mapping, self.check_in, self.check_out)
+        self.client_cm.release_lock('L1', room_type_id=mapping.room_type_id)
+        self.client_cm.fetch_availability(mapping, self.check_in, self.check_out)
+
+        self.assertEqual(len(self._availability_calls()), 4)
+        self.assertEqual(availability_cache.stats()['invalidations'], 3)
+
+    def test_batch_uses_cache(self):
+        fetch_availability_batch(self.mappings, self.check_in, self.check_out)
+        results, errors = fetch_availability_batch(self.mappings, self.check_in, self.check_out)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(len(results), 3)
+        self.assertEqual(len(self._availability_calls()), 3)
+        self.assertEqual(availability_cache.stats()['hits'], 3)
+
+    @override_settings(CHANNEL_MANAGER_CACHE_TTL=0, CHANNEL_MANAGER_CACHE_STALE_TTL=60)
+    def test_stale_answer_when_upstream_fails(self):
+        mapping = self.mappings[0]
+        fresh = self.client_cm.fetch_availability(mapping, self.check_in, self.check_out)
+        self.server.failures.add(mapping.external_room_id)
+
+        self.assertEqual(self.client_cm.fetch_availability(mapping, self.check_in, self.check_out), fresh)
+        results, errors = fetch_availability_batch([mapping], self.check_in, self.check_out)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(results[mapping.id], fresh)
+        self.assertEqual(availability_cache.stats()['stale'], 2)
+
+    def test_concurrent_identical_misses_are_coalesced(self):
+        self.server.default_delay = 0.3
+        mapping = self.mappings[0]
+        answers = []
+
+        def lookup():
+            answers.append(self.client_cm.fetch_availability(mapping, self.check_in, self.check_out))
+
+        threads = [threading.Thread(target=lookup) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(answers), 5)
+        self.assertEqual(len(self._availability_calls()), 1)
+        stats = availability_cache.stats()
+        self.assertEqual((stats['misses'], stats['coalesced']), (1, 4))
@@ -0,0 +1,115 @@
+"""
+External channel manager client tests
+Pooled sessions and bounded, deadline-aware fan-out against the local stub CM
+"""
+
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+
+from core.models import City
+from .channel_manager_service import (
+    CM_TIMEOUT_MESSAGE,
+    ExternalChannelManagerClient,
+    fetch_availability_batch,
+    get_bulk_availability_snapshots,
+)
+from .cm_cache import availability_cache
+from .cm_stub_server import StubChannelManagerServer
+from .models import ChannelManagerRoomMapping, Hotel, RoomType
+
+
+class ChannelManagerClientTests(TestCase):
+
+    def setUp(self):
+        self.server = StubChannelManagerServer(
+            delays={'SLOW-1': 2.0}, default_delay=0.2, failures={'DOWN-1'}, rates={'EXT-0': 4100.0},
+        ).start()
+        self.addCleanup(self.server.stop)
+        self.settings_override = override_settings(
+            CHANNEL_MANAGER_API_BASE_URL=self.server.url,
+            CHANNEL_MANAGER_API_KEY='test-key',
+            CHANNEL_MANAGER_TIMEOUT=5,
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cm-client-tests'},
+                'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cm-client-tests'},
+            },
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        availability_cache.cache.clear()
+
+        self.city = City.objects.create(name='Goa', state='Goa')
+        self.check_in = date.today() + timedelta(days=3)
+        self.check_out = self.check_in + timedelta(days=2)
+        self.hotels = []
+        self.mappings = []
+        for i, room_id in enumerate(['EXT-0', 'EXT-1', 'EXT-2', 'EXT-3', 'SLOW-1', 'DOWN-1']):
+            hotel = Hotel.objects.create(
+                name=f'CM Hotel {i}', description='d', city=self.city, address='a',
+                contact_phone='1', contact_email='h@x.com', inventory_source='external_cm',
+            )
+            room_type = RoomType.objects.create(
+                hotel=hotel, name='Std', description='d', base_price=Decimal('2000.00'), total_rooms=4,
+            )
+            self.hotels.append(hotel)
+            self.mappings.append(ChannelManagerRoomMapping.objects.create(
+                hotel=hotel, room_type=room_type, external_room_id=room_id,
+            ))
+
+    def test_session_is_reused_across_calls(self):
+        client = ExternalChannelManagerClient()
+        for num_rooms in range(1, 5):
+            # Distinct room counts so every call misses the availability cache
+            client.fetch_availability(self.mappings[0], self.check_in, self.check_out, num_rooms)
+
+        self.assertIs(client.session, ExternalChannelManagerClient().session)
+        self.assertEqual(len(self.server.calls), 4)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_batch_runs_concurrently(self):
+        fast = self.mappings[:4]
+        started = time.monotonic()
+        results, errors = fetch_availability_batch(fast, self.check_in, self.check_out, max_concurrency=4)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(errors, {})
+        self.assertEqual(results[fast[0].id]['rate'], 4100.0)
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLess(elapsed, 0.2 * len(fast))
+
+    def test_concurrency_limit(self):
+        fetch_availability_batch(self.mappings[:4], self.check_in, self.check_out, max_concurrency=2)
+        self.assertLessEqual(self.server.max_in_flight, 2)
+
+    def test_deadline_returns_partial_results(self):
+        started = time.monotonic()
+        results, errors = fetch_availability_batch(
+            self.mappings, self.check_in, self.check_out, deadline=0.8, max_concurrency=6
+        )
+        elapsed = time.monotonic() - started
+
+        slow, down = self.mappings[4], self.mappings[5]
+        self.assertLess(elapsed, 1.5)
+        self.assertEqual(errors[slow.id], CM_TIMEOUT_MESSAGE)
+        self.assertIn('503', errors[down.id])
+        self.assertEqual(set(results), {m.id for m in self.mappings[:4]})
+
+    def test_bulk_snapshots_use_batch(self):
+        with self.settings(CHANNEL_MANAGER_BATCH_DEADLINE=0.8):
+            snapshots, errors = get_bulk_availability_snapshots(self.hotels, self.check_in, self.check_out)
+
+        self.assertEqual(snapshots[self.hotels[0].id]['rate'], 4100.0)
+        self.assertEqual(snapshots[self.hotels[0].id]['source'], 'external_cm')
+        self.assertEqual(errors[self.hotels[4].id], CM_TIMEOUT_MESSAGE)
+        self.assertIn(self.hotels[5].id, errors)
+
+    def test_unconfigured_client_uses_stub_rates(self):
+        with self.settings(CHANNEL_MANAGER_API_BASE_URL=None, CHANNEL_MANAGER_API_KEY=None):
+            results, errors = fetch_availability_batch(self.mappings[:2], self.check_in, self.check_out)
+
+        self.assertEqual(errors, {})
+        self.assertEqual(results[self.mappings[0].id]['rate'], 2000.0)
+        self.assertEqual(self.server.calls, [])
@@ -0,0 +1,105 @@
+"""
+Geospatial grid index tests
+SQL candidate pre-filter, distance parity and the distance search API
+"""
+
+import random
+from decimal import Decimal
+from math import asin, cos, radians, sin, sqrt
+
+from django.test import TestCase
+
+from core.models import City
+from .geo_index import (
+    GRID_COLUMNS,
+    bounding_box,
+    cell_ranges,
+    grid_cell_for,
+    nearby_hotels,
+    within_radius_candidates,
+)
+from .models import Hotel, HotelSearchDocument, RoomType
+from .search_index import visible_hotels
+
+
+def brute_force_km(lat1, lon1, lat2, lon2):
+    d_lat = radians(lat2 - lat1)
+    d_lon = radians(lon2 - lon1)
+    a = sin(d_lat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
+    return 2 * 6371.0 * asin(sqrt(a))
+
+
+class GeoIndexTests(TestCase):
+
+    def setUp(self):
+        self.city = City.objects.create(name='Mumbai', state='Maharashtra')
+        self.origin = (19.0760, 72.8777)
+        rng = random.Random(7)
+        self.hotels = []
+        for i in range(40):
+            lat = self.origin[0] + rng.uniform(-1.5, 1.5)
+            lng = self.origin[1] + rng.uniform(-1.5, 1.5)
+            self.hotels.append(self._hotel(f'Hotel {i}', lat, lng))
+
+    def _hotel(self, name, lat, lng):
+        return Hotel.objects.create(
+            name=name, description='d', city=self.city, address='a',
+            contact_phone='1', contact_email='h@x.com',
+            latitude=Decimal(f'{lat:.6f}'), longitude=Decimal(f'{lng:.6f}'),
+        )
+
+    def test_document_stores_grid_cell(self):
+        hotel = self.hotels[0]
+        doc = HotelSearchDocument.objects.get(hotel=hotel)
+        self.assertEqual(doc.geo_cell, grid_cell_for(hotel.latitude, hotel.longitude))
+        self.assertIsNone(grid_cell_for(None, 72.8))
+
+    def test_cell_ranges_cover_bounding_box(self):
+        box = bounding_box(*self.origin, 25)
+        ranges = cell_ranges(*box)
+        self.assertGreater(len(ranges), 1)
+        for lat, lng in [(box[0], box[2]), (box[1], box[3]), self.origin]:
+            cell = grid_cell_for(lat, lng)
+            self.assertTrue(any(low <= cell <= high for low, high in ranges))
+        # Each range stays within a single grid row
+        for low, high in ranges:
+            self.assertEqual(low // GRID_COLUMNS, high // GRID_COLUMNS)
+
+    def test_matches_brute_force(self):
+        for radius in (5, 25, 80, 400):
+            expected = sorted(
+                (brute_force_km(*self.origin, float(h.latitude), float(h.longitude)), h.id)
+                for h in self.hotels
+            )
+            expected = [hotel_id for dist, hotel_id in expected if dist <= radius]
+
+            result = nearby_hotels(visible_hotels(), *self.origin, radius)
+
+            self.assertEqual([hotel.id for hotel, _ in result], expected)
+            for hotel, dist in result:
+                self.assertAlmostEqual(
+                    dist, brute_force_km(*self.origin, float(hotel.latitude), float(hotel.longitude)), places=6
+                )
+
+    def test_candidates_exclude_distant_hotels(self):
+        candidates = within_radius_candidates(visible_hotels(), *self.origin, 25).count()
+        self.assertLess(candidates, len(self.hotels))
+
+    def test_distance_search_keeps_exact_match_and_city_center(self):
+        here = self._hotel('Right Here', *self.origin)
+        RoomType.objects.create(hotel=here, name='Std', description='d', base_price=Decimal('1500.00'))
+
+        response = self.client.get('/hotels/api/search-with-distance/', {
+            'city': 'Mumbai', 'user_lat': self.origin[0], 'user_lon': self.origin[1], 'radius': 5,
+        })
+        self.assertEqual(response.status_code, 200)
+        first = response.json()['hotels'][0]
+        self.assertEqual(first['id'], here.id)
+        self.assertEqual(first['distance_km'], 0.0)
+        self.assertEqual(first['min_price'], 1500.0)
+
+        # City, centre, hotels with their lowest room price - not one price query per hotel
+        with self.assertNumQueries(3):
+            response = self.client.get('/hotels/api/search-with-distance/', {'city': 'Mumbai'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], len(self.hotels) + 1)
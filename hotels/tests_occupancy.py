@@ -0,0 +1,151 @@
+"""
+Room-night fact tests
+Incremental facts on booking/block changes, rollup reads and reconciliation against the source tables
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from bookings.models import Booking, HotelBooking
+from core.models import City
+from .models import Hotel, HotelOccupancyRollup, RoomBlock, RoomNightFact, RoomType
+from .occupancy import occupancy_by_hotel, occupancy_totals, reconcile_facts, split_revenue
+from .pricing_service import OccupancyCalculator
+
+
+class RoomNightFactTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+        city = City.objects.create(name='Goa', state='Goa')
+        self.hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+        )
+        self.standard = RoomType.objects.create(
+            hotel=self.hotel, name='Std', description='d', base_price=Decimal('2500.00'), total_rooms=10,
+        )
+        self.suite = RoomType.objects.create(
+            hotel=self.hotel, name='Suite', description='d', base_price=Decimal('8000.00'), total_rooms=2,
+        )
+        self.check_in = date(2031, 1, 30)
+        self.check_out = date(2031, 2, 2)
+
+    def _stay(self, status='reserved', rooms=2, amount='9000.00', room_type=None):
+        booking = Booking.objects.create(
+            user=self.user, booking_type='hotel', status=status, total_amount=Decimal(amount),
+            customer_name='G', customer_email='g@x.com', customer_phone='9',
+        )
+        HotelBooking.objects.create(
+            booking=booking, room_type=room_type or self.standard, check_in=self.check_in,
+            check_out=self.check_out, number_of_rooms=rooms, total_nights=3,
+        )
+        return booking
+
+    def _fact(self, day, room_type=None):
+        return RoomNightFact.objects.get(room_type=room_type or self.standard, date=day)
+
+    def test_confirm_and_cancel_move_sold_nights(self):
+        booking = self._stay()
+        self.assertFalse(RoomNightFact.objects.exists())
+
+        booking.status = 'confirmed'
+        booking.save()
+        self.assertEqual(RoomNightFact.objects.count(), 6)  # every room type of the hotel, 3 nights
+        first = self._fact(self.check_in)
+        self.assertEqual((first.capacity, first.sold, first.arrivals, first.revenue), (10, 2, 1, Decimal('3000.00')))
+        self.assertEqual(self._fact(self.check_in, self.suite).sold, 0)
+
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(sum(RoomNightFact.objects.values_list('sold', flat=True)), 0)
+        self.assertEqual(sum(RoomNightFact.objects.values_list('revenue', flat=True)), 0)
+
+    def test_stay_created_on_confirmed_booking_and_deleted(self):
+        booking = self._stay(status='confirmed')
+        self.assertEqual(self._fact(self.check_in + timedelta(days=1)).sold, 2)
+        booking.delete()
+        self.assertEqual(self._fact(self.check_in + timedelta(days=1)).sold, 0)
+
+    def test_stay_change_moves_nights(self):
+        booking = self._stay(status='confirmed')
+        stay = booking.hotel_details
+        stay.check_out = self.check_out + timedelta(days=1)
+        stay.number_of_rooms = 1
+        stay.save()
+        self.assertEqual(self._fact(self.check_in).sold, 1)
+        self.assertEqual(self._fact(self.check_out).sold, 1)
+
+    def test_repricing_a_sold_booking_moves_revenue(self):
+        booking = self._stay(status='confirmed')
+        booking.total_amount = Decimal('12000.00')
+        booking.save()
+        first = self._fact(self.check_in)
+        self.assertEqual((first.sold, first.arrivals, first.revenue), (2, 1, Decimal('4000.00')))
+        self.assertEqual(sum(RoomNightFact.objects.values_list('revenue', flat=True)), Decimal('12000.00'))
+
+        booking.customer_name = 'Guest'
+        booking.save()
+        self.assertEqual(sum(RoomNightFact.objects.values_list('revenue', flat=True)), Decimal('12000.00'))
+
+    def test_blocks_mark_nights_and_release_on_delete(self):
+        block = RoomBlock.objects.create(room_type=self.suite, blocked_from=self.check_in, blocked_to=self.check_in)
+        self.assertEqual(self._fact(self.check_in, self.suite).blocked, 2)
+        self.assertEqual(self._fact(self.check_in).blocked, 0)
+
+        block.blocked_to = self.check_in + timedelta(days=1)
+        block.save()
+        self.assertEqual(self._fact(self.check_in + timedelta(days=1), self.suite).blocked, 2)
+
+        block.delete()
+        self.assertEqual(sum(RoomNightFact.objects.values_list('blocked', flat=True)), 0)
+
+    def test_rollups_and_reads(self):
+        self._stay(status='confirmed')
+        self._stay(status='confirmed', rooms=1, amount='24000.00', room_type=self.suite)
+
+        day = HotelOccupancyRollup.objects.get(hotel=self.hotel, period='day', period_start=self.check_in)
+        self.assertEqual((day.capacity, day.sold, day.arrivals), (12, 3, 2))
+        january = HotelOccupancyRollup.objects.get(hotel=self.hotel, period='month', period_start=date(2031, 1, 1))
+        self.assertEqual((january.days, january.sold), (2, 6))
+
+        # Whole February from the month row, edges from day rows, untouched nights at full capacity
+        start, end = date(2031, 1, 25), date(2031, 3, 1)
+        with self.assertNumQueries(2):
+            totals = occupancy_by_hotel(start, end, [self.hotel.id])[self.hotel.id]
+        self.assertEqual(totals['capacity'], 12 * (end - start).days)
+        self.assertEqual(totals['sold'], 9)
+        self.assertEqual(totals['revenue'], Decimal('33000.00'))
+        self.assertEqual(totals['arrivals'], 2)
+
+        summary = OccupancyCalculator.get_hotel_occupancy_summary(self.hotel, self.check_in, self.check_out)
+        self.assertEqual(summary['booked_rooms'], 9)
+        self.assertEqual(summary['occupancy_percentage'], 25.0)
+        self.assertAlmostEqual(OccupancyCalculator.calculate_occupancy(self.suite, self.check_in, self.check_out), 50.0)
+        self.assertEqual(occupancy_totals(self.check_in, self.check_out)['occupancy_pct'], 25.0)
+
+    def test_reconcile_repairs_drift(self):
+        self._stay(status='confirmed')
+        RoomBlock.objects.create(room_type=self.suite, blocked_from=self.check_in, blocked_to=self.check_in)
+        start, end = date(2031, 1, 1), date(2031, 3, 1)
+        self.assertEqual(reconcile_facts(start, end)['corrected'], 0)
+
+        RoomNightFact.objects.filter(room_type=self.standard, date=self.check_in).update(sold=7)
+        RoomNightFact.objects.filter(room_type=self.suite).delete()
+        dry = reconcile_facts(start, end, dry_run=True)
+        self.assertEqual((dry['created'], dry['corrected']), (3, 1))
+        self.assertEqual(self._fact(self.check_in).sold, 7)
+
+        call_command('rebuild_room_night_facts', start='2031-01-01', end='2031-03-01', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self._fact(self.check_in).sold, 2)
+        self.assertEqual(self._fact(self.check_in, self.suite).blocked, 2)
+        day = HotelOccupancyRollup.objects.get(hotel=self.hotel, period='day', period_start=self.check_in)
+        self.assertEqual((day.sold, day.blocked), (2, 2))
+
+    def test_split_revenue_keeps_total(self):
+        shares = split_revenue(Decimal('100.00'), 3)
+        self.assertEqual(sum(shares), Decimal('100.00'))
+        self.assertEqual(shares, [Decimal('33.34'), Decimal('33.33'), Decimal('33.33')])
@@ -0,0 +1,106 @@
+"""
+Hotel search index tests
+Document maintenance via signals, visibility rules and amenity bitmask filtering
+"""
+
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import City
+from property_owners.models import Property, PropertyOwner
+from .models import Hotel, HotelSearchDocument, RoomType
+from .search_index import amenity_mask_for, filter_amenities, hotel_amenity_mask, visible_hotels
+
+
+class HotelSearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.city = City.objects.create(name='Goa', state='Goa')
+        self.hotel = self._hotel('Sea View', has_wifi=True, has_pool=True)
+        RoomType.objects.create(hotel=self.hotel, name='Std', description='d', base_price=Decimal('2500.00'))
+        RoomType.objects.create(hotel=self.hotel, name='Suite', description='d', base_price=Decimal('8000.00'))
+
+    def _hotel(self, name, **extra):
+        return Hotel.objects.create(
+            name=name, description='d', city=self.city, address='a',
+            contact_phone='1', contact_email='h@x.com', **extra,
+        )
+
+    def test_document_tracks_room_prices(self):
+        doc = HotelSearchDocument.objects.get(hotel=self.hotel)
+        self.assertTrue(doc.is_visible)
+        self.assertEqual(doc.min_price, Decimal('2500.00'))
+        self.assertEqual(doc.max_price, Decimal('8000.00'))
+
+        self.hotel.room_types.get(name='Std').delete()
+        doc.refresh_from_db()
+        self.assertEqual(doc.min_price, Decimal('8000.00'))
+
+    def test_visibility_follows_active_and_soft_delete(self):
+        self.hotel.is_active = False
+        self.hotel.save()
+        self.assertFalse(visible_hotels().filter(pk=self.hotel.pk).exists())
+
+        self.hotel.is_active = True
+        self.hotel.save()
+        self.assertTrue(visible_hotels().filter(pk=self.hotel.pk).exists())
+
+        self.hotel.soft_delete()
+        self.assertFalse(HotelSearchDocument.objects.get(hotel=self.hotel).is_visible)
+
+    def test_owner_property_approval_controls_visibility(self):
+        user = get_user_model().objects.create_user(email='owner@x.com', username='owner', password='pw')
+        owner = PropertyOwner.objects.create(
+            user=user, business_name='Biz', description='d', owner_name='Owner', owner_phone='9999999999',
+            owner_email='owner@x.com', city=self.city, address='a', pincode='400001',
+        )
+        prop = Property.objects.create(
+            owner=owner, name='Owned', description='d',
+            city=self.city, address='a', contact_phone='1', contact_email='o@x.com',
+            status='PENDING', is_active=True,
+        )
+        self.hotel.owner_property = prop
+        self.hotel.save()
+        self.assertFalse(HotelSearchDocument.objects.get(hotel=self.hotel).is_visible)
+
+        prop.status = 'APPROVED'
+        prop.save()
+        self.assertTrue(HotelSearchDocument.objects.get(hotel=self.hotel).is_visible)
+
+    def test_amenity_mask_filter(self):
+        plain = self._hotel('Plain', has_wifi=True)
+
+        matches = filter_amenities(visible_hotels(), ['has_wifi', 'has_pool'])
+        self.assertEqual(list(matches.values_list('id', flat=True)), [self.hotel.id])
+        self.assertEqual(
+            set(filter_amenities(visible_hotels(), ['has_wifi']).values_list('id', flat=True)),
+            {self.hotel.id, plain.id},
+        )
+        self.assertEqual(HotelSearchDocument.objects.get(hotel=plain).amenity_mask, hotel_amenity_mask(plain))
+        self.assertTrue(hotel_amenity_mask(plain) & amenity_mask_for(['has_wifi']))
+
+    def test_price_max_keeps_hotels_without_room_types(self):
+        bare = self._hotel('Bare')
+        self.assertIsNone(HotelSearchDocument.objects.get(hotel=bare).min_price)
+
+        response = self.client.get(reverse('hotels:hotel_list'), {'price_max': '2000'})
+        self.assertEqual([h.id for h in response.context['hotels']], [bare.id])
+
+    def test_hotel_delete_removes_document(self):
+        self.hotel.delete()
+        self.assertFalse(HotelSearchDocument.objects.exists())
+
+    def test_rebuild_command(self):
+        Hotel.objects.filter(pk=self.hotel.pk).update(star_rating=5)
+        HotelSearchDocument.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+
+        self.assertIn('Rebuilt 1 hotel search documents', out.getvalue())
+        self.assertEqual(HotelSearchDocument.objects.get(hotel=self.hotel).star_rating, 5)
@@ -11,7 +11,7 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.views.decorators.csrf import csrf_exempt
 
 from django.db import DatabaseError
-from django.db.models import Min, Value, FloatField, Q, DecimalField, F
+from django.db.models import Avg, Min, Value, FloatField, Q, DecimalField, F
 
 from django.db.models.functions import Coalesce
 
@@ -25,15 +25,16 @@ from django_filters.rest_framework import DjangoFilterBackend
 
 from decimal import Decimal
 
-from math import radians, sin, cos, asin, sqrt
-
 from django.utils import timezone
 
 import uuid
 
 import logging
 
-from core.utils import get_recent_searches, update_recent_search
+from urllib.parse import quote
+
+from core.image_manifest import attach_gallery_urls, attach_image_urls
+from core.utils import get_city_choices, get_recent_searches, update_recent_search
 
 
 
@@ -203,10 +204,10 @@ from .channel_manager_service import (
 
     InventoryLockError,
 
-    AvailabilityError,
-
     get_hotel_availability_snapshot,
 
+    get_bulk_availability_snapshots,
+
 )
 
 from .models import (
@@ -217,8 +218,6 @@ from .models import (
 
     RoomMealPlan,
 
-    RoomAvailability,
-
     HotelDiscount,
 
     ChannelManagerRoomMapping,
@@ -237,7 +236,14 @@ from .serializers import (
 
 )
 
-from .pricing_service import PricingCalculator, OccupancyCalculator
+from .pricing_service import PricingCalculator, OccupancyCalculator, BatchQuoteEngine, QuoteRequest, quote_lead_room_types
+from .availability import can_sell
+
+from .search_index import filter_amenities, visible_hotels
+
+from .geo_index import haversine_km, nearby_hotels, rank_by_distance
+
+from . import autocomplete
 
 from core.models import City, CorporateDiscount
 
@@ -335,7 +341,7 @@ class HotelSearchView(generics.ListAPIView):
 
     - has_wifi, has_parking, has_pool, has_gym, has_restaurant, has_spa: Boolean filters
 
-    - sort_by: price_asc, price_desc, rating_asc, rating_desc, name
+    - sort_by: price_asc, price_desc, rating_asc, rating_desc, rating_smoothed (Bayesian), rating_recent (time-decayed), name
 
     - page: Page number (default 1)
 
@@ -351,9 +357,15 @@ class HotelSearchView(generics.ListAPIView):
 
     def get_queryset(self):
 
+        # Visibility, prices and amenities are read from the search document
+
         queryset = (
-            Hotel.objects.filter(is_active=True)
-            .filter(Q(owner_property__isnull=True) | Q(owner_property__status='APPROVED', owner_property__is_active=True))
+            visible_hotels()
+            .annotate(
+                min_room_price=Coalesce(F('search_document__min_price'), Value(0, output_field=DecimalField())),
+                max_room_price=Coalesce(F('search_document__max_price'), Value(0, output_field=DecimalField())),
+            )
+            .select_related('city')
             .prefetch_related('room_types', 'images')
         )
 
@@ -371,11 +383,11 @@ class HotelSearchView(generics.ListAPIView):
 
                 cid = int(city_id)
 
-                queryset = queryset.filter(city_id=cid)
+                queryset = queryset.filter(search_document__city_id=cid)
 
             except (ValueError, TypeError):
 
-                queryset = queryset.filter(city__name__iexact=city_id)
+                queryset = queryset.filter(search_document__city__name__iexact=city_id)
 
         
 
@@ -385,7 +397,7 @@ class HotelSearchView(generics.ListAPIView):
 
         if star_rating:
 
-            queryset = queryset.filter(star_rating=int(star_rating))
+            queryset = queryset.filter(search_document__star_rating=int(star_rating))
 
 
 
@@ -395,101 +407,123 @@ class HotelSearchView(generics.ListAPIView):
 
         if property_type:
 
-            queryset = queryset.filter(property_type=property_type)
+            queryset = queryset.filter(search_document__property_type=property_type)
 
         
 
-        # Amenity filters
+        # Amenity filters (single bitmask test)
 
-        if self.request.query_params.get('has_wifi') == 'true':
+        amenity_fields = ['has_wifi', 'has_parking', 'has_pool', 'has_gym', 'has_restaurant', 'has_spa']
 
-            queryset = queryset.filter(has_wifi=True)
+        queryset = filter_amenities(
 
-        if self.request.query_params.get('has_parking') == 'true':
+            queryset,
 
-            queryset = queryset.filter(has_parking=True)
+            [field for field in amenity_fields if self.request.query_params.get(field) == 'true'],
 
-        if self.request.query_params.get('has_pool') == 'true':
+        )
 
-            queryset = queryset.filter(has_pool=True)
+        
 
-        if self.request.query_params.get('has_gym') == 'true':
+        # Price filter (min price of room types)
 
-            queryset = queryset.filter(has_gym=True)
+        min_price = self.request.query_params.get('min_price')
 
-        if self.request.query_params.get('has_restaurant') == 'true':
+        max_price = self.request.query_params.get('max_price')
 
-            queryset = queryset.filter(has_restaurant=True)
+        
+
+        if min_price:
 
-        if self.request.query_params.get('has_spa') == 'true':
+            queryset = queryset.filter(min_room_price__gte=Decimal(min_price))
 
-            queryset = queryset.filter(has_spa=True)
+        if max_price:
+
+            queryset = queryset.filter(min_room_price__lte=Decimal(max_price))
 
         
 
-        # Price filter (min price of room types)
+        # Sorting
 
-        min_price = self.request.query_params.get('min_price')
+        sort_by = self.request.query_params.get('sort_by', 'name')
 
-        max_price = self.request.query_params.get('max_price')
+        if sort_by == 'price_asc':
 
-        
+            queryset = queryset.order_by('min_room_price')
 
-        if min_price or max_price:
+        elif sort_by == 'price_desc':
 
-            queryset = queryset.annotate(
+            queryset = queryset.order_by('-max_room_price')
 
-                min_room_price=Coalesce(Min('room_types__base_price'), Value(0, output_field=DecimalField()))
+        elif sort_by == 'rating_asc':
 
-            )
+            queryset = queryset.order_by('search_document__review_rating')
 
-            if min_price:
+        elif sort_by == 'rating_desc':
 
-                queryset = queryset.filter(min_room_price__gte=Decimal(min_price))
+            queryset = queryset.order_by('-search_document__review_rating')
 
-            if max_price:
+        elif sort_by in ('rating_smoothed', 'rating_recent'):
 
-                queryset = queryset.filter(min_room_price__lte=Decimal(max_price))
+            from reviews.ratings import order_by_score
+
+            queryset = order_by_score(queryset, 'hotel', 'bayesian_score' if sort_by == 'rating_smoothed' else 'decayed_score')
+
+        else:
+
+            queryset = queryset.order_by('search_document__name')
 
         
 
-        # Sorting
+        return queryset
 
-        sort_by = self.request.query_params.get('sort_by', 'name')
+    
 
-        if sort_by == 'price_asc':
+    def paginate_queryset(self, queryset):
 
-            queryset = queryset.annotate(
+        page = super().paginate_queryset(queryset)
 
-                min_room_price=Coalesce(Min('room_types__base_price'), Value(0, output_field=DecimalField()))
+        self.availability_snapshots = {}
 
-            ).order_by('min_room_price')
+        self.stay_quotes = {}
 
-        elif sort_by == 'price_desc':
+        check_in = self.request.query_params.get('check_in')
 
-            queryset = queryset.annotate(
+        check_out = self.request.query_params.get('check_out')
 
-                max_room_price=Coalesce(F('room_types__base_price'), Value(0, output_field=DecimalField()), output_field=DecimalField())
+        if check_in and check_out:
 
-            ).order_by('-max_room_price')
+            # Snapshot only the hotels being serialized, in one batch
 
-        elif sort_by == 'rating_asc':
+            try:
 
-            queryset = queryset.order_by('review_rating')
+                self.availability_snapshots, _ = get_bulk_availability_snapshots(
 
-        elif sort_by == 'rating_desc':
+                    page if page is not None else queryset, check_in, check_out
 
-            queryset = queryset.order_by('-review_rating')
+                )
 
-        else:
+            except Exception:
 
-            queryset = queryset.order_by('name')
+                logger.exception("Bulk availability lookup failed for hotel search")
 
-        
+            try:
 
-        return queryset
+                self.stay_quotes = quote_lead_room_types(
 
-    
+                    page if page is not None else queryset,
+
+                    date.fromisoformat(check_in),
+
+                    date.fromisoformat(check_out),
+
+                )
+
+            except ValueError:
+
+                self.stay_quotes = {}
+
+        return page
 
     def get_serializer_context(self):
 
@@ -499,6 +533,10 @@ class HotelSearchView(generics.ListAPIView):
 
         context['check_out'] = self.request.query_params.get('check_out')
 
+        context['availability_snapshots'] = getattr(self, 'availability_snapshots', {})
+
+        context['stay_quotes'] = getattr(self, 'stay_quotes', {})
+
         return context
 
 
@@ -557,13 +595,13 @@ def calculate_price(request):
 
     try:
 
-        room_type = RoomType.objects.get(id=serializer.validated_data['room_type_id'])
+        room_type = RoomType.objects.select_related('hotel').get(id=serializer.validated_data['room_type_id'])
 
         meal_plan = None
 
         if serializer.validated_data.get('meal_plan_id'):
 
-            meal_plan = RoomMealPlan.objects.get(
+            meal_plan = RoomMealPlan.objects.select_related('meal_plan').get(
 
                 id=serializer.validated_data['meal_plan_id'],
 
@@ -575,11 +613,9 @@ def calculate_price(request):
 
         
 
-        calculator = PricingCalculator(room_type.hotel)
-
-        
+        # Batch engine path: availability and discount load in one query each
 
-        pricing = calculator.calculate_total_price(
+        pricing = BatchQuoteEngine().quote(QuoteRequest(
 
             room_type=room_type,
 
@@ -597,7 +633,7 @@ def calculate_price(request):
 
             hourly_hours=serializer.validated_data.get('hourly_hours')
 
-        )
+        ))
 
         
 
@@ -872,13 +908,13 @@ def hotel_list(request):
 
     # Hotels are independent - no property_owner relationship
 
-    hotels = (
+    # Visibility and min price come from the denormalized search document
 
-        Hotel.objects.filter(is_active=True)
+    hotels = (
 
-        .filter(Q(owner_property__isnull=True) | Q(owner_property__status='APPROVED', owner_property__is_active=True))
+        visible_hotels()
 
-        .annotate(min_price=Coalesce(Min('room_types__base_price'), Value(0, output_field=DecimalField())))
+        .annotate(min_price=Coalesce(F('search_document__min_price'), Value(0, output_field=DecimalField())))
 
         .select_related('city')
 
@@ -886,7 +922,7 @@ def hotel_list(request):
 
     )
 
-    cities = City.objects.all().order_by('name')
+    cities = get_city_choices()
 
     base_hotels_qs = hotels
 
@@ -1016,7 +1052,7 @@ def hotel_list(request):
 
     if star_rating:
 
-        hotels = hotels.filter(star_rating=star_rating)
+        hotels = hotels.filter(search_document__star_rating=star_rating)
 
 
 
@@ -1024,17 +1060,13 @@ def hotel_list(request):
 
     if property_type:
 
-        hotels = hotels.filter(property_type=property_type)
+        hotels = hotels.filter(search_document__property_type=property_type)
 
 
 
-    # Amenity filters
+    # Amenity filters (single bitmask test)
 
-    for field, enabled in amenity_flags.items():
-
-        if enabled:
-
-            hotels = hotels.filter(**{field: True})
+    hotels = filter_amenities(hotels, [field for field, enabled in amenity_flags.items() if enabled])
 
 
 
@@ -1050,11 +1082,11 @@ def hotel_list(request):
 
     elif sort == 'rating_desc':
 
-        hotels = hotels.order_by('-review_rating')
+        hotels = hotels.order_by('-search_document__review_rating')
 
     elif sort == 'rating_asc':
 
-        hotels = hotels.order_by('review_rating')
+        hotels = hotels.order_by('search_document__review_rating')
 
     
 
@@ -1074,41 +1106,19 @@ def hotel_list(request):
 
 
 
-            def haversine_km(lat1, lon1, lat2, lon2):
-
-                R = 6371.0
-
-                d_lat = radians(lat2 - lat1)
-
-                d_lon = radians(lon2 - lon1)
-
-                a = sin(d_lat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
-
-                c = 2 * asin(sqrt(a))
-
-                return R * c
-
-
+            # Grid-cell pre-filter in SQL, exact distances for the candidates only
 
             nearby = []
 
-            for hotel in hotels:
-
-                if hotel.latitude is None or hotel.longitude is None:
-
-                    continue
-
-                distance = haversine_km(float(hotel.latitude), float(hotel.longitude), user_lat, user_lng)
-
-                if distance <= radius:
+            for hotel, distance in nearby_hotels(hotels, user_lat, user_lng, radius):
 
-                    hotel.distance_km = round(distance, 2)
+                hotel.distance_km = round(distance, 2)
 
-                    hotel.is_nearby = True
+                hotel.is_nearby = True
 
-                    nearby.append(hotel)
+                nearby.append(hotel)
 
-            hotels = sorted(nearby, key=lambda h: getattr(h, 'distance_km', 0))
+            hotels = nearby
 
             if not hotels:
 
@@ -1154,36 +1164,43 @@ def hotel_list(request):
 
     if checkin and checkout:
 
-        for hotel in hotels_iterable:
+        # One batched lookup for the whole page instead of a snapshot per hotel
 
-            try:
+        try:
 
-                hotel.availability_snapshot = get_hotel_availability_snapshot(
+            snapshots, availability_errors = get_bulk_availability_snapshots(
 
-                    hotel, checkin, checkout, int(guests or 1)
+                hotels_iterable, checkin, checkout, int(guests or 1)
 
-                )
+            )
 
-                hotel.availability_error = None
+        except Exception:
 
-            except AvailabilityError as exc:
+            snapshots = {}
 
-                hotel.availability_snapshot = None
+            availability_errors = {hotel.id: "Availability temporarily unavailable" for hotel in hotels_iterable}
 
-                hotel.availability_error = str(exc)
+        for hotel in hotels_iterable:
 
-                availability_errors[hotel.id] = str(exc)
+            hotel.availability_snapshot = snapshots.get(hotel.id)
 
-            except Exception:
+            hotel.availability_error = availability_errors.get(hotel.id)
+
+        if not date_error:
+
+            # Whole-stay price for each card's lead room type, priced as one batch
 
-                hotel.availability_snapshot = None
+            stay_quotes = quote_lead_room_types(hotels_iterable, checkin_dt, checkout_dt)
 
-                hotel.availability_error = "Availability temporarily unavailable"
+            for hotel in hotels_iterable:
 
-                availability_errors[hotel.id] = "Availability temporarily unavailable"
+                hotel.stay_quote = stay_quotes.get(hotel.id)
 
 
 
+    # Card images from the image manifest: no storage calls for the page
+    attach_image_urls(hotels_iterable)
+
     combined_error = date_error or near_me_error
 
 
@@ -1322,6 +1339,12 @@ def hotel_detail(request, pk):
 
     hotel = get_object_or_404(hotel_qs, pk=pk, is_active=True)
 
+    # Display and gallery URLs for the hotel and its rooms from the image manifest
+
+    attach_image_urls([hotel, *hotel.room_types.all()])
+
+    attach_gallery_urls([*hotel.images.all(), *(image for rt in hotel.room_types.all() for image in rt.images.all())])
+
     
 
     today = date.today()
@@ -1908,7 +1931,7 @@ def book_hotel(request, pk):
         
         # SPRINT-1 CRITICAL: Inventory + Block validation (internal only)
         from django.db.models import Min
-        from hotels.models import RoomAvailability, RoomBlock, RoomMealPlan
+        from hotels.models import RoomMealPlan
 
         # Parse numeric fields early for availability checks
         try:
@@ -1943,18 +1966,23 @@ def book_hotel(request, pk):
 
         # Availability: internal inventory must have stock for every night
         try:
-            if stay_type == 'hourly':
-                availability_qs = RoomAvailability.objects.filter(
-                    room_type=room_type,
-                    date=checkin,
-                )
-            else:
-                availability_qs = RoomAvailability.objects.filter(
-                    room_type=room_type,
-                    date__gte=checkin,
-                    date__lt=checkout,
-                )
-            availability = availability_qs.aggregate(min_rooms=Min('available_rooms')).get('min_rooms')
+
+            # Counters, owner blocks, holds and bookings in one interval pass
+
+            sell_check = can_sell(
+
+                room_type,
+
+                checkin,
+
+                checkin + timedelta(days=1) if stay_type == 'hourly' else checkout,
+
+                num_rooms,
+
+            )
+
+            availability = sell_check.available
+
         except DatabaseError as exc:
             friendly_error = 'Inventory data not configured for selected dates'
             logger.error(
@@ -1971,7 +1999,7 @@ def book_hotel(request, pk):
             messages.error(request, friendly_error)
             return render(request, 'hotels/hotel_detail.html', {'hotel': hotel, 'error': friendly_error})
 
-        if availability is None or availability < num_rooms:
+        if not sell_check.ok and not sell_check.blocked:
             friendly_error = 'Room not available for selected dates'
             logger.info(
                 "[INVENTORY_UNAVAILABLE] hotel=%s room_type=%s checkin=%s checkout=%s min=%s rooms_requested=%s",
@@ -1985,14 +2013,8 @@ def book_hotel(request, pk):
             return render(request, 'hotels/hotel_detail.html', {'hotel': hotel, 'error': friendly_error})
 
         # Blocks: owner blocks override availability
-        block_exists = RoomBlock.objects.filter(
-            room_type=room_type,
-            is_active=True,
-            blocked_from__lt=checkout,
-            blocked_to__gt=checkin,
-        ).exists()
 
-        if block_exists:
+        if sell_check.blocked:
             friendly_error = 'Room blocked by property owner for the selected dates'
             logger.warning(
                 "[AVAILABILITY_BLOCK] room_type_id=%s check_in=%s check_out=%s",
@@ -2413,7 +2435,11 @@ def book_hotel(request, pk):
 
                 try:
 
-                    ExternalChannelManagerClient(provider=lock.provider).release_lock(lock.lock_id or lock.reference_id)
+                    ExternalChannelManagerClient(provider=lock.provider).release_lock(
+
+                        lock.lock_id or lock.reference_id, room_type_id=lock.room_type_id
+
+                    )
 
                 except InventoryLockError:
 
@@ -2449,19 +2475,9 @@ def calculate_distance(lat1, lon1, lat2, lon2):
 
     try:
 
-        lon1, lat1, lon2, lat2 = map(radians, [float(lon1), float(lat1), float(lon2), float(lat2)])
-
-        dlon = lon2 - lon1
+        km = haversine_km(float(lat1), float(lon1), [float(lat2)], [float(lon2)])[0]
 
-        dlat = lat2 - lat1
-
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-
-        c = 2 * asin(sqrt(a))
-
-        km = 6371 * c
-
-        return round(km, 1)
+        return round(float(km), 1)
 
     except:
 
@@ -2508,150 +2524,49 @@ AREA_MAPPINGS = {
 
 
 @api_view(['GET'])
-
 def search_suggestions(request):
-
     """
-
     FIX-2: Autocomplete suggestions for hotel search
-
     
-
-    Returns: Cities, Areas, and Hotels with property counts
-
+    Returns: Cities, Areas, and Hotels with property counts, ranked by match
+    quality then popularity. Answered from the in-memory autocomplete index
+    (hotels.autocomplete) without database queries.
     Never returns suggestions with zero properties
-
     """
-
-    query = request.query_params.get('q', '').strip().lower()
-
+    query = request.query_params.get('q', '').strip()
     
-
     if len(query) < 1:
-
         return Response({'suggestions': []})
-
     
-
     suggestions = []
-
-    
-
-    # Search Cities
-
-    cities_list = City.objects.filter(
-
-        name__icontains=query
-
-    ).distinct()
-
-    
-
-    for city in cities_list:
-
-        hotel_count = Hotel.objects.filter(city=city, is_active=True).count()
-
-        if hotel_count > 0:
-
+    for _, entry in autocomplete.suggest(query, kinds=(autocomplete.CITY, autocomplete.AREA, autocomplete.HOTEL)):
+        count = entry.count
+        if entry.kind == autocomplete.CITY:
             suggestions.append({
-
                 'type': 'city',
-
-                'id': city.id,
-
-                'name': city.name,
-
-                'count': hotel_count,
-
-                'display': f"{city.name} ({hotel_count} hotel{'s' if hotel_count != 1 else ''})"
-
+                'id': entry.id,
+                'name': entry.name,
+                'count': count,
+                'display': f"{entry.name} ({count} hotel{'s' if count != 1 else ''})"
             })
-
-    
-
-    # Search Areas (sub-regions within cities)
-
-    city_areas_found = set()
-
-    for hotel in Hotel.objects.filter(name__icontains=query, is_active=True).select_related('city'):
-
-        city_name = hotel.city.name
-
-        if city_name in AREA_MAPPINGS:
-
-            for area_name, bounds in AREA_MAPPINGS[city_name].items():
-
-                if (bounds['lat_min'] <= hotel.latitude <= bounds['lat_max'] and
-                    bounds['lon_min'] <= hotel.longitude <= bounds['lon_max']):
-
-                    area_key = (city_name, area_name)
-
-                    if area_key not in city_areas_found:
-
-                        city_areas_found.add(area_key)
-
-                        area_count = Hotel.objects.filter(
-
-                            city__name=city_name,
-
-                            latitude__gte=bounds['lat_min'],
-
-                            latitude__lte=bounds['lat_max'],
-
-                            longitude__gte=bounds['lon_min'],
-
-                            longitude__lte=bounds['lon_max'],
-
-                            is_active=True
-
-                        ).count()
-
-                        if area_count > 0:
-
-                            suggestions.append({
-
-                                'type': 'area',
-
-                                'city': city_name,
-
-                                'name': area_name,
-
-                                'count': area_count,
-
-                                'display': f"{area_name} ({area_count} hotel{'s' if area_count != 1 else ''})"
-
-                            })
-
-    
-
-    # Search Hotels
-
-    hotels = Hotel.objects.filter(name__icontains=query, is_active=True)[:10]
-
-    for hotel in hotels:
-
-        room_count = hotel.room_types.count()
-
-        if room_count > 0:
-
+        elif entry.kind == autocomplete.AREA:
+            suggestions.append({
+                'type': 'area',
+                'city': entry.city,
+                'name': entry.name,
+                'count': count,
+                'display': f"{entry.name} ({count} hotel{'s' if count != 1 else ''})"
+            })
+        elif count > 0:
             suggestions.append({
-
                 'type': 'hotel',
-
-                'id': hotel.id,
-
-                'name': hotel.name,
-
-                'city': hotel.city.name,
-
-                'count': room_count,
-
-                'display': f"{hotel.name}, {hotel.city.name} ({room_count} room{'s' if room_count != 1 else ''})"
-
+                'id': entry.id,
+                'name': entry.name,
+                'city': entry.city,
+                'count': count,
+                'display': f"{entry.name}, {entry.city} ({count} room{'s' if count != 1 else ''})"
             })
-
     
-
     return Response({'suggestions': suggestions})
 
 
@@ -2680,6 +2595,8 @@ def search_with_distance(request):
 
     - radius: Search radius in km (default 50)
 
+    - check_in, check_out: Stay dates (optional, adds availability per hotel)
+
     
 
     Returns: Hotels with distances from user or city center
@@ -2716,15 +2633,19 @@ def search_with_distance(request):
 
     
 
-    # Get hotel queryset
+    # Get hotel queryset (lowest room price annotated, so the response needs no per-hotel query)
+
+    city_hotels = Hotel.objects.filter(city=city, is_active=True).select_related('city').annotate(
+
+        min_price=Min('room_types__base_price')
+
+    )
 
     if area_name and city_name in AREA_MAPPINGS and area_name in AREA_MAPPINGS[city_name]:
 
         bounds = AREA_MAPPINGS[city_name][area_name]
 
-        hotels = Hotel.objects.filter(
-
-            city=city,
+        hotels = city_hotels.filter(
 
             latitude__gte=bounds['lat_min'],
 
@@ -2734,15 +2655,13 @@ def search_with_distance(request):
 
             longitude__lte=bounds['lon_max'],
 
-            is_active=True
-
-        ).prefetch_related('room_types', 'images')
+        )
 
         search_context = f"{area_name}, {city_name}"
 
     else:
 
-        hotels = Hotel.objects.filter(city=city, is_active=True).prefetch_related('room_types', 'images')
+        hotels = city_hotels
 
         search_context = city_name
 
@@ -2758,15 +2677,11 @@ def search_with_distance(request):
 
             user_lat, user_lon = float(user_lat), float(user_lon)
 
-            hotels_with_distance = []
-
-            for hotel in hotels:
+            hotels_with_distance = [
 
-                dist = calculate_distance(user_lat, user_lon, hotel.latitude, hotel.longitude)
+                (hotel, round(dist, 1)) for hotel, dist in nearby_hotels(hotels, user_lat, user_lon, radius)
 
-                if dist and dist <= radius:
-
-                    hotels_with_distance.append((hotel, dist))
+            ]
 
             
 
@@ -2776,15 +2691,11 @@ def search_with_distance(request):
 
                 fallback_used = True
 
-                hotels_with_distance = []
-
-                for hotel in Hotel.objects.filter(city=city, is_active=True).prefetch_related('room_types', 'images'):
+                hotels_with_distance = [
 
-                    dist = calculate_distance(user_lat, user_lon, hotel.latitude, hotel.longitude)
+                    (hotel, round(dist, 1)) for hotel, dist in rank_by_distance(city_hotels, user_lat, user_lon)
 
-                    if dist:
-
-                        hotels_with_distance.append((hotel, dist))
+                ]
 
             
 
@@ -2798,33 +2709,59 @@ def search_with_distance(request):
 
     else:
 
-        # Use city center as reference (simple average)
+        # Use city center as reference (simple average of located hotels)
 
-        city_hotels = Hotel.objects.filter(city=city, is_active=True)
+        center = Hotel.objects.filter(city=city, is_active=True).aggregate(
 
-        if city_hotels.exists():
+            avg_lat=Avg('latitude'), avg_lon=Avg('longitude')
 
-            avg_lat = sum(h.latitude for h in city_hotels) / city_hotels.count()
+        )
 
-            avg_lon = sum(h.longitude for h in city_hotels) / city_hotels.count()
+        hotels = list(hotels)
 
-        else:
+        distances = {}
 
-            avg_lat, avg_lon = city.latitude, city.longitude
+        if center['avg_lat'] is not None and center['avg_lon'] is not None:
 
-        
+            distances = {
 
-        hotels_with_distance = []
+                hotel.id: round(dist, 1)
 
-        for hotel in hotels:
+                for hotel, dist in rank_by_distance(hotels, center['avg_lat'], center['avg_lon'])
 
-            dist = calculate_distance(avg_lat, avg_lon, hotel.latitude, hotel.longitude)
+            }
+
+        
 
-            hotels_with_distance.append((hotel, dist))
+        hotels_with_distance = [(hotel, distances.get(hotel.id)) for hotel in hotels]
 
         
 
-        hotels_with_distance.sort(key=lambda x: (-x[0].star_rating, x[1] if x[1] else 999))
+        hotels_with_distance.sort(key=lambda x: (-x[0].star_rating, x[1] if x[1] is not None else 999))
+
+    
+
+    # Availability for all result hotels in one batch when dates are supplied
+
+    availability_snapshots = {}
+
+    check_in = request.query_params.get('check_in')
+
+    check_out = request.query_params.get('check_out')
+
+    if check_in and check_out:
+
+        try:
+
+            availability_snapshots, _ = get_bulk_availability_snapshots(
+
+                [hotel for hotel, _ in hotels_with_distance], check_in, check_out
+
+            )
+
+        except Exception:
+
+            logger.exception("Bulk availability lookup failed for distance search")
 
     
 
@@ -2834,7 +2771,7 @@ def search_with_distance(request):
 
     for hotel, distance in hotels_with_distance:
 
-        min_price = hotel.room_types.aggregate(min_price=Min('base_price'))['min_price']
+        min_price = hotel.min_price
 
         hotel_list.append({
 
@@ -2856,6 +2793,8 @@ def search_with_distance(request):
 
             'has_parking': hotel.has_parking,
 
+            'availability': availability_snapshots.get(hotel.id),
+
         })
 
     
@@ -2879,121 +2818,45 @@ def search_with_distance(request):
 
 
 def universal_search(request):
-
     """
-
-    Universal search across cities and hotels.
-
-    Matches: City name, Property name
-
-    Returns: JSON response with matching results
-
+    Universal search across cities, hotels and landmarks.
+    Matches: City name, Property name, Address landmarks
+    Returns: JSON response with matching results (from the in-memory autocomplete index)
     """
-
     from django.http import JsonResponse
-
-    from core.models import City
-
     
-
     q = request.GET.get('q', '').strip()
-
     
-
     if not q or len(q) < 1:
-
         return JsonResponse([], safe=False)
-
     
-
     results = []
-
-    
-
-    # Search Cities - clicking redirects to filtered hotel list
-
-    cities = City.objects.filter(name__icontains=q)
-
-    for city in cities:
-
-        hotel_count = Hotel.objects.filter(city=city, is_active=True).count()
-
-        if hotel_count > 0:
-
+    for _, entry in autocomplete.suggest(q, kinds=(autocomplete.CITY, autocomplete.HOTEL, autocomplete.LANDMARK)):
+        if entry.kind == autocomplete.CITY:
+            # Clicking redirects to filtered hotel list
             results.append({
-
                 'type': 'city',
-
-                'id': city.id,
-
-                'label': f"{city.name} ({hotel_count} hotel{'s' if hotel_count != 1 else ''})",
-
-                'name': city.name,
-
-                'url': f"/hotels/?city_id={city.id}"  # Fixed: use city_id parameter for filtering
-
+                'id': entry.id,
+                'label': f"{entry.name} ({entry.count} hotel{'s' if entry.count != 1 else ''})",
+                'name': entry.name,
+                'url': f"/hotels/?city_id={entry.id}"
             })
-
-    
-
-    # Search Hotels
-
-    hotels = Hotel.objects.filter(name__icontains=q, is_active=True)[:10]
-
-    for hotel in hotels:
-
-        results.append({
-
-            'type': 'hotel',
-
-            'id': hotel.id,
-
-            'label': hotel.name,
-
-            'name': hotel.name,
-
-            'city': hotel.city.name,
-
-            'url': f"/hotels/{hotel.id}/"
-
-        })
-
-    
-
-    # Search Areas / Landmarks (based on address substrings)
-
-    area_labels = set()
-
-    area_hotels = Hotel.objects.filter(address__icontains=q, is_active=True)[:10]
-
-    for h in area_hotels:
-
-        label = h.address
-
-        if not label:
-
-            continue
-
-        # Normalize and deduplicate simple area strings
-
-        label_norm = label.strip()
-
-        if label_norm and label_norm.lower() not in area_labels:
-
-            area_labels.add(label_norm.lower())
-
+        elif entry.kind == autocomplete.HOTEL:
+            results.append({
+                'type': 'hotel',
+                'id': entry.id,
+                'label': entry.name,
+                'name': entry.name,
+                'city': entry.city,
+                'url': f"/hotels/{entry.id}/"
+            })
+        else:
             results.append({
-
                 'type': 'area',
-
-                'label': label_norm,
-
-                'url': f"/hotels/?q={q}"
-
+                'label': f"{entry.name}, {entry.city}",
+                'url': f"/hotels/?q={quote(entry.name)}"
             })
-
     
-
     return JsonResponse(results, safe=False)
 
 
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.utils import timezone
+
 from .models import NotificationTemplate, Notification, NotificationPreference
 
 
@@ -20,10 +22,11 @@ class NotificationTemplateAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['recipient', 'notification_type', 'status', 'sent_at', 'created_at']
+    list_display = ['recipient', 'notification_type', 'status', 'attempts', 'sent_at', 'created_at']
     list_filter = ['notification_type', 'status', 'created_at']
     search_fields = ['recipient', 'booking_id', 'payment_id', 'body']
-    readonly_fields = ['created_at', 'updated_at', 'sent_at', 'provider_reference']
+    readonly_fields = ['created_at', 'updated_at', 'sent_at', 'provider_reference', 'payload', 'attempts', 'next_attempt_at', 'claim_token', 'claimed_at']
+    actions = ['requeue']
     fieldsets = (
         ('Recipient Info', {
             'fields': ('user', 'recipient', 'notification_type')
@@ -34,6 +37,10 @@ class NotificationAdmin(admin.ModelAdmin):
         ('Status', {
             'fields': ('status', 'error_message', 'provider_reference', 'sent_at')
         }),
+        ('Outbox', {
+            'fields': ('payload', 'attempts', 'next_attempt_at', 'claim_token', 'claimed_at'),
+            'classes': ('collapse',)
+        }),
         ('References', {
             'fields': ('booking_id', 'payment_id')
         }),
@@ -45,6 +52,13 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def has_add_permission(self, request):
         return False
+    
+    @admin.action(description='Requeue failed / dead-letter notifications')
+    def requeue(self, request, queryset):
+        count = queryset.filter(status__in=['failed', 'dead']).update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), claim_token='', claimed_at=None, error_message='',
+        )
+        self.message_user(request, f'{count} notifications requeued')
 
 
 @admin.register(NotificationPreference)
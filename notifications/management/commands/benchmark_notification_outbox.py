@@ -0,0 +1,68 @@
+"""
+Management command to benchmark the notification outbox against local fake SMTP/SMS sinks.
+Queues --count emails and SMS (booking_id BENCH-<n>), drains them with the outbox worker and
+reports throughput plus how many SMTP connections / MSG91 requests were needed; nothing leaves the machine:
+python manage.py benchmark_notification_outbox [--count 500] [--latency 0.01] [--batch-size 50] [--no-threads] [--keep]
+"""
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from notifications.models import Notification
+from notifications.outbox import OutboxWorker
+from notifications.sinks import FakeSMSServer, FakeSMTPServer, sink_settings
+
+
+class Command(BaseCommand):
+    help = 'Benchmark outbox throughput against local fake SMTP/SMS sinks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Messages per channel')
+        parser.add_argument('--latency', type=float, default=0.005, help='Simulated provider latency per message/request (seconds)')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--no-threads', action='store_true')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        run = f"BENCH-{uuid.uuid4().hex[:8]}"
+        user = get_user_model().objects.filter(is_superuser=True).first() or get_user_model().objects.first()
+        if user is None:
+            self.stderr.write('Create a user first')
+            return
+
+        with FakeSMTPServer(latency=options['latency']) as smtp, FakeSMSServer(latency=options['latency']) as sms:
+            with override_settings(**sink_settings(smtp, sms)):
+                # bulk_create instead of enqueue(): no on_commit wake-up, so an RQ
+                # worker with the real provider settings never picks these rows up
+                Notification.objects.bulk_create([
+                    Notification(
+                        user=user, notification_type=channel, recipient=recipient, subject=run, body='Benchmark',
+                        payload=payload, status='pending', booking_id=run,
+                    )
+                    for index in range(count)
+                    for channel, recipient, payload in (
+                        ('email', f'bench{index}@example.com', {'html': '<p>Benchmark</p>'}),
+                        ('sms', f'9190000{index:05d}', {'template_id': 'sink-template', 'variables': {'message': run}}),
+                    )
+                ], batch_size=500)
+                worker = OutboxWorker(['email', 'sms'], options['batch_size'], threads=not options['no_threads'])
+                report = worker.run_once()
+
+            self.stdout.write(
+                f"  email: {report['channels']['email']['sent']}/{count} sent over "
+                f"{smtp.connections} SMTP connections ({smtp.messages} messages)"
+            )
+            self.stdout.write(
+                f"  sms: {report['channels']['sms']['sent']}/{count} sent in "
+                f"{sms.requests} MSG91 requests ({sms.recipients} recipients)"
+            )
+
+        if not options['keep']:
+            Notification.objects.filter(booking_id=run).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"{report['sent']} messages in {report['seconds']:.2f}s ({report['per_second']:.1f} msgs/sec); "
+            f"{report['retried']} retrying, {report['dead']} dead"
+        ))
@@ -0,0 +1,48 @@
+"""
+Management command to drain the notification outbox (cron, or when no RQ worker runs).
+Sends every due email/SMS/WhatsApp row on a per-channel thread pool, retrying failures with
+backoff and moving permanent failures to the dead-letter status:
+python manage.py process_notification_outbox [--channel email] [--batch-size 50] [--loop --sleep 5] [--no-threads]
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import CHANNELS, OutboxWorker, outbox_lag
+
+
+class Command(BaseCommand):
+    help = 'Send pending notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--channel', choices=CHANNELS, action='append', dest='channels', help='Channel to drain (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows claimed per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep draining until interrupted')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds between runs with --loop')
+        parser.add_argument('--no-threads', action='store_true', help='Drain inline instead of on a thread pool')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(options['channels'], options['batch_size'], threads=not options['no_threads'])
+        try:
+            while True:
+                report = worker.run_once()
+                self._report(report, worker.channels)
+                if not options['loop']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def _report(self, report, channels):
+        for channel, counts in report['channels'].items():
+            if counts['batches']:
+                self.stdout.write(
+                    f"  {channel}: {counts['sent']} sent, {counts['retried']} retrying, "
+                    f"{counts['dead']} dead ({counts['batches']} batches)"
+                )
+        lag = ', '.join(f'{channel} {seconds:.0f}s' for channel, seconds in outbox_lag(channels).items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Sent {report['sent']} ({report['per_second']:.1f}/s), {report['retried']} retrying, "
+            f"{report['dead']} dead, {report['released']} stale claims released, "
+            f"{report['throttled_seconds']:.1f}s rate-limited; lag: {lag}"
+        ))
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(blank=True, help_text='Message kind, e.g. booking_confirmation, reminder', max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['kind', 'booking_id'], name='notif_kind_booking_idx'),
+        ),
+    ]
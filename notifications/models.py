@@ -43,8 +43,10 @@ class Notification(models.Model):
     """Track sent notifications"""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('sending', 'Sending'),
         ('sent', 'Sent'),
         ('failed', 'Failed'),
+        ('dead', 'Dead letter'),
         ('delivered', 'Delivered'),
     ]
     
@@ -70,12 +72,22 @@ class Notification(models.Model):
     # Related booking/payment info
     booking_id = models.CharField(max_length=100, blank=True)
     payment_id = models.CharField(max_length=100, blank=True)
+    kind = models.CharField(max_length=40, blank=True, help_text="Message kind, e.g. booking_confirmation, reminder")
+    
+    # Outbox delivery state (notifications.outbox)
+    payload = models.JSONField(default=dict, blank=True, help_text="Channel extras: html body, SMS template and variables")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True, help_text="Retry not before this time")
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['status', 'notification_type']),
+            models.Index(fields=['status', 'notification_type', 'next_attempt_at'], name='notif_outbox_due_idx'),
+            models.Index(fields=['kind', 'booking_id'], name='notif_kind_booking_idx'),
         ]
     
     def __str__(self):
@@ -0,0 +1,470 @@
+"""
+Notification outbox
+
+Sending used to happen inside the request: render, write the Notification
+row, then block on SMTP, MSG91 and WhatsApp one after another. The outbox
+splits that in two:
+- enqueue() only writes a ``pending`` Notification row, so it commits or
+  rolls back with the caller's transaction (a booking that fails never
+  leaves a confirmation behind)
+- OutboxWorker drains pending rows per channel on a thread pool
+  (NOTIFICATION_OUTBOX_CONCURRENCY), claiming batches with a conditional
+  UPDATE so workers never send the same row twice
+- each worker thread keeps one transport for its whole run: one SMTP
+  connection for every email it sends, one HTTP session and one MSG91 call
+  per batch of recipients sharing a template
+- NOTIFICATION_OUTBOX_RATE_LIMITS caps messages per second per channel
+  (a token bucket shared by that channel's threads) so bulk runs such as
+  reminders stay under provider limits
+- failures are retried with exponential backoff (``next_attempt_at``);
+  permanent errors, or NOTIFICATION_OUTBOX_MAX_ATTEMPTS failures, move the
+  row to the ``dead`` letter status for a person to look at
+
+An RQ job (notifications.tasks.drain_notification_outbox) drains the
+outbox after commit when django-rq is installed; otherwise
+``process_notification_outbox`` runs from cron. send_now() delivers a single row inline for flows that need the
+result straight away (OTP codes).
+"""
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import NamedTuple
+
+import requests
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ('email', 'sms', 'whatsapp')
+
+DEFAULT_CONCURRENCY = {'email': 4, 'sms': 2, 'whatsapp': 2}
+
+
+def max_attempts():
+    return getattr(settings, 'NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def default_batch_size():
+    return getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 50)
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts`` (30s, 60s, 120s, ... capped at an hour by default)."""
+    base = getattr(settings, 'NOTIFICATION_OUTBOX_BACKOFF_SECONDS', 30)
+    cap = getattr(settings, 'NOTIFICATION_OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def claim_timeout():
+    """Rows left in ``sending`` longer than this (a crashed worker) go back to pending."""
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_OUTBOX_CLAIM_TIMEOUT', 600))
+
+
+def channel_concurrency():
+    return {**DEFAULT_CONCURRENCY, **getattr(settings, 'NOTIFICATION_OUTBOX_CONCURRENCY', {})}
+
+
+def rate_limits():
+    """Messages per second per channel; channels not listed are unlimited."""
+    return getattr(settings, 'NOTIFICATION_OUTBOX_RATE_LIMITS', {})
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` messages per second, bursting up to ``burst``; thread-safe."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.clock, self.sleep = clock, sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, count=1):
+        """Block until ``count`` messages may go out; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # A batch larger than the bucket goes out once the bucket is full (tokens go negative)
+                if self.tokens >= min(count, self.capacity):
+                    self.tokens -= count
+                    return waited
+                delay = (min(count, self.capacity) - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+
+# Enqueue
+
+
+def build(channel, recipient, body='', *, user, subject='', html_body='', template=None,
+          template_id='', variables=None, sender='', booking_id='', payment_id='', kind='', dry_run=None):
+    """An unsaved pending Notification (see enqueue() / enqueue_many())."""
+    payload = {
+        key: value for key, value in {
+            'html': html_body, 'template_id': template_id, 'variables': variables, 'sender': sender,
+        }.items() if value
+    }
+    if dry_run is not None:
+        payload['dry_run'] = dry_run
+    return Notification(
+        user=user, notification_type=channel, template=template, recipient=recipient,
+        subject=subject, body=body, payload=payload, status='pending',
+        booking_id=str(booking_id or ''), payment_id=str(payment_id or ''), kind=kind,
+    )
+
+
+def enqueue(channel, recipient, body='', **kwargs):
+    """Write a pending Notification in the caller's transaction; a worker sends it after commit."""
+    notification = build(channel, recipient, body, **kwargs)
+    notification.save()
+    transaction.on_commit(lambda: _wake(channel))
+    return notification
+
+
+def enqueue_many(notifications):
+    """Bulk enqueue() for unsaved rows from build(): batched INSERTs and one wake-up per channel."""
+    if not notifications:
+        return []
+    created = Notification.objects.bulk_create(notifications, batch_size=500)
+    for channel in sorted({notification.notification_type for notification in created}):
+        transaction.on_commit(lambda channel=channel: _wake(channel))
+    return created
+
+
+_no_worker_logged = False
+
+
+def _wake(channel):
+    global _no_worker_logged
+    try:
+        from notifications.tasks import drain_notification_outbox
+    except ImportError:
+        if not _no_worker_logged:
+            _no_worker_logged = True
+            logger.warning('django-rq is not installed; outbox rows wait for process_notification_outbox')
+        return
+    try:
+        drain_notification_outbox.delay(channel)
+    except Exception:
+        logger.warning('Could not queue outbox drain for %s; rows stay pending for the next run', channel, exc_info=True)
+
+
+# Transports
+
+
+class Delivery(NamedTuple):
+    ok: bool
+    reference: str = ''
+    error: str = ''
+    permanent: bool = False
+
+
+def _dry_run(notification, flag):
+    return notification.payload.get('dry_run', getattr(settings, flag, False))
+
+
+class EmailTransport:
+    """Sends over one SMTP connection for the transport's lifetime (reconnecting once if dropped)."""
+    channel = 'email'
+
+    def __init__(self):
+        self.connection = None
+
+    def _open(self):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+        self.connection.open()
+
+    def send(self, notifications):
+        results = {}
+        for notification in notifications:
+            if _dry_run(notification, 'NOTIFICATIONS_EMAIL_DRY_RUN'):
+                results[notification.pk] = Delivery(True, 'dry-run')
+                continue
+            html = notification.payload.get('html', '')
+            message = EmailMultiAlternatives(
+                subject=notification.subject,
+                body=strip_tags(html or notification.body),
+                from_email=notification.payload.get('sender') or settings.DEFAULT_FROM_EMAIL,
+                to=[notification.recipient],
+            )
+            if html:
+                message.attach_alternative(html, 'text/html')
+            results[notification.pk] = self._send_one(message)
+        return results
+
+    def _send_one(self, message, retried=False):
+        try:
+            self._open()
+            message.connection = self.connection
+            self.connection.send_messages([message])
+            return Delivery(True)
+        except smtplib.SMTPServerDisconnected as exc:
+            self.close()
+            if not retried:
+                return self._send_one(message, retried=True)
+            return Delivery(False, error=str(exc))
+        except smtplib.SMTPRecipientsRefused as exc:
+            return Delivery(False, error=str(exc), permanent=True)
+        except Exception as exc:  # noqa: BLE001
+            return Delivery(False, error=str(exc))
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:  # noqa: BLE001
+                pass
+            self.connection = None
+
+
+class MSG91Transport:
+    """One MSG91 flow call per batch of recipients sharing a template, over a reused HTTP session."""
+    channel = 'sms'
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def send(self, notifications):
+        results, groups = {}, defaultdict(list)
+        for notification in notifications:
+            if _dry_run(notification, 'NOTIFICATIONS_SMS_DRY_RUN'):
+                results[notification.pk] = Delivery(True, 'dry-run')
+                continue
+            template_id = notification.payload.get('template_id') or getattr(settings, 'MSG91_DEFAULT_TEMPLATE_ID', '')
+            if not settings.MSG91_AUTHKEY or not template_id:
+                results[notification.pk] = Delivery(False, error='MSG91 credentials/template missing', permanent=True)
+                continue
+            sender = notification.payload.get('sender') or settings.MSG91_SENDER_ID
+            groups[(template_id, sender)].append(notification)
+
+        size = getattr(settings, 'MSG91_BATCH_SIZE', 100)
+        for (template_id, sender), group in groups.items():
+            for start in range(0, len(group), size):
+                chunk = group[start:start + size]
+                delivery = self._post(template_id, sender, chunk)
+                results.update((notification.pk, delivery) for notification in chunk)
+        return results
+
+    def _post(self, template_id, sender, chunk):
+        payload = {
+            'template_id': template_id,
+            'sender': sender,
+            'route': settings.MSG91_ROUTE,
+            'country': settings.MSG91_COUNTRY,
+            'recipients': [
+                {'mobiles': notification.recipient, **notification.payload.get('variables', {})}
+                for notification in chunk
+            ],
+        }
+        headers = {'accept': 'application/json', 'content-type': 'application/json', 'authkey': settings.MSG91_AUTHKEY}
+        try:
+            response = self.session.post(
+                settings.MSG91_BASE_URL, json=payload, headers=headers,
+                timeout=getattr(settings, 'MSG91_TIMEOUT', 10),
+            )
+        except requests.RequestException as exc:
+            return Delivery(False, error=str(exc))
+        if response.status_code in (200, 201, 202):
+            return Delivery(True, response.text[:200])
+        error = f'MSG91 {response.status_code}: {response.text[:200]}'
+        # 4xx is a bad request or credentials: retrying will not help (429 excepted)
+        return Delivery(False, error=error, permanent=400 <= response.status_code < 500 and response.status_code != 429)
+
+    def close(self):
+        self.session.close()
+
+
+class WhatsAppTransport:
+    """Placeholder until a WhatsApp Business API is integrated: rows are marked sent."""
+    channel = 'whatsapp'
+
+    def send(self, notifications):
+        return {notification.pk: Delivery(True) for notification in notifications}
+
+    def close(self):
+        pass
+
+
+TRANSPORTS = {'email': EmailTransport, 'sms': MSG91Transport, 'whatsapp': WhatsAppTransport}
+
+
+# Claiming and recording
+
+
+def due(now=None):
+    return Q(status='pending') & (Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now or timezone.now()))
+
+
+def claim(channel, limit, now=None):
+    """Atomically move up to ``limit`` due rows of one channel to ``sending`` and return them."""
+    now = now or timezone.now()
+    ids = list(
+        Notification.objects.filter(due(now), notification_type=channel)
+        .order_by('created_at', 'pk').values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Notification.objects.filter(pk__in=ids, status='pending').update(status='sending', claim_token=token, claimed_at=now)
+    return list(Notification.objects.filter(claim_token=token, status='sending').order_by('created_at', 'pk'))
+
+
+def release_stale(now=None):
+    now = now or timezone.now()
+    return Notification.objects.filter(status='sending', claimed_at__lt=now - claim_timeout()).update(
+        status='pending', claim_token='',
+    )
+
+
+def record(notifications, results, retry=True, now=None):
+    """Store delivery results. Returns {'sent': n, 'retried': n, 'dead': n, 'failed': n}."""
+    now = now or timezone.now()
+    counts = {'sent': 0, 'retried': 0, 'dead': 0, 'failed': 0}
+    for notification in notifications:
+        delivery = results.get(notification.pk) or Delivery(False, error='No delivery result')
+        notification.attempts += 1
+        notification.claim_token = ''
+        notification.updated_at = now
+        if delivery.ok:
+            notification.status = 'sent'
+            notification.sent_at = now
+            notification.provider_reference = delivery.reference or notification.provider_reference
+            notification.error_message = ''
+            notification.next_attempt_at = None
+        else:
+            notification.error_message = delivery.error
+            if not retry:
+                notification.status = 'failed'
+            elif delivery.permanent or notification.attempts >= max_attempts():
+                notification.status = 'dead'
+            else:
+                notification.status = 'pending'
+                notification.next_attempt_at = now + backoff(notification.attempts)
+        key = {'sent': 'sent', 'pending': 'retried', 'dead': 'dead', 'failed': 'failed'}[notification.status]
+        counts[key] += 1
+    Notification.objects.bulk_update(notifications, [
+        'status', 'attempts', 'claim_token', 'sent_at', 'provider_reference', 'error_message',
+        'next_attempt_at', 'updated_at',
+    ])
+    return counts
+
+
+def send_now(notification):
+    """Deliver one row inline (no retries: a failure is recorded as ``failed``) and return it."""
+    transport = TRANSPORTS[notification.notification_type]()
+    try:
+        results = transport.send([notification])
+    finally:
+        transport.close()
+    record([notification], results, retry=False)
+    if notification.status == 'sent':
+        logger.info('%s sent to %s', notification.notification_type, notification.recipient)
+    else:
+        logger.error('%s to %s failed: %s', notification.notification_type, notification.recipient, notification.error_message)
+    return notification
+
+
+# Worker
+
+
+def outbox_lag(channels=CHANNELS, now=None):
+    """Seconds the oldest due row of each channel has been waiting."""
+    now = now or timezone.now()
+    oldest = dict(
+        Notification.objects.filter(due(now), notification_type__in=channels)
+        .values('notification_type').annotate(oldest=Min('created_at')).values_list('notification_type', 'oldest')
+    )
+    return {channel: (now - oldest[channel]).total_seconds() if channel in oldest else 0.0 for channel in channels}
+
+
+class OutboxWorker:
+    """
+    Drain due rows: NOTIFICATION_OUTBOX_CONCURRENCY threads per channel,
+    each with its own transport, claiming ``batch_size`` rows at a time
+    until nothing is due. ``threads=False`` drains inline (one transport per
+    channel) for tests and single-process cron runs.
+    """
+
+    def __init__(self, channels=None, batch_size=None, concurrency=None, threads=True, rates=None):
+        self.channels = list(channels or CHANNELS)
+        self.batch_size = batch_size or default_batch_size()
+        self.concurrency = {**channel_concurrency(), **(concurrency or {})}
+        self.threads = threads
+        self.limiters = {
+            channel: RateLimiter(rate) for channel, rate in {**rate_limits(), **(rates or {})}.items() if rate
+        }
+
+    def run_once(self):
+        started = time.monotonic()
+        released = release_stale()
+        jobs = [channel for channel in self.channels for _ in range(max(self.concurrency.get(channel, 1), 1))]
+        if self.threads and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='outbox') as pool:
+                reports = list(pool.map(self._drain_thread, jobs))
+        else:
+            reports = [self._drain(channel) for channel in self.channels]
+
+        report = {
+            'sent': 0, 'retried': 0, 'dead': 0, 'failed': 0, 'batches': 0, 'throttled_seconds': 0.0,
+            'released': released, 'channels': {},
+        }
+        for channel, counts in reports:
+            per_channel = report['channels'].setdefault(channel, {'sent': 0, 'retried': 0, 'dead': 0, 'batches': 0})
+            for key in ('sent', 'retried', 'dead', 'batches'):
+                per_channel[key] += counts[key]
+            for key in ('sent', 'retried', 'dead', 'failed', 'batches', 'throttled_seconds'):
+                report[key] += counts[key]
+        report['seconds'] = time.monotonic() - started
+        report['per_second'] = report['sent'] / report['seconds'] if report['seconds'] else 0.0
+        return report
+
+    def _drain_thread(self, channel):
+        try:
+            return self._drain(channel)
+        finally:
+            db_connection.close()
+
+    def _drain(self, channel):
+        counts = {'sent': 0, 'retried': 0, 'dead': 0, 'failed': 0, 'batches': 0, 'throttled_seconds': 0.0}
+        transport = TRANSPORTS[channel]()
+        limiter = self.limiters.get(channel)
+        try:
+            while True:
+                batch = claim(channel, self.batch_size)
+                if not batch:
+                    break
+                if limiter:
+                    counts['throttled_seconds'] += limiter.acquire(len(batch))
+                try:
+                    results = transport.send(batch)
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception('Outbox %s transport failed for a batch of %d', channel, len(batch))
+                    results = {notification.pk: Delivery(False, error=str(exc)) for notification in batch}
+                for key, value in record(batch, results).items():
+                    counts[key] += value
+                counts['batches'] += 1
+        finally:
+            transport.close()
+        return channel, counts
+
+
+def drain(**kwargs):
+    return OutboxWorker(**kwargs).run_once()
@@ -0,0 +1,185 @@
+"""
+Notification resolution cache
+
+Everything a send needs besides the message data is looked up here once
+instead of once per recipient:
+- system_user() memoizes the account that owns notifications sent without a
+  user (OTP to a new phone, guest booking notices) for the process; the old
+  lookup ran up to three user queries plus a get_or_create per send
+- template() precompiles every active NotificationTemplate (and the built-in
+  defaults in notifications.services) into CompiledTemplate render callables;
+  the compiled set is loaded in one query and kept per process for
+  NOTIFICATION_TEMPLATE_CACHE_SECONDS, and dropped as soon as a template is
+  saved or deleted (notifications.signals)
+- file_template() keeps compiled Django file templates (OTP/test emails)
+- preferences_for() loads NotificationPreference rows for a whole batch of
+  users in one query; users without a row get an unsaved default preference
+  instead of one being created inside the send path
+"""
+import string
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.template.loader import get_template
+
+from .models import NotificationPreference, NotificationTemplate
+
+SYSTEM_USERNAME = 'system_notifier'
+
+_lock = threading.Lock()
+_system_user = None
+_templates = None
+_templates_loaded_at = 0.0
+
+
+class CompiledTemplate:
+    """A ``{placeholder}`` subject/body pair parsed once; missing variables render as ''."""
+
+    def __init__(self, subject, body, name='', notification_type=''):
+        self.name = name
+        self.notification_type = notification_type
+        self._subject = self._compile(subject or '')
+        self._body = self._compile(body or '')
+
+    @staticmethod
+    def _compile(text):
+        parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            parts.append((literal, field, spec or '', conversion))
+        return parts
+
+    @staticmethod
+    def _render(parts, context):
+        out = []
+        for literal, field, spec, conversion in parts:
+            out.append(literal)
+            if field is None:
+                continue
+            value = context.get(field, '')
+            if conversion == 'r':
+                value = repr(value)
+            elif conversion == 's':
+                value = str(value)
+            try:
+                out.append(format(value, spec))
+            except (TypeError, ValueError):
+                out.append(str(value))
+        return ''.join(out)
+
+    def render(self, context):
+        """(subject, body) for ``context``."""
+        return self._render(self._subject, context), self._render(self._body, context)
+
+
+# System user
+
+
+def system_user():
+    """The user that owns notifications sent without one, looked up once per process."""
+    global _system_user
+    if _system_user is not None:
+        return _system_user
+    with _lock:
+        if _system_user is None:
+            User = get_user_model()
+            # Prefer an existing superuser, then staff, to avoid creating noise
+            existing = (
+                User.objects.filter(Q(is_superuser=True) | Q(is_staff=True))
+                .order_by('-is_superuser', 'pk').first()
+            )
+            if existing is None:
+                existing, _ = User.objects.get_or_create(
+                    username=SYSTEM_USERNAME,
+                    defaults={
+                        'email': 'alerts.goexplorer+system@gmail.com',
+                        'first_name': 'System',
+                        'last_name': 'Notifier',
+                        'is_staff': True,
+                    },
+                )
+            _system_user = existing
+    return _system_user
+
+
+def resolve_user(user):
+    return user or system_user()
+
+
+def forget_user(user_pk):
+    """Drop the memoized system user if it is ``user_pk`` (it was deleted)."""
+    global _system_user
+    if _system_user is not None and _system_user.pk == user_pk:
+        _system_user = None
+
+
+# Templates
+
+
+def _template_ttl():
+    return getattr(settings, 'NOTIFICATION_TEMPLATE_CACHE_SECONDS', 300)
+
+
+def templates():
+    """{name: CompiledTemplate} for every active NotificationTemplate."""
+    global _templates, _templates_loaded_at
+    compiled = _templates
+    if compiled is not None and time.monotonic() - _templates_loaded_at < _template_ttl():
+        return compiled
+    rows = NotificationTemplate.objects.filter(is_active=True).order_by().values_list('name', 'notification_type', 'subject', 'body')
+    compiled = {name: CompiledTemplate(subject, body, name, kind) for name, kind, subject, body in rows}
+    with _lock:
+        _templates, _templates_loaded_at = compiled, time.monotonic()
+    return compiled
+
+
+def template(name, notification_type=None, default=None):
+    """The compiled admin template ``name`` (for ``notification_type``), else ``default``."""
+    compiled = templates().get(name)
+    if compiled is None or (notification_type and compiled.notification_type != notification_type):
+        return default
+    return compiled
+
+
+@lru_cache(maxsize=64)
+def file_template(template_name):
+    return get_template(template_name)
+
+
+def render_file(template_name, context):
+    """render_to_string() without re-resolving the template on every send."""
+    return file_template(template_name).render(context)
+
+
+def clear_templates():
+    global _templates
+    _templates = None
+    file_template.cache_clear()
+
+
+def reset():
+    """Drop every cached lookup (tests, or after bulk admin changes)."""
+    global _system_user
+    _system_user = None
+    clear_templates()
+
+
+# Preferences
+
+
+def preferences_for(users):
+    """{user id: NotificationPreference} for ``users`` in one query; defaults (unsaved) for users without a row."""
+    user_ids = {getattr(user, 'pk', user) for user in users if user is not None}
+    found = {pref.user_id: pref for pref in NotificationPreference.objects.filter(user_id__in=user_ids)}
+    return {user_id: found.get(user_id) or NotificationPreference(user_id=user_id) for user_id in user_ids}
+
+
+def preference_for(user):
+    """One user's preference row, or unsaved defaults when the user has none."""
+    try:
+        return user.notification_preference
+    except NotificationPreference.DoesNotExist:
+        return NotificationPreference(user=user)
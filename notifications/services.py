@@ -2,18 +2,19 @@
 Notification services for sending emails, WhatsApp, and SMS.
 
 Phase 1 goal: reliable email/SMS infrastructure with env-driven safety.
+Booking/payment notifications are queued in the notification outbox
+(notifications.outbox) and sent by its workers; NotificationService still
+delivers inline for flows that need the result immediately (OTP).
 """
 import logging
 from typing import Any, Dict
 
-import requests
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
 
-from .models import Notification, NotificationTemplate, NotificationPreference
+from . import outbox, resolution
+from .models import Notification
+from .resolution import CompiledTemplate
 
 User = get_user_model()
 
@@ -29,30 +30,8 @@ class NotificationService:
 
     @staticmethod
     def _resolve_user(user: User | None, fallback_email: str | None = None) -> User:
-        """Ensure a user exists for notification logging without requiring OTP/booking flows."""
-        if user:
-            return user
-
-        # Prefer existing staff/superuser to avoid creating noise
-        existing = (
-            User.objects.filter(is_superuser=True).first()
-            or User.objects.filter(is_staff=True).first()
-        )
-        if existing:
-            return existing
-
-        # Create a system notifier user as last resort
-        email_value = fallback_email or "alerts.goexplorer+system@gmail.com"
-        system_user, _ = User.objects.get_or_create(
-            username="system_notifier",
-            defaults={
-                "email": email_value,
-                "first_name": "System",
-                "last_name": "Notifier",
-                "is_staff": True,
-            },
-        )
-        return system_user
+        """Ensure a user exists for notification logging without requiring OTP/booking flows (memoized per process)."""
+        return resolution.resolve_user(user)
 
     @staticmethod
     def send_email(
@@ -64,43 +43,19 @@ class NotificationService:
         user: User | None = None,
         dry_run: bool | None = None,
         sender: str | None = None,
+        queue: bool = False,
     ) -> Notification | None:
         context = context or {}
-        html_body = render_to_string(template, context)
-        text_body = strip_tags(html_body)
-
-        dry_run = settings.NOTIFICATIONS_EMAIL_DRY_RUN if dry_run is None else dry_run
+        html_body = resolution.render_file(template, context)
         resolved_user = NotificationService._resolve_user(user, fallback_email=to)
 
-        notification = Notification.objects.create(
-            user=resolved_user,
-            notification_type="email",
-            recipient=to,
-            subject=subject,
-            body=html_body,
-            status="pending",
+        notification = outbox.enqueue(
+            "email", to, html_body,
+            user=resolved_user, subject=subject, html_body=html_body, sender=sender or "", dry_run=dry_run,
         )
-
-        if dry_run:
-            notification.mark_sent("dry-run")
-            logger.info("[DRY-RUN] Email queued (not sent) to %s", to)
+        if queue:
             return notification
-
-        try:
-            send_mail(
-                subject=subject,
-                message=text_body,
-                from_email=sender or settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[to],
-                html_message=html_body,
-                fail_silently=False,
-            )
-            notification.mark_sent()
-            logger.info("Email sent to %s", to)
-        except Exception as exc:  # noqa: BLE001
-            notification.mark_failed(str(exc))
-            logger.exception("Email send failed to %s", to)
-        return notification
+        return outbox.send_now(notification)
 
     @staticmethod
     def send_sms(
@@ -111,151 +66,189 @@ class NotificationService:
         user: User | None = None,
         dry_run: bool | None = None,
         sender_id: str | None = None,
+        queue: bool = False,
     ) -> Notification | None:
         variables = variables or {}
-        dry_run = settings.NOTIFICATIONS_SMS_DRY_RUN if dry_run is None else dry_run
         resolved_user = NotificationService._resolve_user(user)
-        sender_value = sender_id or settings.MSG91_SENDER_ID
-
-        notification = Notification.objects.create(
-            user=resolved_user,
-            notification_type="sms",
-            recipient=phone,
-            body=f"template={template_id} vars={variables}",
-            status="pending",
-        )
-
-        if dry_run:
-            notification.mark_sent("dry-run")
-            logger.info("[DRY-RUN] SMS queued (not sent) to %s", phone)
-            return notification
 
-        if not settings.MSG91_AUTHKEY or not template_id:
-            error_msg = "MSG91 credentials/template missing"
-            notification.mark_failed(error_msg)
-            logger.error("SMS send aborted for %s: %s", phone, error_msg)
+        notification = outbox.enqueue(
+            "sms", phone, f"template={template_id} vars={variables}",
+            user=resolved_user, template_id=template_id or "", variables=variables,
+            sender=sender_id or "", dry_run=dry_run,
+        )
+        if queue:
             return notification
-
-        payload = {
-            "template_id": template_id,
-            "sender": sender_value,
-            "route": settings.MSG91_ROUTE,
-            "country": settings.MSG91_COUNTRY,
-            "recipients": [
-                {
-                    "mobiles": phone,
-                    **variables,
-                }
-            ],
-        }
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "authkey": settings.MSG91_AUTHKEY,
-        }
-
-        try:
-            response = requests.post(
-                settings.MSG91_BASE_URL,
-                json=payload,
-                headers=headers,
-                timeout=10,
-            )
-            if response.status_code in (200, 201, 202):
-                notification.mark_sent(response.text[:200])
-                logger.info("SMS sent to %s via MSG91", phone)
-            else:
-                error_msg = f"MSG91 {response.status_code}: {response.text[:200]}"
-                notification.mark_failed(error_msg)
-                logger.error("Failed SMS to %s: %s", phone, error_msg)
-        except Exception as exc:  # noqa: BLE001
-            notification.mark_failed(str(exc))
-            logger.exception("Exception while sending SMS to %s", phone)
-
-        return notification
+        return outbox.send_now(notification)
+
+
+# Built-in message texts; an active NotificationTemplate with the same name and
+# channel (admin / setup_notifications) replaces the default for that channel.
+DEFAULT_TEMPLATES = {
+    ('booking_confirmation', 'email'): CompiledTemplate('Booking Confirmation - {booking_id}', """
+Dear {user_name},
+
+Your booking has been confirmed!
+
+Booking Details:
+- Booking ID: {booking_id}
+- Type: {booking_type}
+- Property: {property_name}
+- Date: {booking_date}
+- Price: ₹{price}
+- Status: {status}
+
+Please keep this confirmation for your records.
+
+Thank you for booking with GoExplorer!
+
+Best regards,
+GoExplorer Team
+"""),
+    ('booking_confirmation', 'whatsapp'): CompiledTemplate('', """
+🎉 Booking Confirmed!
+
+Booking ID: {booking_id}
+Property: {property_name}
+Date: {booking_date}
+Price: ₹{price}
+
+Thank you for booking with GoExplorer! 🌍
+"""),
+    ('booking_confirmation', 'sms'): CompiledTemplate(
+        '', 'GoExplorer: Your booking {booking_id} is confirmed! Property: {property_name}. Price: ₹{price}. Ref: www.goexplorer.com',
+    ),
+    ('payment_success', 'email'): CompiledTemplate('Payment Received - {payment_id}', """
+Dear {user_name},
+
+Your payment has been received successfully!
+
+Payment Details:
+- Payment ID: {payment_id}
+- Amount: ₹{amount}
+- Booking: {booking_id}
+- Date: {payment_date}
+- Status: {status}
+
+Thank you!
+
+GoExplorer Team
+"""),
+    ('reminder', 'email'): CompiledTemplate('Booking Reminder - {booking_id}', """
+Dear {user_name},
+
+This is a reminder for your upcoming {booking_type}:
+
+- Booking ID: {booking_id}
+- Property: {property_name}
+- Date: {booking_date}
+- Time: {check_in_time}
+
+Please arrive on time!
+
+GoExplorer Team
+"""),
+    ('reminder', 'whatsapp'): CompiledTemplate(
+        '', '⏰ Reminder: your {booking_type} {booking_id} ({property_name}) is on {booking_date}, {check_in_time}. Have a great trip! 🌍',
+    ),
+    ('reminder', 'sms'): CompiledTemplate(
+        '', 'GoExplorer: Reminder - your {booking_type} {booking_id} ({property_name}) is on {booking_date}, {check_in_time}.',
+    ),
+    ('booking_expired', 'email'): CompiledTemplate('Your GoExplorer booking {booking_id} has expired', """
+Dear {user_name},
+
+Your {booking_type} booking {booking_id} expired due to non-payment and the reservation has been released.
+
+You can book again any time at www.goexplorer.com.
+
+GoExplorer Team
+"""),
+}
+
+# Preference flag per channel for each notification kind (None: always sent)
+KIND_PREFERENCES = {
+    'booking_confirmation': {
+        'email': 'email_booking_confirmation', 'whatsapp': 'whatsapp_booking_confirmation', 'sms': 'sms_booking_confirmation',
+    },
+    'reminder': {'email': 'email_booking_reminder', 'whatsapp': 'whatsapp_booking_reminder', 'sms': 'sms_booking_reminder'},
+    'payment_success': {'email': 'email_payment_updates'},
+    'booking_expired': {'email': None},
+}
+
+CONTEXT_DEFAULTS = {
+    'booking_id': 'N/A', 'payment_id': 'N/A', 'booking_type': 'booking', 'price': '0', 'amount': '0',
+    'status': 'Confirmed', 'check_in_time': 'As per confirmation',
+}
+KIND_DEFAULTS = {
+    'booking_confirmation': {'booking_type': 'Travel'},
+    'payment_success': {'status': 'Completed'},
+}
+
+
+def render_message(kind, channel, context):
+    """(subject, body) for one kind/channel: the admin template when active, else the built-in one."""
+    default = DEFAULT_TEMPLATES[(kind, channel)]
+    return resolution.template(kind, channel, default).render(context)
+
+
+def _context(kind, user, data):
+    return {**CONTEXT_DEFAULTS, **KIND_DEFAULTS.get(kind, {}), 'user_name': user.first_name or user.username, **data}
+
+
+def _recipient(channel, user, preference, data):
+    if channel == 'email':
+        return data.get('email') or user.email
+    if channel == 'whatsapp':
+        return preference.whatsapp_number
+    return preference.phone_number
+
+
+def build_notifications(kind, user, data, preference):
+    """{channel: unsaved Notification} for every channel the user's preference allows."""
+    context = _context(kind, user, data)
+    rows = {}
+    for channel, flag in KIND_PREFERENCES[kind].items():
+        if flag and not getattr(preference, flag):
+            continue
+        recipient = _recipient(channel, user, preference, data)
+        if not recipient:
+            continue
+        subject, body = render_message(kind, channel, context)
+        extras = {}
+        if channel == 'sms':
+            extras = {'template_id': getattr(settings, 'MSG91_DEFAULT_TEMPLATE_ID', ''), 'variables': {'message': body}}
+        rows[channel] = outbox.build(
+            channel, recipient, body, user=user, subject=subject,
+            booking_id=data.get('booking_id', ''), payment_id=data.get('payment_id', ''), kind=kind, **extras,
+        )
+    return rows
 
 
 class EmailService:
     """Send email notifications"""
     
     @staticmethod
-    def send_email(user, subject, body, html_body=None, template=None):
+    def send_email(user, subject, body, html_body=None, template=None, booking_id='', payment_id=''):
         """
-        Send email notification
+        Queue email notification (sent by the outbox worker after commit)
         """
-        try:
-            if html_body is None:
-                html_body = body
-            
-            recipient = user.email
-            if not recipient:
-                logger.warning(f"User {user.id} has no email address")
-                return None
-            
-            # Send email
-            send_mail(
-                subject=subject,
-                message=strip_tags(body),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient],
-                html_message=html_body,
-                fail_silently=False,
-            )
-            
-            # Log notification
-            notification = Notification.objects.create(
-                user=user,
-                notification_type='email',
-                template=template,
-                recipient=recipient,
-                subject=subject,
-                body=body,
-                status='sent'
-            )
-            
-            logger.info(f"Email sent to {recipient} for user {user.id}")
-            return notification
-            
-        except Exception as e:
-            logger.error(f"Failed to send email to {user.email}: {str(e)}")
-            notification = Notification.objects.create(
-                user=user,
-                notification_type='email',
-                template=template,
-                recipient=user.email,
-                subject=subject,
-                body=body,
-                status='failed',
-                error_message=str(e)
-            )
-            return notification
+        recipient = user.email
+        if not recipient:
+            logger.warning(f"User {user.id} has no email address")
+            return None
+        
+        notification = outbox.enqueue(
+            'email', recipient, body,
+            user=user, subject=subject, html_body=html_body or '', template=template,
+            booking_id=booking_id, payment_id=payment_id,
+        )
+        logger.info(f"Email queued to {recipient} for user {user.id}")
+        return notification
     
     @staticmethod
     def send_booking_confirmation(user, booking_data):
         """Send booking confirmation email"""
-        subject = f"Booking Confirmation - {booking_data.get('booking_id', 'N/A')}"
-        body = f"""
-        Dear {user.first_name or user.username},
-        
-        Your booking has been confirmed!
-        
-        Booking Details:
-        - Booking ID: {booking_data.get('booking_id')}
-        - Type: {booking_data.get('booking_type', 'Travel')}
-        - Property: {booking_data.get('property_name')}
-        - Date: {booking_data.get('booking_date')}
-        - Price: ₹{booking_data.get('price', '0')}
-        - Status: {booking_data.get('status', 'Confirmed')}
-        
-        Please keep this confirmation for your records.
-        
-        Thank you for booking with GoExplorer!
-        
-        Best regards,
-        GoExplorer Team
-        """
-        
-        return EmailService.send_email(user, subject, body)
+        subject, body = render_message('booking_confirmation', 'email', _context('booking_confirmation', user, booking_data))
+        return EmailService.send_email(user, subject, body, booking_id=booking_data.get('booking_id', ''))
 
 
 class WhatsAppService:
@@ -267,75 +260,40 @@ class WhatsAppService:
     WHATSAPP_BUSINESS_ID = getattr(settings, 'WHATSAPP_BUSINESS_ID', '')
     
     @staticmethod
-    def send_message(user, phone_number, message_template, template_params=None):
+    def send_message(user, phone_number, message_template, template_params=None, booking_id=''):
         """
-        Send WhatsApp message
+        Queue WhatsApp message (sent by the outbox worker after commit)
         
-        In production, integrate with:
+        In production, integrate with (outbox.WhatsAppTransport):
         - Twilio WhatsApp API
         - Meta WhatsApp Business API
         - Nexmo/Vonage
         """
-        try:
-            if not phone_number:
-                logger.warning(f"User {user.id} has no WhatsApp number")
-                return None
-            
-            # Log notification (actual sending would use WhatsApp API)
-            notification = Notification.objects.create(
-                user=user,
-                notification_type='whatsapp',
-                recipient=phone_number,
-                body=f"Template: {message_template}\n{template_params or ''}",
-                status='pending'
-            )
-            
-            # TODO: Integrate with actual WhatsApp API
-            # For demo, mark as sent
-            notification.status = 'sent'
-            notification.save()
-            
-            logger.info(f"WhatsApp message queued for {phone_number}")
-            return notification
-            
-        except Exception as e:
-            logger.error(f"Failed to send WhatsApp to {phone_number}: {str(e)}")
-            notification = Notification.objects.create(
-                user=user,
-                notification_type='whatsapp',
-                recipient=phone_number,
-                body=message_template,
-                status='failed',
-                error_message=str(e)
-            )
-            return notification
+        if not phone_number:
+            logger.warning(f"User {user.id} has no WhatsApp number")
+            return None
+        
+        notification = outbox.enqueue(
+            'whatsapp', phone_number, f"Template: {message_template}\n{template_params or ''}",
+            user=user, booking_id=booking_id,
+        )
+        logger.info(f"WhatsApp message queued for {phone_number}")
+        return notification
     
     @staticmethod
-    def send_booking_confirmation(user, booking_data):
+    def send_booking_confirmation(user, booking_data, preference=None):
         """Send WhatsApp booking confirmation"""
-        try:
-            preference = user.notification_preference
-            if not preference.whatsapp_booking_confirmation or not preference.whatsapp_number:
-                return None
-        except NotificationPreference.DoesNotExist:
+        preference = preference or resolution.preference_for(user)
+        if not preference.whatsapp_booking_confirmation or not preference.whatsapp_number:
             return None
         
-        message = f"""
-        🎉 Booking Confirmed!
-        
-        Booking ID: {booking_data.get('booking_id')}
-        Property: {booking_data.get('property_name')}
-        Date: {booking_data.get('booking_date')}
-        Price: ₹{booking_data.get('price')}
-        
-        Thank you for booking with GoExplorer! 🌍
-        """
-        
+        _, message = render_message('booking_confirmation', 'whatsapp', _context('booking_confirmation', user, booking_data))
         return WhatsAppService.send_message(
             user, 
             preference.whatsapp_number, 
             'booking_confirmation',
-            message
+            message,
+            booking_id=booking_data.get('booking_id', ''),
         )
 
 
@@ -347,127 +305,72 @@ class SMSService:
     SMS_SENDER_ID = getattr(settings, 'SMS_SENDER_ID', 'GoExplorer')
     
     @staticmethod
-    def send_sms(user, phone_number, message):
+    def send_sms(user, phone_number, message, booking_id=''):
         """
-        Send SMS notification.
+        Queue SMS notification.
 
-        Uses MSG91 templated flow when configured, falls back to dry-run logging otherwise.
+        Sent by the outbox worker through the MSG91 templated flow (batched per
+        template), or marked sent without delivery in dry-run.
         """
-        try:
-            if not phone_number:
-                logger.warning(f"User {user.id} has no phone number")
-                return None
-
-            template_id = getattr(settings, "MSG91_DEFAULT_TEMPLATE_ID", "")
-            variables = {"message": message} if message else {}
-
-            # Use the central service for real delivery/dry-run handling
-            return NotificationService.send_sms(
-                phone=phone_number,
-                template_id=template_id,
-                variables=variables,
-                user=user,
-            )
-
-        except Exception as e:  # noqa: BLE001
-            logger.error(f"Failed to send SMS to {phone_number}: {str(e)}")
-            notification = Notification.objects.create(
-                user=user,
-                notification_type='sms',
-                recipient=phone_number,
-                body=message,
-                status='failed',
-                error_message=str(e)
-            )
-            return notification
+        if not phone_number:
+            logger.warning(f"User {user.id} has no phone number")
+            return None
+
+        template_id = getattr(settings, "MSG91_DEFAULT_TEMPLATE_ID", "")
+        variables = {"message": message} if message else {}
+        return outbox.enqueue(
+            'sms', phone_number, message,
+            user=user, template_id=template_id, variables=variables, booking_id=booking_id,
+        )
     
     @staticmethod
-    def send_booking_confirmation(user, booking_data):
+    def send_booking_confirmation(user, booking_data, preference=None):
         """Send SMS booking confirmation"""
-        try:
-            preference = user.notification_preference
-            if not preference.sms_booking_confirmation or not preference.phone_number:
-                return None
-        except NotificationPreference.DoesNotExist:
+        preference = preference or resolution.preference_for(user)
+        if not preference.sms_booking_confirmation or not preference.phone_number:
             return None
         
-        message = f"GoExplorer: Your booking {booking_data.get('booking_id')} is confirmed! Property: {booking_data.get('property_name')}. Price: ₹{booking_data.get('price')}. Ref: www.goexplorer.com"
-        
-        return SMSService.send_sms(user, preference.phone_number, message)
+        _, message = render_message('booking_confirmation', 'sms', _context('booking_confirmation', user, booking_data))
+        return SMSService.send_sms(user, preference.phone_number, message, booking_id=booking_data.get('booking_id', ''))
 
 
 class NotificationManager:
-    """Unified notification manager"""
+    """Unified notification manager (every channel is queued in the outbox, so callers never wait on a provider)"""
+    
+    @staticmethod
+    def send(kind, user, data, preference=None):
+        """Queue every enabled channel of one notification kind; returns {channel: Notification or None}"""
+        preference = preference or resolution.preference_for(user)
+        rows = build_notifications(kind, user, data, preference)
+        created = dict(zip(rows, outbox.enqueue_many(list(rows.values()))))
+        return {channel: created.get(channel) for channel in KIND_PREFERENCES[kind]}
+    
+    @staticmethod
+    def send_bulk(kind, recipients):
+        """
+        Queue one notification kind for many recipients: [(user, data), ...]
+        (user None: the system notifier, e.g. guest bookings with data['email']).
+        Costs one preference query and a bulk insert per batch, not per recipient.
+        Returns the queued Notification rows.
+        """
+        recipients = [(resolution.resolve_user(user), data) for user, data in recipients]
+        preferences = resolution.preferences_for(user for user, _ in recipients)
+        rows = []
+        for user, data in recipients:
+            rows.extend(build_notifications(kind, user, data, preferences[user.pk]).values())
+        return outbox.enqueue_many(rows)
     
     @staticmethod
     def send_booking_confirmation(user, booking_data):
-        """Send all enabled booking confirmation notifications"""
-        results = {
-            'email': None,
-            'whatsapp': None,
-            'sms': None
-        }
-        
-        try:
-            preference = user.notification_preference
-        except NotificationPreference.DoesNotExist:
-            # Create default preferences
-            preference = NotificationPreference.objects.create(user=user)
-        
-        # Send email
-        if preference.email_booking_confirmation:
-            results['email'] = EmailService.send_booking_confirmation(user, booking_data)
-        
-        # Send WhatsApp
-        if preference.whatsapp_booking_confirmation and preference.whatsapp_number:
-            results['whatsapp'] = WhatsAppService.send_booking_confirmation(user, booking_data)
-        
-        # Send SMS
-        if preference.sms_booking_confirmation and preference.phone_number:
-            results['sms'] = SMSService.send_booking_confirmation(user, booking_data)
-        
-        return results
+        """Queue all enabled booking confirmation notifications (call inside the booking transaction)"""
+        return NotificationManager.send('booking_confirmation', user, booking_data)
     
     @staticmethod
     def send_payment_confirmation(user, payment_data):
         """Send payment confirmation notifications"""
-        subject = f"Payment Received - {payment_data.get('payment_id', 'N/A')}"
-        body = f"""
-        Dear {user.first_name or user.username},
-        
-        Your payment has been received successfully!
-        
-        Payment Details:
-        - Payment ID: {payment_data.get('payment_id')}
-        - Amount: ₹{payment_data.get('amount', '0')}
-        - Booking: {payment_data.get('booking_id')}
-        - Date: {payment_data.get('payment_date')}
-        - Status: {payment_data.get('status', 'Completed')}
-        
-        Thank you!
-        
-        GoExplorer Team
-        """
-        
-        return EmailService.send_email(user, subject, body)
+        return NotificationManager.send('payment_success', user, payment_data)['email']
     
     @staticmethod
     def send_reminder(user, reminder_data):
         """Send booking reminder notification"""
-        subject = f"Booking Reminder - {reminder_data.get('booking_id')}"
-        body = f"""
-        Dear {user.first_name or user.username},
-        
-        This is a reminder for your upcoming {reminder_data.get('booking_type', 'booking')}:
-        
-        - Booking ID: {reminder_data.get('booking_id')}
-        - Property: {reminder_data.get('property_name')}
-        - Date: {reminder_data.get('booking_date')}
-        - Time: {reminder_data.get('check_in_time', 'As per confirmation')}
-        
-        Please arrive on time!
-        
-        GoExplorer Team
-        """
-        
-        return EmailService.send_email(user, subject, body)
+        return NotificationManager.send('reminder', user, reminder_data)['email']
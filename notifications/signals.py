@@ -0,0 +1,21 @@
+"""
+Keep the notification resolution cache (notifications.resolution) in step:
+compiled templates are dropped when a NotificationTemplate changes, and the
+memoized system notifier is forgotten when that user is deleted.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import resolution
+from .models import NotificationTemplate
+
+
+@receiver([post_save, post_delete], sender=NotificationTemplate)
+def clear_compiled_templates(sender, **kwargs):
+    resolution.clear_templates()
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_system_user(sender, instance, **kwargs):
+    resolution.forget_user(instance.pk)
@@ -0,0 +1,175 @@
+"""
+Local fake SMTP and SMS sinks
+
+Offline stand-ins for SendGrid and MSG91 so the outbox can be exercised and
+benchmarked without sending anything:
+- FakeSMTPServer speaks just enough SMTP (EHLO, AUTH PLAIN, MAIL, RCPT,
+  DATA, RSET, NOOP, QUIT) for Django's SMTP backend, counting connections
+  and messages so connection reuse is visible
+- FakeSMSServer accepts MSG91 flow POSTs, counting requests and recipients;
+  ``fail_first`` answers that many requests with a 503 to exercise retries
+- both can add per-message ``latency`` to mimic a slow provider
+
+sink_settings() returns the settings that point EMAIL_* and MSG91_* at a
+running pair of sinks (for override_settings).
+"""
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Sink:
+    """Run a socketserver on a daemon thread; use as a context manager."""
+    server_class = None
+    handler_class = None
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.server = self.server_class((host, port), self.handler_class)
+        self.server.sink = self
+        self.thread = None
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, **increments):
+        with self.lock:
+            for key, value in increments.items():
+                setattr(self, key, getattr(self, key) + value)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        sink = self.server.sink
+        sink.count(connections=1)
+        self.reply('220 fake-smtp ready')
+        recipients = 0
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.wfile.write(b'250-fake-smtp\r\n250-AUTH PLAIN\r\n250 OK\r\n')
+            elif verb == 'AUTH':
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                recipients = 0
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients += 1
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                if sink.latency:
+                    time.sleep(sink.latency)
+                sink.count(messages=1, recipients=recipients)
+                self.reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class FakeSMTPServer(_Sink):
+    server_class = type('_Server', (socketserver.ThreadingTCPServer,), {'daemon_threads': True, 'allow_reuse_address': True})
+    handler_class = _SMTPHandler
+
+    def __init__(self, *args, **kwargs):
+        self.connections = self.messages = self.recipients = 0
+        super().__init__(*args, **kwargs)
+
+
+class _SMSHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        sink = self.server.sink
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with sink.lock:
+            fail = sink.fail_first > 0
+            if fail:
+                sink.fail_first -= 1
+        if fail:
+            status, reply = 503, {'type': 'error', 'message': 'Service unavailable'}
+        else:
+            try:
+                recipients = len(json.loads(body or b'{}').get('recipients', []))
+            except ValueError:
+                recipients = 0
+            if sink.latency:
+                time.sleep(sink.latency)
+            sink.count(requests=1, recipients=recipients)
+            status, reply = 200, {'type': 'success', 'message': f'fake-{sink.requests}'}
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeSMSServer(_Sink):
+    server_class = type('_Server', (ThreadingHTTPServer,), {'daemon_threads': True})
+    handler_class = _SMSHandler
+
+    def __init__(self, *args, fail_first=0, **kwargs):
+        self.requests = self.recipients = 0
+        self.fail_first = fail_first
+        super().__init__(*args, **kwargs)
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}/api/v5/flow/'
+
+
+def sink_settings(smtp=None, sms=None):
+    """Settings that route email and/or SMS to running sinks."""
+    values = {}
+    if smtp is not None:
+        values.update(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST=smtp.host, EMAIL_PORT=smtp.port, EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='sink', EMAIL_HOST_PASSWORD='sink', NOTIFICATIONS_EMAIL_DRY_RUN=False,
+        )
+    if sms is not None:
+        values.update(
+            MSG91_BASE_URL=sms.url, MSG91_AUTHKEY='sink', MSG91_DEFAULT_TEMPLATE_ID='sink-template',
+            NOTIFICATIONS_SMS_DRY_RUN=False,
+        )
+    return values
@@ -0,0 +1,13 @@
+"""
+Background tasks for notifications using django-rq
+"""
+from django_rq import job
+
+
+@job
+def drain_notification_outbox(channel=None):
+    """Send due outbox notifications (one channel, or all); queued after commit by notifications.outbox"""
+    from notifications.outbox import drain
+
+    report = drain(channels=[channel] if channel else None)
+    return {key: report[key] for key in ('sent', 'retried', 'dead')}
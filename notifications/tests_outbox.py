@@ -0,0 +1,124 @@
+"""
+Notification outbox tests
+Transactional enqueue, batched SMTP/MSG91 dispatch against local sinks, retry with backoff and dead-letter
+"""
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import outbox
+from .models import Notification
+from .outbox import OutboxWorker, claim, enqueue, outbox_lag
+from .services import NotificationService, SMSService
+from .sinks import FakeSMSServer, FakeSMTPServer, sink_settings
+
+
+class NotificationOutboxTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+
+    def _drain(self, *channels, **kwargs):
+        return OutboxWorker(channels or None, threads=False, **kwargs).run_once()
+
+    def test_enqueue_rolls_back_with_the_caller(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue('email', 'g@x.com', 'Hi', user=self.user, subject='Booking')
+                raise RuntimeError('booking failed')
+        self.assertFalse(Notification.objects.exists())
+
+        queued = SMSService.send_sms(self.user, '919000000001', 'Confirmed', booking_id='BK-1')
+        self.assertEqual((queued.status, queued.booking_id), ('pending', 'BK-1'))
+        self.assertEqual(queued.payload['variables'], {'message': 'Confirmed'})
+
+    def test_commit_queues_drain_job_or_warns_once_without_worker(self):
+        drain_job = mock.Mock()
+        with mock.patch.dict('sys.modules', {'notifications.tasks': mock.Mock(drain_notification_outbox=drain_job)}):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue('email', 'g@x.com', 'Hi', user=self.user, subject='Booking')
+        drain_job.delay.assert_called_once_with('email')
+
+        # No django-rq: the rows wait for process_notification_outbox, and that is logged once per process
+        with mock.patch.dict('sys.modules', {'notifications.tasks': None}), \
+                mock.patch.object(outbox, '_no_worker_logged', False), \
+                self.assertLogs('notifications.outbox', 'WARNING') as logs:
+            for _ in range(2):
+                with self.captureOnCommitCallbacks(execute=True):
+                    enqueue('email', 'g@x.com', 'Hi', user=self.user, subject='Booking')
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(Notification.objects.filter(status='pending').count(), 3)
+
+    def test_batched_dispatch_reuses_connection_and_groups_recipients(self):
+        for index in range(5):
+            enqueue('email', f'u{index}@x.com', 'Hi', user=self.user, subject='Booking', html_body='<b>Hi</b>')
+            enqueue('sms', f'91900000000{index}', 'Hi', user=self.user, template_id='tpl', variables={'name': 'G'})
+        with FakeSMTPServer() as smtp, FakeSMSServer() as sms, override_settings(**sink_settings(smtp, sms), MSG91_BATCH_SIZE=2):
+            report = self._drain('email', 'sms', batch_size=10)
+
+        self.assertEqual((report['sent'], report['dead'], report['retried']), (10, 0, 0))
+        self.assertEqual((smtp.connections, smtp.messages), (1, 5))
+        self.assertEqual((sms.requests, sms.recipients), (3, 5))
+        self.assertFalse(Notification.objects.exclude(status='sent').exists())
+        self.assertEqual(outbox_lag(), {'email': 0.0, 'sms': 0.0, 'whatsapp': 0.0})
+
+    def test_transient_failures_back_off_then_succeed(self):
+        row = enqueue('sms', '919000000001', 'Hi', user=self.user, template_id='tpl')
+        with FakeSMSServer(fail_first=1) as sms, override_settings(**sink_settings(sms=sms)):
+            report = self._drain('sms')
+            row.refresh_from_db()
+            self.assertEqual((report['retried'], row.status, row.attempts), (1, 'pending', 1))
+            self.assertIn('MSG91 503', row.error_message)
+            self.assertGreater(row.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+            self.assertEqual(self._drain('sms')['sent'], 0)
+            Notification.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(self._drain('sms')['sent'], 1)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.error_message), ('sent', 2, ''))
+
+    @override_settings(NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2, NOTIFICATIONS_SMS_DRY_RUN=False, MSG91_AUTHKEY='')
+    def test_permanent_or_exhausted_failures_are_dead_lettered(self):
+        permanent = enqueue('sms', '919000000001', 'Hi', user=self.user, template_id='tpl')
+        self._drain('sms')
+        permanent.refresh_from_db()
+        self.assertEqual((permanent.status, permanent.attempts), ('dead', 1))
+
+        flaky = enqueue('email', 'g@x.com', 'Hi', user=self.user, subject='Booking')
+        with override_settings(NOTIFICATIONS_EMAIL_DRY_RUN=False, EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=1, EMAIL_USE_TLS=False, EMAIL_TIMEOUT=1):
+            for _ in range(2):
+                self._drain('email')
+                Notification.objects.filter(pk=flaky.pk, status='pending').update(next_attempt_at=None)
+        flaky.refresh_from_db()
+        self.assertEqual((flaky.status, flaky.attempts), ('dead', 2))
+
+        out = io.StringIO()
+        call_command('process_notification_outbox', no_threads=True, stdout=out)
+        self.assertIn('Sent 0', out.getvalue())
+
+    def test_claimed_rows_are_not_claimed_twice(self):
+        for index in range(3):
+            enqueue('email', f'u{index}@x.com', 'Hi', user=self.user, subject='Booking')
+        first = claim('email', 2)
+        second = claim('email', 5)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({row.pk for row in first} & {row.pk for row in second})
+        self.assertEqual(claim('email', 5), [])
+
+    def test_send_now_keeps_inline_otp_semantics(self):
+        dry = NotificationService.send_sms('919000000001', 'otp-tpl', {'otp': '1234'}, dry_run=True)
+        self.assertEqual((dry.status, dry.provider_reference), ('sent', 'dry-run'))
+
+        with FakeSMTPServer() as smtp, override_settings(**sink_settings(smtp=smtp)):
+            sent = NotificationService.send_email(
+                'g@x.com', 'Your code', 'notifications/email/test_email.html', {'message': 'x'}, user=self.user,
+            )
+        self.assertEqual((sent.status, sent.attempts, smtp.messages), ('sent', 1, 1))
@@ -0,0 +1,69 @@
+"""
+Notification resolution cache tests
+Compiled templates, batched preference loading and the memoized system notifier user
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from . import resolution
+from .models import Notification, NotificationPreference, NotificationTemplate
+from .resolution import CompiledTemplate
+from .services import NotificationManager, render_message
+
+User = get_user_model()
+
+
+class NotificationResolutionTests(TestCase):
+
+    def setUp(self):
+        resolution.reset()
+        self.addCleanup(resolution.reset)
+
+    def _users(self, count, start=0):
+        users = [User.objects.create_user(username=f'u{start + i}', email=f'u{start + i}@x.com') for i in range(count)]
+        NotificationPreference.objects.create(user=users[0], sms_booking_reminder=True, phone_number='919000000001')
+        return users
+
+    def test_compiled_template_renders_and_admin_override_invalidates(self):
+        compiled = CompiledTemplate('Hi {user_name}', 'Total {price:>6} for {booking_id!r}{missing}')
+        self.assertEqual(compiled.render({'user_name': 'A', 'price': '90', 'booking_id': 'B1'}), ('Hi A', 'Total     90 for \'B1\''))
+
+        context = {'user_name': 'A', 'booking_id': 'B1', 'booking_type': 'Hotel', 'property_name': 'Sea View'}
+        self.assertIn('Sea View', render_message('reminder', 'email', context)[1])
+        with self.assertNumQueries(0):
+            render_message('reminder', 'email', context)
+
+        NotificationTemplate.objects.create(name='reminder', notification_type='email', subject='Soon: {booking_id}', body='See you at {property_name}')
+        self.assertEqual(render_message('reminder', 'email', context), ('Soon: B1', 'See you at Sea View'))
+        # An email template does not replace the SMS text
+        self.assertIn('GoExplorer: Reminder', render_message('reminder', 'sms', context)[1])
+
+    def test_system_user_is_memoized(self):
+        first = resolution.system_user()
+        self.assertEqual(first.username, resolution.SYSTEM_USERNAME)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolution.resolve_user(None), first)
+        first.delete()
+        self.assertNotEqual(resolution.system_user().pk, first.pk)
+
+    def test_bulk_send_costs_constant_queries(self):
+        small, large = self._users(2), self._users(20, start=10)
+        NotificationManager.send_bulk('reminder', [(user, {'booking_id': 'WARM'}) for user in small])
+        Notification.objects.all().delete()
+
+        with self.assertNumQueries(2):
+            NotificationManager.send_bulk('reminder', [(user, {'booking_id': f'B{user.pk}'}) for user in small])
+        with self.assertNumQueries(2):
+            rows = NotificationManager.send_bulk('reminder', [(user, {'booking_id': f'B{user.pk}'}) for user in large])
+
+        self.assertEqual(len(rows), 21)
+        sms = Notification.objects.get(notification_type='sms', user=large[0])
+        self.assertEqual(sms.payload['variables']['message'], sms.body)
+        self.assertEqual(Notification.objects.filter(booking_id=f'B{large[5].pk}').count(), 1)
+
+    def test_missing_preference_uses_defaults_without_creating_one(self):
+        user = User.objects.create_user(username='guest', email='g@x.com')
+        results = NotificationManager.send_booking_confirmation(user, {'booking_id': 'BK-9', 'property_name': 'Sea View'})
+        self.assertEqual((results['whatsapp'], results['sms']), (None, None))
+        self.assertIn('Type: Travel', results['email'].body)
+        self.assertFalse(NotificationPreference.objects.filter(user=user).exists())
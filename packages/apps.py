@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PackagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'packages'
+
+    def ready(self):
+        """Register signals when app is ready"""
+        import packages.signals  # noqa
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0004_package_itinerary_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='packagedeparture',
+            index=models.Index(fields=['departure_date'], name='pkgdeparture_date_idx'),
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from django.core.files.storage import default_storage
 from django.templatetags.static import static
-from core.models import TimeStampedModel, City
+from core.models import ResponsiveImageMixin, TimeStampedModel, City
 from core.soft_delete import SoftDeleteMixin, SoftDeleteManager, AllObjectsManager
 
 
@@ -85,20 +85,21 @@ class Package(SoftDeleteMixin, TimeStampedModel):
 
     @property
     def primary_image_url(self):
-        image = self.get_primary_image()
-        if self._image_exists(image):
-            try:
-                return image.url
-            except Exception:
-                return ''
-        return ''
+        from core.image_manifest import display_url
+        return display_url(self)
 
     @property
     def display_image_url(self):
         return self.primary_image_url or static('images/package_placeholder.svg')
 
+    @property
+    def image_variants(self):
+        """WebP/JPEG srcsets and card URL of the display image ({} until derivatives exist)."""
+        from core.image_manifest import display_variants
+        return display_variants(self)
+
 
-class PackageImage(models.Model):
+class PackageImage(ResponsiveImageMixin, models.Model):
     """Additional images for packages"""
     package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='packages/gallery/')
@@ -160,6 +161,9 @@ class PackageDeparture(TimeStampedModel):
     class Meta:
         ordering = ['departure_date']
         unique_together = ['package', 'departure_date']
+        indexes = [
+            models.Index(fields=['departure_date'], name='pkgdeparture_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.package.name} - {self.departure_date}"
@@ -0,0 +1,29 @@
+"""
+Signals for Packages app - keep the image manifest in sync with package images
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.image_manifest import gallery_image_changed, owner_deleted, owner_saved, owner_saving
+from .models import Package, PackageImage
+
+
+@receiver(pre_save, sender=Package)
+def remember_package_image(sender, instance, **kwargs):
+    owner_saving(instance, **kwargs)
+
+
+@receiver(post_save, sender=Package)
+def refresh_package_image_manifest(sender, instance, **kwargs):
+    owner_saved(instance, **kwargs)
+
+
+@receiver(post_delete, sender=Package)
+def forget_package_image_manifest(sender, instance, **kwargs):
+    owner_deleted(instance, **kwargs)
+
+
+@receiver(post_save, sender=PackageImage)
+@receiver(post_delete, sender=PackageImage)
+def refresh_package_gallery_manifest(sender, instance, **kwargs):
+    gallery_image_changed(instance, 'package', **kwargs)
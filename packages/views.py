@@ -14,6 +14,7 @@ from .models import Package, PackageDeparture
 from core.models import CorporateDiscount
 from bookings.models import Booking
 from .serializers import PackageListSerializer, PackageDetailSerializer
+from core.image_manifest import attach_image_urls
 from core.utils import update_recent_search, get_recent_searches
 
 
@@ -57,7 +58,7 @@ def package_list(request):
         )
 
     context = {
-        'packages': packages.order_by('-created_at'),
+        'packages': attach_image_urls(packages.order_by('-created_at')),
         'search_destination': search_destination,
         'min_price': min_price,
         'max_price': max_price,
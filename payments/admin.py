@@ -70,7 +70,7 @@ class InvoiceAdmin(admin.ModelAdmin):
     list_display = ['invoice_number', 'booking', 'billing_name', 'total_amount', 'invoice_date']
     list_filter = ['invoice_date']
     search_fields = ['invoice_number', 'booking__booking_id', 'billing_name', 'billing_email']
-    readonly_fields = ['invoice_number', 'invoice_date']
+    readonly_fields = ['invoice_number', 'invoice_date', 'document_hash']
     
     fieldsets = (
         ('Invoice Details', {
@@ -85,18 +85,18 @@ class InvoiceAdmin(admin.ModelAdmin):
         ('Tax Details', {
             'fields': ('cgst', 'sgst', 'igst')
         }),
-        ('PDF', {
-            'fields': ('pdf_file',)
+        ('Document', {
+            'fields': ('pdf_file', 'document_hash')
         }),
     )
 
 
 @admin.register(Wallet)
 class WalletAdmin(admin.ModelAdmin):
-    list_display = ['user', 'balance', 'currency', 'is_active', 'created_at']
+    list_display = ['user', 'balance', 'cashback_available', 'currency', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['user__username', 'user__email']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['cashback_available', 'cashback_next_expiry', 'created_at', 'updated_at']
     
     fieldsets = (
         ('User', {
@@ -105,6 +105,9 @@ class WalletAdmin(admin.ModelAdmin):
         ('Balance', {
             'fields': ('balance', 'currency', 'is_active')
         }),
+        ('Cashback', {
+            'fields': ('cashback_available', 'cashback_next_expiry')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at')
         }),
@@ -159,7 +162,11 @@ class CashbackLedgerAdmin(admin.ModelAdmin):
     
     def expire_selected_cashback(self, request, queryset):
         """Manually expire selected cashback entries"""
+        from .cashback import refresh
         now = timezone.now()
+        wallet_ids = set(queryset.filter(is_expired=False, is_used=False).values_list('wallet_id', flat=True))
         count = queryset.filter(is_expired=False, is_used=False).update(is_expired=True, expired_on=now)
+        for wallet_id in wallet_ids:
+            refresh(wallet_id)
         self.message_user(request, f"{count} cashback entries marked as expired.")
     expire_selected_cashback.short_description = "Expire selected cashback"
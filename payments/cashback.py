@@ -0,0 +1,193 @@
+"""
+Materialized wallet cashback
+
+Wallet.cashback_available and Wallet.cashback_next_expiry mirror the
+CashbackLedger so balance reads are a single-row lookup instead of a SUM
+over the ledger on every checkout render:
+- cashback_available is the unused remainder (amount - used_amount) of
+  every active, unexpired entry
+- cashback_next_expiry is the earliest expires_at among those entries; once
+  it has passed the materialized total is stale until expire_stale() (or
+  the lazy refresh in Wallet.get_available_balance) catches up
+
+Every change goes through this module inside a transaction that holds the
+wallet row lock: credit() adds an entry, CashbackAllocator drains entries
+FIFO by expiry (locking only the entries it takes from, partially using the
+last one), and expire_stale() expires entries wallet by wallet.
+check_consistency() compares the materialized values with the ledger
+(``check_wallet_cashback`` runs it, optionally fixing drift).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Min, Sum
+from django.utils import timezone
+
+from .models import CashbackLedger, Wallet
+
+ZERO = Decimal('0.00')
+
+REMAINING = ExpressionWrapper(F('amount') - F('used_amount'), output_field=DecimalField(max_digits=10, decimal_places=2))
+
+
+def active_entries(wallet_id, now=None):
+    return CashbackLedger.objects.filter(
+        wallet_id=wallet_id, is_used=False, is_expired=False, expires_at__gt=now or timezone.now(),
+    )
+
+
+def ledger_state(wallet_id, now=None):
+    """(available, next_expiry) recomputed from the ledger."""
+    totals = active_entries(wallet_id, now).aggregate(available=Sum(REMAINING), next_expiry=Min('expires_at'))
+    return (totals['available'] or ZERO).quantize(ZERO), totals['next_expiry']
+
+
+def _store(wallet, available, next_expiry):
+    wallet.cashback_available = available
+    wallet.cashback_next_expiry = next_expiry
+    Wallet.objects.filter(pk=wallet.pk).update(
+        cashback_available=available, cashback_next_expiry=next_expiry, updated_at=timezone.now(),
+    )
+
+
+def _lock(wallet):
+    return Wallet.objects.select_for_update().get(pk=wallet.pk if isinstance(wallet, Wallet) else wallet)
+
+
+def refresh(wallet, now=None):
+    """Recompute one wallet's materialized cashback from its ledger (under the wallet lock)."""
+    with transaction.atomic():
+        locked = _lock(wallet)
+        _store(locked, *ledger_state(locked.pk, now))
+    if isinstance(wallet, Wallet) and wallet is not locked:
+        wallet.cashback_available, wallet.cashback_next_expiry = locked.cashback_available, locked.cashback_next_expiry
+    return locked
+
+
+def credit(wallet, amount, booking=None, description='', validity_days=365):
+    """Add a cashback entry and raise the wallet's available total."""
+    amount = Decimal(str(amount))
+    with transaction.atomic():
+        locked = _lock(wallet)
+        entry = CashbackLedger.objects.create(
+            wallet=locked, booking=booking, amount=amount,
+            expires_at=timezone.now() + timedelta(days=validity_days), description=description,
+        )
+        next_expiry = min(filter(None, [locked.cashback_next_expiry, entry.expires_at]))
+        _store(locked, locked.cashback_available + amount, next_expiry)
+    wallet.cashback_available, wallet.cashback_next_expiry = locked.cashback_available, locked.cashback_next_expiry
+    return entry
+
+
+class CashbackAllocator:
+    """
+    Drain a wallet's cashback FIFO by expiry. Call inside a transaction that
+    already holds (or lets the allocator take) the wallet row lock; every
+    ledger writer takes that lock first, so the entries chosen from an
+    unlocked read cannot change before they are locked.
+    """
+
+    def __init__(self, wallet):
+        self.wallet = wallet
+
+    def plan(self, amount, now=None):
+        """[(entry id, amount to take), ...] covering ``amount``, oldest expiry first."""
+        remaining, plan = Decimal(str(amount)), []
+        rows = active_entries(self.wallet.pk, now).order_by('expires_at', 'pk').values_list('pk', 'amount', 'used_amount')
+        for pk, entry_amount, used in rows.iterator(chunk_size=50):
+            if remaining <= 0:
+                break
+            take = min(entry_amount - used, remaining)
+            plan.append((pk, take))
+            remaining -= take
+        return plan, remaining
+
+    def allocate(self, amount, now=None):
+        """Use ``amount`` of cashback; returns the entries drained. Raises ValueError when short."""
+        amount = Decimal(str(amount))
+        if amount <= 0:
+            return []
+        now = now or timezone.now()
+        with transaction.atomic():
+            wallet = _lock(self.wallet)
+            if wallet.cashback_next_expiry and wallet.cashback_next_expiry <= now:
+                expire_wallet(wallet, now)
+            if wallet.cashback_available < amount:
+                raise ValueError('Insufficient cashback balance')
+            plan, short = self.plan(amount, now)
+            if short > 0:
+                raise ValueError('Cashback balance changed during processing')
+
+            takes = dict(plan)
+            entries = list(
+                CashbackLedger.objects.select_for_update().filter(pk__in=list(takes)).order_by('expires_at', 'pk')
+            )
+            for entry in entries:
+                entry.used_amount += takes[entry.pk]
+                entry.used_on = now
+                entry.is_used = entry.used_amount >= entry.amount
+                entry.updated_at = now
+            CashbackLedger.objects.bulk_update(entries, ['used_amount', 'used_on', 'is_used', 'updated_at'])
+
+            next_expiry = wallet.cashback_next_expiry
+            if entries and entries[0].expires_at == next_expiry and entries[0].is_used:
+                # The soonest entry is gone; the next one is wherever the ledger says
+                next_expiry = active_entries(wallet.pk, now).aggregate(next_expiry=Min('expires_at'))['next_expiry']
+            _store(wallet, wallet.cashback_available - amount, next_expiry)
+        self.wallet.cashback_available, self.wallet.cashback_next_expiry = wallet.cashback_available, wallet.cashback_next_expiry
+        return entries
+
+
+def expire_wallet(wallet, now=None):
+    """Expire one wallet's stale entries and lower its total. Returns the number of entries expired."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        locked = _lock(wallet)
+        count = CashbackLedger.objects.filter(
+            wallet_id=locked.pk, is_used=False, is_expired=False, expires_at__lte=now,
+        ).update(is_expired=True, expired_on=now, updated_at=now)
+        _store(locked, *ledger_state(locked.pk, now))
+    if isinstance(wallet, Wallet) and wallet is not locked:
+        wallet.cashback_available, wallet.cashback_next_expiry = locked.cashback_available, locked.cashback_next_expiry
+    return count
+
+
+def expire_stale(now=None):
+    """Expire every entry past its expiry, wallet by wallet. Returns the number of entries expired."""
+    now = now or timezone.now()
+    wallet_ids = set(Wallet.objects.filter(cashback_next_expiry__lte=now).values_list('pk', flat=True))
+    # Also wallets whose materialized expiry drifted (e.g. entries edited in admin)
+    wallet_ids.update(
+        CashbackLedger.objects.filter(is_used=False, is_expired=False, expires_at__lte=now).values_list('wallet_id', flat=True)
+    )
+    return sum(expire_wallet(wallet_id, now) for wallet_id in sorted(wallet_ids))
+
+
+def check_consistency(wallets=None, fix=False, now=None):
+    """
+    Compare materialized cashback with the ledger for ``wallets`` (default:
+    all). Returns [{'wallet', 'stored', 'ledger', 'stored_expiry', 'ledger_expiry'}]
+    for every mismatch, refreshing them when ``fix`` is set.
+    """
+    now = now or timezone.now()
+    queryset = Wallet.objects.all() if wallets is None else Wallet.objects.filter(pk__in=[getattr(w, 'pk', w) for w in wallets])
+    ledger = {
+        row['wallet_id']: row
+        for row in CashbackLedger.objects.filter(
+            wallet__in=queryset, is_used=False, is_expired=False, expires_at__gt=now,
+        ).values('wallet_id').annotate(available=Sum(REMAINING), next_expiry=Min('expires_at')).order_by()
+    }
+    mismatches = []
+    for wallet in queryset.only('pk', 'cashback_available', 'cashback_next_expiry').order_by('pk').iterator():
+        row = ledger.get(wallet.pk, {})
+        available = (row.get('available') or ZERO).quantize(ZERO)
+        next_expiry = row.get('next_expiry')
+        if wallet.cashback_available != available or wallet.cashback_next_expiry != next_expiry:
+            mismatches.append({
+                'wallet': wallet.pk, 'stored': wallet.cashback_available, 'ledger': available,
+                'stored_expiry': wallet.cashback_next_expiry, 'ledger_expiry': next_expiry,
+            })
+            if fix:
+                refresh(wallet.pk, now)
+    return mismatches
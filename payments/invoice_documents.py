@@ -0,0 +1,272 @@
+"""
+Invoice documents
+
+Rendered invoice documents are produced once and served from storage:
+- an invoice is rendered from its immutable snapshot with
+  ``payments/invoice_document.html``, as HTML or, when
+  INVOICE_DOCUMENT_FORMAT = 'pdf' and WeasyPrint is installed, as PDF
+- documents are content addressed
+  (``invoices/documents/<hash prefix>/<sha256>.<ext>``): identical bytes are
+  stored once, and Invoice.pdf_file/document_hash point at the stored copy,
+  so repeat downloads never render again
+- generate() is the bulk path for month-end runs: it creates missing
+  invoices for confirmed bookings in batches (bulk_create, joins fetched up
+  front) and renders documents in parallel worker processes; workers only
+  render and hash, while database and storage writes stay in the calling
+  process (generate_invoices command, benchmark_invoice_generation)
+"""
+import hashlib
+import logging
+import multiprocessing
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from bookings.models import Booking
+from .models import Invoice, Payment
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME = 'payments/invoice_document.html'
+
+DOCUMENT_PREFIX = 'invoices/documents'
+
+GENERATE_BATCH_SIZE = 200
+
+# format -> (content type, file extension)
+FORMATS = {
+    'html': ('text/html; charset=utf-8', 'html'),
+    'pdf': ('application/pdf', 'pdf'),
+}
+
+INVOICED_STATUSES = ('confirmed', 'completed')
+
+SNAPSHOT_FIELDS = (
+    'invoice_number', 'invoice_date', 'billing_name', 'billing_email', 'billing_phone', 'billing_address',
+    'property_name', 'check_in', 'check_out', 'num_rooms', 'meal_plan',
+    'subtotal', 'service_fee', 'tax_amount', 'discount_amount', 'wallet_used', 'total_amount', 'paid_amount',
+    'payment_mode', 'payment_timestamp', 'cgst', 'sgst', 'igst',
+)
+
+
+def _weasyprint_available():
+    try:
+        import weasyprint  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def document_format():
+    """Configured document format; PDF falls back to HTML when WeasyPrint is missing."""
+    fmt = getattr(settings, 'INVOICE_DOCUMENT_FORMAT', 'html')
+    if fmt == 'pdf' and not _weasyprint_available():
+        logger.warning("[INVOICE_DOCUMENT] WeasyPrint is not installed, rendering HTML invoices")
+        return 'html'
+    return fmt if fmt in FORMATS else 'html'
+
+
+def document_name(digest, fmt):
+    return f'{DOCUMENT_PREFIX}/{digest[:2]}/{digest}.{FORMATS[fmt][1]}'
+
+
+def content_type_for(name):
+    for content_type, extension in FORMATS.values():
+        if name.endswith(f'.{extension}'):
+            return content_type
+    return 'application/octet-stream'
+
+
+# Rendering (render() and render_batch() run in worker processes: no database or storage access)
+
+
+def snapshot(invoice):
+    """Picklable template context for ``invoice`` (its booking must be loaded or select_related)."""
+    data = {field: getattr(invoice, field) for field in SNAPSHOT_FIELDS}
+    data['booking_id'] = str(invoice.booking.booking_id)
+    return data
+
+
+def render(data, fmt='html'):
+    """Document bytes for an invoice snapshot."""
+    html = render_to_string(TEMPLATE_NAME, data)
+    if fmt == 'pdf':
+        from weasyprint import HTML
+        return HTML(string=html).write_pdf()
+    return html.encode('utf-8')
+
+
+def store(content, fmt, storage=None, digest=None):
+    """
+    Save ``content`` under its content address unless it is already stored.
+    Returns (sha256, stored name, True when the file already existed).
+    """
+    storage = storage or default_storage
+    digest = digest or hashlib.sha256(content).hexdigest()
+    name = document_name(digest, fmt)
+    if storage.exists(name):
+        return digest, name, True
+    return digest, storage.save(name, ContentFile(content)), False
+
+
+def render_batch(items, fmt):
+    """[(invoice id, sha256, document bytes)] for [(invoice id, snapshot)]; runs in worker processes."""
+    results = []
+    for invoice_id, data in items:
+        content = render(data, fmt)
+        results.append((invoice_id, hashlib.sha256(content).hexdigest(), content))
+    return results
+
+
+# Single invoices
+
+
+def ensure_document(invoice, regenerate=False):
+    """Stored document name for ``invoice``, rendering and storing it the first time."""
+    if invoice.document_hash and invoice.pdf_file and not regenerate:
+        return invoice.pdf_file.name
+    fmt = document_format()
+    digest, name, _ = store(render(snapshot(invoice), fmt), fmt)
+    Invoice.objects.filter(pk=invoice.pk).update(pdf_file=name, document_hash=digest)
+    invoice.pdf_file.name, invoice.document_hash = name, digest
+    return name
+
+
+def open_document(invoice):
+    """(open file, content type) of the stored document, re-rendering it if the file went missing."""
+    name = ensure_document(invoice)
+    try:
+        handle = default_storage.open(name, 'rb')
+    except FileNotFoundError:
+        logger.warning("[INVOICE_DOCUMENT] %s missing from storage, rendering again", name)
+        name = ensure_document(invoice, regenerate=True)
+        handle = default_storage.open(name, 'rb')
+    return handle, content_type_for(name)
+
+
+# Bulk generation
+
+
+def bookings_confirmed_between(date_from=None, date_to=None):
+    """Invoiceable bookings confirmed on local days date_from..date_to."""
+    bookings = Booking.objects.filter(status__in=INVOICED_STATUSES)
+    if date_from:
+        bookings = bookings.filter(confirmed_at__gte=timezone.make_aware(datetime.combine(date_from, datetime.min.time())))
+    if date_to:
+        bookings = bookings.filter(
+            confirmed_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+        )
+    return bookings
+
+
+def _invoice_numbers(count):
+    """``count`` unused invoice numbers in the Invoice.generate_number format."""
+    prefix = timezone.now().strftime('INV-%Y%m%d%H%M%S-')
+    taken = {
+        int(number.rsplit('-', 1)[1])
+        for number in Invoice.objects.filter(invoice_number__startswith=prefix).values_list('invoice_number', flat=True)
+    }
+    free = [suffix for suffix in range(1000, 10000) if suffix not in taken]
+    if count > len(free):
+        raise ValueError(f"Cannot number {count} invoices in one second; use a smaller batch")
+    return [f'{prefix}{suffix}' for suffix in random.sample(free, count)]
+
+
+def create_missing_invoices(bookings, batch_size=GENERATE_BATCH_SIZE):
+    """Bulk-create invoice snapshots for ``bookings`` that have none. Returns the number created."""
+    pending = bookings.filter(invoice__isnull=True).order_by('pk')
+    created, last_pk = 0, 0
+    while True:
+        batch = list(
+            pending.filter(pk__gt=last_pk)
+            .select_related('hotel_details__room_type__hotel', 'hotel_details__meal_plan')
+            .prefetch_related(Prefetch(
+                'payments', queryset=Payment.objects.filter(status='success'), to_attr='successful_payments',
+            ))[:batch_size]
+        )
+        if not batch:
+            return created
+        last_pk = batch[-1].pk
+        invoices = [
+            Invoice.build_for_booking(booking, next(iter(booking.successful_payments), None), number)
+            for booking, number in zip(batch, _invoice_numbers(len(batch)))
+        ]
+        with transaction.atomic():
+            Invoice.objects.bulk_create(invoices, batch_size=batch_size)
+        created += len(invoices)
+
+
+def _batches(invoices, batch_size):
+    last_pk = 0
+    while True:
+        batch = list(invoices.filter(pk__gt=last_pk).select_related('booking').order_by('pk')[:batch_size])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield [(invoice.pk, snapshot(invoice)) for invoice in batch]
+
+
+def _save_results(results, fmt):
+    """Store rendered documents and point their invoices at them. Returns how many were already stored."""
+    invoices, reused = [], 0
+    for invoice_id, digest, content in results:
+        digest, name, existed = store(content, fmt, digest=digest)
+        invoices.append(Invoice(pk=invoice_id, pdf_file=name, document_hash=digest))
+        reused += existed
+    Invoice.objects.bulk_update(invoices, ['pdf_file', 'document_hash'])
+    return reused
+
+
+def generate(bookings, workers=1, regenerate=False, batch_size=GENERATE_BATCH_SIZE):
+    """
+    Create missing invoices for ``bookings`` and render their documents,
+    ``workers`` processes at a time (1 renders inline). Existing documents are
+    kept unless ``regenerate``. Returns a report dict.
+    """
+    started = time.monotonic()
+    fmt = document_format()
+    created = create_missing_invoices(bookings, batch_size)
+    invoices = Invoice.objects.filter(booking__in=bookings.values('pk'))
+    if not regenerate:
+        invoices = invoices.filter(document_hash='')
+
+    rendered = reused = 0
+    if workers <= 1:
+        for items in _batches(invoices, batch_size):
+            reused += _save_results(render_batch(items, fmt), fmt)
+            rendered += len(items)
+    else:
+        # Spawned workers start clean instead of inheriting this process's database connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+            in_flight = deque()
+            for items in _batches(invoices, batch_size):
+                in_flight.append(pool.submit(render_batch, items, fmt))
+                rendered += len(items)
+                if len(in_flight) >= workers * 2:
+                    reused += _save_results(in_flight.popleft().result(), fmt)
+            while in_flight:
+                reused += _save_results(in_flight.popleft().result(), fmt)
+
+    seconds = time.monotonic() - started
+    logger.info("[INVOICE_DOCUMENT] created=%s rendered=%s reused=%s workers=%s seconds=%.2f",
+                created, rendered, reused, workers, seconds)
+    return {
+        'created': created,
+        'rendered': rendered,
+        'reused': reused,
+        'format': fmt,
+        'seconds': seconds,
+        'per_second': rendered / seconds if seconds else 0.0,
+    }
@@ -0,0 +1,81 @@
+"""
+Management command to benchmark bulk invoice generation on a month of synthetic bookings.
+Bulk-creates --bookings confirmed bookings (customer_name BENCH-<run>) spread over last month, then
+generates their invoices with 1 worker and with --workers, and reports invoices/documents per second:
+python manage.py benchmark_invoice_generation [--bookings 3000] [--workers 4] [--batch-size 200] [--keep]
+"""
+import os
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models.signals import pre_delete
+from django.utils import timezone
+
+from bookings.models import Booking
+from finance.signals import remove_from_finance_rollups
+from payments.invoice_documents import GENERATE_BATCH_SIZE, generate
+from payments.models import Invoice
+
+
+class Command(BaseCommand):
+    help = 'Benchmark invoice creation and document rendering for a month of bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=3000, help='Synthetic bookings in the month')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=GENERATE_BATCH_SIZE)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark bookings, invoices and documents')
+
+    def handle(self, *args, **options):
+        count = options['bookings']
+        run = f"BENCH-{uuid.uuid4().hex[:8]}"
+        user = get_user_model().objects.filter(is_superuser=True).first() or get_user_model().objects.first()
+        if user is None:
+            self.stderr.write('Create a user first')
+            return
+
+        # bulk_create: no finance/notification signals fire for the synthetic rows
+        month_start = timezone.now() - timedelta(days=30)
+        Booking.objects.bulk_create([
+            Booking(
+                user=user, booking_type='hotel', status='confirmed', customer_name=run,
+                customer_email=f'bench{index}@example.com', customer_phone='9000000000',
+                total_amount=Decimal('2500.00') + index % 500, paid_amount=Decimal('2500.00') + index % 500,
+                confirmed_at=month_start + timedelta(minutes=index * 43200 // max(count, 1)),
+            )
+            for index in range(count)
+        ], batch_size=1000)
+        bookings = Booking.objects.filter(customer_name=run)
+
+        try:
+            sequential = generate(bookings, workers=1, batch_size=options['batch_size'])
+            self._report('1 worker', sequential)
+            parallel = generate(bookings, workers=options['workers'], regenerate=True, batch_size=options['batch_size'])
+            self._report(f"{options['workers']} workers (regenerate)", parallel)
+        finally:
+            if not options['keep']:
+                names = list(Invoice.objects.filter(booking__in=bookings).values_list('pdf_file', flat=True))
+                for name in filter(None, names):
+                    default_storage.delete(name)
+                # The synthetic rows never entered the finance rollups, so don't subtract them on delete
+                pre_delete.disconnect(remove_from_finance_rollups, sender=Booking)
+                try:
+                    bookings.delete()
+                finally:
+                    pre_delete.connect(remove_from_finance_rollups, sender=Booking)
+
+        speedup = parallel['per_second'] / sequential['per_second'] if sequential['per_second'] else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} bookings: {sequential['per_second']:.1f} docs/sec with 1 worker, "
+            f"{parallel['per_second']:.1f} docs/sec with {options['workers']} ({speedup:.1f}x)"
+        ))
+
+    def _report(self, label, report):
+        self.stdout.write(
+            f"  {label}: {report['created']} invoices created, {report['rendered']} {report['format'].upper()} "
+            f"documents ({report['reused']} already stored) in {report['seconds']:.2f}s"
+        )
@@ -0,0 +1,35 @@
+"""
+Management command to compare materialized wallet cashback with the CashbackLedger.
+Expires stale entries first (like the nightly expiry job), then reports every wallet whose
+cashback_available / cashback_next_expiry disagree with its ledger; --fix recomputes them:
+python manage.py check_wallet_cashback [--wallet 12] [--fix] [--no-expire]
+"""
+from django.core.management.base import BaseCommand
+
+from payments.cashback import check_consistency, expire_stale
+
+
+class Command(BaseCommand):
+    help = 'Check (and optionally fix) materialized wallet cashback against the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallet', type=int, action='append', dest='wallets', help='Wallet id to check (repeatable)')
+        parser.add_argument('--fix', action='store_true', help='Recompute mismatched wallets from their ledger')
+        parser.add_argument('--no-expire', action='store_true', help='Skip expiring stale entries before checking')
+
+    def handle(self, *args, **options):
+        if not options['no_expire']:
+            self.stdout.write(f"  Expired {expire_stale()} stale cashback entries")
+
+        mismatches = check_consistency(options['wallets'], fix=options['fix'])
+        for row in mismatches:
+            self.stdout.write(
+                f"  Wallet {row['wallet']}: stored ₹{row['stored']} (next expiry {row['stored_expiry']}), "
+                f"ledger ₹{row['ledger']} (next expiry {row['ledger_expiry']})"
+            )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Wallet cashback consistent with ledger'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(mismatches)} wallets'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} wallets out of sync (re-run with --fix)'))
@@ -7,6 +7,7 @@ from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
+from payments.cashback import refresh as refresh_cashback
 from payments.models import Wallet, CashbackLedger
 
 User = get_user_model()
@@ -102,6 +103,8 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.WARNING('Expired cashback already exists'))
         
+        refresh_cashback(wallet)
+
         self.stdout.write(self.style.SUCCESS('\n=== Test Data Summary ==='))
         self.stdout.write(f'User: {test_user.username} / {test_user.email}')
         self.stdout.write(f'Password: testpass123')
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Min, Sum
+from django.utils import timezone
+
+
+def materialize_cashback(apps, schema_editor):
+    Wallet = apps.get_model('payments', 'Wallet')
+    CashbackLedger = apps.get_model('payments', 'CashbackLedger')
+    remaining = ExpressionWrapper(F('amount') - F('used_amount'), output_field=DecimalField(max_digits=10, decimal_places=2))
+    rows = CashbackLedger.objects.filter(
+        is_used=False, is_expired=False, expires_at__gt=timezone.now(),
+    ).values('wallet_id').annotate(available=Sum(remaining), next_expiry=Min('expires_at')).order_by()
+    for row in rows:
+        Wallet.objects.filter(pk=row['wallet_id']).update(
+            cashback_available=row['available'], cashback_next_expiry=row['next_expiry'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0012_invoice_check_in_invoice_check_out_invoice_meal_plan_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='cashback_available',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='cashback_next_expiry',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(materialize_cashback, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,6 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
-from datetime import timedelta
 from core.models import TimeStampedModel
 from bookings.models import Booking
 
@@ -100,18 +99,29 @@ class Invoice(TimeStampedModel):
     igst = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
     pdf_file = models.FileField(upload_to='invoices/', null=True, blank=True)
+    # SHA-256 of the rendered document stored in pdf_file (payments.invoice_documents)
+    document_hash = models.CharField(max_length=64, blank=True)
+    
+    class Meta:
+        indexes = [
+            # Finance invoice listing pages by (created_at, id) and filters on invoice_date
+            models.Index(fields=['created_at'], name='invoice_created_at_idx'),
+            models.Index(fields=['invoice_date'], name='invoice_date_idx'),
+        ]
     
     def __str__(self):
         return f"Invoice {self.invoice_number}"
     
-    @classmethod
-    def create_for_booking(cls, booking, payment=None):
-        """Create invoice after successful booking payment - immutable snapshot"""
+    @staticmethod
+    def generate_number():
         import random
         timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
         random_suffix = random.randint(1000, 9999)
-        invoice_number = f"INV-{timestamp}-{random_suffix}"
-        
+        return f"INV-{timestamp}-{random_suffix}"
+    
+    @classmethod
+    def build_for_booking(cls, booking, payment=None, invoice_number=None):
+        """Unsaved immutable invoice snapshot of a paid booking (bulk paths save many at once)"""
         # Get booking details
         hotel_booking = getattr(booking, 'hotel_details', None)
         property_name = ''
@@ -137,9 +147,9 @@ class Invoice(TimeStampedModel):
         
         wallet_used = booking.wallet_balance_before - booking.wallet_balance_after if (booking.wallet_balance_before and booking.wallet_balance_after) else Decimal('0')
         
-        invoice = cls.objects.create(
+        return cls(
             booking=booking,
-            invoice_number=invoice_number,
+            invoice_number=invoice_number or cls.generate_number(),
             billing_name=booking.customer_name,
             billing_email=booking.customer_email,
             billing_phone=booking.customer_phone,
@@ -158,6 +168,12 @@ class Invoice(TimeStampedModel):
             payment_mode=payment.payment_method if payment else '',
             payment_timestamp=booking.confirmed_at,
         )
+    
+    @classmethod
+    def create_for_booking(cls, booking, payment=None):
+        """Create invoice after successful booking payment - immutable snapshot"""
+        invoice = cls.build_for_booking(booking, payment)
+        invoice.save()
         return invoice
 
 
@@ -167,6 +183,9 @@ class Wallet(TimeStampedModel):
     
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     cashback_earned = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Materialized from CashbackLedger by payments.cashback (never write directly)
+    cashback_available = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    cashback_next_expiry = models.DateTimeField(null=True, blank=True, db_index=True)
     currency = models.CharField(max_length=3, default='INR')
     is_active = models.BooleanField(default=True)
     
@@ -212,14 +231,14 @@ class Wallet(TimeStampedModel):
     
     def get_available_balance(self):
         """Get available balance (balance + non-expired cashback)"""
-        total_cashback = CashbackLedger.objects.filter(
-            wallet=self,
-            is_used=False,
-            is_expired=False,
-            expires_at__gt=timezone.now()
-        ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
-        
-        return self.balance + total_cashback
+        return self.balance + self.get_available_cashback()
+
+    def get_available_cashback(self):
+        """Materialized unused, unexpired cashback; expires stale entries first if one has lapsed"""
+        if self.cashback_next_expiry and self.cashback_next_expiry <= timezone.now():
+            from .cashback import expire_wallet
+            expire_wallet(self)
+        return self.cashback_available
 
 
 class WalletTransaction(TimeStampedModel):
@@ -327,53 +346,52 @@ class CashbackLedger(TimeStampedModel):
     def __str__(self):
         return f"{self.wallet.user.username} - Cashback ₹{self.amount} - {'Used' if self.is_used else 'Active' if not self.is_expired else 'Expired'}"
     
+    @property
+    def remaining_amount(self):
+        return self.amount - self.used_amount
+
     def mark_as_used(self, amount=None):
-        """Mark cashback as used"""
+        """Use this entry (all of its remainder by default); the wallet total follows"""
+        from django.db import transaction
+        from .cashback import refresh
+
         if self.is_expired:
             raise ValueError("Cannot use expired cashback")
         if self.is_used:
             raise ValueError("Cashback already used")
         
-        use_amount = Decimal(str(amount)) if amount else self.amount
-        if use_amount > self.amount:
+        use_amount = Decimal(str(amount)) if amount else self.remaining_amount
+        if use_amount > self.remaining_amount:
             raise ValueError("Cannot use more than available cashback")
         
-        self.is_used = True
-        self.used_on = timezone.now()
-        self.used_amount = use_amount
-        self.save(update_fields=['is_used', 'used_on', 'used_amount', 'updated_at'])
+        with transaction.atomic():
+            Wallet.objects.select_for_update().filter(pk=self.wallet_id).first()
+            self.used_amount += use_amount
+            self.is_used = self.used_amount >= self.amount
+            self.used_on = timezone.now()
+            self.save(update_fields=['is_used', 'used_on', 'used_amount', 'updated_at'])
+            refresh(self.wallet_id)
     
     def check_and_expire(self):
         """Check if cashback has expired and mark accordingly"""
         if not self.is_expired and timezone.now() > self.expires_at:
-            self.is_expired = True
-            self.expired_on = timezone.now()
-            self.save(update_fields=['is_expired', 'expired_on', 'updated_at'])
-            return True
+            from .cashback import expire_wallet
+            expire_wallet(self.wallet_id)
+            self.refresh_from_db(fields=['is_expired', 'expired_on', 'updated_at'])
+            return self.is_expired
         return False
     
     @classmethod
     def expire_all_stale(cls):
-        """Expire all cashback that has passed expiry date"""
-        now = timezone.now()
-        expired_count = cls.objects.filter(
-            is_expired=False,
-            is_used=False,
-            expires_at__lte=now
-        ).update(is_expired=True, expired_on=now)
-        return expired_count
+        """Expire all cashback that has passed expiry date (and lower the wallets' materialized totals)"""
+        from .cashback import expire_stale
+        return expire_stale()
     
     @classmethod
     def create_cashback(cls, wallet, amount, booking=None, description="", validity_days=365):
         """Create new cashback entry"""
-        cashback = cls.objects.create(
-            wallet=wallet,
-            booking=booking,
-            amount=Decimal(str(amount)),
-            expires_at=timezone.now() + timedelta(days=validity_days),
-            description=description
-        )
-        return cashback
+        from .cashback import credit
+        return credit(wallet, amount, booking=booking, description=description, validity_days=validity_days)
 
 
 class PayoutRequest(TimeStampedModel):
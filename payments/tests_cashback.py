@@ -0,0 +1,99 @@
+"""
+Wallet cashback tests
+Materialized cashback_available/next-expiry kept in step with the ledger on credit, FIFO use and expiry
+"""
+
+import io
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .cashback import CashbackAllocator, check_consistency, expire_stale
+from .models import CashbackLedger, Wallet
+
+
+class WalletCashbackTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+        self.wallet = Wallet.objects.create(user=self.user, balance=Decimal('100.00'))
+
+    def _credit(self, amount, days):
+        return CashbackLedger.create_cashback(self.wallet, amount, description=f'{amount}', validity_days=days)
+
+    def test_credit_materializes_and_reads_are_row_lookups(self):
+        later = self._credit('150.00', 30)
+        sooner = self._credit('50.00', 5)
+        wallet = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual(wallet.cashback_available, Decimal('200.00'))
+        self.assertEqual(wallet.cashback_next_expiry, sooner.expires_at)
+        self.assertLess(sooner.expires_at, later.expires_at)
+        with self.assertNumQueries(0):
+            self.assertEqual(wallet.get_available_balance(), Decimal('300.00'))
+        self.assertEqual(check_consistency(), [])
+
+    def test_allocator_drains_fifo_and_keeps_partial_remainder(self):
+        middle = self._credit('100.00', 10)
+        first = self._credit('200.00', 5)
+        last = self._credit('50.00', 30)
+        untouched = CashbackLedger.objects.get(pk=last.pk).updated_at
+
+        drained = CashbackAllocator(self.wallet).allocate(Decimal('250.00'))
+        self.assertEqual([entry.pk for entry in drained], [first.pk, middle.pk])
+
+        first.refresh_from_db()
+        middle.refresh_from_db()
+        self.assertEqual((first.is_used, first.used_amount), (True, Decimal('200.00')))
+        self.assertEqual((middle.is_used, middle.used_amount, middle.remaining_amount), (False, Decimal('50.00'), Decimal('50.00')))
+        self.assertEqual(CashbackLedger.objects.get(pk=last.pk).updated_at, untouched)
+
+        wallet = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual(wallet.cashback_available, Decimal('100.00'))
+        self.assertEqual(wallet.cashback_next_expiry, middle.expires_at)
+        self.assertEqual(self.wallet.cashback_available, Decimal('100.00'))
+        self.assertEqual(check_consistency(), [])
+
+        with self.assertRaises(ValueError):
+            CashbackAllocator(self.wallet).allocate(Decimal('100.01'))
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).cashback_available, Decimal('100.00'))
+
+    def test_expiry_lowers_total_lazily_and_in_bulk(self):
+        soon = self._credit('40.00', 1)
+        self._credit('60.00', 20)
+        past = timezone.now() - timedelta(minutes=1)
+        CashbackLedger.objects.filter(pk=soon.pk).update(expires_at=past)
+        Wallet.objects.filter(pk=self.wallet.pk).update(cashback_next_expiry=past)
+
+        wallet = Wallet.objects.get(pk=self.wallet.pk)
+        self.assertEqual(wallet.get_available_cashback(), Decimal('60.00'))
+        self.assertTrue(CashbackLedger.objects.get(pk=soon.pk).is_expired)
+        self.assertGreater(wallet.cashback_next_expiry, timezone.now())
+
+        other = Wallet.objects.create(user=get_user_model().objects.create_user(username='o', email='o@x.com', password='pw'))
+        stale = CashbackLedger.create_cashback(other, '25.00', validity_days=1)
+        CashbackLedger.objects.filter(pk=stale.pk).update(expires_at=past)
+        self.assertEqual(CashbackLedger.expire_all_stale(), 1)
+        self.assertEqual(Wallet.objects.get(pk=other.pk).cashback_available, Decimal('0.00'))
+        self.assertIsNone(Wallet.objects.get(pk=other.pk).cashback_next_expiry)
+        self.assertEqual(expire_stale(), 0)
+
+    def test_consistency_command_reports_and_fixes_drift(self):
+        self._credit('80.00', 15)
+        CashbackLedger.objects.create(
+            wallet=self.wallet, amount=Decimal('20.00'), expires_at=timezone.now() + timedelta(days=3), description='raw',
+        )
+        mismatches = check_consistency()
+        self.assertEqual([(row['stored'], row['ledger']) for row in mismatches], [(Decimal('80.00'), Decimal('100.00'))])
+
+        out = io.StringIO()
+        call_command('check_wallet_cashback', stdout=out)
+        self.assertIn('1 wallets out of sync', out.getvalue())
+        call_command('check_wallet_cashback', fix=True, stdout=io.StringIO())
+        self.assertEqual(Wallet.objects.get(pk=self.wallet.pk).cashback_available, Decimal('100.00'))
+        out = io.StringIO()
+        call_command('check_wallet_cashback', stdout=out)
+        self.assertIn('consistent with ledger', out.getvalue())
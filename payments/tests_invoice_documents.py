@@ -0,0 +1,120 @@
+"""
+Invoice document tests
+Documents rendered once and served from content-addressed storage; batched, parallel month-end generation and its benchmark
+"""
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from bookings.models import Booking, HotelBooking
+from core.models import City
+from finance.models import FinanceDailyRollup
+from finance.views import download_invoice
+from hotels.models import Hotel, RoomType
+from . import invoice_documents
+from .models import Invoice, Payment
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='invoice-document-tests-')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, INVOICE_DOCUMENT_FORMAT='html')
+class InvoiceDocumentTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='guest', email='g@x.com', password='pw')
+        city = City.objects.create(name='Goa', state='Goa')
+        hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+        )
+        self.room_type = RoomType.objects.create(
+            hotel=hotel, name='Std', description='d', base_price=Decimal('2000.00'), total_rooms=10,
+        )
+        self.today = timezone.localdate()
+
+    def _booking(self, confirmed_days_ago=1, status='confirmed'):
+        booking = Booking.objects.create(
+            user=self.user, booking_type='hotel', status=status, total_amount=Decimal('2100.00'),
+            paid_amount=Decimal('2100.00'), customer_name='Guest', customer_email='g@x.com', customer_phone='9',
+            confirmed_at=timezone.now() - timedelta(days=confirmed_days_ago),
+        )
+        HotelBooking.objects.create(
+            booking=booking, room_type=self.room_type, check_in=self.today + timedelta(days=5),
+            check_out=self.today + timedelta(days=7), number_of_rooms=1, total_nights=2,
+            price_snapshot={'service_fee': '100.00'},
+        )
+        Payment.objects.create(booking=booking, amount=booking.total_amount, status='success', payment_method='upi')
+        return booking
+
+    def _download(self, invoice):
+        request = RequestFactory().get(f'/finance/invoice/{invoice.pk}/download/')
+        request.user = self.user
+        response = download_invoice(request, invoice.pk)
+        return response, b''.join(response.streaming_content)
+
+    def test_download_renders_once_then_serves_stored_copy(self):
+        invoice = Invoice.create_for_booking(self._booking(), Payment.objects.get())
+        with mock.patch.object(invoice_documents, 'render', wraps=invoice_documents.render) as render:
+            response, content = self._download(invoice)
+            again, repeat = self._download(invoice)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(content, repeat)
+        self.assertIn(invoice.invoice_number.encode(), content)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn(f'invoice_{invoice.invoice_number}.html', response['Content-Disposition'])
+
+        invoice.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(invoice.document_hash, digest)
+        self.assertEqual(invoice.pdf_file.name, f'invoices/documents/{digest[:2]}/{digest}.html')
+        self.assertEqual(again['ETag'], f'"{digest}"')
+
+        # A stored copy that went missing is rendered again at the same address
+        default_storage.delete(invoice.pdf_file.name)
+        self.assertEqual(self._download(invoice)[1], content)
+
+    def test_bulk_generation_for_confirmation_range(self):
+        in_range = [self._booking(confirmed_days_ago=days) for days in (2, 3, 4)]
+        self._booking(confirmed_days_ago=40)
+        self._booking(status='reserved')
+        bookings = invoice_documents.bookings_confirmed_between(self.today - timedelta(days=10), self.today)
+
+        report = invoice_documents.generate(bookings, batch_size=2)
+        self.assertEqual((report['created'], report['rendered'], report['reused']), (3, 3, 0))
+        invoices = Invoice.objects.filter(booking__in=in_range)
+        self.assertEqual(invoices.exclude(document_hash='').count(), 3)
+        self.assertEqual(len(set(invoices.values_list('invoice_number', flat=True))), 3)
+        self.assertEqual(Invoice.objects.count(), 3)
+        invoice = invoices.get(booking=in_range[0])
+        self.assertEqual((invoice.service_fee, invoice.payment_mode, invoice.property_name), (Decimal('100.00'), 'upi', 'Sea View'))
+
+        # Nothing left to do; regenerating writes the same bytes to the same addresses
+        self.assertEqual(invoice_documents.generate(bookings)['rendered'], 0)
+        hashes = dict(invoices.values_list('pk', 'document_hash'))
+        report = invoice_documents.generate(bookings, workers=2, regenerate=True)
+        self.assertEqual((report['created'], report['rendered'], report['reused']), (0, 3, 3))
+        self.assertEqual(dict(invoices.values_list('pk', 'document_hash')), hashes)
+
+    def test_benchmark_cleans_up_after_itself(self):
+        self._booking()
+        rollups = list(FinanceDailyRollup.objects.values_list('date', 'bookings_created', 'gross_revenue'))
+        out = io.StringIO()
+        call_command('benchmark_invoice_generation', bookings=12, workers=1, batch_size=5, stdout=out)
+        self.assertIn('12 bookings:', out.getvalue())
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertFalse(Invoice.objects.exists())
+        self.assertEqual(list(FinanceDailyRollup.objects.values_list('date', 'bookings_created', 'gross_revenue')), rollups)
@@ -162,7 +162,8 @@ def process_wallet_payment(request):
     - If any step fails, rollback the entire transaction
     """
     from bookings.models import Booking
-    from .models import Payment, Wallet, WalletTransaction, CashbackLedger
+    from .cashback import CashbackAllocator
+    from .models import Payment, Wallet, WalletTransaction
     from django.utils import timezone
     from django.db import transaction
     from django.urls import reverse
@@ -202,7 +203,7 @@ def process_wallet_payment(request):
     if not wallet:
         return JsonResponse({'status': 'error', 'message': 'Wallet not found'}, status=404)
 
-    # Check balance + cashback availability (non-mutating)
+    # Check balance + cashback availability (materialized on the wallet row)
     total_available = wallet.get_available_balance()
     if total_available < amount:
         return JsonResponse({
@@ -271,27 +272,11 @@ def process_wallet_payment(request):
                         payment_gateway='internal',
                     )
 
-            # Use cashback ledger FIFO for remainder
+            # Use cashback FIFO by expiry for the remainder (locks only the entries drained)
             cashback_used = Decimal('0')
             if cashback_needed > 0:
-                cashback_entries = CashbackLedger.objects.select_for_update().filter(
-                    wallet=wallet,
-                    is_used=False,
-                    is_expired=False,
-                    expires_at__gt=timezone.now()
-                ).order_by('expires_at')
-
-                remaining = cashback_needed
-                for cb_entry in cashback_entries:
-                    if remaining <= 0:
-                        break
-                    use_amount = min(cb_entry.amount, remaining)
-                    cb_entry.mark_as_used(use_amount)
-                    cashback_used += use_amount
-                    remaining -= use_amount
-
-                if remaining > 0:
-                    raise ValueError("Cashback balance changed during processing")
+                CashbackAllocator(wallet).allocate(cashback_needed)
+                cashback_used = cashback_needed
 
             # Create payment record (idempotent per booking via transaction_id)
             payment = Payment.objects.create(
@@ -316,9 +301,10 @@ def process_wallet_payment(request):
             booking.expires_at = None  # BLOCKER FIX: Clear timer after payment
             booking.wallet_balance_before = wallet_balance_before
             booking.wallet_balance_after = wallet.balance
+            booking.wallet_used_amount = payable_locked
             booking.save(update_fields=[
                 'paid_amount', 'payment_reference', 'status', 'confirmed_at',
-                'expires_at', 'wallet_balance_before', 'wallet_balance_after', 'updated_at'
+                'expires_at', 'wallet_balance_before', 'wallet_balance_after', 'wallet_used_amount', 'updated_at'
             ])
 
             # Lock inventory permanently
@@ -5,3 +5,7 @@ class PropertyOwnersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'property_owners'
     verbose_name = 'Property Owners (Homestays, Resorts, Villas)'
+
+    def ready(self):
+        """Register signals when app is ready"""
+        import property_owners.signals  # noqa
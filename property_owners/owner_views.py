@@ -45,48 +45,17 @@ class OwnerDashboardView(LoginRequiredMixin, UserPassesTestMixin, ListView):
             status='approved'
         ).count()
         
-        # Sprint-1: Dashboard Metrics (30-day)
+        # Sprint-1: Dashboard Metrics (30-day), read from the room-night rollups
         from datetime import timedelta
         from django.utils import timezone
-        from django.db.models import Sum, Count, Q
-        from bookings.models import HotelBooking
-        from decimal import Decimal
-        
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        
-        # Get all rooms for this owner's hotels
-        owner_hotels = profile.properties.all()
-        from hotels.models import RoomType
-        owner_rooms = RoomType.objects.filter(hotel__in=[h.id for h in owner_hotels]) if owner_hotels.exists() else RoomType.objects.none()
-        
-        # Bookings in last 30 days
-        recent_bookings = HotelBooking.objects.filter(
-            room_type__in=owner_rooms,
-            booking__created_at__gte=thirty_days_ago
-        )
-        
-        # Total bookings count
-        bookings_30d = recent_bookings.count()
+        from hotels.occupancy import occupancy_totals
         
-        # Revenue (30d) - sum of booking totals
-        revenue_30d = recent_bookings.aggregate(
-            total=Sum('booking__total_amount')
-        )['total'] or Decimal('0')
-        
-        # Occupancy % - Calculate as: booked nights / total available nights
-        total_rooms = owner_rooms.count()
-        if total_rooms > 0:
-            # Total available room-nights in 30 days
-            total_capacity = total_rooms * 30
-            
-            # Total booked nights
-            booked_nights = recent_bookings.aggregate(
-                total=Sum('total_nights')
-            )['total'] or 0
-            
-            occupancy_pct = round((booked_nights / total_capacity) * 100, 1) if total_capacity > 0 else 0
-        else:
-            occupancy_pct = 0
+        today = timezone.localdate()
+        owner_hotel_ids = Hotel.objects.filter(owner_property__owner=profile).values_list('id', flat=True)
+        totals = occupancy_totals(today - timedelta(days=30), today, owner_hotel_ids)
+        bookings_30d = totals['arrivals']
+        revenue_30d = totals['revenue']
+        occupancy_pct = totals['occupancy_pct']
         
         context['metrics'] = {
             'bookings_30d': bookings_30d,
@@ -485,6 +454,7 @@ def room_type_delete(request, hotel_id, room_id):
 def room_calendar(request, room_id):
     """View room availability calendar with blocks"""
     from hotels.models import RoomBlock
+    from hotels.availability import AvailabilityWindow
     from property_owners.models import PropertyOwner
     from datetime import date, timedelta
     import calendar
@@ -516,31 +486,12 @@ def room_calendar(request, room_id):
     cal = calendar.Calendar(firstweekday=6)  # Start with Sunday
     month_days = cal.monthdatescalendar(year, month)
     
-    # Mark blocked dates
-    blocked_dates = set()
-    for block in blocks:
-        current = max(block.blocked_from, first_day)
-        end = min(block.blocked_to, last_day)
-        while current <= end:
-            blocked_dates.add(current)
-            current += timedelta(days=1)
-    
-    # Get bookings for this room to prevent blocking
-    from bookings.models import HotelBooking
-    upcoming_bookings = HotelBooking.objects.filter(
-        room_type=room,
-        check_in_date__lte=last_day,
-        check_out_date__gte=first_day,
-        status__in=['RESERVED', 'CONFIRMED', 'CHECKED_IN']
-    ).values_list('check_in_date', 'check_out_date')
-    
-    booked_dates = set()
-    for check_in, check_out in upcoming_bookings:
-        current = max(check_in, first_day)
-        end = min(check_out, last_day)
-        while current < end:  # Check-out day is not included
-            booked_dates.add(current)
-            current += timedelta(days=1)
+    # Blocks, held/booked stays and per-night sellable rooms from one window
+    # over the visible grid (leading/trailing days of adjacent months included)
+    window = AvailabilityWindow([room], month_days[0][0], month_days[-1][-1] + timedelta(days=1))
+    nights = window.nights(room.pk)
+    blocked_dates = {night.date for night in nights if night.blocked}
+    booked_dates = {night.date for night in nights if night.committed}
     
     return render(request, 'property_owners/room_calendar.html', {
         'room': room,
@@ -621,65 +572,87 @@ def unblock_dates(request, block_id):
         return JsonResponse({'error': str(e)}, status=400)
 
 
+def _owned_room_types(owner_profile, room_type_ids):
+    """Room types among ``room_type_ids`` whose hotel belongs to one of the owner's properties."""
+    return RoomType.objects.filter(pk__in=room_type_ids, hotel__owner_property__owner=owner_profile)
+
+
+def _calendar_response(result):
+    status = 400 if result['failed'] else 200
+    return JsonResponse({'success': not result['failed'], **result}, status=status)
+
+
 @login_required
 def bulk_block_dates(request, room_id):
     """Bulk block multiple date ranges"""
-    from hotels.models import RoomBlock
+    from hotels.calendar_editor import apply_calendar_edits
     from property_owners.models import PropertyOwner
-    from datetime import datetime
     import json
     
     if request.method != 'POST':
         return JsonResponse({'error': 'POST required'}, status=405)
     
-    room = get_object_or_404(RoomType, pk=room_id)
     owner_profile = get_object_or_404(PropertyOwner, user=request.user)
-    
-    # Verify ownership
-    if not hasattr(room.hotel, 'property') or room.hotel.property.owner != owner_profile:
-        return JsonResponse({'error': 'Not authorized'}, status=403)
+    room = get_object_or_404(_owned_room_types(owner_profile, [room_id]))
     
     try:
         ranges = json.loads(request.POST.get('ranges', '[]'))
-        reason = request.POST.get('reason', '').strip()
-        
-        created_count = 0
-        errors = []
-        
-        for range_data in ranges:
-            try:
-                blocked_from = datetime.strptime(range_data['from'], '%Y-%m-%d').date()
-                blocked_to = datetime.strptime(range_data['to'], '%Y-%m-%d').date()
-                
-                block = RoomBlock(
-                    room_type=room,
-                    blocked_from=blocked_from,
-                    blocked_to=blocked_to,
-                    reason=reason,
-                    created_by=request.user
-                )
-                block.full_clean()
-                block.save()
-                created_count += 1
-            except Exception as e:
-                errors.append(f"{range_data.get('from')} to {range_data.get('to')}: {str(e)}")
-        
-        if errors:
-            return JsonResponse({
-                'success': False,
-                'created': created_count,
-                'errors': errors
-            }, status=400)
-        
-        messages.success(request, f'Blocked {created_count} date ranges')
-        return JsonResponse({
-            'success': True,
-            'created': created_count,
-            'message': f'{created_count} ranges blocked successfully'
-        })
-        
-    except Exception as e:
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not isinstance(ranges, list):
+        return JsonResponse({'error': 'ranges must be a list'}, status=400)
+    
+    ranges = [
+        {**range_data, 'room_type': room.pk, 'action': 'block'} if isinstance(range_data, dict) else range_data
+        for range_data in ranges
+    ]
+    result = apply_calendar_edits(
+        [room], ranges, user=request.user, default_reason=request.POST.get('reason', '').strip(),
+    )
+    result['created'] = result['applied']
+    result['errors'] = [
+        f"{entry.get('from')} to {entry.get('to')}: {entry['error']}"
+        for entry in result['report'] if entry['status'] == 'error'
+    ]
+    if result['applied'] and not result['failed']:
+        result['message'] = f"{result['applied']} ranges blocked successfully"
+        messages.success(request, f"Blocked {result['applied']} date ranges")
+    return _calendar_response(result)
+
+
+@login_required
+def bulk_calendar_update(request):
+    """Block/unblock, set price or set available rooms over many ranges and room types in one request.
+
+    Body (JSON): {"ranges": [{"room_type": 1, "from": "2031-03-01", "to": "2031-03-05",
+    "action": "block|unblock|set_price|set_available", "price": "2999", "available_rooms": 4,
+    "reason": "..."}, ...]}
+    Returns a per-range report and the per-night diff for the calendar.
+    """
+    from hotels.calendar_editor import apply_calendar_edits
+    from property_owners.models import PropertyOwner
+    import json
+    
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    
+    owner_profile = get_object_or_404(PropertyOwner, user=request.user)
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError as e:
         return JsonResponse({'error': str(e)}, status=400)
+    ranges = payload.get('ranges') if isinstance(payload, dict) else None
+    if not isinstance(ranges, list) or not ranges:
+        return JsonResponse({'error': 'ranges must be a non-empty list'}, status=400)
+    
+    room_type_ids = set()
+    for range_data in ranges:
+        try:
+            room_type_ids.add(int(range_data.get('room_type')))
+        except (AttributeError, TypeError, ValueError):
+            continue
+    room_types = _owned_room_types(owner_profile, room_type_ids)
+    return _calendar_response(apply_calendar_edits(room_types, ranges, user=request.user))
 
 
 # Sprint-1: Payout Request Views
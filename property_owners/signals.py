@@ -0,0 +1,17 @@
+"""
+Signals for Property Owners app - queue responsive derivatives for owner-uploaded images
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.image_manifest import record_files
+from .models import PropertyImage, PropertyRoomImage
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_save, sender=PropertyRoomImage)
+def queue_property_image_derivatives(sender, instance, raw=False, **kwargs):
+    """Owner uploads get the same card/gallery/hero derivatives as catalogue images."""
+    if raw or not instance.image:
+        return
+    record_files([instance.image.name], reinspect=[instance.image.name])
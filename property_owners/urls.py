@@ -34,6 +34,7 @@ urlpatterns = [
     path('owner/room/<int:room_id>/block/', owner_views.block_dates, name='block-dates'),
     path('owner/room/<int:room_id>/bulk-block/', owner_views.bulk_block_dates, name='bulk-block-dates'),
     path('owner/block/<int:block_id>/unblock/', owner_views.unblock_dates, name='unblock-dates'),
+    path('owner/calendar/bulk/', owner_views.bulk_calendar_update, name='bulk-calendar-update'),
     
     # Sprint-1: Payout Requests
     path('owner/payout/request/', owner_views.request_payout, name='payout-request'),
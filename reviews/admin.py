@@ -8,11 +8,13 @@ Admin capabilities:
 - Filter by approval status, rating, entity
 - Bulk actions for moderation
 - View booking verification
+- Bulk actions rebuild the affected rating aggregates
 """
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils import timezone
-from .models import HotelReview, BusReview, PackageReview
+from .models import HotelReview, BusReview, PackageReview, RatingAggregate
+from .ratings import recompute_for_reviews
 
 
 class ReviewAdminMixin:
@@ -123,18 +125,21 @@ class ReviewAdminMixin:
             approved_at=None,
             approved_by=None
         )
+        recompute_for_reviews(queryset)
         self.message_user(request, f'✗ Unapproved {updated} review(s)')
     unapprove_reviews.short_description = '✗ Unapprove selected reviews'
     
     def hide_reviews(self, request, queryset):
         """Hide selected reviews (soft delete)."""
         updated = queryset.update(is_hidden=True)
+        recompute_for_reviews(queryset)
         self.message_user(request, f'🙈 Hidden {updated} review(s)')
     hide_reviews.short_description = '🙈 Hide selected reviews'
     
     def unhide_reviews(self, request, queryset):
         """Unhide selected reviews."""
         updated = queryset.update(is_hidden=False)
+        recompute_for_reviews(queryset)
         self.message_user(request, f'👁 Unhidden {updated} review(s)')
     unhide_reviews.short_description = '👁 Unhide selected reviews'
 
@@ -177,3 +182,18 @@ class PackageReviewAdmin(ReviewAdminMixin, admin.ModelAdmin):
             return '—'
     entity_name.short_description = 'Package'
 
+
+
+@admin.register(RatingAggregate)
+class RatingAggregateAdmin(admin.ModelAdmin):
+    """Read-only view of the running rating totals (rebuilt by reconcile_review_ratings)."""
+
+    list_display = ['entity_type', 'entity_id', 'average_rating', 'rating_count', 'bayesian_score', 'decayed_score', 'updated_at']
+    list_filter = ['entity_type']
+    search_fields = ['entity_id']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
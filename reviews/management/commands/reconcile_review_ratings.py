@@ -0,0 +1,27 @@
+"""
+Management command to rebuild review rating aggregates from the review tables.
+Signals keep aggregates current; run this nightly (to refresh time-decayed scores)
+and after bulk imports or raw SQL edits:
+python manage.py reconcile_review_ratings [--type hotel --type bus]
+"""
+from django.core.management.base import BaseCommand
+
+from reviews.ratings import SOURCES, recompute
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hotel/bus/package rating aggregates and entity rating columns in one pass per type'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            action='append',
+            choices=list(SOURCES),
+            dest='types',
+            help='Entity type to rebuild (repeatable; default: all)',
+        )
+
+    def handle(self, *args, **options):
+        for entity_type in options['types'] or SOURCES:
+            written = recompute(entity_type)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} {entity_type} rating aggregates'))
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_remove_busreview_booking_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('hotel', 'Hotel Review'), ('bus', 'Bus Review'), ('package', 'Package Review')], max_length=20)),
+                ('entity_id', models.BigIntegerField()),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('stars_1', models.IntegerField(default=0)),
+                ('stars_2', models.IntegerField(default=0)),
+                ('stars_3', models.IntegerField(default=0)),
+                ('stars_4', models.IntegerField(default=0)),
+                ('stars_5', models.IntegerField(default=0)),
+                ('decayed_sum', models.FloatField(default=0)),
+                ('decayed_weight', models.FloatField(default=0)),
+                ('decayed_at', models.DateTimeField(blank=True, null=True)),
+                ('average_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('bayesian_score', models.DecimalField(decimal_places=4, default=0, help_text='Average smoothed towards the prior', max_digits=5)),
+                ('decayed_score', models.DecimalField(decimal_places=4, default=0, help_text='Recency-weighted, smoothed average', max_digits=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Rating Aggregate',
+                'verbose_name_plural': 'Rating Aggregates',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ratingaggregate',
+            constraint=models.UniqueConstraint(fields=('entity_type', 'entity_id'), name='reviews_rating_agg_entity_uniq'),
+        ),
+    ]
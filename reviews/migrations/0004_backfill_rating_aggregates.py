@@ -0,0 +1,86 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+
+# entity type -> (review model, review entity field, (app, entity model), entity (average, count) columns)
+SOURCES = {
+    'hotel': ('HotelReview', 'hotel_id', ('hotels', 'Hotel'), ('review_rating', 'review_count')),
+    'bus': ('BusReview', 'bus_id', ('buses', 'Bus'), ('average_rating', 'total_reviews')),
+    'package': ('PackageReview', 'package_id', ('packages', 'Package'), ('rating', 'review_count')),
+}
+
+
+def _quantize(value, places):
+    return Decimal(str(value)).quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    """Build RatingAggregate rows from the existing visible reviews (what reviews.ratings.recompute() does)"""
+    RatingAggregate = apps.get_model('reviews', 'RatingAggregate')
+    HotelSearchDocument = apps.get_model('hotels', 'HotelSearchDocument')
+    half_life = getattr(settings, 'REVIEW_RATING_HALF_LIFE_DAYS', 180)
+    prior_mean = getattr(settings, 'REVIEW_RATING_PRIOR_MEAN', 3.5)
+    prior_weight = getattr(settings, 'REVIEW_RATING_PRIOR_WEIGHT', 5)
+    now = timezone.now()
+
+    def score(total, weight):
+        return (prior_mean * prior_weight + total) / (prior_weight + weight) if weight + prior_weight > 0 else 0
+
+    for entity_type, (review_model, entity_field, entity_model, (average_field, count_field)) in SOURCES.items():
+        Review = apps.get_model('reviews', review_model)
+        Entity = apps.get_model(*entity_model)
+        aggregates = {}
+        reviews = Review.objects.filter(is_approved=True, is_hidden=False).order_by()
+        for entity_id, rating, written_at in reviews.values_list(entity_field, 'rating', 'created_at').iterator():
+            aggregate = aggregates.get(entity_id)
+            if aggregate is None:
+                aggregate = aggregates[entity_id] = RatingAggregate(
+                    entity_type=entity_type, entity_id=entity_id, decayed_at=now,
+                )
+            weight = 0.5 ** (max((now - written_at).total_seconds(), 0.0) / 86400 / half_life) if written_at else 1.0
+            aggregate.rating_sum += rating
+            aggregate.rating_count += 1
+            setattr(aggregate, f'stars_{rating}', getattr(aggregate, f'stars_{rating}') + 1)
+            aggregate.decayed_sum += rating * weight
+            aggregate.decayed_weight += weight
+
+        for aggregate in aggregates.values():
+            aggregate.average_rating = _quantize(aggregate.rating_sum / aggregate.rating_count, 2)
+            aggregate.bayesian_score = _quantize(score(aggregate.rating_sum, aggregate.rating_count), 4)
+            aggregate.decayed_score = _quantize(score(aggregate.decayed_sum, aggregate.decayed_weight), 4)
+            Entity.objects.filter(pk=aggregate.entity_id).update(**{
+                average_field: aggregate.average_rating, count_field: aggregate.rating_count,
+            })
+            if entity_type == 'hotel':
+                HotelSearchDocument.objects.filter(hotel_id=aggregate.entity_id).update(
+                    review_rating=aggregate.average_rating,
+                )
+
+        # Entities whose stored columns claim reviews they no longer have
+        missing = list(
+            Entity.objects.exclude(**{count_field: 0, average_field: 0})
+            .exclude(pk__in=list(aggregates)).values_list('pk', flat=True)
+        )
+        Entity.objects.filter(pk__in=missing).update(**{average_field: 0, count_field: 0})
+        if entity_type == 'hotel':
+            HotelSearchDocument.objects.filter(hotel_id__in=missing).update(review_rating=0)
+
+        RatingAggregate.objects.filter(entity_type=entity_type).delete()
+        RatingAggregate.objects.bulk_create(aggregates.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_ratingaggregate'),
+        ('hotels', '0025_roomnightfact_hoteloccupancyrollup'),
+        ('buses', '0008_bustripindex'),
+        ('packages', '0005_packagedeparture_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -7,8 +7,9 @@ Industry-standard review system:
 - Admin has full control (approve/hide)
 - Linked to bookings for verification
 - Soft delete only
+- Visible ratings are rolled up per entity in RatingAggregate (reviews.ratings)
 """
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -79,10 +80,17 @@ class Review(TimeStampedModel):
                 f"Review cannot be created. Booking must be COMPLETED with payment. Current status: {self.booking.status}"
             )
 
+    @property
+    def is_visible(self):
+        """Counts towards the public rating: approved and not hidden."""
+        return self.is_approved and not self.is_hidden
+
     def save(self, *args, **kwargs):
         """Run validation before persisting to enforce eligibility rules."""
         self.full_clean()
-        return super().save(*args, **kwargs)
+        # The rating aggregate is updated from post_save; commit both or neither
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
 
 
 class HotelReview(Review):
@@ -177,3 +185,47 @@ class PackageReview(Review):
             if self.booking.package_details.package_departure.package_id != self.package_id:
                 raise ValidationError("Review must reference the same package as the booking.")
 
+
+
+class RatingAggregate(models.Model):
+    """Running rating totals for one hotel, bus or package.
+
+    Maintained by reviews.signals as reviews are approved, hidden, re-rated
+    or deleted, and rebuilt by ``manage.py reconcile_review_ratings``. Only
+    visible reviews (approved, not hidden) are counted. ``decayed_sum`` and
+    ``decayed_weight`` are as of ``decayed_at``; each review weighs
+    0.5 ** (age / REVIEW_RATING_HALF_LIFE_DAYS).
+    """
+    ENTITY_TYPES = Review.REVIEW_TYPES
+
+    entity_type = models.CharField(max_length=20, choices=ENTITY_TYPES)
+    entity_id = models.BigIntegerField()
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    stars_1 = models.IntegerField(default=0)
+    stars_2 = models.IntegerField(default=0)
+    stars_3 = models.IntegerField(default=0)
+    stars_4 = models.IntegerField(default=0)
+    stars_5 = models.IntegerField(default=0)
+    decayed_sum = models.FloatField(default=0)
+    decayed_weight = models.FloatField(default=0)
+    decayed_at = models.DateTimeField(null=True, blank=True)
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    bayesian_score = models.DecimalField(max_digits=5, decimal_places=4, default=0, help_text="Average smoothed towards the prior")
+    decayed_score = models.DecimalField(max_digits=5, decimal_places=4, default=0, help_text="Recency-weighted, smoothed average")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entity_type', 'entity_id'], name='reviews_rating_agg_entity_uniq'),
+        ]
+        verbose_name = 'Rating Aggregate'
+        verbose_name_plural = 'Rating Aggregates'
+
+    def __str__(self):
+        return f"{self.entity_type} #{self.entity_id}: {self.average_rating} ({self.rating_count})"
+
+    @property
+    def histogram(self):
+        """{stars: count} for 1-5."""
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
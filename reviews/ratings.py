@@ -0,0 +1,232 @@
+"""
+Review rating aggregates
+
+Keeps a RatingAggregate row per hotel, bus and package so ratings never need
+an AVG scan over the review tables:
+- a visible review (approved, not hidden) adds its stars to the running
+  sum/count/histogram; approval, hiding, re-rating, moving or deleting a
+  review applies the difference under a row lock, in the review's transaction
+- time decay: every review weighs 0.5 ** (age / REVIEW_RATING_HALF_LIFE_DAYS);
+  the weighted sums are rolled forward to "now" on each change
+- Bayesian smoothing pulls entities with few reviews towards
+  REVIEW_RATING_PRIOR_MEAN with the weight of REVIEW_RATING_PRIOR_WEIGHT reviews
+- the plain average and count are copied onto the entity columns that
+  listings read (Hotel.review_rating/review_count and its search document,
+  Bus.average_rating/total_reviews, Package.rating/review_count)
+- recompute() rebuilds aggregates from the review tables in one pass per
+  type (reconcile_review_ratings command, bulk admin actions)
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from buses.models import Bus
+from hotels.models import Hotel
+from hotels.search_index import refresh_search_documents
+from packages.models import Package
+
+from .models import BusReview, HotelReview, PackageReview, RatingAggregate
+
+RECOMPUTE_BATCH_SIZE = 1000
+
+# entity type -> (review model, review entity field, entity manager, entity (average, count) columns)
+SOURCES = {
+    'hotel': (HotelReview, 'hotel_id', Hotel.all_objects, ('review_rating', 'review_count')),
+    'bus': (BusReview, 'bus_id', Bus.objects, ('average_rating', 'total_reviews')),
+    'package': (PackageReview, 'package_id', Package.objects, ('rating', 'review_count')),
+}
+
+SCORE_FIELDS = ('average_rating', 'bayesian_score', 'decayed_score')
+
+
+def half_life_days():
+    return getattr(settings, 'REVIEW_RATING_HALF_LIFE_DAYS', 180)
+
+
+def prior():
+    """(mean, weight) of the Bayesian prior."""
+    return (
+        getattr(settings, 'REVIEW_RATING_PRIOR_MEAN', 3.5),
+        getattr(settings, 'REVIEW_RATING_PRIOR_WEIGHT', 5),
+    )
+
+
+def entity_type_for(review):
+    for entity_type, (model, *_) in SOURCES.items():
+        if isinstance(review, model):
+            return entity_type
+    raise ValueError(f"Not a review: {review!r}")
+
+
+def decay_factor(since, until):
+    """Weight a review written at ``since`` has left at ``until``."""
+    if since is None or until is None:
+        return 1.0
+    age_days = max((until - since).total_seconds(), 0.0) / 86400
+    return 0.5 ** (age_days / half_life_days())
+
+
+def _quantize(value, places):
+    return Decimal(str(value)).quantize(Decimal(1).scaleb(-places), rounding=ROUND_HALF_UP)
+
+
+def _score(total, weight):
+    mean, prior_weight = prior()
+    if weight + prior_weight <= 0:
+        return 0
+    return (mean * prior_weight + total) / (prior_weight + weight)
+
+
+def refresh_scores(aggregate):
+    """Recompute the derived score columns from the running totals."""
+    count = aggregate.rating_count
+    aggregate.average_rating = _quantize(aggregate.rating_sum / count if count else 0, 2)
+    aggregate.bayesian_score = _quantize(_score(aggregate.rating_sum, count) if count else 0, 4)
+    aggregate.decayed_score = _quantize(
+        _score(aggregate.decayed_sum, aggregate.decayed_weight) if count else 0, 4
+    )
+    return aggregate
+
+
+def _roll(aggregate, now):
+    """Age the weighted sums from decayed_at to ``now``."""
+    factor = decay_factor(aggregate.decayed_at, now)
+    aggregate.decayed_sum *= factor
+    aggregate.decayed_weight *= factor
+    aggregate.decayed_at = now
+
+
+def _add(aggregate, rating, written_at, sign, now):
+    weight = decay_factor(written_at, now)
+    aggregate.rating_sum += sign * rating
+    aggregate.rating_count += sign
+    field = f'stars_{rating}'
+    setattr(aggregate, field, getattr(aggregate, field) + sign)
+    aggregate.decayed_sum += sign * rating * weight
+    aggregate.decayed_weight += sign * weight
+    if aggregate.rating_count <= 0:
+        # Clear float residue once the last review is gone
+        aggregate.decayed_sum = aggregate.decayed_weight = 0.0
+
+
+def _sync_entities(entity_type, aggregates, missing=()):
+    """Copy average/count onto the entity rows listings read."""
+    _, _, manager, (average_field, count_field) = SOURCES[entity_type]
+    for aggregate in aggregates:
+        manager.filter(pk=aggregate.entity_id).update(**{
+            average_field: aggregate.average_rating, count_field: aggregate.rating_count,
+        })
+    if missing:
+        manager.filter(pk__in=list(missing)).update(**{average_field: 0, count_field: 0})
+    if entity_type == 'hotel':
+        refresh_search_documents([aggregate.entity_id for aggregate in aggregates] + list(missing))
+
+
+def apply_delta(entity_type, entity_id, changes, now=None):
+    """
+    Apply ``changes`` - (rating, written_at, +1/-1) tuples - to one entity's
+    aggregate under a row lock and sync the entity columns.
+    """
+    if not changes or entity_id is None:
+        return None
+    now = now or timezone.now()
+    with transaction.atomic():
+        _, created = RatingAggregate.objects.get_or_create(entity_type=entity_type, entity_id=entity_id)
+        if created:
+            # No aggregate yet (reviews imported without signals): seed it from the review
+            # table, which already includes this change, instead of applying the delta to zero
+            recompute(entity_type, [entity_id], now)
+            return RatingAggregate.objects.filter(entity_type=entity_type, entity_id=entity_id).first()
+        aggregate = RatingAggregate.objects.select_for_update().get(entity_type=entity_type, entity_id=entity_id)
+        _roll(aggregate, now)
+        for rating, written_at, sign in changes:
+            _add(aggregate, rating, written_at, sign, now)
+        refresh_scores(aggregate).save()
+        _sync_entities(entity_type, [aggregate])
+    return aggregate
+
+
+def review_changed(review, previous=None):
+    """
+    Update aggregates for a saved ``review``; ``previous`` is its stored
+    (is_visible, rating, entity id) before the save, None when it is new.
+    """
+    entity_type = entity_type_for(review)
+    entity_field = SOURCES[entity_type][1]
+    current = (review.is_visible, review.rating, getattr(review, entity_field))
+    if previous == current:
+        return
+    deltas = defaultdict(list)
+    if previous and previous[0]:
+        deltas[previous[2]].append((previous[1], review.created_at, -1))
+    if current[0]:
+        deltas[current[2]].append((current[1], review.created_at, 1))
+    now = timezone.now()
+    for entity_id, changes in deltas.items():
+        apply_delta(entity_type, entity_id, changes, now)
+
+
+def review_deleted(review):
+    if review.is_visible:
+        entity_type = entity_type_for(review)
+        apply_delta(entity_type, getattr(review, SOURCES[entity_type][1]), [(review.rating, review.created_at, -1)])
+
+
+def recompute(entity_type, entity_ids=None, now=None):
+    """
+    Rebuild aggregates for ``entity_ids`` (default: every entity of the type)
+    from the review table in one pass. Returns the number of aggregates written.
+    """
+    model, entity_field, manager, (average_field, count_field) = SOURCES[entity_type]
+    now = now or timezone.now()
+    reviews = model.objects.filter(is_approved=True, is_hidden=False).order_by()
+    if entity_ids is not None:
+        entity_ids = set(entity_ids)
+        reviews = reviews.filter(**{f'{entity_field}__in': entity_ids})
+
+    aggregates = {}
+    for entity_id, rating, written_at in reviews.values_list(entity_field, 'rating', 'created_at').iterator(RECOMPUTE_BATCH_SIZE):
+        aggregate = aggregates.get(entity_id)
+        if aggregate is None:
+            aggregate = aggregates[entity_id] = RatingAggregate(
+                entity_type=entity_type, entity_id=entity_id, decayed_at=now,
+            )
+        _add(aggregate, rating, written_at, 1, now)
+    for aggregate in aggregates.values():
+        refresh_scores(aggregate)
+
+    stale = RatingAggregate.objects.filter(entity_type=entity_type)
+    if entity_ids is not None:
+        stale = stale.filter(entity_id__in=entity_ids)
+    with transaction.atomic():
+        if entity_ids is None:
+            # Entities whose stored columns claim reviews they no longer have
+            missing = set(
+                manager.exclude(**{count_field: 0, average_field: 0}).values_list('pk', flat=True)
+            ) - set(aggregates)
+        else:
+            missing = entity_ids - set(aggregates)
+        stale.delete()
+        RatingAggregate.objects.bulk_create(aggregates.values(), batch_size=RECOMPUTE_BATCH_SIZE)
+        _sync_entities(entity_type, aggregates.values(), missing)
+    return len(aggregates)
+
+
+def recompute_for_reviews(queryset):
+    """Rebuild the aggregates touched by a bulk update of ``queryset`` (admin actions)."""
+    entity_type = entity_type_for(queryset.model())
+    entity_field = SOURCES[entity_type][1]
+    return recompute(entity_type, queryset.order_by().values_list(entity_field, flat=True).distinct())
+
+
+def order_by_score(queryset, entity_type, score='bayesian_score', descending=True):
+    """Order an entity queryset by one of SCORE_FIELDS; entities without reviews sort last."""
+    if score not in SCORE_FIELDS:
+        raise ValueError(f"Unknown rating score: {score}")
+    value = RatingAggregate.objects.filter(entity_type=entity_type, entity_id=OuterRef('pk')).values(score)[:1]
+    key = F('rating_score').desc(nulls_last=True) if descending else F('rating_score').asc(nulls_last=True)
+    return queryset.annotate(rating_score=Subquery(value)).order_by(key, 'pk')
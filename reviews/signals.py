@@ -0,0 +1,52 @@
+"""
+Signals for Reviews app - keep RatingAggregate and the entity rating columns in step with visible reviews
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from buses.models import Bus
+from hotels.models import Hotel
+from packages.models import Package
+from . import ratings
+from .models import BusReview, HotelReview, PackageReview, RatingAggregate
+
+
+def _entity_key(review):
+    entity_type = ratings.entity_type_for(review)
+    return entity_type, getattr(review, ratings.SOURCES[entity_type][1])
+
+
+@receiver(pre_save, sender=HotelReview)
+@receiver(pre_save, sender=BusReview)
+@receiver(pre_save, sender=PackageReview)
+def remember_rating_state(sender, instance, raw=False, **kwargs):
+    instance._previous_rating_state = None
+    if raw or instance.pk is None:
+        return
+    entity_type, _ = _entity_key(instance)
+    row = sender.objects.filter(pk=instance.pk).values_list(
+        'is_approved', 'is_hidden', 'rating', ratings.SOURCES[entity_type][1],
+    ).first()
+    if row:
+        instance._previous_rating_state = (row[0] and not row[1], row[2], row[3])
+
+
+@receiver(post_save, sender=HotelReview)
+@receiver(post_save, sender=BusReview)
+@receiver(post_save, sender=PackageReview)
+def apply_review_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ratings.review_changed(instance, getattr(instance, '_previous_rating_state', None))
+
+
+@receiver(post_delete, sender=HotelReview)
+@receiver(post_delete, sender=BusReview)
+@receiver(post_delete, sender=PackageReview)
+def apply_review_delete(sender, instance, **kwargs):
+    if isinstance(kwargs.get('origin'), (Hotel, Bus, Package)):
+        # Cascade from the entity itself: its aggregate goes too
+        entity_type, entity_id = _entity_key(instance)
+        RatingAggregate.objects.filter(entity_type=entity_type, entity_id=entity_id).delete()
+        return
+    ratings.review_deleted(instance)
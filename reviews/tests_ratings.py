@@ -0,0 +1,139 @@
+"""
+Review rating aggregate tests
+Incremental sum/count/histogram on approve, hide, re-rate and delete; smoothed and decayed scores; one-pass reconciliation
+"""
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from bookings.models import Booking, HotelBooking
+from core.models import City
+from hotels.models import Hotel, HotelSearchDocument, RoomType
+from packages.models import Package
+from . import ratings
+from .models import HotelReview, PackageReview, RatingAggregate
+
+User = get_user_model()
+
+
+@override_settings(REVIEW_RATING_PRIOR_MEAN=3.0, REVIEW_RATING_PRIOR_WEIGHT=2, REVIEW_RATING_HALF_LIFE_DAYS=30)
+class RatingAggregateTests(TestCase):
+
+    def setUp(self):
+        city = City.objects.create(name='Goa', state='Goa')
+        self.hotel = Hotel.objects.create(
+            name='Sea View', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+        )
+        self.other = Hotel.objects.create(
+            name='Hill Top', description='d', city=city, address='a', contact_phone='1', contact_email='h@x.com',
+        )
+        for hotel in (self.hotel, self.other):
+            RoomType.objects.create(hotel=hotel, name='Std', description='d', base_price=Decimal('2500.00'), total_rooms=10)
+
+    def _review(self, rating, approved=True, hotel=None):
+        hotel = hotel or self.hotel
+        user = User.objects.create_user(username=f'guest{User.objects.count()}', email=f'g{User.objects.count()}@x.com')
+        booking = Booking.objects.create(
+            user=user, booking_type='hotel', status='completed', total_amount=Decimal('100.00'),
+            paid_amount=Decimal('100.00'), customer_name='G', customer_email='g@x.com', customer_phone='9',
+        )
+        HotelBooking.objects.create(
+            booking=booking, room_type=hotel.room_types.first(), check_in=date.today() - timedelta(days=3),
+            check_out=date.today() - timedelta(days=1), number_of_rooms=1, total_nights=2,
+        )
+        return HotelReview.objects.create(
+            review_type='hotel', user=user, booking=booking, hotel=hotel,
+            rating=rating, comment='c', is_approved=approved,
+        )
+
+    def _aggregate(self, hotel=None):
+        return RatingAggregate.objects.get(entity_type='hotel', entity_id=(hotel or self.hotel).pk)
+
+    def test_moderation_updates_aggregate_and_entity_columns(self):
+        reviews = [self._review(5), self._review(4), self._review(2, approved=False)]
+        aggregate = self._aggregate()
+        self.assertEqual((aggregate.rating_sum, aggregate.rating_count), (9, 2))
+        self.assertEqual(aggregate.histogram, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1})
+        self.assertEqual(aggregate.bayesian_score, Decimal('3.7500'))
+
+        reviews[2].is_approved = True
+        reviews[2].save()
+        reviews[0].is_hidden = True
+        reviews[0].save()
+        reviews[1].rating = 3
+        reviews[1].save()
+        self.hotel.refresh_from_db()
+        self.assertEqual((self.hotel.review_rating, self.hotel.review_count), (Decimal('2.50'), 2))
+        self.assertEqual(HotelSearchDocument.objects.get(hotel=self.hotel).review_rating, Decimal('2.50'))
+        self.assertEqual(self._aggregate().histogram, {1: 0, 2: 1, 3: 1, 4: 0, 5: 0})
+
+        reviews[2].delete()
+        reviews[1].delete()
+        aggregate = self._aggregate()
+        self.assertEqual((aggregate.rating_count, aggregate.average_rating, aggregate.decayed_weight), (0, Decimal('0.00'), 0.0))
+
+    def test_decayed_score_favours_recent_reviews(self):
+        old = self._review(1)
+        HotelReview.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=60))
+        self._review(3, hotel=self.other)
+        ratings.recompute('hotel')
+        self._review(5)
+
+        aggregate = self._aggregate()
+        # Two half-lives: the 1-star review weighs a quarter of the new 5-star one
+        self.assertAlmostEqual(aggregate.decayed_weight, 1.25, places=3)
+        self.assertEqual(aggregate.average_rating, Decimal('3.00'))
+        self.assertGreater(aggregate.decayed_score, aggregate.bayesian_score)
+
+        ranked = ratings.order_by_score(Hotel.objects.all(), 'hotel', 'decayed_score')
+        self.assertEqual([hotel.pk for hotel in ranked], [self.hotel.pk, self.other.pk])
+
+    def test_reconcile_rebuilds_from_review_tables(self):
+        self._review(4)
+        self._review(2)
+        package = Package.objects.create(
+            name='Goa Escape', description='d', package_type='beach', duration_days=3, duration_nights=2,
+            starting_price=Decimal('9999.00'), rating=Decimal('4.90'), review_count=12,
+        )
+        stale = Hotel.objects.create(
+            name='Seeded', description='d', city=self.hotel.city, address='a', contact_phone='1',
+            contact_email='h@x.com', review_rating=Decimal('4.50'), review_count=150,
+        )
+        user = User.objects.create_user(username='bulk', email='b@x.com')
+        # Imported rows skip save() and signals
+        PackageReview.objects.bulk_create([
+            PackageReview(review_type='package', user=user, package=package, rating=rating, comment='c', is_approved=True)
+            for rating in (5, 4, 4)
+        ])
+        RatingAggregate.objects.filter(entity_type='hotel').update(rating_sum=99)
+
+        call_command('reconcile_review_ratings', stdout=io.StringIO())
+
+        self.assertEqual(self._aggregate().rating_sum, 6)
+        package.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((package.rating, package.review_count), (Decimal('4.33'), 3))
+        self.assertEqual((stale.review_rating, stale.review_count), (Decimal('0.00'), 0))
+
+    def test_first_change_seeds_aggregate_from_existing_reviews(self):
+        legacy = [self._review(5), self._review(4)]
+        # Reviews that predate the aggregates: the entity columns are right, no aggregate row exists
+        RatingAggregate.objects.all().delete()
+        Hotel.all_objects.filter(pk=self.hotel.pk).update(review_rating=Decimal('4.50'), review_count=2)
+
+        legacy[1].is_approved = False
+        legacy[1].save()
+        self.hotel.refresh_from_db()
+        self.assertEqual((self.hotel.review_rating, self.hotel.review_count), (Decimal('5.00'), 1))
+        self.assertEqual((self._aggregate().rating_sum, self._aggregate().rating_count), (5, 1))
+
+        legacy[0].is_hidden = True
+        RatingAggregate.objects.all().delete()
+        legacy[0].save()
+        self.hotel.refresh_from_db()
+        self.assertEqual((self.hotel.review_rating, self.hotel.review_count), (Decimal('0.00'), 0))
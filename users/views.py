@@ -447,7 +447,7 @@ def user_profile(request):
     CATEGORY B FIX: Runs lightweight expiry sync on page load to avoid stale 'payment_pending' rows.
     """
     from bookings.models import Booking
-    from payments.models import Wallet, CashbackLedger
+    from payments.models import Wallet
     from bookings.pricing_calculator import calculate_pricing
     from decimal import Decimal
     from django.utils import timezone
@@ -493,21 +493,9 @@ def user_profile(request):
     logger.info("[PROFILE_PAGE_LOADED] user=%s bookings_count=%d wallet_balance=%.2f expired_synced=%d",
                 request.user.email, len(bookings), wallet_balance, expired_count)
     
-    # Get active cashback
-    active_cashback = Decimal('0.00')
-    cashback_expiry = None
-    if wallet:
-        cashback_ledgers = CashbackLedger.objects.filter(
-            wallet=wallet,
-            is_used=False,
-            is_expired=False,
-            expires_at__gte=timezone.now()
-        ).order_by('expires_at')
-        
-        for ledger in cashback_ledgers:
-            active_cashback += ledger.amount
-            if not cashback_expiry or ledger.expires_at < cashback_expiry:
-                cashback_expiry = ledger.expires_at
+    # Get active cashback (materialized on the wallet row)
+    active_cashback = wallet.get_available_cashback() if wallet else Decimal('0.00')
+    cashback_expiry = wallet.cashback_next_expiry if wallet else None
     
     return render(request, 'users/profile.html', {
         'bookings': bookings,